@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+多关键词匹配的微基准：原有的逐个关键词扫描 vs MultiPatternMatcher
+
+对比三个热路径（每份报告调用一次或多次）：
+- 报告头部过滤：逐行 `any(keyword in line ...)` + 逐行正则 vs 全文单遍扫描（_filter_header_info）
+- 风险征兆识别：逐个证据样本 `any(keyword.lower() in text ...)` vs 单遍扫描后查集合（identify_risk_signs）
+- 诊断边界修正：`any(keyword in text ...)` vs 匹配器search（_fix_diagnosis_boundary）
+
+另附一个纯Python的Aho-Corasick自动机作为参照：逐字符跳转的解释开销在报告长度的文本上
+高于逐个关键词的`in`，MultiPatternMatcher因此由re的C实现完成扫描。
+
+语料目录中的每个文件（*.txt）是一份报告的OCR文本；不指定时使用内置的示例报告。
+
+用法：
+    uv run python scripts/benchmark_multi_pattern.py [语料目录] [--number 2000]
+"""
+
+import argparse
+import bisect
+import itertools
+import re
+import sys
+import timeit
+from collections import deque
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from medcrux.analysis.report_structure_parser import (  # noqa: E402
+    DIAGNOSIS_KEYWORD_MATCHER,
+    DIAGNOSIS_START_KEYWORDS,
+    HEADER_KEYWORD_MATCHER,
+    HEADER_KEYWORDS,
+)
+from medcrux.analysis.risk_sign_identifier import identify_risk_signs  # noqa: E402
+from medcrux.analysis.risk_sign_samples import STRONG_EVIDENCE_SAMPLES, WEAK_EVIDENCE_SAMPLES  # noqa: E402
+
+SAMPLE_REPORT = """某某医院超声检查报告
+姓名：[姓名] 性别：女 年龄：45岁 超声号：[编号] 住院号：[编号]
+科别：乳腺外科 床号：12 检查部位：双侧乳腺 仪器名称：[仪器] 院区：总院
+检查所见：
+双侧乳腺腺体结构清晰，在左侧乳腺3点钟方向距乳头约1.9cm处可见大小约1.2×0.8×0.6cm低回声结节，
+椭圆形，边界清晰，均匀低回声，平行，后方回声无明显改变，CDFI：未见明显血流信号。
+右侧乳腺10点钟方向可见0.9×0.6cm低回声结节，形态不规则，边界模糊，可见毛刺，内部回声不均匀。
+双侧腋窝未见明显肿大淋巴结。
+影像学诊断：
+1.左侧乳腺低回声结节，BI-RADS 3类。
+2.右侧乳腺低回声结节，BI-RADS 4A类。
+建议：定期复查，必要时穿刺活检。
+报告医师：[姓名] 报告日期：[日期]
+"""
+
+_LEGACY_HEADER_PATTERN = r"(姓名|年龄|性别|超声号|住院号|科别|床号|检查部位|仪器名称|院区)[:：]\s*"
+
+
+def legacy_header_lines(text: str) -> list[str]:
+    """原有的_filter_header_info逐行扫描"""
+    filtered = []
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if any(keyword in stripped for keyword in HEADER_KEYWORDS):
+            continue
+        if re.search(_LEGACY_HEADER_PATTERN, stripped):
+            continue
+        filtered.append(stripped)
+    return filtered
+
+
+def matcher_header_lines(text: str) -> list[str]:
+    """全文单遍扫描（与_filter_header_info相同的做法）"""
+    lines = text.split("\n")
+    line_starts = list(itertools.accumulate((len(line) + 1 for line in lines), initial=0))
+    header_lines = set()
+    match = HEADER_KEYWORD_MATCHER.find(text)
+    while match is not None:
+        line_index = bisect.bisect_right(line_starts, match.start) - 1
+        header_lines.add(line_index)
+        match = HEADER_KEYWORD_MATCHER.find(text, line_starts[line_index + 1])
+    return [line.strip() for index, line in enumerate(lines) if line.strip() and index not in header_lines]
+
+
+def legacy_risk_signs(text: str) -> list[dict[str, str]]:
+    """原有的identify_risk_signs：逐个证据样本、逐个关键词扫描"""
+    text = text.lower()
+    risk_signs = []
+    for level, samples in (("strong", STRONG_EVIDENCE_SAMPLES), ("weak", WEAK_EVIDENCE_SAMPLES)):
+        for evidence in samples:
+            matched = any(keyword.lower() in text for keyword in evidence["keywords"])
+            if matched and not any(rs["sign"] == evidence["sign"] for rs in risk_signs):
+                risk_signs.append(
+                    {
+                        "sign": evidence["sign"],
+                        "evidence_level": level,
+                        "evidence_source": evidence["evidence_source"],
+                        "suggestion": evidence["suggestion"],
+                    }
+                )
+    return risk_signs
+
+
+def matcher_risk_signs(text: str) -> list[dict[str, str]]:
+    """当前的identify_risk_signs：单遍扫描后按证据样本查集合"""
+    return identify_risk_signs({}, findings_text=text)
+
+
+class PurePythonAhoCorasick:
+    """纯Python的Aho-Corasick自动机（仅作参照）"""
+
+    def __init__(self, keywords: list[str]):
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail = [0]
+        self.output: list[list[str]] = [[]]
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append(keyword)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def matched_keywords(self, text: str) -> set[str]:
+        matched = set()
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            matched.update(self.output[state])
+        return matched
+
+
+def load_texts(corpus: Path | None) -> list[str]:
+    if corpus is None:
+        return [SAMPLE_REPORT]
+    return [path.read_text(encoding="utf-8") for path in sorted(corpus.glob("*.txt"))]
+
+
+def bench(func, texts: list[str], number: int) -> float:
+    """每份报告的平均耗时（微秒）"""
+    seconds = timeit.timeit(lambda: [func(text) for text in texts], number=number)
+    return seconds / number / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多关键词匹配微基准")
+    parser.add_argument("corpus", type=Path, nargs="?", help="语料目录（*.txt），默认使用内置示例报告")
+    parser.add_argument("--number", type=int, default=2000, help="每项重复次数")
+    args = parser.parse_args()
+
+    texts = load_texts(args.corpus)
+    if not texts:
+        print(f"❌ 语料目录中没有报告文件: {args.corpus}")
+        sys.exit(1)
+
+    for text in texts:
+        assert legacy_header_lines(text) == matcher_header_lines(text), "头部过滤结果不一致"
+        assert legacy_risk_signs(text) == matcher_risk_signs(text), "风险征兆识别结果不一致"
+
+    samples = STRONG_EVIDENCE_SAMPLES + WEAK_EVIDENCE_SAMPLES
+    evidence_keywords = sorted({keyword.lower() for evidence in samples for keyword in evidence["keywords"]})
+    automaton = PurePythonAhoCorasick(evidence_keywords)
+    cases = [
+        ("头部过滤", legacy_header_lines, matcher_header_lines),
+        ("风险征兆识别", legacy_risk_signs, matcher_risk_signs),
+        (
+            "诊断关键词检查",
+            lambda text: any(keyword in text for keyword in DIAGNOSIS_START_KEYWORDS),
+            DIAGNOSIS_KEYWORD_MATCHER.search,
+        ),
+    ]
+
+    print(f"📊 报告数: {len(texts)}, 平均长度: {sum(map(len, texts)) / len(texts):.0f} 字符（每份报告的平均耗时）")
+    for name, legacy, matcher in cases:
+        legacy_us = bench(legacy, texts, args.number)
+        matcher_us = bench(matcher, texts, args.number)
+        print(f"{name}: 逐个关键词 {legacy_us:.1f}µs → 匹配器 {matcher_us:.1f}µs（{legacy_us / matcher_us:.1f}x）")
+    automaton_us = bench(lambda text: automaton.matched_keywords(text.lower()), texts, args.number)
+    print(f"参照：纯Python Aho-Corasick（风险征兆关键词）{automaton_us:.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
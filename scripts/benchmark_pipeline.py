@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+端到端流程耗时基准（配合LLM录制回放使用）
+
+对语料中的每份报告依次执行报告结构解析、主分析和独立BI-RADS判断，统计每份报告的耗时。
+
+先用真实后端录制一次，之后不需要网络和API Key即可重复运行，结果可复现：
+
+    # 录制（请求真实后端，同时写入录制目录）
+    MEDCRUX_LLM_CASSETTE_MODE=record MEDCRUX_LLM_CASSETTE_DIR=llm_cassettes \\
+        uv run python scripts/benchmark_pipeline.py <语料目录>
+    # 按原始延迟回放（设置MEDCRUX_LLM_CASSETTE_LATENCY_SCALE可缩放延迟，0为不等待）
+    MEDCRUX_LLM_CASSETTE_MODE=replay MEDCRUX_LLM_CASSETTE_DIR=llm_cassettes \\
+        uv run python scripts/benchmark_pipeline.py <语料目录>
+
+录制文件包含报告原文，不要提交到代码仓库。
+语料目录中的每个文件（*.txt）是一份报告的OCR文本。
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from medcrux.analysis.exam_segmenter import isolate_breast_exam  # noqa: E402
+from medcrux.analysis.lesion_cache import lesion_cache  # noqa: E402
+from medcrux.analysis.llm_cassette import get_cassette_mode  # noqa: E402
+from medcrux.analysis.llm_engine import analyze_birads_independently, analyze_text_with_deepseek  # noqa: E402
+from medcrux.analysis.report_structure_parser import build_analysis_input, parse_report_structure  # noqa: E402
+
+
+def run_pipeline(ocr_text: str) -> float:
+    """执行一份报告的LLM流程，返回耗时（秒）"""
+    start = time.perf_counter()
+    exam_text = isolate_breast_exam(ocr_text) or ocr_text
+    report_structure = parse_report_structure(exam_text)
+    analysis_text, _ = build_analysis_input(exam_text, report_structure)
+    analyze_text_with_deepseek(analysis_text)
+    if report_structure.get("findings"):
+        analyze_birads_independently(report_structure["findings"])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端流程耗时基准")
+    parser.add_argument("corpus", type=Path, help="语料目录（*.txt）")
+    args = parser.parse_args()
+
+    files = sorted(args.corpus.glob("*.txt"))
+    if not files:
+        print(f"❌ 语料目录中没有报告文件: {args.corpus}")
+        sys.exit(1)
+
+    # 病灶缓存会让重复运行少发请求，基准期间关闭，保证录制和回放的请求序列一致
+    lesion_cache.max_size = 0
+    print(f"📊 录制回放模式: {get_cassette_mode()}，报告数: {len(files)}")
+    timings = []
+    for path in files:
+        elapsed = run_pipeline(path.read_text(encoding="utf-8"))
+        timings.append(elapsed)
+        print(f"  {path.name:<30} {elapsed:>8.2f}秒")
+
+    print(f"✅ 合计 {sum(timings):.2f}秒，中位数 {statistics.median(timings):.2f}秒，最大 {max(timings):.2f}秒")
+
+
+if __name__ == "__main__":
+    main()
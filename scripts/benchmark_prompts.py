@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+提示词变体基准：对比不同提示词的token、延迟、JSON有效率和结果一致率
+
+对语料中的每份报告，按每个命名变体依次执行报告结构解析、主分析和独立BI-RADS判断，
+按阶段统计（llm_metrics记录的实际用量）：
+- 平均输入/输出token（每次调用）
+- 延迟p50/p95
+- JSON有效率：直接解析成功的比例（clean）、最终解析成功的比例（含本地修复和续写/纠正）
+- 一致率：结果与参考输出一致的比例（--runs大于1时统计每份报告的每次运行）
+  （参考输出默认为第一个变体第一次运行的结果，也可以用--reference指定之前保存的参考输出）
+
+后端使用当前配置，建议使用本地替身服务（MEDCRUX_LLM_PROVIDER=local）或录制回放
+（MEDCRUX_LLM_CASSETTE_MODE=replay，见llm_cassette），结果可复现且不消耗API额度。
+
+变体文件（JSON）中每个变体可以覆盖环境变量和提示词（提示词文件路径相对于变体文件）：
+    {
+        "baseline": {},
+        "full_schema": {"env": {"MEDCRUX_LLM_SCHEMA": "full"}},
+        "short_structure": {"prompts": {"REPORT_STRUCTURE_SYSTEM_PROMPT": "prompts/structure_short.txt"}}
+    }
+可覆盖的提示词见PROMPT_TARGETS。未指定变体文件时对比紧凑编码和原有输出格式。
+
+语料目录中的每个文件（*.txt）是一份报告的OCR文本。
+
+用法：
+    uv run python scripts/benchmark_prompts.py <语料目录> [--variants 变体.json] [--runs 1]
+        [--reference 参考输出.json] [--save-reference 参考输出.json] [--csv 结果.csv] [--markdown 结果.md]
+"""
+
+import argparse
+import csv
+import difflib
+import json
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from medcrux.analysis import llm_engine, report_structure_parser  # noqa: E402
+from medcrux.analysis.lesion_cache import lesion_cache  # noqa: E402
+from medcrux.analysis.llm_client import (  # noqa: E402
+    STAGE_ANALYSIS,
+    STAGE_INDEPENDENT_BIRADS,
+    STAGE_REPORT_STRUCTURE,
+)
+from medcrux.analysis.llm_metrics import JSON_PARSE_CLEAN, JSON_PARSE_FAILED, registry  # noqa: E402
+
+STAGES = (STAGE_REPORT_STRUCTURE, STAGE_ANALYSIS, STAGE_INDEPENDENT_BIRADS)
+
+# 变体可覆盖的提示词：名称 → 所在模块
+PROMPT_TARGETS = {
+    "REPORT_STRUCTURE_SYSTEM_PROMPT": report_structure_parser,
+    "REPORT_STRUCTURE_USER_PROMPT": report_structure_parser,
+    "ANALYSIS_SYSTEM_PROMPT": llm_engine,
+    "ANALYSIS_USER_PROMPT": llm_engine,
+    "INDEPENDENT_BIRADS_SYSTEM_PROMPT": llm_engine,
+    "INDEPENDENT_BIRADS_USER_PROMPT": llm_engine,
+    "LESION_USER_PROMPT": llm_engine,
+}
+
+DEFAULT_VARIANTS = {
+    "compact": {"env": {"MEDCRUX_LLM_SCHEMA": "compact"}},
+    "full": {"env": {"MEDCRUX_LLM_SCHEMA": "full"}},
+}
+
+# 检查所见与参考输出的相似度不低于该值时视为一致
+FINDINGS_SIMILARITY_THRESHOLD = 0.9
+
+
+def load_variants(path: Path | None) -> dict[str, dict]:
+    """读取变体文件，提示词替换为文件内容"""
+    if path is None:
+        return DEFAULT_VARIANTS
+    variants = json.loads(path.read_text(encoding="utf-8"))
+    for name, variant in variants.items():
+        prompts = {}
+        for target, prompt_file in (variant.get("prompts") or {}).items():
+            if target not in PROMPT_TARGETS:
+                print(f"❌ 变体{name}中未知的提示词：{target}（可选：{', '.join(PROMPT_TARGETS)}）")
+                sys.exit(1)
+            prompts[target] = (path.parent / prompt_file).read_text(encoding="utf-8")
+        variant["prompts"] = prompts
+    return variants
+
+
+@contextmanager
+def apply_variant(variant: dict):
+    """临时设置变体的环境变量和提示词，退出时恢复"""
+    saved_env = {key: os.environ.get(key) for key in variant.get("env", {})}
+    saved_prompts = {target: getattr(PROMPT_TARGETS[target], target) for target in variant.get("prompts", {})}
+    os.environ.update({key: str(value) for key, value in variant.get("env", {}).items()})
+    for target, prompt in variant.get("prompts", {}).items():
+        setattr(PROMPT_TARGETS[target], target, prompt)
+    try:
+        yield
+    finally:
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        for target, prompt in saved_prompts.items():
+            setattr(PROMPT_TARGETS[target], target, prompt)
+
+
+def _nodule_signature(nodules: list[dict], birads_field: str) -> list[list]:
+    """结节的（侧别, 钟点, BI-RADS）列表，用于比较一致性"""
+    return sorted(
+        [
+            str((nodule.get("location") or {}).get("breast") or ""),
+            str((nodule.get("location") or {}).get("clock_position") or ""),
+            str(nodule.get(birads_field) or ""),
+        ]
+        for nodule in nodules or []
+    )
+
+
+def run_sample(ocr_text: str) -> dict[str, dict]:
+    """执行一份报告的三个阶段，返回各阶段用于比较一致性的输出"""
+    structure = report_structure_parser.parse_report_structure(ocr_text)
+    analysis_text, _ = report_structure_parser.build_analysis_input(ocr_text, structure)
+    analysis = llm_engine.analyze_text_with_deepseek(analysis_text)
+    independent = {}
+    if structure.get("findings"):
+        independent = llm_engine.analyze_birads_independently(structure["findings"])
+
+    birads = report_structure_parser.extract_doctor_birads(structure.get("diagnosis") or "")
+    return {
+        STAGE_REPORT_STRUCTURE: {
+            "findings": structure.get("findings") or "",
+            "diagnosis_birads": sorted(birads.get("birads_set", set())),
+        },
+        STAGE_ANALYSIS: {"nodules": _nodule_signature(analysis.get("nodules"), "birads_class")},
+        STAGE_INDEPENDENT_BIRADS: {
+            "nodules": _nodule_signature(independent.get("nodules"), "llm_birads_class"),
+            "highest": independent.get("llm_highest_birads"),
+        },
+    }
+
+
+def outputs_agree(stage: str, output: dict, reference: dict) -> bool:
+    """阶段输出与参考输出是否一致"""
+    if stage == STAGE_REPORT_STRUCTURE:
+        similarity = difflib.SequenceMatcher(None, output["findings"], reference["findings"]).ratio()
+        return (
+            output["diagnosis_birads"] == reference["diagnosis_birads"] and similarity >= FINDINGS_SIMILARITY_THRESHOLD
+        )
+    return output == reference
+
+
+def run_variant(name: str, variant: dict, samples: dict[str, str], runs: int) -> tuple[dict, dict[str, list]]:
+    """运行一个变体，返回(各阶段用量汇总, 各报告每次运行的输出)"""
+    registry.reset()
+    outputs: dict[str, list] = {sample_name: [] for sample_name in samples}
+    with apply_variant(variant):
+        for _ in range(runs):
+            for sample_name, ocr_text in samples.items():
+                outputs[sample_name].append(run_sample(ocr_text))
+
+    snapshot = registry.snapshot()
+    rows = {}
+    for stage in STAGES:
+        summary = snapshot["stages"].get(stage, {})
+        parse_counts = snapshot["json_parse"].get(stage, {})
+        parsed = sum(count for key, count in parse_counts.items() if key != "repair_rate")
+        calls = summary.get("calls", 0)
+        rows[stage] = {
+            "variant": name,
+            "stage": stage,
+            "calls": calls,
+            "avg_prompt_tokens": round(summary.get("prompt_tokens", 0) / calls, 1) if calls else 0.0,
+            "avg_completion_tokens": round(summary.get("completion_tokens", 0) / calls, 1) if calls else 0.0,
+            "latency_p50": summary.get("latency_p50"),
+            "latency_p95": summary.get("latency_p95"),
+            "json_clean_rate": round(parse_counts.get(JSON_PARSE_CLEAN, 0) / parsed, 4) if parsed else None,
+            "json_valid_rate": round(1 - parse_counts.get(JSON_PARSE_FAILED, 0) / parsed, 4) if parsed else None,
+            "agreement": None,
+        }
+    return rows, outputs
+
+
+def first_run_outputs(outputs: dict[str, list]) -> dict[str, dict]:
+    """各报告第一次运行的输出（作为参考输出保存和使用）"""
+    return {name: runs[0] for name, runs in outputs.items() if runs}
+
+
+def fill_agreement(rows: dict, outputs: dict[str, list], reference: dict):
+    """按参考输出计算各阶段的一致率（统计所有运行）"""
+    for stage in STAGES:
+        compared = [
+            (run[stage], reference[name][stage])
+            for name, runs in outputs.items()
+            if name in reference and stage in reference[name]
+            for run in runs
+            if stage in run
+        ]
+        if compared:
+            agreed = sum(outputs_agree(stage, output, expected) for output, expected in compared)
+            rows[stage]["agreement"] = round(agreed / len(compared), 4)
+
+
+def _format(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def to_markdown(rows: list[dict]) -> str:
+    """结果表格（Markdown）"""
+    columns = list(rows[0].keys())
+    lines = ["| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+    lines.extend("| " + " | ".join(_format(row[column]) for column in columns) + " |" for row in rows)
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提示词变体基准")
+    parser.add_argument("corpus", type=Path, help="语料目录（*.txt）")
+    parser.add_argument("--variants", type=Path, help="变体文件（JSON），默认对比紧凑编码和原有输出格式")
+    parser.add_argument("--runs", type=int, default=1, help="每份报告重复次数（默认1）")
+    parser.add_argument("--reference", type=Path, help="参考输出（JSON），默认以第一个变体的结果为参考")
+    parser.add_argument("--save-reference", type=Path, help="把第一个变体的结果保存为参考输出")
+    parser.add_argument("--csv", type=Path, help="结果输出为CSV")
+    parser.add_argument("--markdown", type=Path, help="结果输出为Markdown表格")
+    args = parser.parse_args()
+
+    samples = {path.name: path.read_text(encoding="utf-8") for path in sorted(args.corpus.glob("*.txt"))}
+    if not samples:
+        print(f"❌ 语料目录中没有报告文件: {args.corpus}")
+        sys.exit(1)
+
+    variants = load_variants(args.variants)
+    reference = json.loads(args.reference.read_text(encoding="utf-8")) if args.reference else None
+    # 病灶缓存会让后运行的变体少发请求，基准期间关闭
+    lesion_cache.max_size = 0
+    print(f"📊 开始对比 {len(variants)} 个变体 × {len(samples)} 份报告 × {args.runs} 次...")
+
+    all_rows = []
+    for index, (name, variant) in enumerate(variants.items()):
+        rows, outputs = run_variant(name, variant, samples, args.runs)
+        if index == 0:
+            if reference is None:
+                reference = first_run_outputs(outputs)
+            if args.save_reference:
+                args.save_reference.write_text(
+                    json.dumps(first_run_outputs(outputs), ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+                )
+                print(f"📄 参考输出已保存: {args.save_reference}")
+        fill_agreement(rows, outputs, reference)
+        all_rows.extend(rows.values())
+
+    table = to_markdown(all_rows)
+    print(table)
+    if args.markdown:
+        args.markdown.write_text(table, encoding="utf-8")
+        print(f"📄 结果已写入: {args.markdown}")
+    if args.csv:
+        with args.csv.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(all_rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(all_rows)
+        print(f"📄 结果已写入: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
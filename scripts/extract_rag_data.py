@@ -23,6 +23,7 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root / "src"))
 
 # 必须在修改sys.path之后导入
+from medcrux.rag.context_packer import entity_token_count, relation_token_count  # noqa: E402
 from medcrux.rag.extraction.document_parser import DocumentParser  # noqa: E402
 from medcrux.rag.extraction.entity_extractor import EntityExtractor  # noqa: E402
 from medcrux.rag.extraction.relation_extractor import RelationExtractor  # noqa: E402
@@ -133,6 +134,8 @@ def main():
             "type": entity_type,
             "name": entity["name"],
             "file": str(relative_path),
+            # 预先计算提示词中该实体行的token数，供RAG上下文打包使用
+            "token_count": entity_token_count(entity),
         }
 
     # 保存实体索引
@@ -165,6 +168,7 @@ def main():
             "source": relation["source_entity_id"],
             "target": relation["target_entity_id"],
             "file": str(relative_path),
+            "token_count": relation_token_count(relation),
         }
 
     # 保存关系索引
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+批量模式与逐份调用的吞吐和token对比
+
+对语料中的全部报告，分别逐份调用analyze_birads_independently（单份模式）
+和调用analyze_birads_batch（批量模式，MEDCRUX_LLM_BATCH_SIZE份报告一次请求），
+按llm_metrics记录的实际用量对比每份报告的调用次数、输入/输出token和吞吐。
+
+后端使用当前配置（真实DeepSeek，或本地替身服务：MEDCRUX_LLM_PROVIDER=local，
+替身服务的延迟不随输入长度变化，吞吐对比只反映调用次数的差异）。
+
+语料目录中的每个文件是一份报告：
+- *.txt：检查所见（或完整OCR文本）
+- *.json：{"ocr_text": "...", "report_structure": {"findings": "..."}}
+
+单份模式默认逐病灶并发判断，调用次数按病灶计；设置MEDCRUX_LLM_FANOUT_WORKERS=1时按整份报告请求。
+
+用法：
+    uv run python scripts/measure_batch_mode.py <语料目录> [--repeat 4] [--batch-size 4]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from medcrux.analysis.batch_analyzer import analyze_birads_batch  # noqa: E402
+from medcrux.analysis.lesion_cache import lesion_cache  # noqa: E402
+from medcrux.analysis.llm_client import STAGE_INDEPENDENT_BIRADS, STAGE_INDEPENDENT_BIRADS_BATCH  # noqa: E402
+from medcrux.analysis.llm_engine import analyze_birads_independently  # noqa: E402
+from medcrux.analysis.llm_metrics import registry  # noqa: E402
+
+MODE_SINGLE = "single"
+MODE_BATCH = "batch"
+
+
+def load_findings(path: Path) -> str:
+    """读取一份报告的检查所见"""
+    if path.suffix == ".json":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return (data.get("report_structure") or {}).get("findings") or data.get("ocr_text", "")
+    return path.read_text(encoding="utf-8")
+
+
+def run_mode(mode: str, findings_list: list[str], batch_size: int) -> dict:
+    """以指定模式判断全部报告，返回用量汇总"""
+    registry.reset()
+    # 语料重复时逐份调用会命中病灶缓存，对比期间关闭缓存，两种模式都实际请求每份报告
+    lesion_cache.clear()
+    lesion_cache.max_size = 0
+    start = time.perf_counter()
+    if mode == MODE_BATCH:
+        analyze_birads_batch(findings_list, batch_size=batch_size)
+    else:
+        for findings in findings_list:
+            analyze_birads_independently(findings)
+    elapsed = time.perf_counter() - start
+
+    stages = registry.snapshot()["stages"]
+    single = stages.get(STAGE_INDEPENDENT_BIRADS, {})
+    batch = stages.get(STAGE_INDEPENDENT_BIRADS_BATCH, {})
+    reports = len(findings_list)
+    prompt_tokens = single.get("prompt_tokens", 0) + batch.get("prompt_tokens", 0)
+    completion_tokens = single.get("completion_tokens", 0) + batch.get("completion_tokens", 0)
+    return {
+        "mode": mode,
+        "reports": reports,
+        "batch_calls": batch.get("calls", 0),
+        # 批量模式下单份调用的次数即逐份重试（及短文本、未成批报告）的次数
+        "single_calls": single.get("calls", 0),
+        "prompt_tokens_per_report": round(prompt_tokens / reports, 1),
+        "completion_tokens_per_report": round(completion_tokens / reports, 1),
+        "reports_per_second": round(reports / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量模式与逐份调用的吞吐和token对比")
+    parser.add_argument("corpus", type=Path, help="语料目录（*.txt / *.json）")
+    parser.add_argument("--repeat", type=int, default=4, help="语料重复次数，模拟批处理任务规模（默认4）")
+    parser.add_argument("--batch-size", type=int, help="每批报告数（默认读取MEDCRUX_LLM_BATCH_SIZE）")
+    args = parser.parse_args()
+
+    files = sorted(p for p in args.corpus.iterdir() if p.suffix in (".txt", ".json"))
+    if not files:
+        print(f"❌ 语料目录中没有报告文件: {args.corpus}")
+        sys.exit(1)
+
+    findings_list = [load_findings(path) for path in files] * args.repeat
+    batch_size = args.batch_size or int(os.getenv("MEDCRUX_LLM_BATCH_SIZE", "4"))
+    print(f"📊 开始对比 {len(findings_list)} 份报告（每批 {batch_size} 份）...")
+    results = [run_mode(mode, findings_list, batch_size) for mode in (MODE_SINGLE, MODE_BATCH)]
+
+    print(f"{'模式':<8} {'批量调用':>8} {'单份调用':>8} {'输入token/份':>12} {'输出token/份':>12} {'报告/秒':>8}")
+    for row in results:
+        print(
+            f"{row['mode']:<8} {row['batch_calls']:>8} {row['single_calls']:>8} "
+            f"{row['prompt_tokens_per_report']:>12} {row['completion_tokens_per_report']:>12} "
+            f"{row['reports_per_second']:>8}"
+        )
+
+    single, batch = results
+    if single["prompt_tokens_per_report"]:
+        saved = 1 - batch["prompt_tokens_per_report"] / single["prompt_tokens_per_report"]
+        print(
+            f"\n✅ 每份报告输入token {single['prompt_tokens_per_report']} → {batch['prompt_tokens_per_report']}"
+            f"（节省{saved:.1%}），吞吐 {single['reports_per_second']} → {batch['reports_per_second']} 份/秒"
+        )
+
+
+if __name__ == "__main__":
+    main()
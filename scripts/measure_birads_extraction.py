@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+原报告BI-RADS分类提取的命中率对比：原有的字面正则 vs 容忍OCR噪声的文法提取（birads_grammar）
+
+对语料中的每份报告，取影像学诊断（本地切分失败时使用完整文本），分别用两种方法提取分类，
+统计提取为空（需要LLM回退）的报告数。--noise会为每份报告额外生成OCR噪声变体
+（如"BI-RADS 3类"→"BIRADS3类"、"Bl-RADS:3"、"BI—RADS 3类"、"3类"），模拟OCR误识别。
+
+语料目录中的每个文件（*.txt）是一份报告的OCR文本。
+
+用法：
+    uv run python scripts/measure_birads_extraction.py <语料目录> [--noise] [--verbose]
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from medcrux.analysis.birads_grammar import extract_birads_mentions  # noqa: E402
+from medcrux.analysis.report_structure_parser import split_sections_locally  # noqa: E402
+
+# 原有extract_doctor_birads使用的字面正则（对比基线）
+LEGACY_PATTERN = re.compile(r"BI-RADS\s+(\d+[ABC]?)\s*类?", re.IGNORECASE)
+
+# OCR噪声变体：对"BI-RADS <分类>"的改写
+NOISE_VARIANTS = {
+    "no_space": lambda m: f"BI-RADS{m.group(1)}",
+    "no_dash": lambda m: f"BIRADS {m.group(1)}",
+    "colon": lambda m: f"BI-RADS:{m.group(1)}",
+    "lowercase_l": lambda m: f"Bl-RADS {m.group(1)}",
+    "em_dash": lambda m: f"BI—RADS {m.group(1)}",
+    "cjk_one": lambda m: f"BI一RADS {m.group(1)}",
+    "no_keyword": lambda m: m.group(1),
+}
+_BIRADS_MENTION = re.compile(r"BI-RADS\s+(\d[ABCabc]?)", re.IGNORECASE)
+
+
+def load_samples(corpus: Path, noise: bool) -> dict[str, str]:
+    """读取语料，返回{名称: 影像学诊断}"""
+    samples = {}
+    for path in sorted(corpus.glob("*.txt")):
+        text = path.read_text(encoding="utf-8")
+        diagnosis = split_sections_locally(text).diagnosis or text
+        samples[path.name] = diagnosis
+        if noise and _BIRADS_MENTION.search(diagnosis):
+            for variant, replace in NOISE_VARIANTS.items():
+                samples[f"{path.name}#{variant}"] = _BIRADS_MENTION.sub(replace, diagnosis)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BI-RADS分类提取命中率对比")
+    parser.add_argument("corpus", type=Path, help="语料目录（*.txt）")
+    parser.add_argument("--noise", action="store_true", help="额外生成OCR噪声变体")
+    parser.add_argument("--verbose", action="store_true", help="逐份输出提取结果")
+    args = parser.parse_args()
+
+    samples = load_samples(args.corpus, args.noise)
+    if not samples:
+        print(f"❌ 语料目录中没有报告文件: {args.corpus}")
+        sys.exit(1)
+
+    legacy_misses = grammar_misses = 0
+    for name, diagnosis in samples.items():
+        legacy = [match.group(1).upper() for match in LEGACY_PATTERN.finditer(diagnosis)]
+        grammar = [mention.value for mention in extract_birads_mentions(diagnosis)]
+        legacy_misses += not legacy
+        grammar_misses += not grammar
+        if args.verbose:
+            print(f"{name}: 字面正则={legacy or '-'} 文法={grammar or '-'}")
+
+    total = len(samples)
+    print(f"📊 报告数: {total}")
+    print(f"字面正则: 提取为空 {legacy_misses} 份（{legacy_misses / total:.1%}，需要LLM回退）")
+    print(f"文法提取: 提取为空 {grammar_misses} 份（{grammar_misses / total:.1%}，需要LLM回退）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+紧凑输出schema的输出token和延迟对比
+
+对语料中的每份报告，分别以原有输出格式（MEDCRUX_LLM_SCHEMA=full）和紧凑编码格式
+（MEDCRUX_LLM_SCHEMA=compact）调用主分析和独立BI-RADS判断，
+按llm_metrics记录的实际用量对比输出token和延迟。
+
+后端使用当前配置（真实DeepSeek，或本地替身服务：MEDCRUX_LLM_PROVIDER=local，
+替身服务的延迟不随输出长度变化，只有token对比有意义）。
+
+语料目录中的每个文件是一份报告：
+- *.txt：OCR文本（独立BI-RADS判断也使用完整文本）
+- *.json：{"ocr_text": "...", "report_structure": {"findings": "..."}}
+
+用法：
+    uv run python scripts/measure_compact_schema.py <语料目录> [--runs 3] [--csv 输出.csv]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from medcrux.analysis.compact_schema import SCHEMA_COMPACT, SCHEMA_FULL  # noqa: E402
+from medcrux.analysis.llm_client import STAGE_ANALYSIS, STAGE_INDEPENDENT_BIRADS  # noqa: E402
+from medcrux.analysis.llm_engine import analyze_birads_independently, analyze_text_with_deepseek  # noqa: E402
+from medcrux.analysis.llm_metrics import registry  # noqa: E402
+
+
+def load_sample(path: Path) -> tuple[str, str]:
+    """读取一份报告，返回(OCR文本, 检查所见)"""
+    if path.suffix == ".json":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        ocr_text = data.get("ocr_text", "")
+        findings = (data.get("report_structure") or {}).get("findings") or ocr_text
+        return ocr_text, findings
+    ocr_text = path.read_text(encoding="utf-8")
+    return ocr_text, ocr_text
+
+
+def run_schema(schema: str, samples: list[tuple[str, str]], runs: int) -> dict:
+    """以指定schema运行全部报告，返回各阶段的用量汇总"""
+    os.environ["MEDCRUX_LLM_SCHEMA"] = schema
+    registry.reset()
+    for _ in range(runs):
+        for ocr_text, findings in samples:
+            analyze_text_with_deepseek(ocr_text)
+            analyze_birads_independently(findings)
+
+    stages = registry.snapshot()["stages"]
+    rows = {}
+    for stage in (STAGE_ANALYSIS, STAGE_INDEPENDENT_BIRADS):
+        summary = stages.get(stage, {})
+        calls = summary.get("calls", 0)
+        rows[stage] = {
+            "schema": schema,
+            "stage": stage,
+            "calls": calls,
+            "avg_completion_tokens": round(summary.get("completion_tokens", 0) / calls, 1) if calls else 0.0,
+            "avg_latency": summary.get("avg_latency", 0.0),
+            "latency_p95": summary.get("latency_p95"),
+        }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="紧凑输出schema的输出token和延迟对比")
+    parser.add_argument("corpus", type=Path, help="语料目录（*.txt / *.json）")
+    parser.add_argument("--runs", type=int, default=1, help="每份报告重复次数（默认1）")
+    parser.add_argument("--csv", type=Path, help="结果输出为CSV")
+    args = parser.parse_args()
+
+    files = sorted(p for p in args.corpus.iterdir() if p.suffix in (".txt", ".json"))
+    if not files:
+        print(f"❌ 语料目录中没有报告文件: {args.corpus}")
+        sys.exit(1)
+
+    samples = [load_sample(path) for path in files]
+    print(f"📊 开始对比 {len(samples)} 份报告 × {args.runs} 次...")
+    results = {schema: run_schema(schema, samples, args.runs) for schema in (SCHEMA_FULL, SCHEMA_COMPACT)}
+
+    print(f"{'阶段':<20} {'格式':<8} {'调用':>6} {'平均输出token':>14} {'平均延迟':>10} {'P95延迟':>10}")
+    for stage in (STAGE_ANALYSIS, STAGE_INDEPENDENT_BIRADS):
+        for schema in (SCHEMA_FULL, SCHEMA_COMPACT):
+            row = results[schema][stage]
+            p95 = f"{row['latency_p95']:.2f}" if row["latency_p95"] is not None else "-"
+            print(
+                f"{stage:<20} {schema:<8} {row['calls']:>6} {row['avg_completion_tokens']:>14} "
+                f"{row['avg_latency']:>10.2f} {p95:>10}"
+            )
+
+    print()
+    for stage in (STAGE_ANALYSIS, STAGE_INDEPENDENT_BIRADS):
+        full, compact = results[SCHEMA_FULL][stage], results[SCHEMA_COMPACT][stage]
+        if full["avg_completion_tokens"]:
+            saved = 1 - compact["avg_completion_tokens"] / full["avg_completion_tokens"]
+            print(
+                f"✅ {stage}: 输出token {full['avg_completion_tokens']} → {compact['avg_completion_tokens']}"
+                f"（节省{saved:.1%}），平均延迟 {full['avg_latency']:.2f}秒 → {compact['avg_latency']:.2f}秒"
+            )
+
+    if args.csv:
+        rows = [row for schema_rows in results.values() for row in schema_rows.values()]
+        with args.csv.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"📄 结果已写入: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+GraphRAG实体匹配对比：原有的逐实体子串匹配 vs 倒排索引（ngram_index）
+
+对每个查询（语料中的报告，或内置的示例查询），分别用两种方法匹配实体，输出匹配到的实体和耗时；
+--scale会在知识库之后追加随机汉字组成的填充实体，观察耗时随知识库规模的变化。
+
+语料目录中的每个文件（*.txt）是一份报告的OCR文本。
+
+用法：
+    uv run python scripts/measure_entity_matching.py [语料目录] [--scale 1 10 50] [--verbose]
+"""
+
+import argparse
+import random
+import sys
+import timeit
+from functools import partial
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from medcrux.rag.graphrag_retriever import MAX_MATCHED_ENTITIES, MIN_MATCH_SCORE, GraphRAGRetriever  # noqa: E402
+from medcrux.rag.ngram_index import EntityNgramIndex  # noqa: E402
+
+SAMPLE_QUERIES = {
+    "spaced": "BI-RADS 3类 边界清晰 椭圆形",
+    "malignant": "左侧乳腺低回声结节，形态不规则，边界模糊，可见毛刺，内部可见微钙化，后方回声衰减伴声影。BI-RADS 4B类",
+    "benign": "右侧乳腺10点钟方向查见0.8×0.5cm无回声，边界清晰，形态规则，后方回声增强。BI-RADS 2类",
+}
+
+
+def legacy_match(entities: dict[str, dict], query: str) -> list[str]:
+    """原有的_match_entities：按空白切分查询，逐个实体做子串匹配"""
+    query_words = set(query.lower().split())
+    if not query_words:
+        return []
+    matched = []
+    for entity_id, entity in entities.items():
+        score = 0.0
+        if any(word in entity_id.lower() for word in query_words):
+            score += 0.5
+        if score < 0.3 and entity.get("name") and any(word in entity["name"].lower() for word in query_words):
+            score += 0.4
+        if score < 0.5 and entity.get("content"):
+            common_words = query_words & set(entity["content"].lower()[:200].split())
+            if common_words:
+                score += min(len(common_words) * 0.2, 0.3)
+        if score > 0.3:
+            matched.append((entity_id, score))
+    matched.sort(key=lambda item: item[1], reverse=True)
+    return [entity_id for entity_id, _ in matched[:MAX_MATCHED_ENTITIES]]
+
+
+def scaled_entities(entities: dict[str, dict], scale: int) -> dict[str, dict]:
+    """在知识库之后追加(scale-1)倍数量的填充实体（随机汉字，模拟与查询无关的知识）"""
+    rng = random.Random(0)
+
+    def random_text(length: int) -> str:
+        return "".join(chr(rng.randint(0x4E00, 0x9FFF)) for _ in range(length))
+
+    scaled = dict(entities)
+    for number in range(len(entities) * (scale - 1)):
+        scaled[f"filler_{number}"] = {"name": random_text(8), "content": random_text(150)}
+    return scaled
+
+
+def load_queries(corpus: Path | None) -> dict[str, str]:
+    if corpus is None:
+        return dict(SAMPLE_QUERIES)
+    return {path.name: path.read_text(encoding="utf-8") for path in sorted(corpus.glob("*.txt"))}
+
+
+def bench(func, queries: dict[str, str], number: int) -> float:
+    """每次查询的平均耗时（微秒）"""
+    seconds = timeit.timeit(lambda: [func(query) for query in queries.values()], number=number)
+    return seconds / number / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GraphRAG实体匹配对比")
+    parser.add_argument("corpus", type=Path, nargs="?", help="语料目录（*.txt），默认使用内置示例查询")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 50], help="知识库规模倍数")
+    parser.add_argument("--number", type=int, default=200, help="计时重复次数")
+    parser.add_argument("--verbose", action="store_true", help="逐个查询输出匹配到的实体名称")
+    args = parser.parse_args()
+
+    queries = load_queries(args.corpus)
+    if not queries:
+        print(f"❌ 语料目录中没有报告文件: {args.corpus}")
+        sys.exit(1)
+
+    entities = GraphRAGRetriever().entities
+    index = EntityNgramIndex(entities)
+    print(f"📊 实体数: {len(entities)}, 检索词数: {index.term_count}, 查询数: {len(queries)}")
+    for name, query in queries.items():
+        legacy = legacy_match(entities, query)
+        matched = [entity_id for entity_id, _ in index.search(query, MAX_MATCHED_ENTITIES, MIN_MATCH_SCORE)]
+        print(f"{name}: 逐实体匹配 {len(legacy)} 个实体，倒排索引 {len(matched)} 个实体")
+        if args.verbose:
+            print(f"  逐实体匹配: {[entities[entity_id]['name'] for entity_id in legacy]}")
+            print(f"  倒排索引:   {[entities[entity_id]['name'] for entity_id in matched]}")
+
+    print("\n⏱  每次查询的平均耗时（所有查询平均）")
+    for scale in args.scale:
+        scaled = scaled_entities(entities, scale)
+        scaled_index = EntityNgramIndex(scaled)
+        legacy_us = bench(partial(legacy_match, scaled), queries, args.number)
+        index_us = bench(
+            partial(scaled_index.search, limit=MAX_MATCHED_ENTITIES, min_score=MIN_MATCH_SCORE), queries, args.number
+        )
+        print(f"{len(scaled):>6} 个实体: 逐实体匹配 {legacy_us:8.0f}µs, 倒排索引 {index_us:8.0f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+主分析输入token节省报告
+
+对比主分析（analyze_text_with_deepseek）使用完整OCR文本和只使用
+检查所见+影像学诊断两种输入的token数量（按estimate_tokens估算）。
+
+语料目录中的每个文件是一份报告：
+- *.txt：OCR文本，报告结构通过parse_report_structure解析（需要LLM后端，
+  可使用本地替身服务：MEDCRUX_LLM_PROVIDER=local）
+- *.json：{"ocr_text": "...", "report_structure": {...}}，已有结构解析结果时不再调用LLM
+
+用法：
+    uv run python scripts/measure_token_savings.py <语料目录> [--csv 输出.csv]
+"""
+
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from medcrux.analysis.report_structure_parser import (  # noqa: E402
+    ANALYSIS_INPUT_SECTIONS,
+    build_analysis_input,
+    parse_report_structure,
+)
+from medcrux.utils import estimate_tokens  # noqa: E402
+
+
+def load_sample(path: Path) -> tuple[str, dict | None]:
+    """读取一份报告，返回(OCR文本, 报告结构)"""
+    if path.suffix == ".json":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        ocr_text = data.get("ocr_text", "")
+        report_structure = data.get("report_structure")
+    else:
+        ocr_text = path.read_text(encoding="utf-8")
+        report_structure = None
+
+    if report_structure is None:
+        report_structure = parse_report_structure(ocr_text)
+    return ocr_text, report_structure
+
+
+def measure(path: Path) -> dict:
+    """计算一份报告的token节省"""
+    ocr_text, report_structure = load_sample(path)
+    analysis_text, analysis_input = build_analysis_input(ocr_text, report_structure)
+    full_tokens = estimate_tokens(ocr_text)
+    scoped_tokens = estimate_tokens(analysis_text)
+    return {
+        "file": path.name,
+        "analysis_input": analysis_input,
+        "full_tokens": full_tokens,
+        "scoped_tokens": scoped_tokens,
+        "saved_tokens": full_tokens - scoped_tokens,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="主分析输入token节省报告")
+    parser.add_argument("corpus", type=Path, help="语料目录（*.txt / *.json）")
+    parser.add_argument("--csv", type=Path, help="逐份报告结果输出为CSV")
+    args = parser.parse_args()
+
+    files = sorted(p for p in args.corpus.iterdir() if p.suffix in (".txt", ".json"))
+    if not files:
+        print(f"❌ 语料目录中没有报告文件: {args.corpus}")
+        sys.exit(1)
+
+    print(f"📊 开始统计 {len(files)} 份报告...")
+    rows = [measure(path) for path in files]
+
+    total_full = sum(row["full_tokens"] for row in rows)
+    total_scoped = sum(row["scoped_tokens"] for row in rows)
+    scoped_count = sum(1 for row in rows if row["analysis_input"] == ANALYSIS_INPUT_SECTIONS)
+    saved_ratio = (total_full - total_scoped) / total_full if total_full else 0.0
+
+    print(f"{'文件':<40} {'输入':<10} {'完整':>8} {'精简':>8} {'节省':>8}")
+    for row in rows:
+        print(
+            f"{row['file']:<40} {row['analysis_input']:<10} "
+            f"{row['full_tokens']:>8} {row['scoped_tokens']:>8} {row['saved_tokens']:>8}"
+        )
+
+    print()
+    print(f"✅ 使用精简输入: {scoped_count}/{len(rows)} 份（其余回退到完整OCR文本）")
+    print(
+        f"✅ 估算token: 完整 {total_full} → 精简 {total_scoped}，节省 {total_full - total_scoped}（{saved_ratio:.1%}）"
+    )
+
+    if args.csv:
+        with args.csv.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"📄 逐份结果已写入: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+#!/bin/bash
+# 启动本地LLM替身服务（OpenAI兼容接口，用于离线压测）
+#
+# 用法：
+#   ./scripts/start_llm_stub.sh
+#   MEDCRUX_STUB_LATENCY="lognormal:2.0,0.4" MEDCRUX_STUB_SEED=42 ./scripts/start_llm_stub.sh
+#
+# 然后以替身后端启动API服务：
+#   MEDCRUX_LLM_PROVIDER=local ./scripts/start_api.sh
+
+# 获取脚本所在目录和项目根目录
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+PROJECT_ROOT="$(cd "$SCRIPT_DIR/.." && pwd)"
+
+# 切换到项目根目录
+cd "$PROJECT_ROOT" || { echo "❌ 无法切换到项目根目录"; exit 1; }
+
+STUB_PORT="${MEDCRUX_STUB_PORT:-8900}"
+
+echo "🧪 启动LLM替身服务 [端口: $STUB_PORT, 延迟分布: ${MEDCRUX_STUB_LATENCY:-0}]"
+echo ""
+
+export PYTHONPATH="$PROJECT_ROOT/src:$PYTHONPATH"
+uv run uvicorn medcrux.analysis.llm_stub_server:app --host 127.0.0.1 --port "$STUB_PORT"
@@ -0,0 +1,184 @@
+"""
+批量分析模块：离线批处理任务把多份报告合并为一次独立BI-RADS判断请求
+
+逐份调用时，每份报告都要单独支付完整的System Prompt（规则说明、输出格式、RAG上下文）。
+批处理任务（如历史报告回溯）对单份延迟不敏感，可以把多份报告的检查所见合并为一次请求：
+
+- 每批最多MEDCRUX_LLM_BATCH_SIZE份报告（默认4），用户消息中每份报告以"### 报告 r<序号>"开头
+- System Prompt与逐份调用相同，末尾追加批量输出说明：返回{"reports": [{"rid": ..., 该报告的判断结果}]}
+- RAG上下文按整批检查所见检索一次
+- 按rid拆分响应，每份结果按单份调用的规则校验、展开和规范化；
+  缺失或校验失败的报告（以及整批请求失败时的全部报告）改为逐份调用analyze_birads_independently
+- 全部请求以批处理优先级（PRIORITY_BATCH）排队，为交互式请求保留限流容量
+
+结果与逐份调用的返回格式相同，按输入顺序返回。
+"""
+
+import json
+import os
+
+from medcrux.analysis import llm_engine
+from medcrux.analysis.compact_schema import (
+    COMPACT_REQUIRED_NODULE_FIELDS,
+    INDEPENDENT_BIRADS_COMPACT_REQUIRED_FIELDS,
+    SCHEMA_COMPACT,
+    expand_independent_birads_result,
+    get_output_schema,
+)
+from medcrux.analysis.json_repair import ResultRequirements, validate_nodule_result
+from medcrux.analysis.llm_client import (
+    STAGE_INDEPENDENT_BIRADS,
+    STAGE_INDEPENDENT_BIRADS_BATCH,
+    create_chat_completion,
+    parse_json_response,
+)
+from medcrux.analysis.llm_engine import (
+    analyze_birads_independently,
+    build_independent_birads_system_prompt,
+    finalize_independent_birads_result,
+    retrieve_independent_birads_context,
+)
+from medcrux.analysis.llm_provider import is_llm_configured
+from medcrux.analysis.llm_rate_limiter import PRIORITY_BATCH, llm_priority
+from medcrux.analysis.llm_router import route_model
+from medcrux.analysis.location_normalizer import normalize_nodule_location
+from medcrux.utils.logger import log_error_with_context, setup_logger
+
+logger = setup_logger("medcrux.analysis.batch_analyzer")
+
+DEFAULT_BATCH_SIZE = 4
+
+# 检查所见短于该长度时不调用LLM（同analyze_birads_independently）
+_MIN_FINDINGS_LENGTH = 10
+
+BATCH_MARKER = "多报告批量判断"
+BATCH_OUTPUT_INSTRUCTIONS = f"""
+
+## {BATCH_MARKER}
+用户消息包含多份报告的检查所见，每份以"### 报告 <rid>"开头。请逐份独立判断（报告之间互不参考），
+每份报告的判断结果格式同上，加上rid字段后放入reports数组，每份报告必须返回一项：
+{{"reports":[{{"rid":"r1",...}},{{"rid":"r2",...}}]}}"""
+
+BATCH_USER_PROMPT = "以下是{count}份报告的检查所见（事实性描述），请逐份识别所有异常发现并独立判断BI-RADS分类："
+
+
+def get_batch_size() -> int:
+    """每批报告数（MEDCRUX_LLM_BATCH_SIZE）"""
+    return max(1, int(os.getenv("MEDCRUX_LLM_BATCH_SIZE", str(DEFAULT_BATCH_SIZE))))
+
+
+def _report_id(index: int) -> str:
+    return f"r{index + 1}"
+
+
+def _build_user_message(batch: list[tuple[str, str]]) -> str:
+    sections = [f"### 报告 {rid}\n{text.strip()}" for rid, text in batch]
+    return BATCH_USER_PROMPT.format(count=len(batch)) + "\n\n" + "\n\n".join(sections)
+
+
+def _split_response(result: dict, batch: list[tuple[str, str]], compact: bool) -> dict[str, dict]:
+    """
+    按rid拆分批量响应，只返回校验通过的报告结果（已展开、标准化位置并规范化ID）
+    """
+    required_fields = INDEPENDENT_BIRADS_COMPACT_REQUIRED_FIELDS if compact else ("nodules", "llm_highest_birads")
+    required_nodule_fields = COMPACT_REQUIRED_NODULE_FIELDS if compact else ("llm_birads_class",)
+    expected = {rid for rid, _ in batch}
+
+    slices: dict[str, dict] = {}
+    for item in result.get("reports") or []:
+        if not isinstance(item, dict):
+            continue
+        report = dict(item)
+        rid = str(report.pop("rid", ""))
+        if rid not in expected or rid in slices:
+            continue
+        problems = validate_nodule_result(report, required_fields, required_nodule_fields)
+        if problems:
+            logger.warning(f"批量判断中报告{rid}的结果不可用：{'；'.join(problems)}")
+            continue
+        report = expand_independent_birads_result(report)
+        for nodule in report.get("nodules", []) or []:
+            normalize_nodule_location(nodule)
+        slices[rid] = finalize_independent_birads_result(report)
+    return slices
+
+
+def _request_batch(batch: list[tuple[str, str]], compact: bool) -> dict[str, dict]:
+    """
+    发起一次批量请求
+
+    Returns:
+        {rid: 报告结果}，只包含校验通过的报告
+
+    Raises:
+        Exception: LLM调用或整体解析失败
+    """
+    rag_context = retrieve_independent_birads_context("\n".join(text for _, text in batch))
+    system_prompt = build_independent_birads_system_prompt(rag_context, compact) + BATCH_OUTPUT_INSTRUCTIONS
+    request_kwargs = {
+        "model": route_model(STAGE_INDEPENDENT_BIRADS),
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": _build_user_message(batch)},
+        ],
+        "temperature": 0.1,
+        "stream": False,
+        "response_format": {"type": "json_object"},
+    }
+    # 通过模块属性访问客户端，与llm_engine共用同一个（测试中可统一替换）
+    response = create_chat_completion(llm_engine.client, STAGE_INDEPENDENT_BIRADS_BATCH, **request_kwargs)
+    result = parse_json_response(
+        llm_engine.client,
+        STAGE_INDEPENDENT_BIRADS_BATCH,
+        response,
+        request_kwargs,
+        requirements=ResultRequirements(fields=("reports",)),
+    )
+    if not isinstance(result, dict):
+        raise json.JSONDecodeError("批量响应不是JSON对象", str(result), 0)
+    return _split_response(result, batch, compact)
+
+
+def analyze_birads_batch(findings_list: list[str], batch_size: int | None = None) -> list[dict]:
+    """
+    批量独立判断BI-RADS分类（离线批处理任务使用）
+
+    Args:
+        findings_list: 每份报告的检查所见
+        batch_size: 每批报告数，默认读取MEDCRUX_LLM_BATCH_SIZE
+
+    Returns:
+        与findings_list一一对应的结果，格式同analyze_birads_independently
+    """
+    batch_size = batch_size or get_batch_size()
+    results: list[dict | None] = [None] * len(findings_list)
+
+    with llm_priority(PRIORITY_BATCH):
+        index_by_rid = {
+            _report_id(index): index
+            for index, text in enumerate(findings_list)
+            if text and len(text.strip()) >= _MIN_FINDINGS_LENGTH
+        }
+        pending = [(rid, findings_list[index]) for rid, index in index_by_rid.items()]
+        if batch_size > 1 and is_llm_configured():
+            compact = get_output_schema() == SCHEMA_COMPACT
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start : start + batch_size]
+                if len(batch) < 2:
+                    continue
+                try:
+                    slices = _request_batch(batch, compact)
+                except Exception as e:
+                    log_error_with_context(logger, e, context={"reports": len(batch)}, operation="批量BI-RADS判断")
+                    slices = {}
+                for rid, result in slices.items():
+                    results[index_by_rid[rid]] = result
+                missing = len(batch) - len(slices)
+                logger.info(f"批量BI-RADS判断完成 [报告数: {len(batch)}, 需逐份重试: {missing}]")
+
+        # 短文本、未成批的报告，以及批量结果缺失或校验失败的报告逐份判断
+        for index, text in enumerate(findings_list):
+            if results[index] is None:
+                results[index] = analyze_birads_independently(text)
+
+    return results
@@ -0,0 +1,165 @@
+"""
+BI-RADS分类提取模块：容忍OCR噪声的记号化 + 小型文法
+
+原报告的BI-RADS分类写法很多，OCR还会引入噪声，例如：
+- "BI-RADS 3类"、"BI-RADS3类"、"BIRADS:3"、"Bl-RADS 4a"、"BI—RADS 4A类"、"BI一RADS 3类"
+- 省略关键词的分类："4a类"、"3类"
+- 范围："3-4类"、"BI-RADS 3~4类"
+- 枚举："BI-RADS 2类和3类"、"BI-RADS 3、4类"、"BI-RADS 3类；BI-RADS 4类"
+
+本模块先用一个预编译的正则把文本切分为记号（BI-RADS关键词、其他RADS关键词、分类、"类"、
+范围符、枚举符、句末标点等），再按文法识别分类：
+- 关键词（或分类、分级等填充词）之后的分类
+- 范围符之后的分类（与前一个分类组成范围，两端都计入）
+- 枚举符之后带"类"的分类；枚举链中前面的分类都不带"类"时也接受不带"类"的分类（如"3、4"）
+- 不带关键词但带"类"的分类（同一句中前面出现TI-RADS等其他分级体系时不计入）
+- 带"级"的分类只在BI-RADS关键词（或其后的填充词）之后计入："Adler 2级"、"脂肪肝 1级"等
+  其他分级很常见；Adler、血流分级重置文法状态（与其他RADS不同，不影响同一句中之后带"类"的分类）
+分类之后紧跟"个"、"cm"、"月"等量词单位时不视为分类（如"2个结节"、"6个月复查"）。
+"""
+
+import re
+from dataclasses import dataclass
+
+# 记号（按顺序尝试，先出现的优先）
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<birads>B\s?[I1lL|!]\s?[-—–－‐一_·.]?\s?R\s?A\s?D\s?S)
+    | (?P<other_rads>(?:C-?)?T[I1l]-?RADS|L[I1l]-?RADS|P[I1l]-?RADS|O-?RADS)
+    | (?P<other_grade>Adler|血流分级)
+    | (?P<category>(?<![\d.．])[0-6](?:\s?[ABC](?![A-Z]))?
+        (?![\d.．]|\s?(?:个|处|枚|点|岁|次|月|年|周|天|cm|mm)))
+    | (?P<suffix>类)
+    | (?P<grade>级)
+    | (?P<filler>分类|分级|评估|评级|为|是)
+    | (?P<range>[-~～—–－至到])
+    | (?P<enum>[、，,/和及与或])
+    | (?P<colon>[:：∶])
+    | (?P<stop>[。；;\n])
+    | (?P<space>[ \t\r]+)
+    | (?P<other>.)
+    """,
+    re.VERBOSE | re.IGNORECASE,
+)
+
+# 不影响文法状态的记号
+_SKIPPED_TOKENS = ("space", "colon")
+# 分类之后的后缀记号（"级"只在关键词之后接受，见_accept_category）
+_SUFFIX_TOKENS = ("suffix", "grade")
+
+# 填充词、范围符、枚举符和其他字符对文法状态的影响：(记号, 上一个记号) → 新的上一个记号，未列出的组合重置
+_TRANSITIONS = {
+    ("filler", "keyword"): "keyword",
+    ("range", "keyword"): "keyword",
+    ("range", "category"): "range",
+    ("enum", "category"): "enum",
+}
+
+
+@dataclass(frozen=True)
+class BiradsMention:
+    """一处BI-RADS分类"""
+
+    value: str  # 规范化的分类（如"3"、"4A"）
+    start: int  # 在原文中的起止位置（含"类"）
+    end: int
+    text: str  # 原文
+    explicit: bool  # 前面有BI-RADS关键词（同一枚举或范围链中）
+    in_range: bool  # 属于范围（如"3-4类"）
+
+
+def normalize_birads_value(raw: str) -> str:
+    """规范化分类写法（去掉空格，字母大写）"""
+    return re.sub(r"\s", "", raw).upper()
+
+
+def birads_sort_key(value: str) -> tuple[int, str]:
+    """分类的比较键：先比较数字，再比较字母后缀（4C > 4B > 4A > 4）"""
+    match = re.match(r"(\d+)([A-Z]?)", value)
+    if not match:
+        return (-1, "")
+    return (int(match.group(1)), match.group(2))
+
+
+def _tokenize(text: str) -> list[re.Match]:
+    return [token for token in _TOKEN_PATTERN.finditer(text) if token.lastgroup not in _SKIPPED_TOKENS]
+
+
+def _kind(tokens: list[re.Match], index: int) -> str | None:
+    return tokens[index].lastgroup if index < len(tokens) else None
+
+
+def _has_suffix(tokens: list[re.Match], index: int) -> bool:
+    """分类之后有"类"，或者是带"类"的范围的起点（如"3-4类"中的3）"""
+    if _kind(tokens, index + 1) == "suffix":
+        return True
+    return (
+        _kind(tokens, index + 1) == "range"
+        and _kind(tokens, index + 2) == "category"
+        and _kind(tokens, index + 3) == "suffix"
+    )
+
+
+def _accept_category(expect: str | None, context: str | None, has_suffix: bool, chain_has_suffix: bool) -> bool:
+    """按上一个记号判断当前分类记号是否为BI-RADS分类（has_suffix只表示带"类"，带"级"的分类只在关键词之后接受）"""
+    if expect in ("keyword", "range"):
+        return True
+    if expect == "enum":
+        return has_suffix or not chain_has_suffix
+    return has_suffix and context != "other"
+
+
+def extract_birads_mentions(text: str) -> list[BiradsMention]:
+    """
+    提取文本中的全部BI-RADS分类
+
+    Args:
+        text: 影像学诊断或OCR文本
+
+    Returns:
+        BiradsMention列表（按原文顺序）
+    """
+    if not text:
+        return []
+
+    tokens = _tokenize(text)
+    mentions: list[BiradsMention] = []
+    context = None  # 当前句中最近的分级体系："birads" / "other"
+    expect = None  # 上一个有意义的记号："keyword" / "category" / "enum" / "range"
+    chain_explicit = False  # 当前枚举或范围链是否由BI-RADS关键词开始
+    chain_has_suffix = False  # 当前枚举或范围链中是否已有带"类"的分类
+
+    for index, token in enumerate(tokens):
+        kind = token.lastgroup
+        if kind == "birads":
+            context, expect, chain_explicit, chain_has_suffix = "birads", "keyword", True, False
+        elif kind == "other_rads":
+            context, expect = "other", None
+        elif kind == "category":
+            has_suffix = _has_suffix(tokens, index)
+            if not _accept_category(expect, context, has_suffix, chain_has_suffix):
+                expect = None
+                continue
+
+            if expect not in ("enum", "range"):
+                chain_explicit = expect == "keyword"
+                chain_has_suffix = False
+            chain_has_suffix = chain_has_suffix or has_suffix
+            end = tokens[index + 1].end() if _kind(tokens, index + 1) in _SUFFIX_TOKENS else token.end()
+            mentions.append(
+                BiradsMention(
+                    value=normalize_birads_value(token.group()),
+                    start=token.start(),
+                    end=end,
+                    text=text[token.start() : end],
+                    explicit=chain_explicit,
+                    in_range=expect == "range" or _kind(tokens, index + 1) == "range",
+                )
+            )
+            expect = "category"
+        elif kind == "stop":
+            context, expect = None, None
+        elif kind not in _SUFFIX_TOKENS:
+            expect = _TRANSITIONS.get((kind, expect))
+
+    return mentions
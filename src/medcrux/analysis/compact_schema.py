@@ -0,0 +1,252 @@
+"""
+紧凑输出schema模块：用短编码代替长中文字符串，减少LLM输出token
+
+LLM延迟主要由输出token决定。原输出格式要求模型为每个结节逐字输出字段名和
+"均匀低回声"、"大部分清晰"等中文枚举值，以及冗长的理由。紧凑schema：
+- 形态学标准术语（LogicalConsistencyChecker的标准术语集合）、侧别、风险、性别使用短编码
+- 字段名使用1-2个字母；位置和大小照抄原文，展开时由location_normalizer标准化
+- 结节ID、结节总数、最高风险、不一致预警等可推导字段不再由模型输出，在本地补全
+- 非标准术语（如"条状"、"低回声"）仍输出原文，本地原样保留（不丢失风险信号）
+
+expand_analysis_result / expand_independent_birads_result 在本地把紧凑结果展开为原有响应格式，
+下游（一致性检查、API响应）无需改动。模型仍返回原格式时原样返回。
+
+配置（环境变量）：
+- MEDCRUX_LLM_SCHEMA：compact（默认）/ full
+"""
+
+import os
+
+from medcrux.analysis.location_normalizer import normalize_location, parse_size_cm
+
+SCHEMA_COMPACT = "compact"
+SCHEMA_FULL = "full"
+
+# 紧凑schema提示词中的标记（本地替身服务据此返回紧凑响应）
+COMPACT_SCHEMA_MARKER = "紧凑编码输出"
+
+# 形态学标准术语编码（覆盖LogicalConsistencyChecker的标准术语集合，见tests/test_compact_schema.py）
+SHAPE_CODES = {"OV": "椭圆形", "RD": "圆形", "IR": "不规则形"}
+BOUNDARY_CODES = {"CI": "清晰", "MC": "大部分清晰", "IN": "模糊", "AN": "成角", "ML": "微小分叶", "SP": "毛刺状"}
+ECHO_CODES = {"HY": "均匀低回声", "HE": "不均匀回声", "AE": "无回声", "IS": "等回声", "HR": "高回声", "CX": "复合回声"}
+ORIENTATION_CODES = {"P": "平行", "NP": "不平行"}
+
+BREAST_CODES = {"L": "left", "R": "right"}
+RISK_CODES = {"L": "Low", "M": "Medium", "H": "High"}
+GENDER_CODES = {"F": "Female", "M": "Male", "U": "Unknown"}
+
+# (紧凑字段名, 原字段名, 编码表)
+_MORPHOLOGY_FIELDS = (
+    ("s", "shape", SHAPE_CODES),
+    ("m", "boundary", BOUNDARY_CODES),
+    ("e", "echo", ECHO_CODES),
+    ("o", "orientation", ORIENTATION_CODES),
+)
+
+_RISK_LEVELS = {"Low": 1, "Medium": 2, "High": 3}
+
+# 紧凑结果的必需字段（parse_json_response本地修复后校验用）
+# 结节数组之后必须跟着尾随字段：输出在结节数组中间被截断时，本地修复会丢弃后面的结节并补全括号，
+# 只校验"nodules"无法区分"结节被截掉"和"本来就只有这些结节"，尾随字段缺失则说明输出不完整
+ANALYSIS_COMPACT_REQUIRED_FIELDS = ("nodules", "sm", "ad")
+INDEPENDENT_BIRADS_COMPACT_REQUIRED_FIELDS = ("nodules", "n")
+COMPACT_REQUIRED_NODULE_FIELDS = ("k",)
+
+
+def get_output_schema() -> str:
+    """当前配置的输出schema（compact / full）"""
+    schema = os.getenv("MEDCRUX_LLM_SCHEMA", SCHEMA_COMPACT).strip().lower()
+    return SCHEMA_FULL if schema == SCHEMA_FULL else SCHEMA_COMPACT
+
+
+def _code_table(codes: dict[str, str]) -> str:
+    return " ".join(f"{code}={term}" for code, term in codes.items())
+
+
+_CODE_TABLES = f"""编码表（只能使用表中编码；非标准术语直接输出原文，如"条状"、"低回声"）：
+- s 形状：{_code_table(SHAPE_CODES)}
+- m 边界：{_code_table(BOUNDARY_CODES)}
+- e 回声：{_code_table(ECHO_CODES)}
+- o 方位：{_code_table(ORIENTATION_CODES)}
+- b 侧别：L=左乳 R=右乳"""
+
+_OUTPUT_HEADER = f"按以下{COMPACT_SCHEMA_MARKER}（覆盖上文的字段名和格式），返回JSON（无markdown、无空格）："
+
+_LOCATION_FIELDS = """- b：侧别；c：钟点方向原文，报告只提到象限时填象限原文；d：距乳头距离原文（未提到时省略）
+- s/m/e/o：形状/边界/回声/方位编码；z：大小原文（位置和大小照抄原文，系统在本地标准化）"""
+
+ANALYSIS_COMPACT_OUTPUT = f"""{_OUTPUT_HEADER}
+{{"g":"F","nodules":[{{"b":"L","c":"3点","d":"1.9cm","s":"OV","m":"CI","e":"HY","o":"P","z":"1.2×0.8×0.6cm","ms":[],"k":"3","r":"L","x":[]}}],"sm":"摘要","ad":"建议"}}
+
+字段：
+- g：患者性别 F/M/U
+{_LOCATION_FIELDS}
+- ms：恶性征象列表（无则[]）；k：BI-RADS分类（如"3"、"4a"）；r：风险 L/M/H
+- x：不一致原因（每条不超过15字，无则[]）
+- sm：整体摘要（不超过30字）；ad：综合建议（不超过30字）；必须放在nodules之后
+- 结节ID、结节总数、最高风险由系统计算，不要输出
+
+{_CODE_TABLES}
+
+- 必须识别所有结节，不能遗漏；没有结节时返回：{{"g":"U","nodules":[],"sm":"未见结节","ad":""}}
+
+示例：原文"在右侧乳腺外下象限距乳头约27mm处可见1.0×0.6cm低回声结节，椭圆形，边界清楚，平行"
+→ {{"b":"R","c":"外下象限","d":"27mm","s":"OV","m":"CI","e":"低回声","o":"P","z":"1.0×0.6cm",...}}"""
+
+INDEPENDENT_BIRADS_COMPACT_OUTPUT = f"""{_OUTPUT_HEADER}
+{{"nodules":[{{"b":"L","c":"3点","d":"1.9cm","s":"OV","m":"CI","e":"HY","o":"P","z":"1.2×0.8×0.6cm","k":"3","y":"理由"}}],"n":1}}
+
+字段：
+{_LOCATION_FIELDS}
+- k：独立判断的BI-RADS分类（如"3"、"4a"）；y：判断理由（不超过20字，基于形态学特征）
+- n：结节数，必须放在nodules之后
+- 结节ID、最高BI-RADS分类由系统计算，不要输出
+
+{_CODE_TABLES}
+
+- 必须识别所有异常发现，不能遗漏；没有异常发现时返回：{{"nodules":[],"n":0}}"""
+
+
+def _decode(value, codes: dict[str, str]) -> str:
+    """编码转换为标准术语；不是编码时视为原文（非标准术语）保留"""
+    if value is None:
+        return ""
+    text = str(value).strip()
+    return codes.get(text.upper(), text)
+
+
+def _expand_location(nodule: dict) -> dict:
+    """位置原文展开后交给location_normalizer标准化（钟点、象限镜像转换、距离单位）"""
+    location = {"breast": _decode(nodule.get("b"), BREAST_CODES)}
+    for key, field in (("c", "clock_position"), ("q", "quadrant"), ("d", "distance_from_nipple")):
+        if nodule.get(key) not in (None, ""):
+            location[field] = str(nodule[key]).strip()
+    return normalize_location(location)
+
+
+def _expand_morphology(nodule: dict) -> dict:
+    morphology = {field: _decode(nodule.get(key), codes) for key, field, codes in _MORPHOLOGY_FIELDS}
+    size = str(nodule.get("z") or "").strip()
+    morphology["size"] = parse_size_cm(size) or size
+    return morphology
+
+
+def _is_full_format(result: object, full_key: str) -> bool:
+    if not isinstance(result, dict) or full_key in result:
+        return True
+    nodules = result.get("nodules")
+    return not isinstance(nodules, list) or any(isinstance(n, dict) and "morphology" in n for n in nodules)
+
+
+def expand_analysis_result(result: dict) -> dict:
+    """
+    把主分析的紧凑结果展开为原有格式（含overall_assessment）
+
+    Args:
+        result: LLM返回的紧凑结果；已经是原有格式时原样返回
+
+    Returns:
+        与analyze_text_with_deepseek原有返回格式相同的结果
+    """
+    if _is_full_format(result, "overall_assessment"):
+        return result
+
+    nodules = []
+    for index, compact in enumerate((n for n in result["nodules"] if isinstance(n, dict)), start=1):
+        reasons = [str(reason) for reason in compact.get("x") or []]
+        nodules.append(
+            {
+                "id": f"nodule_{index}",
+                "location": _expand_location(compact),
+                "morphology": _expand_morphology(compact),
+                "malignant_signs": list(compact.get("ms") or []),
+                "birads_class": str(compact.get("k") or ""),
+                "risk_assessment": _decode(compact.get("r") or "L", RISK_CODES),
+                "inconsistency_alert": bool(reasons),
+                "inconsistency_reasons": reasons,
+            }
+        )
+
+    highest_risk = max((n["risk_assessment"] for n in nodules), key=lambda r: _RISK_LEVELS.get(r, 0), default="Low")
+    return {
+        "patient_gender": _decode(result.get("g") or "U", GENDER_CODES),
+        "nodules": nodules,
+        "overall_assessment": {
+            "total_nodules": len(nodules),
+            "highest_risk": highest_risk,
+            "summary": result.get("sm", ""),
+            "advice": result.get("ad", ""),
+        },
+    }
+
+
+def expand_independent_birads_result(result: dict) -> dict:
+    """
+    把独立BI-RADS判断的紧凑结果展开为原有格式（含llm_highest_birads）
+
+    最高分类按数字部分比较（同analyze_birads_independently的回退逻辑），由调用方计算。
+    """
+    if _is_full_format(result, "llm_highest_birads"):
+        return result
+
+    nodules = [
+        {
+            "id": f"nodule_{index}",
+            "location": _expand_location(compact),
+            "morphology": _expand_morphology(compact),
+            "llm_birads_class": str(compact.get("k") or ""),
+            "llm_birads_reasoning": compact.get("y", ""),
+        }
+        for index, compact in enumerate((n for n in result["nodules"] if isinstance(n, dict)), start=1)
+    ]
+    return {"nodules": nodules, "llm_highest_birads": None}
+
+
+def _encode(value: str, codes: dict[str, str]) -> str:
+    reverse = {term: code for code, term in codes.items()}
+    return reverse.get(value, value)
+
+
+def _compact_nodule(nodule: dict) -> dict:
+    location = nodule.get("location") or {}
+    morphology = nodule.get("morphology") or {}
+    compact = {"b": _encode(location.get("breast", ""), BREAST_CODES)}
+    for key, field in (("c", "clock_position"), ("q", "quadrant"), ("d", "distance_from_nipple")):
+        if location.get(field):
+            compact[key] = location[field]
+    for key, field, codes in _MORPHOLOGY_FIELDS:
+        compact[key] = _encode(morphology.get(field, ""), codes)
+    compact["z"] = morphology.get("size") or ""
+    return compact
+
+
+def compact_analysis_result(result: dict) -> dict:
+    """把原有格式的主分析结果编码为紧凑格式（expand_analysis_result的逆操作，用于测量和替身服务）"""
+    nodules = []
+    for nodule in result.get("nodules", []):
+        compact = _compact_nodule(nodule)
+        compact.update(
+            {
+                "ms": nodule.get("malignant_signs", []),
+                "k": nodule.get("birads_class", ""),
+                "r": _encode(nodule.get("risk_assessment", "Low"), RISK_CODES),
+                "x": nodule.get("inconsistency_reasons", []),
+            }
+        )
+        nodules.append(compact)
+    overall = result.get("overall_assessment") or {}
+    return {
+        "g": _encode(result.get("patient_gender", "Unknown"), GENDER_CODES),
+        "nodules": nodules,
+        "sm": overall.get("summary", ""),
+        "ad": overall.get("advice", ""),
+    }
+
+
+def compact_independent_birads_result(result: dict) -> dict:
+    """把原有格式的独立BI-RADS判断结果编码为紧凑格式"""
+    nodules = [
+        {**_compact_nodule(n), "k": n.get("llm_birads_class", ""), "y": n.get("llm_birads_reasoning", "")}
+        for n in result.get("nodules", [])
+    ]
+    return {"nodules": nodules, "n": len(nodules)}
@@ -0,0 +1,185 @@
+"""
+检查项目切分模块：在多检查混合报告中定位乳腺超声部分，LLM各阶段只处理乳腺超声内容
+
+体检套餐等混合报告会把甲状腺、肝胆、心电图等检查和乳腺超声写在一起。
+本模块按检查项目标题词表在本地切分文本（不调用LLM），只保留报告头部和乳腺超声部分：
+
+- 标题 = 部位 + 检查方式（如"乳腺彩超"、"甲状腺超声"），或独立标题（如"心电图"、"血常规"）
+- 报告头部（第一个标题之前的内容，含患者性别）保留，其余检查项目的内容去掉
+- 淋巴结超声常与乳腺超声一起检查（腋窝淋巴结），默认不作为其他检查项目
+- 至少有一个乳腺标题和一个其他检查标题时才切分；其他检查部分中出现BI-RADS分类时
+  （如诊断按部位集中写在最后），无法安全切分，保留完整文本
+
+词表可以通过MEDCRUX_EXAM_LEXICON指定JSON文件扩充（各字段的条目追加到默认词表）：
+    {
+        "breast_organs": ["乳腺及腋窝"],
+        "other_organs": ["肾上腺"],
+        "modalities": ["超声检查"],
+        "other_titles": ["糖化血红蛋白"]
+    }
+"""
+
+import json
+import os
+import re
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from pathlib import Path
+
+from medcrux.analysis.birads_grammar import extract_birads_mentions
+from medcrux.utils.logger import log_error_with_context, setup_logger
+
+logger = setup_logger("medcrux.analysis.exam_segmenter")
+
+# 主分析输入来源：结构解析失败时只使用混合报告中的乳腺超声部分（见report_structure_parser的ANALYSIS_INPUT_*）
+ANALYSIS_INPUT_BREAST_EXAM = "breast_exam"
+
+DEFAULT_EXAM_LEXICON = {
+    "breast_organs": ["乳腺", "乳房", "双乳", "双侧乳腺"],
+    "other_organs": [
+        "甲状腺",
+        "肝胆胰脾",
+        "肝胆",
+        "腹部",
+        "泌尿系",
+        "子宫附件",
+        "妇科",
+        "心脏",
+        "颈动脉",
+        "颈部血管",
+        "前列腺",
+        "盆腔",
+    ],
+    "modalities": ["彩色多普勒超声", "彩色超声", "彩超", "超声", "B超"],
+    "other_titles": [
+        "心电图",
+        "胸部正位",
+        "胸部DR",
+        "胸部CT",
+        "胸部X线",
+        "胸片",
+        "骨密度",
+        "血常规",
+        "尿常规",
+        "肝功能",
+        "肾功能",
+        "血脂",
+    ],
+}
+
+# 乳腺超声部分（去掉标题后）少于该长度时不切分
+MIN_BREAST_CONTENT_LENGTH = 10
+
+
+def _alternation(words: list[str]) -> str:
+    return "|".join(re.escape(word) for word in sorted(set(words), key=len, reverse=True))
+
+
+@dataclass(frozen=True)
+class ExamLexicon:
+    """检查项目标题词表（编译后的正则）"""
+
+    pattern: re.Pattern
+
+    @classmethod
+    def from_dict(cls, lexicon: dict[str, list[str]]) -> "ExamLexicon":
+        modalities = _alternation(lexicon["modalities"])
+        pattern = re.compile(
+            rf"(?P<breast>(?:{_alternation(lexicon['breast_organs'])})(?:{modalities}))"
+            rf"|(?P<other>(?:{_alternation(lexicon['other_organs'])})(?:{modalities})"
+            rf"|{_alternation(lexicon['other_titles'])})"
+        )
+        return cls(pattern=pattern)
+
+
+@lru_cache(maxsize=4)
+def _load_lexicon(path: str) -> ExamLexicon:
+    lexicon = {key: list(words) for key, words in DEFAULT_EXAM_LEXICON.items()}
+    if path:
+        try:
+            extra = json.loads(Path(path).read_text(encoding="utf-8"))
+            for key, words in extra.items():
+                if key not in lexicon:
+                    logger.warning(f"检查项目词表中未知的字段：{key}（可选：{', '.join(lexicon)}）")
+                    continue
+                lexicon[key].extend(words)
+        except (OSError, ValueError) as e:
+            log_error_with_context(logger, e, context={"path": path}, operation="读取检查项目词表")
+    return ExamLexicon.from_dict(lexicon)
+
+
+def get_exam_lexicon() -> ExamLexicon:
+    """当前检查项目词表（默认词表 + MEDCRUX_EXAM_LEXICON指定的扩充）"""
+    return _load_lexicon(os.getenv("MEDCRUX_EXAM_LEXICON", ""))
+
+
+@dataclass(frozen=True)
+class ExamBlock:
+    """一个检查项目（或报告头部）在原文中的范围"""
+
+    title: str | None  # 检查项目标题，报告头部为None
+    start: int
+    end: int
+    is_breast: bool
+
+
+def segment_exams(text: str) -> list[ExamBlock]:
+    """
+    按检查项目标题切分文本
+
+    Returns:
+        ExamBlock列表（按原文顺序，覆盖全文；第一个标题之前有内容时以报告头部开始）
+    """
+    blocks = []
+    matches = list(get_exam_lexicon().pattern.finditer(text))
+    if not matches or matches[0].start() > 0:
+        end = matches[0].start() if matches else len(text)
+        blocks.append(ExamBlock(title=None, start=0, end=end, is_breast=False))
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+        if blocks and blocks[-1].title == match.group():
+            # 同一检查项目内再次出现标题（如"心电图正常"、"乳腺超声：BI-RADS 3类"），并入前一个检查项目
+            blocks[-1] = replace(blocks[-1], end=end)
+            continue
+        blocks.append(
+            ExamBlock(title=match.group(), start=match.start(), end=end, is_breast=match.lastgroup == "breast")
+        )
+    return blocks
+
+
+def isolate_breast_exam(text: str) -> str | None:
+    """
+    从多检查混合报告中提取报告头部和乳腺超声部分
+
+    Args:
+        text: OCR识别的文本
+
+    Returns:
+        只包含报告头部和乳腺超声部分的文本；不是混合报告或无法安全切分时返回None
+    """
+    if not text:
+        return None
+
+    blocks = segment_exams(text)
+    breast_blocks = [block for block in blocks if block.is_breast]
+    other_blocks = [block for block in blocks if block.title is not None and not block.is_breast]
+    if not breast_blocks or not other_blocks:
+        return None
+
+    breast_content = "".join(text[block.start + len(block.title) : block.end].strip() for block in breast_blocks)
+    if len(breast_content) < MIN_BREAST_CONTENT_LENGTH:
+        logger.debug("乳腺超声部分过短，不切分检查项目")
+        return None
+
+    for block in other_blocks:
+        if extract_birads_mentions(text[block.start : block.end]):
+            logger.debug(f"检查项目[{block.title}]中包含BI-RADS分类，不切分检查项目")
+            return None
+
+    kept = [text[block.start : block.end].strip() for block in blocks if block.title is None or block.is_breast]
+    isolated = "\n".join(part for part in kept if part)
+    logger.info(
+        f"多检查报告只保留乳腺超声部分 [长度: {len(isolated)}/{len(text)} 字符, "
+        f"去掉的检查项目: {'、'.join(dict.fromkeys(block.title for block in other_blocks))}]"
+    )
+    return isolated
@@ -0,0 +1,274 @@
+"""
+检查所见本地提取模块：规则快速通道（不调用LLM）
+
+很多常规报告使用完全标准的术语描述病灶（如"椭圆形、边界清晰、均匀低回声、平行"），
+并在影像学诊断中给出明确的BI-RADS分类。这类报告可以用预编译的正则表达式
+直接提取位置、大小和形态学特征，再由LogicalConsistencyChecker做确定性的充要条件检查，
+无需调用LLM。
+
+只有当每个病灶都被高置信度地提取时才走快速通道，否则返回None，由LLM分析：
+- 每个病灶必须有：左右侧、钟点方向或象限（由location_normalizer转换为钟点）、大小、形状/边界/回声/方位（均为标准术语）
+- BI-RADS分类必须明确，且为2类或3类（LogicalConsistencyChecker已定义充要条件的分类）
+- 不能出现未否定的可疑征象（毛刺、钙化、血流丰富等）
+- 不能出现"多发"、"数个"等无法逐个对应的描述
+- 影像学诊断中带BI-RADS分类的每一侧、每个分类都必须对应到提取出的病灶（否则说明有病灶描述未被识别）
+"""
+
+import re
+
+from medcrux.analysis.birads_grammar import extract_birads_mentions
+from medcrux.analysis.location_normalizer import (
+    normalize_location,
+    normalize_quadrant,
+    parse_clock_position,
+    parse_distance_cm,
+    parse_size_cm,
+)
+from medcrux.rag.logical_consistency_checker import LogicalConsistencyChecker
+from medcrux.utils.logger import setup_logger
+
+logger = setup_logger("medcrux.analysis.findings_extractor")
+
+# 分析结果来源
+ANALYSIS_SOURCE_LLM = "llm"
+ANALYSIS_SOURCE_FAST_PATH = "fast_path"
+
+# 快速通道支持的BI-RADS分类
+FAST_PATH_BIRADS = {"2", "3"}
+
+# BI-RADS分类对应的风险评估和建议
+BIRADS_RISK = {"2": "Low", "3": "Low"}
+BIRADS_ADVICE = {
+    "2": "良性发现，建议常规随访。",
+    "3": "可能良性发现，建议6个月后短期随访复查。",
+}
+
+# 标准术语（按长度倒序匹配，避免"不规则形"被"规则"截断、"不平行"被"平行"截断）
+SHAPE_PATTERN = re.compile(r"(不规则形|椭圆形|圆形)")
+BOUNDARY_PATTERN = re.compile(r"边界(大部分清晰|清晰|清楚|模糊|成角|微小分叶|毛刺状)")
+ECHO_PATTERN = re.compile(r"(?<!不)(均匀低回声|不均匀回声|无回声|等回声|高回声|复合回声)")
+ORIENTATION_PATTERN = re.compile(r"(不平行|(?<!不)平行)")
+
+# 同义词（与分析提示词中的术语标准化规则一致）
+BOUNDARY_SYNONYMS = {"清楚": "清晰"}
+
+BREAST_PATTERN = re.compile(r"(左|右)侧?乳")
+CLOCK_PATTERN = re.compile(r"(\d{1,2})\s*点(?:钟)?")
+DISTANCE_PATTERN = re.compile(r"距乳头(?:约)?\s*(\d+(?:\.\d+)?)\s*(mm|cm|MM|CM)")
+SIZE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*[×xX*]\s*(\d+(?:\.\d+)?)(?:\s*[×xX*]\s*(\d+(?:\.\d+)?))?\s*(mm|cm|MM|CM)")
+GENDER_PATTERN = re.compile(r"性\s*别\s*[:：]?\s*(男|女)")
+
+# 病灶描述（含这些词、或同时含侧别和大小但无法完整提取的句子会使快速通道失效）
+LESION_KEYWORDS = ("结节", "低回声", "无回声", "等回声", "高回声", "回声区", "肿块", "囊肿", "占位")
+
+# 多个病灶合并描述，无法逐个对应
+MULTIPLE_LESION_KEYWORDS = ("多发", "多个", "数个", "散在", "大小不等")
+
+# 可疑征象：出现且未被否定时交给LLM判断
+SUSPICIOUS_KEYWORDS = ("毛刺", "成角", "分叶", "钙化", "血流丰富", "衰减", "纵横比>1", "纵横比大于1", "结构扭曲")
+NEGATION_PATTERN = re.compile(r"(未见|未探及|未显示|无|不伴)[^，,。；;]{0,6}$")
+
+# 正常描述（如"未见明显占位"），不视为病灶
+NORMAL_FINDING_PATTERN = re.compile(r"未见(明显)?(异常|占位|结节|肿块)")
+
+
+def _split_sentences(text: str) -> list[str]:
+    return [s.strip() for s in re.split(r"[。；;\n]", text) if s.strip()]
+
+
+def _has_unnegated_suspicious_sign(sentence: str) -> bool:
+    for keyword in SUSPICIOUS_KEYWORDS:
+        for match in re.finditer(re.escape(keyword), sentence):
+            if not NEGATION_PATTERN.search(sentence[: match.start()]):
+                return True
+    return False
+
+
+def _extract_lesion(sentence: str) -> dict | None:
+    """从单句病灶描述中提取位置、大小和形态学特征，任一必填项缺失时返回None"""
+    breast_match = BREAST_PATTERN.search(sentence)
+    size_match = SIZE_PATTERN.search(sentence)
+    shape_match = SHAPE_PATTERN.search(sentence)
+    boundary_match = BOUNDARY_PATTERN.search(sentence)
+    echo_match = ECHO_PATTERN.search(sentence)
+    orientation_match = ORIENTATION_PATTERN.search(sentence)
+
+    if not all((breast_match, size_match, shape_match, boundary_match, echo_match, orientation_match)):
+        return None
+
+    # 位置：明确的钟点方向，或只有象限（由location_normalizer按左右乳镜像转换为钟点）
+    raw_location = {"breast": breast_match.group(1)}
+    clock_match = CLOCK_PATTERN.search(sentence)
+    if clock_match:
+        raw_location["clock_position"] = clock_match.group(0)
+    quadrant = normalize_quadrant(sentence)
+    if quadrant:
+        raw_location["quadrant"] = quadrant
+    location = normalize_location(raw_location)
+    if not parse_clock_position(location.get("clock_position")):
+        return None
+    distance_match = DISTANCE_PATTERN.search(sentence)
+    if distance_match:
+        location["distance_from_nipple"] = parse_distance_cm(distance_match.group(0))
+
+    boundary = boundary_match.group(1)
+    return {
+        "location": location,
+        "morphology": {
+            "shape": shape_match.group(1),
+            "boundary": BOUNDARY_SYNONYMS.get(boundary, boundary),
+            "echo": echo_match.group(1),
+            "orientation": orientation_match.group(1),
+            "size": parse_size_cm(size_match.group(0)),
+        },
+    }
+
+
+def _is_lesion_candidate(sentence: str) -> bool:
+    """含病灶关键词，或同时含侧别和大小（如"右侧乳腺10点钟方向查见0.8×0.5cm液性暗区"）"""
+    if any(keyword in sentence for keyword in LESION_KEYWORDS):
+        return True
+    return bool(BREAST_PATTERN.search(sentence) and SIZE_PATTERN.search(sentence))
+
+
+def _collect_lesions(findings: str) -> list[dict] | None:
+    """逐句提取病灶，任一病灶描述无法高置信度提取时返回None"""
+    if any(keyword in findings for keyword in MULTIPLE_LESION_KEYWORDS):
+        return None
+
+    lesions = []
+    for sentence in _split_sentences(findings):
+        if NORMAL_FINDING_PATTERN.search(sentence) and not SIZE_PATTERN.search(sentence):
+            continue
+        if not _is_lesion_candidate(sentence):
+            continue
+        if _has_unnegated_suspicious_sign(sentence):
+            logger.debug(f"快速通道跳过：存在可疑征象 [{sentence[:30]}]")
+            return None
+        lesion = _extract_lesion(sentence)
+        if lesion is None:
+            logger.debug(f"快速通道跳过：病灶描述不完整 [{sentence[:30]}]")
+            return None
+        lesions.append(lesion)
+    return lesions
+
+
+def _birads_by_breast(diagnosis: str) -> dict[str, str] | None:
+    """
+    从影像学诊断中提取各侧的BI-RADS分类
+
+    Returns:
+        {"left": "3", "right": "2", "any": "3"}；"any"仅在全报告只有一个分类时存在。
+        同一侧出现多个不同分类时无法对应到病灶，返回None。
+    """
+    values = {mention.value.lower() for mention in extract_birads_mentions(diagnosis)}
+    if not values:
+        return None
+
+    result = {}
+    if len(values) == 1:
+        result["any"] = values.pop()
+
+    for sentence in _split_sentences(diagnosis):
+        # 同一句内逗号分隔的子句沿用前文提到的侧别（如"左侧乳腺低回声结节，BI-RADS 3类"）
+        sides: set[str] = set()
+        for clause in re.split(r"[，,]", sentence):
+            if "双" in clause:
+                sides = {"left", "right"}
+            elif "左" in clause or "右" in clause:
+                sides = {side for side, word in (("left", "左"), ("right", "右")) if word in clause}
+
+            clause_values = {mention.value.lower() for mention in extract_birads_mentions(clause)}
+            if not clause_values:
+                continue
+            if len(clause_values) > 1:
+                return None
+            value = clause_values.pop()
+            for side in sides:
+                if result.get(side, value) != value:
+                    return None
+                result[side] = value
+    return result
+
+
+def extract_findings_fast_path(findings: str | None, diagnosis: str | None, ocr_text: str = "") -> dict | None:
+    """
+    规则快速通道：从检查所见和影像学诊断中直接生成结节分析结果
+
+    Args:
+        findings: 检查所见
+        diagnosis: 影像学诊断（提供BI-RADS分类）
+        ocr_text: 完整OCR文本（仅用于提取患者性别，可选）
+
+    Returns:
+        与analyze_text_with_deepseek相同格式的结果（analysis_source为"fast_path"），
+        无法高置信度提取所有病灶时返回None
+    """
+    if not findings or not diagnosis:
+        return None
+
+    birads_map = _birads_by_breast(diagnosis)
+    if not birads_map:
+        return None
+
+    lesions = _collect_lesions(findings)
+    if not lesions:
+        return None
+
+    checker = LogicalConsistencyChecker()
+    nodules = []
+    for index, lesion in enumerate(lesions, start=1):
+        birads_class = birads_map.get(lesion["location"]["breast"], birads_map.get("any"))
+        if birads_class not in FAST_PATH_BIRADS:
+            return None
+
+        consistency = checker.check_consistency({**lesion["morphology"], "malignant_signs": []}, birads_class)
+        risk_assessment = BIRADS_RISK[birads_class]
+        if consistency["inconsistency"]:
+            risk_assessment = consistency["risk_assessment"]
+
+        nodules.append(
+            {
+                "id": f"nodule_{index}",
+                **lesion,
+                "malignant_signs": [],
+                "birads_class": birads_class,
+                "risk_assessment": risk_assessment,
+                "inconsistency_alert": consistency["inconsistency"],
+                "inconsistency_reasons": consistency["violations"],
+            }
+        )
+
+    # 诊断中的每个侧别和分类都要有对应的病灶，否则检查所见中有病灶没有被提取（病灶数会少算）
+    diagnosis_sides = {side for side in birads_map if side != "any"}
+    diagnosis_values = {mention.value.lower() for mention in extract_birads_mentions(diagnosis)}
+    nodule_sides = {n["location"]["breast"] for n in nodules}
+    nodule_values = {n["birads_class"] for n in nodules}
+    if not (diagnosis_sides <= nodule_sides and diagnosis_values <= nodule_values):
+        logger.debug(f"快速通道跳过：诊断中的侧别或分类没有对应的病灶 [{diagnosis[:30]}]")
+        return None
+
+    risk_levels = {"Low": 1, "Medium": 2, "High": 3}
+    highest_risk = max((n["risk_assessment"] for n in nodules), key=lambda r: risk_levels.get(r, 0))
+    highest_birads = max(n["birads_class"] for n in nodules)
+    summary = "；".join(
+        f"{'左' if n['location']['breast'] == 'left' else '右'}乳{n['location']['clock_position']}"
+        f"{n['morphology']['echo']}结节（BI-RADS {n['birads_class']}类）"
+        for n in nodules
+    )
+
+    gender_match = GENDER_PATTERN.search(ocr_text or "")
+    patient_gender = {"女": "Female", "男": "Male"}.get(gender_match.group(1)) if gender_match else "Unknown"
+
+    logger.info(f"快速通道完成 [结节数: {len(nodules)}, 最高BI-RADS: {highest_birads}]")
+    return {
+        "patient_gender": patient_gender,
+        "nodules": nodules,
+        "overall_assessment": {
+            "total_nodules": len(nodules),
+            "highest_risk": highest_risk,
+            "summary": summary,
+            "advice": BIRADS_ADVICE[highest_birads],
+        },
+        "analysis_source": ANALYSIS_SOURCE_FAST_PATH,
+    }
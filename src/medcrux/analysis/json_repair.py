@@ -0,0 +1,241 @@
+"""
+JSON修复模块：本地修复LLM返回的不合法JSON
+
+LLM偶尔返回不合法的JSON（尤其是输出被截断时），直接json.loads失败会让整个阶段报错，
+用户只能重新上传、重新支付整条流水线的成本。本模块在本地尝试修复常见问题：
+- markdown代码块（```json ... ```）和JSON前后的多余文字
+- 尾随逗号（[1, 2,] / {"a": 1,}）
+- 字符串中未转义的双引号和换行
+- 输出被截断：补全未闭合的字符串、数组和对象，丢弃不完整的最后一个元素
+
+修复后再用validate_nodule_result做结构校验，确保结节数据可用。
+"""
+
+import json
+import re
+from dataclasses import dataclass
+
+# 修复类型
+REPAIR_CODE_FENCE = "code_fence"
+REPAIR_EXTRA_TEXT = "extra_text"
+REPAIR_TRAILING_COMMA = "trailing_comma"
+REPAIR_UNESCAPED_QUOTE = "unescaped_quote"
+REPAIR_CONTROL_CHAR = "control_char"
+REPAIR_TRUNCATED = "truncated"
+
+# 截断修复时最多回退的元素数
+_MAX_TRUNCATION_CUTS = 50
+
+_CODE_FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*(.*?)\s*(?:```|$)", re.DOTALL)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONRepairError(json.JSONDecodeError):
+    """本地无法修复的JSON（是JSONDecodeError的子类，兼容原有异常处理）"""
+
+
+def _next_significant_char(text: str, start: int) -> str:
+    for ch in text[start:]:
+        if not ch.isspace():
+            return ch
+    return ""
+
+
+def _scan_string_char(text: str, index: int, escape: bool, out: list[str], repairs: set[str]) -> tuple[bool, bool]:
+    """
+    处理字符串内部的一个字符（转义、未转义的引号、控制字符）
+
+    Returns:
+        (是否仍在字符串内部, 下一个字符是否被转义)
+    """
+    ch = text[index]
+    if escape:
+        out.append(ch)
+        return True, False
+    if ch == "\\":
+        out.append(ch)
+        return True, True
+    if ch == '"':
+        # 只有后面紧跟分隔符（或文本结束）的引号才是字符串结束，否则视为未转义的引号
+        if _next_significant_char(text, index + 1) in {",", ":", "}", "]", ""}:
+            out.append(ch)
+            return False, False
+        out.append('\\"')
+        repairs.add(REPAIR_UNESCAPED_QUOTE)
+    elif ch in "\n\r\t":
+        out.append({"\n": "\\n", "\r": "\\r", "\t": "\\t"}[ch])
+        repairs.add(REPAIR_CONTROL_CHAR)
+    else:
+        out.append(ch)
+    return True, False
+
+
+def _scan(text: str, repairs: set[str]) -> tuple[str, list[str], bool]:
+    """
+    逐字符扫描并修复字符串内部和尾随逗号问题
+
+    Returns:
+        (修复后的文本, 未闭合的括号栈, 是否停在字符串内部)
+    """
+    out: list[str] = []
+    stack: list[str] = []
+    in_string = False
+    escape = False
+
+    for index, ch in enumerate(text):
+        if in_string:
+            in_string, escape = _scan_string_char(text, index, escape, out, repairs)
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(ch)
+        elif ch in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+                repairs.add(REPAIR_TRAILING_COMMA)
+            if stack:
+                stack.pop()
+        out.append(ch)
+
+    return "".join(out), stack, in_string
+
+
+def _close(text: str, stack: list[str], in_string: bool) -> str:
+    """补全未闭合的字符串和括号，去掉悬空的逗号、冒号和键"""
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    elif text.endswith(":"):
+        # 只有键没有值：去掉这个键
+        text = re.sub(r',?\s*"(?:[^"\\]|\\.)*"\s*:$', "", text)
+    return text + "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+def _extract_json_body(text: str, repairs: set[str]) -> str:
+    """去掉代码块标记和JSON之前的多余文字（之后的文字在解析时忽略）"""
+    stripped = text.strip()
+    fence = _CODE_FENCE_PATTERN.search(stripped)
+    if fence and "```" in stripped:
+        stripped = fence.group(1).strip()
+        repairs.add(REPAIR_CODE_FENCE)
+
+    starts = [i for i in (stripped.find("{"), stripped.find("[")) if i >= 0]
+    if not starts:
+        return stripped
+    start = min(starts)
+    if start > 0:
+        repairs.add(REPAIR_EXTRA_TEXT)
+    return stripped[start:]
+
+
+def repair_json(text: str) -> tuple[object, list[str]]:
+    """
+    解析并在必要时修复JSON文本
+
+    Args:
+        text: LLM返回的文本
+
+    Returns:
+        (解析结果, 修复类型列表)；文本本身合法时修复类型列表为空
+
+    Raises:
+        JSONRepairError: 本地无法修复
+    """
+    if text is None:
+        raise JSONRepairError("LLM返回内容为空", "", 0)
+    try:
+        return json.loads(text), []
+    except json.JSONDecodeError:
+        pass
+
+    repairs: set[str] = set()
+    body = _extract_json_body(text, repairs)
+    decoder = json.JSONDecoder()
+    last_error: json.JSONDecodeError | None = None
+
+    for _ in range(_MAX_TRUNCATION_CUTS):
+        scanned, stack, in_string = _scan(body, repairs)
+        cut = body.rfind(",")
+        if in_string:
+            # 截断在字符串中间：值可能不完整（如"BI-RADS 4a"被截成"BI-RADS "），丢弃该元素；
+            # 前面没有可回退的逗号时（如第一个字段的值被截断）不保留不完整的值，无法修复
+            if cut <= 0:
+                break
+            body = body[:cut]
+            continue
+        candidate = scanned
+        if stack or in_string:
+            candidate = _close(scanned, stack, in_string)
+        try:
+            result, end = decoder.raw_decode(candidate)
+        except json.JSONDecodeError as e:
+            last_error = e
+        else:
+            if candidate[end:].strip():
+                # JSON之后还有文字（如"以上是分析结果"）
+                repairs.add(REPAIR_EXTRA_TEXT)
+            elif stack or in_string:
+                repairs.add(REPAIR_TRUNCATED)
+            return result, sorted(repairs)
+
+        # 截断在元素中间：回退到上一个逗号，丢弃不完整的最后一个元素
+        if cut <= 0 or not (stack or in_string):
+            break
+        body = body[:cut]
+
+    position = last_error.pos if last_error else 0
+    raise JSONRepairError(f"JSON无法修复：{last_error.msg if last_error else '未知错误'}", text, position)
+
+
+@dataclass(frozen=True)
+class ResultRequirements:
+    """修复后的结果必须满足的结构要求（见validate_nodule_result）"""
+
+    fields: tuple[str, ...] = ()  # 顶层必须包含的字段
+    nodule_fields: tuple[str, ...] = ()  # 每个结节必须包含的字段
+
+
+def validate_nodule_result(
+    result: object, required_fields: tuple[str, ...] = (), required_nodule_fields: tuple[str, ...] = ()
+) -> list[str]:
+    """
+    校验结节分析结果的结构
+
+    输出被截断时，修复后的JSON可能缺少排在后面的字段或整个结节，
+    因此顶层必需字段（如"overall_assessment"）缺失也视为不可用。
+
+    Args:
+        result: 解析后的JSON
+        required_fields: 顶层必须包含的字段
+        required_nodule_fields: 每个结节必须包含的字段（如("morphology", "birads_class")）
+
+    Returns:
+        问题列表，为空表示结构可用
+    """
+    if not isinstance(result, dict):
+        return [f"顶层不是对象：{type(result).__name__}"]
+
+    problems = [f"缺少字段：{field}" for field in required_fields if field not in result]
+    nodules = result.get("nodules")
+    if nodules is None:
+        return problems
+    if not isinstance(nodules, list):
+        return [*problems, f"nodules不是数组：{type(nodules).__name__}"]
+
+    for index, nodule in enumerate(nodules, start=1):
+        if not isinstance(nodule, dict):
+            problems.append(f"第{index}个结节不是对象")
+            continue
+        for field in ("location", "morphology"):
+            if field in nodule and not isinstance(nodule[field], dict):
+                problems.append(f"第{index}个结节的{field}不是对象")
+        missing = [field for field in required_nodule_fields if field not in nodule]
+        if missing:
+            problems.append(f"第{index}个结节缺少字段：{', '.join(missing)}")
+    return problems
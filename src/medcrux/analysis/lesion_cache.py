@@ -0,0 +1,136 @@
+"""
+病灶判断缓存模块：按规范化的病灶描述缓存独立BI-RADS判断结果（LRU）
+
+同一患者的复查报告、以及不同患者的模板化报告，经常出现完全相同的病灶描述，
+但每次都会重新请求LLM判断。本模块把病灶描述规范化后作为缓存键，
+只有新出现或有变化的病灶才需要调用LLM。
+
+规范化规则（只消除书写差异，不改变语义）：
+- 全角字符转半角（NFKC），英文字母转小写，去除所有空白
+- 标点统一：，、；;。 → ","，合并连续标点，去除首尾标点
+- 乘号统一：x、X、*、＊ → "×"
+- 单位统一：mm/毫米 → cm（数值除以10），厘米 → cm
+- 数值统一：去除多余的0（"1.20" → "1.2"，"2.0" → "2"）
+
+缓存键还包含模型名称和用户提示词（逐病灶判断与整体判断分开缓存）。
+容量由MEDCRUX_LESION_CACHE_SIZE配置（默认512条，设为0关闭缓存），缓存保存在进程内。
+"""
+
+import copy
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_PUNCTUATION_PATTERN = re.compile(r"[,，、;；。]+")
+_MULTIPLY_PATTERN = re.compile(r"(?<=\d)[xX*＊](?=\d)")
+_DIMENSIONS_WITH_UNIT_PATTERN = re.compile(r"(\d+(?:\.\d+)?(?:×\d+(?:\.\d+)?)*)(mm|cm|毫米|厘米)")
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _format_number(value: float) -> str:
+    return f"{round(value, 3):g}"
+
+
+def _dimensions_to_cm(match: re.Match) -> str:
+    factor = 0.1 if match.group(2) in ("mm", "毫米") else 1.0
+    numbers = [_format_number(float(value) * factor) for value in match.group(1).split("×")]
+    return f"{'×'.join(numbers)}cm"
+
+
+def canonicalize_lesion(text: str | None) -> str:
+    """
+    规范化病灶描述，书写差异（空白、标点、单位、数值格式）不同但含义相同的描述得到相同结果
+
+    Args:
+        text: 病灶描述原文
+
+    Returns:
+        规范化后的描述
+    """
+    if not text:
+        return ""
+    value = unicodedata.normalize("NFKC", text).lower()
+    value = _WHITESPACE_PATTERN.sub("", value)
+    value = _PUNCTUATION_PATTERN.sub(",", value).strip(",")
+    value = _MULTIPLY_PATTERN.sub("×", value)
+    value = _DIMENSIONS_WITH_UNIT_PATTERN.sub(_dimensions_to_cm, value)
+    return _NUMBER_PATTERN.sub(lambda match: _format_number(float(match.group(0))), value)
+
+
+class LesionJudgmentCache:
+    """
+    病灶判断结果的LRU缓存（线程安全）
+
+    存取时都深拷贝结果，调用方修改返回值（如重新编号结节ID）不会影响缓存内容。
+    """
+
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def make_key(text: str, model: str, user_prompt: str) -> tuple:
+        """构建缓存键：（模型, 用户提示词, 规范化的病灶描述）"""
+        return (model, user_prompt, canonicalize_lesion(text))
+
+    def get(self, key: tuple) -> dict | None:
+        """查询缓存，命中时返回结果的副本并标记为最近使用"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return copy.deepcopy(result)
+
+    def put(self, key: tuple, result: dict):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if not self.enabled:
+            return
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def snapshot(self) -> dict:
+        """返回缓存统计"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": self._hits / lookups if lookups else None,
+            }
+
+    def clear(self):
+        """清空缓存和统计（主要用于测试）"""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+
+# 进程内单例
+lesion_cache = LesionJudgmentCache(max_size=int(os.getenv("MEDCRUX_LESION_CACHE_SIZE", "512")))
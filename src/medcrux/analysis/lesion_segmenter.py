@@ -0,0 +1,56 @@
+"""
+病灶分段模块：把检查所见切分为逐个病灶的描述
+
+超声报告通常按"在X侧乳腺…查见…"逐个描述病灶。按病灶切分后，
+独立BI-RADS判断可以对每个病灶并发发起一个小请求，输出时间不再随结节数线性增长。
+
+切分规则：
+- 以"（在）左/右侧乳（腺/房）"开头的位置作为病灶描述的起点，直到下一个起点（"左乳头"、"右乳晕"除外）
+- 不包含病灶描述的片段（如"左侧乳腺腺体结构清晰"、"右侧乳腺未见明显结节"）丢弃
+- 以下情况无法可靠切分，返回空列表（由调用方整体判断）：
+  出现"多发"、"数个"等合并描述；病灶描述不以侧别开头；片段只有位置没有病灶描述
+"""
+
+import re
+
+from medcrux.analysis.findings_extractor import LESION_KEYWORDS, MULTIPLE_LESION_KEYWORDS, NORMAL_FINDING_PATTERN
+
+# "距左乳头约2cm"、"右乳晕旁"中的"左乳"/"右乳"是病灶描述内部的参照位置，不是新病灶的起点
+LESION_START_PATTERN = re.compile(r"(?:在)?[左右]侧?乳(?![头晕])(?:腺|房)?")
+
+
+def split_lesions(findings: str | None) -> list[str]:
+    """
+    把检查所见切分为逐个病灶的描述
+
+    Args:
+        findings: 检查所见文本
+
+    Returns:
+        病灶描述列表（按原文顺序）；无法可靠切分时返回空列表
+    """
+    if not findings or any(keyword in findings for keyword in MULTIPLE_LESION_KEYWORDS):
+        return []
+
+    starts = [match.start() for match in LESION_START_PATTERN.finditer(findings)]
+    if not starts or _has_lesion(findings[: starts[0]]):
+        # 病灶描述不以侧别开头（如"乳腺内查见低回声结节，位于左乳3点"），无法按起点切分
+        return []
+
+    segments = []
+    for index, start in enumerate(starts):
+        end = starts[index + 1] if index + 1 < len(starts) else len(findings)
+        segment = findings[start:end].strip(" ，,、。；;\n")
+        if _has_lesion(segment):
+            segments.append(segment)
+        elif re.search(r"\d", segment):
+            # 只有位置没有病灶描述（如"左乳3点、右乳5点各查见一结节"），切分会丢失病灶
+            return []
+    return segments
+
+
+def _has_lesion(text: str) -> bool:
+    """是否包含病灶描述（"未见明显结节"等正常描述不算）"""
+    if not any(keyword in text for keyword in LESION_KEYWORDS):
+        return False
+    return not (NORMAL_FINDING_PATTERN.search(text) and not re.search(r"\d", text))
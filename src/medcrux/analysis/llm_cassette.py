@@ -0,0 +1,149 @@
+"""
+LLM录制回放模块：把chat.completions请求和响应（含耗时）录制为本地文件，并按原始或缩放的延迟回放
+
+性能测试要么用零延迟的mock代替LLM，要么依赖真实API Key。录制回放模式下：
+- record：请求照常发给后端，同时把请求、响应和耗时写入录制目录
+- replay：不访问网络，按请求内容查找录制文件返回响应，并按录制耗时 × 缩放系数等待；
+  等待时间超过请求的timeout时按超时处理（抛出APITimeoutError，与真实后端一致）
+
+配置：
+- MEDCRUX_LLM_CASSETTE_MODE：off（默认）/ record / replay
+- MEDCRUX_LLM_CASSETTE_DIR：录制目录（默认llm_cassettes）
+- MEDCRUX_LLM_CASSETTE_LATENCY_SCALE：回放延迟缩放系数（默认1.0，设为0不等待）
+
+录制文件按请求内容（timeout除外）的哈希命名，同一请求多次录制时依次追加，回放时按顺序循环返回。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import openai
+from openai.types.chat import ChatCompletion
+
+from medcrux.utils.logger import setup_logger
+
+logger = setup_logger("medcrux.analysis.llm_cassette")
+
+CASSETTE_OFF = "off"
+CASSETTE_RECORD = "record"
+CASSETTE_REPLAY = "replay"
+
+DEFAULT_CASSETTE_DIR = "llm_cassettes"
+
+# 不参与匹配的请求参数（同一请求的timeout随剩余时限变化）
+_IGNORED_REQUEST_KEYS = ("timeout",)
+
+
+class CassetteMissError(LookupError):
+    """回放模式下找不到请求对应的录制"""
+
+
+def get_cassette_mode() -> str:
+    """录制回放模式（MEDCRUX_LLM_CASSETTE_MODE）"""
+    mode = os.getenv("MEDCRUX_LLM_CASSETTE_MODE", CASSETTE_OFF).strip().lower()
+    if mode not in (CASSETTE_OFF, CASSETTE_RECORD, CASSETTE_REPLAY):
+        logger.warning(f"未知的录制回放模式：{mode}，不启用")
+        return CASSETTE_OFF
+    return mode
+
+
+def get_cassette_dir() -> Path:
+    """录制目录（MEDCRUX_LLM_CASSETTE_DIR）"""
+    return Path(os.getenv("MEDCRUX_LLM_CASSETTE_DIR", DEFAULT_CASSETTE_DIR))
+
+
+def get_latency_scale() -> float:
+    """回放延迟缩放系数（MEDCRUX_LLM_CASSETTE_LATENCY_SCALE）"""
+    return max(0.0, float(os.getenv("MEDCRUX_LLM_CASSETTE_LATENCY_SCALE", "1.0")))
+
+
+def request_key(request_kwargs: dict) -> str:
+    """请求内容的哈希（作为录制文件名）"""
+    request = {key: value for key, value in request_kwargs.items() if key not in _IGNORED_REQUEST_KEYS}
+    canonical = json.dumps(request, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:24]
+
+
+class CassetteClient:
+    """
+    录制回放客户端，提供与OpenAI客户端相同的 `chat.completions.create` 接口（线程安全）
+
+    Args:
+        directory: 录制目录
+        mode: CASSETTE_RECORD（需要inner）或CASSETTE_REPLAY
+        inner: 录制模式下实际发送请求的客户端
+        latency_scale: 回放延迟缩放系数
+    """
+
+    def __init__(self, directory: Path, mode: str, inner=None, latency_scale: float = 1.0):
+        if mode == CASSETTE_RECORD and inner is None:
+            raise ValueError("录制模式需要实际发送请求的客户端")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._inner = inner
+        self._lock = threading.Lock()
+        self._replay_positions: dict[str, int] = {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _load(self, key: str) -> dict | None:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def _create(self, **request_kwargs):
+        key = request_key(request_kwargs)
+        if self.mode == CASSETTE_RECORD:
+            return self._record(key, request_kwargs)
+        return self._replay(key, request_kwargs)
+
+    def _record(self, key: str, request_kwargs: dict):
+        start = time.perf_counter()
+        response = self._inner.chat.completions.create(**request_kwargs)
+        latency = time.perf_counter() - start
+
+        interaction = {"latency": round(latency, 4), "response": response.model_dump(mode="json")}
+        with self._lock:
+            cassette = self._load(key) or {
+                "request": {k: v for k, v in request_kwargs.items() if k not in _IGNORED_REQUEST_KEYS},
+                "interactions": [],
+            }
+            cassette["interactions"].append(interaction)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._path(key).write_text(json.dumps(cassette, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        logger.debug(f"LLM请求已录制 [{key}, 耗时: {latency:.2f}秒]")
+        return response
+
+    def _replay(self, key: str, request_kwargs: dict):
+        with self._lock:
+            cassette = self._load(key)
+            if not cassette or not cassette.get("interactions"):
+                raise CassetteMissError(f"录制目录{self.directory}中没有该请求的录制：{key}")
+            interactions = cassette["interactions"]
+            position = self._replay_positions.get(key, 0)
+            self._replay_positions[key] = position + 1
+        interaction = interactions[position % len(interactions)]
+
+        delay = interaction.get("latency", 0.0) * self.latency_scale
+        timeout = request_kwargs.get("timeout")
+        if isinstance(timeout, int | float) and delay > timeout:
+            time.sleep(timeout)
+            raise openai.APITimeoutError(request=httpx.Request("POST", f"cassette://{key}"))
+        if delay > 0:
+            time.sleep(delay)
+        return ChatCompletion.model_validate(interaction["response"])
+
+    def reset(self):
+        """回放位置归零（同一请求重新从第一次录制开始返回）"""
+        with self._lock:
+            self._replay_positions.clear()
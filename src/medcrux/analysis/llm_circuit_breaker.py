@@ -0,0 +1,132 @@
+"""
+LLM熔断器模块：后端持续出错或变慢时快速失败
+
+DeepSeek变慢或持续出错时，如果每次上传仍要等待多次失败调用，用户会长时间等待后才看到
+"AI分析失败"。熔断器在所有阶段共享（同一个后端）：
+
+- closed（关闭）：正常调用；连续失败次数达到阈值时打开
+- open（打开）：直接拒绝调用（LLMCircuitOpenError），API层返回本地降级结果
+- half_open（半开）：打开持续open_seconds后，放行一个探测请求；
+  探测成功则关闭，失败则重新打开
+
+失败的定义：瞬时错误（连接错误、超时、429、5xx）以及超过阶段慢调用阈值的成功调用。
+鉴权失败、参数错误等不可重试错误说明后端可达，不计入失败。
+
+配置（环境变量）：
+- MEDCRUX_LLM_BREAKER_FAILURES：连续失败阈值（默认5）
+- MEDCRUX_LLM_BREAKER_OPEN_SECONDS：打开持续时间（默认30秒）
+"""
+
+import os
+import threading
+import time
+
+from medcrux.utils.logger import setup_logger
+
+logger = setup_logger("medcrux.analysis.llm_circuit_breaker")
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class LLMCircuitOpenError(RuntimeError):
+    """熔断器打开，LLM调用被拒绝"""
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器（线程安全）"""
+
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """
+        是否允许发起请求
+
+        打开状态超过open_seconds后转为半开，只放行一个探测请求。
+        """
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_OPEN:
+                if self._clock() - self._opened_at < self.open_seconds:
+                    return False
+                self._state = STATE_HALF_OPEN
+                logger.info("LLM熔断器进入半开状态，放行探测请求")
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self, latency: float = 0.0, slow_threshold: float | None = None):
+        """记录一次成功调用；超过慢调用阈值时按失败处理"""
+        if slow_threshold is not None and latency > slow_threshold:
+            logger.warning(f"LLM慢调用：{latency:.2f}秒（阈值{slow_threshold:.0f}秒），计入熔断失败")
+            self.record_failure()
+            return
+
+        with self._lock:
+            self._consecutive_failures = 0
+            if self._state != STATE_CLOSED:
+                logger.info("LLM熔断器探测成功，恢复关闭状态")
+            self._state = STATE_CLOSED
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """放行的请求没有实际发出（如限流排队超时）时归还半开状态的探测名额"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """记录一次失败调用"""
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == STATE_HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != STATE_OPEN:
+                    logger.warning(
+                        f"LLM熔断器打开 [连续失败: {self._consecutive_failures}, 持续: {self.open_seconds:.0f}秒]"
+                    )
+                self._state = STATE_OPEN
+                self._opened_at = self._clock()
+                self._probe_in_flight = False
+
+    def is_open(self) -> bool:
+        """熔断器是否处于打开状态（且未到半开探测时间）"""
+        with self._lock:
+            return self._state == STATE_OPEN and self._clock() - self._opened_at < self.open_seconds
+
+    def snapshot(self) -> dict:
+        """返回熔断器当前状态"""
+        with self._lock:
+            retry_after = 0.0
+            if self._state == STATE_OPEN:
+                retry_after = max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "retry_after": round(retry_after, 2),
+            }
+
+    def reset(self):
+        """恢复关闭状态（测试或手动恢复时使用）"""
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._consecutive_failures = 0
+            self._opened_at = 0.0
+            self._probe_in_flight = False
+
+
+# 进程内单例（所有阶段共享同一个后端）
+breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("MEDCRUX_LLM_BREAKER_FAILURES", "5")),
+    open_seconds=float(os.getenv("MEDCRUX_LLM_BREAKER_OPEN_SECONDS", "30")),
+)
@@ -0,0 +1,370 @@
+"""
+LLM调用策略模块：为DeepSeek调用提供超时、有限重试和对冲请求
+
+背景：
+- `client.chat.completions.create` 默认没有阶段级时限，单个卡住的连接可能让请求挂起数分钟
+- 网络抖动、限流、5xx等瞬时错误应当重试，但重试次数和总耗时必须有上限
+
+策略（按阶段配置，见STAGE_POLICIES）：
+- timeout：单次请求超时
+- deadline：整个阶段（含所有重试）的总时限
+- 重试：只对瞬时错误重试，指数退避 + 全抖动（full jitter）
+- 对冲（hedging，可选）：首个请求在尾延迟分位数（如p95）内未返回时，再发起一个相同请求，取先返回者
+- 熔断：所有阶段共享一个熔断器（见llm_circuit_breaker），打开时直接抛出LLMCircuitOpenError
+- 限流：每次请求前在跨进程令牌桶中排队（见llm_rate_limiter），排队时间计入阶段总时限
+"""
+
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+
+import openai
+
+from medcrux.analysis.json_repair import JSONRepairError, ResultRequirements, repair_json, validate_nodule_result
+from medcrux.analysis.llm_circuit_breaker import LLMCircuitOpenError, breaker
+from medcrux.analysis.llm_metrics import (
+    JSON_PARSE_CLEAN,
+    JSON_PARSE_CONTINUED,
+    JSON_PARSE_FAILED,
+    JSON_PARSE_REPAIRED,
+    OUTCOME_ERROR,
+    OUTCOME_SUCCESS,
+    OUTCOME_TIMEOUT,
+    LLMCallRecord,
+    extract_usage,
+    registry,
+)
+from medcrux.analysis.llm_rate_limiter import estimate_request_tokens, rate_limiter
+from medcrux.analysis.llm_router import get_stage_config, record_stage_model
+from medcrux.utils.logger import setup_logger
+
+logger = setup_logger("medcrux.analysis.llm_client")
+
+# 阶段名称（与三次LLM调用一一对应）
+STAGE_REPORT_STRUCTURE = "report_structure"
+STAGE_ANALYSIS = "analysis"
+STAGE_INDEPENDENT_BIRADS = "independent_birads"
+# 批处理任务：多份报告合并为一次独立BI-RADS判断请求（见batch_analyzer）
+STAGE_INDEPENDENT_BIRADS_BATCH = "independent_birads_batch"
+
+
+@dataclass(frozen=True)
+class StagePolicy:
+    """单个LLM阶段的调用策略"""
+
+    timeout: float  # 单次请求超时（秒）
+    deadline: float  # 阶段总时限（秒），包含所有重试和退避等待
+    max_retries: int = 2  # 瞬时错误的最大重试次数（不含首次请求）
+    backoff_base: float = 0.5  # 退避基数（秒）
+    backoff_max: float = 4.0  # 单次退避上限（秒）
+    hedge: bool = False  # 是否启用对冲请求
+    hedge_percentile: float = 0.95  # 触发对冲的延迟分位数
+    hedge_min_delay: float = 2.0  # 对冲最短等待（秒），样本不足时也使用该值
+    slow_call_threshold: float | None = None  # 慢调用阈值（秒），超过时计入熔断失败
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    """读取布尔型环境变量"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+# 对冲请求会增加API调用量，默认关闭，通过 MEDCRUX_LLM_HEDGE=1 开启
+_HEDGE_ENABLED = _env_flag("MEDCRUX_LLM_HEDGE")
+
+STAGE_POLICIES: dict[str, StagePolicy] = {
+    # 结构解析：输出较短，超时可以更紧
+    STAGE_REPORT_STRUCTURE: StagePolicy(timeout=20.0, deadline=45.0, hedge=_HEDGE_ENABLED, slow_call_threshold=15.0),
+    # 主分析：提示词和输出都最长
+    STAGE_ANALYSIS: StagePolicy(
+        timeout=60.0, deadline=120.0, hedge=_HEDGE_ENABLED, hedge_min_delay=8.0, slow_call_threshold=45.0
+    ),
+    # 独立BI-RADS判断
+    STAGE_INDEPENDENT_BIRADS: StagePolicy(
+        timeout=45.0, deadline=90.0, hedge=_HEDGE_ENABLED, hedge_min_delay=5.0, slow_call_threshold=35.0
+    ),
+    # 批量独立BI-RADS判断：输出随报告数增长；离线任务不对冲，慢调用不计入熔断
+    STAGE_INDEPENDENT_BIRADS_BATCH: StagePolicy(timeout=120.0, deadline=240.0),
+}
+
+DEFAULT_POLICY = StagePolicy(timeout=60.0, deadline=120.0)
+
+# 对冲请求使用的线程池（被放弃的请求会在后台跑完，受单次timeout约束）
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="medcrux-llm")
+
+
+class LLMDeadlineExceededError(TimeoutError):
+    """LLM阶段总时限耗尽"""
+
+
+def get_stage_policy(stage: str) -> StagePolicy:
+    """获取阶段调用策略，未配置的阶段使用默认策略；单次超时可按阶段覆盖（见llm_router）"""
+    policy = STAGE_POLICIES.get(stage, DEFAULT_POLICY)
+    timeout = get_stage_config(stage).timeout
+    if timeout:
+        policy = replace(policy, timeout=timeout, deadline=max(policy.deadline, timeout))
+    return policy
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    判断错误是否为可重试的瞬时错误
+
+    可重试：连接错误、超时、限流（429）、服务端错误（5xx）、请求冲突/超时状态码（408/409）
+    不可重试：鉴权失败、参数错误等客户端错误
+    """
+    if isinstance(error, openai.APIConnectionError | TimeoutError | ConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in {408, 409, 429} or error.status_code >= 500
+    return False
+
+
+def _backoff_delay(policy: StagePolicy, attempt: int) -> float:
+    """计算第attempt次重试前的退避时间（指数退避 + 全抖动）"""
+    cap = min(policy.backoff_max, policy.backoff_base * (2**attempt))
+    return random.uniform(0, cap)
+
+
+def _hedge_delay(stage: str, policy: StagePolicy) -> float:
+    """对冲触发延迟：取阶段延迟的分位数，不低于hedge_min_delay"""
+    observed = registry.latency_percentile(stage, policy.hedge_percentile)
+    if observed is None:
+        return policy.hedge_min_delay
+    return max(observed, policy.hedge_min_delay)
+
+
+def _call_with_hedge(client, stage: str, policy: StagePolicy, timeout: float, request_kwargs: dict):
+    """
+    发起一次（可能带对冲的）请求
+
+    首个请求在对冲延迟内未返回时，发起第二个相同请求，返回先成功的结果；
+    两个请求都失败时抛出首个请求的异常。
+    """
+
+    model = str(request_kwargs.get("model", "unknown"))
+
+    def _send(hedged: bool = False):
+        if hedged:
+            # 对冲请求不排队，直接记入限流桶
+            rate_limiter.charge(estimate_request_tokens(request_kwargs))
+        start = time.monotonic()
+        try:
+            response = client.chat.completions.create(timeout=timeout, **request_kwargs)
+        except Exception as e:
+            latency = time.monotonic() - start
+            outcome = OUTCOME_TIMEOUT if isinstance(e, openai.APITimeoutError | TimeoutError) else OUTCOME_ERROR
+            registry.record(
+                LLMCallRecord(
+                    stage=stage,
+                    model=model,
+                    latency=latency,
+                    outcome=outcome,
+                    error_type=type(e).__name__,
+                    hedged=hedged,
+                )
+            )
+            if is_transient_error(e):
+                breaker.record_failure()
+            else:
+                # 不可重试错误（鉴权、参数等）说明后端可达，不计入熔断失败
+                breaker.record_success(latency)
+            raise
+        latency = time.monotonic() - start
+        breaker.record_success(latency, policy.slow_call_threshold)
+        registry.record(
+            LLMCallRecord(
+                stage=stage,
+                model=model,
+                latency=latency,
+                outcome=OUTCOME_SUCCESS,
+                hedged=hedged,
+                **extract_usage(response),
+            )
+        )
+        return response
+
+    if not policy.hedge:
+        return _send()
+
+    primary: Future = _executor.submit(_send)
+    delay = min(_hedge_delay(stage, policy), timeout)
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    logger.info(f"LLM阶段{stage}请求超过{delay:.2f}秒未返回，发起对冲请求")
+    hedged: Future = _executor.submit(_send, True)
+    pending = {primary, hedged}
+    first_error: Exception | None = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is None:
+                if future is hedged:
+                    logger.info(f"LLM阶段{stage}对冲请求先返回")
+                return future.result()
+            if first_error is None or future is primary:
+                first_error = error
+    raise first_error
+
+
+def create_chat_completion(client, stage: str, **request_kwargs):
+    """
+    按阶段策略调用 `client.chat.completions.create`
+
+    Args:
+        client: OpenAI兼容客户端
+        stage: 阶段名称（STAGE_*常量）
+        **request_kwargs: 透传给chat.completions.create的参数（model、messages等），
+            未指定max_tokens时使用阶段配置的上限
+
+    Returns:
+        chat.completions.create的响应
+
+    Raises:
+        LLMCircuitOpenError: 熔断器打开
+        LLMDeadlineExceededError: 阶段总时限耗尽
+        Exception: 不可重试的错误，或重试次数耗尽后的最后一个错误
+    """
+    policy = get_stage_policy(stage)
+    max_tokens = get_stage_config(stage).max_tokens
+    if max_tokens:
+        request_kwargs.setdefault("max_tokens", max_tokens)
+    start_time = time.monotonic()
+    attempt = 0
+    request_tokens = estimate_request_tokens(request_kwargs)
+
+    while True:
+        remaining = policy.deadline - (time.monotonic() - start_time)
+        if remaining <= 0:
+            raise LLMDeadlineExceededError(f"LLM阶段{stage}超过总时限{policy.deadline:.0f}秒")
+        # 先检查熔断器：熔断时被拒绝的调用不消耗限流令牌
+        if not breaker.allow_request():
+            raise LLMCircuitOpenError(f"LLM熔断器已打开，跳过阶段{stage}")
+        if not rate_limiter.acquire(request_tokens, timeout=remaining):
+            breaker.release_probe()
+            raise LLMDeadlineExceededError(f"LLM阶段{stage}限流排队超过总时限{policy.deadline:.0f}秒")
+        remaining = policy.deadline - (time.monotonic() - start_time)
+
+        try:
+            response = _call_with_hedge(client, stage, policy, min(policy.timeout, remaining), request_kwargs)
+        except Exception as e:
+            if not is_transient_error(e) or attempt >= policy.max_retries:
+                raise
+            delay = _backoff_delay(policy, attempt)
+            remaining = policy.deadline - (time.monotonic() - start_time)
+            if delay >= remaining:
+                raise LLMDeadlineExceededError(
+                    f"LLM阶段{stage}重试等待将超过总时限{policy.deadline:.0f}秒：{type(e).__name__}"
+                ) from e
+            attempt += 1
+            logger.warning(f"LLM阶段{stage}发生瞬时错误：{type(e).__name__}，{delay:.2f}秒后第{attempt}次重试")
+            time.sleep(delay)
+            continue
+
+        record_stage_model(stage, str(request_kwargs.get("model", "unknown")))
+        return response
+
+
+# 输出被截断（finish_reason为length）时，请求从中断处继续
+CONTINUATION_PROMPT = (
+    "你的上一条回复在中途被截断。请从中断处继续输出剩余的JSON内容，不要重复已输出的部分，不要添加任何说明。"
+)
+# 输出格式错误时，请求只返回修正后的完整JSON
+CORRECTION_PROMPT = "你的上一条回复不是合法或完整的JSON（{problems}）。请只输出修正后的完整JSON，不要添加任何说明。"
+
+
+def _load_repaired(content: str, requirements: ResultRequirements) -> tuple[object, list, list]:
+    """本地修复并校验，返回(结果, 修复类型, 结构问题)"""
+    result, repairs = repair_json(content)
+    problems = validate_nodule_result(result, requirements.fields, requirements.nodule_fields)
+    return result, repairs, problems
+
+
+def parse_json_response(
+    client,
+    stage: str,
+    response,
+    request_kwargs: dict,
+    *,
+    requirements: ResultRequirements = ResultRequirements(),
+):
+    """
+    解析LLM返回的JSON，失败时先本地修复，本地修复失败才发起一次续写/纠正请求
+
+    顺序：
+    1. json.loads直接解析（clean）
+    2. 本地修复（代码块、尾随逗号、未转义引号、截断）并校验结构（repaired）；
+       finish_reason为length时跳过本地修复（补全截断的JSON会静默丢失后面的结节或内容）
+    3. 输出被截断时请求从中断处续写并拼接，否则请求返回修正后的完整JSON（continued）
+
+    Args:
+        client: OpenAI兼容客户端
+        stage: 阶段名称
+        response: chat.completions.create的响应
+        request_kwargs: 原请求参数（续写请求沿用model、messages等）
+        requirements: 修复后的结果必须包含的顶层字段和结节字段
+
+    Raises:
+        json.JSONDecodeError: 所有方式都失败，或续写/纠正后结果仍不符合结构要求（JSONRepairError）
+        Exception: 续写/纠正请求本身失败（同create_chat_completion）
+    """
+    choice = response.choices[0]
+    content = choice.message.content
+    try:
+        result = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        pass
+    else:
+        registry.record_json_parse(stage, JSON_PARSE_CLEAN)
+        return result
+
+    truncated = getattr(choice, "finish_reason", None) == "length"
+    if truncated:
+        # 输出被截断：本地补全只能丢弃被截断的结节或保留不完整的文本，直接请求续写
+        problems = ["输出被截断"]
+    else:
+        try:
+            result, repairs, problems = _load_repaired(content or "", requirements)
+        except JSONRepairError as e:
+            problems = [e.msg]
+        else:
+            if not problems:
+                logger.warning(f"LLM阶段{stage}输出JSON已在本地修复：{repairs}")
+                registry.record_json_parse(stage, JSON_PARSE_REPAIRED)
+                return result
+
+    follow_up = CONTINUATION_PROMPT if truncated else CORRECTION_PROMPT.format(problems="；".join(problems))
+    logger.warning(f"LLM阶段{stage}输出JSON本地修复失败：{problems}，发起{'续写' if truncated else '纠正'}请求")
+    messages = [
+        *request_kwargs.get("messages", []),
+        {"role": "assistant", "content": content or ""},
+        {"role": "user", "content": follow_up},
+    ]
+    follow_up_kwargs = {**request_kwargs, "messages": messages}
+    if truncated:
+        # 续写输出的是JSON片段，不能要求JSON对象格式
+        follow_up_kwargs.pop("response_format", None)
+
+    try:
+        follow_up_response = create_chat_completion(client, stage, **follow_up_kwargs)
+        follow_up_content = follow_up_response.choices[0].message.content or ""
+        combined = (content or "") + follow_up_content if truncated else follow_up_content
+        result, repairs, problems = _load_repaired(combined, requirements)
+    except Exception:
+        registry.record_json_parse(stage, JSON_PARSE_FAILED)
+        raise
+    if problems:
+        # 结节列表被截断、缺少overall_assessment等：不能当作合法结果交给下游
+        logger.warning(f"LLM阶段{stage}续写/纠正后结果仍不完整：{problems}")
+        registry.record_json_parse(stage, JSON_PARSE_FAILED)
+        raise JSONRepairError(f"续写/纠正后结果仍不完整：{'；'.join(problems)}", combined, 0)
+    registry.record_json_parse(stage, JSON_PARSE_CONTINUED)
+    return result
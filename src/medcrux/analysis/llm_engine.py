@@ -10,13 +10,37 @@ LLM分析引擎模块：使用DeepSeek进行医学逻辑分析
 - LLM分析：结合RAG检索的专业知识，分析报告描述与结论的一致性
 """
 
+import contextvars
 import json
 import os
 import re
 import time
-
-from openai import OpenAI
-
+from concurrent.futures import ThreadPoolExecutor
+
+from medcrux.analysis.compact_schema import (
+    ANALYSIS_COMPACT_OUTPUT,
+    ANALYSIS_COMPACT_REQUIRED_FIELDS,
+    COMPACT_REQUIRED_NODULE_FIELDS,
+    INDEPENDENT_BIRADS_COMPACT_OUTPUT,
+    INDEPENDENT_BIRADS_COMPACT_REQUIRED_FIELDS,
+    SCHEMA_COMPACT,
+    expand_analysis_result,
+    expand_independent_birads_result,
+    get_output_schema,
+)
+from medcrux.analysis.json_repair import ResultRequirements
+from medcrux.analysis.lesion_cache import lesion_cache
+from medcrux.analysis.lesion_segmenter import split_lesions
+from medcrux.analysis.llm_client import (
+    STAGE_ANALYSIS,
+    STAGE_INDEPENDENT_BIRADS,
+    create_chat_completion,
+    parse_json_response,
+)
+from medcrux.analysis.llm_provider import LazyLLMClient, is_llm_configured
+from medcrux.analysis.llm_router import get_stage_config, route_model
+from medcrux.analysis.location_normalizer import normalize_nodule_location
+from medcrux.rag.context_packer import pack_rag_context
 from medcrux.rag.graphrag_retriever import GraphRAGRetriever
 from medcrux.rag.logical_consistency_checker import LogicalConsistencyChecker
 from medcrux.utils.logger import log_error_with_context, setup_logger
@@ -25,19 +49,174 @@ from medcrux.utils.logger import log_error_with_context, setup_logger
 logger = setup_logger("medcrux.analysis")
 
 # 初始化客户端 (DeepSeek 兼容 OpenAI SDK)
-# 建议将 API KEY 放入环境变量，或者在此处临时硬编码测试
-# export DEEPSEEK_API_KEY="sk-..."
-api_key = os.getenv("DEEPSEEK_API_KEY")
-if not api_key:
+# 建议将 API KEY 放入环境变量：export DEEPSEEK_API_KEY="sk-..."
+# 后端可通过 MEDCRUX_LLM_PROVIDER / MEDCRUX_LLM_BASE_URL 切换（见llm_provider），客户端在首次调用时创建
+if not is_llm_configured():
     logger.warning("DEEPSEEK_API_KEY未设置，AI分析功能将不可用")
-else:
-    logger.info("DeepSeek API客户端初始化完成")
 
-client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
+client = LazyLLMClient()
 
 # 初始化GraphRAG检索器（单例模式）
 _retriever: GraphRAGRetriever | None = None
 
+# 各阶段的用户消息（其后拼接报告文本）
+ANALYSIS_USER_PROMPT = "这是 OCR 识别出的医学报告文本，请分析："
+INDEPENDENT_BIRADS_USER_PROMPT = "这是检查所见（事实性描述），请识别所有异常发现并独立判断BI-RADS分类："
+LESION_USER_PROMPT = "这是检查所见中一个病灶的描述（事实性描述），请独立判断BI-RADS分类："
+
+# 逐病灶并发判断的最大并发数（MEDCRUX_LLM_FANOUT_WORKERS，设为1关闭并发）
+LESION_FANOUT_WORKERS = int(os.getenv("MEDCRUX_LLM_FANOUT_WORKERS", "4"))
+
+# 原有输出格式（MEDCRUX_LLM_SCHEMA=full时使用；默认使用compact_schema中的紧凑编码格式）
+_ANALYSIS_FULL_OUTPUT = """返回JSON（无markdown）：
+{
+    "patient_gender": "Unknown/Female/Male",
+    "nodules": [
+        {
+            "id": "nodule_1",
+            "location": {
+                "breast": "left/right",
+                "clock_position": "钟点方向或象限原文",
+                "distance_from_nipple": "距离原文"  // 未提到时省略
+            },
+            "morphology": {
+                "shape": "椭圆形/圆形/不规则形/条状/条索状/其他",
+                "boundary": "清晰/大部分清晰/模糊/成角/微小分叶/毛刺状",
+                "echo": "均匀低回声/不均匀回声/无回声/等回声/高回声/复合回声",
+                "orientation": "平行/不平行",
+                "size": "大小原文"
+            },
+            "malignant_signs": ["恶性征象1", "恶性征象2"],
+            "birads_class": "3",
+            "risk_assessment": "Low/Medium/High",
+            "inconsistency_alert": true/false,
+            "inconsistency_reasons": ["原因1", "原因2"]
+        }
+    ],
+    "overall_assessment": {
+        "total_nodules": 1,
+        "highest_risk": "Low/Medium/High",
+        "summary": "整体评估摘要",
+        "advice": "综合建议"
+    }
+}
+
+要求：
+- 必须识别所有结节，不能遗漏
+- 必须提取每个结节的位置信息（如果报告中提到）
+- 必须提取所有形态学特征和BI-RADS分类
+- 如检测到不一致，必须在inconsistency_reasons中说明原因
+- 如果报告中没有结节，返回空列表：{"nodules": [], "overall_assessment": {"total_nodules": 0, ...}}"""
+
+_INDEPENDENT_BIRADS_FULL_OUTPUT = """返回JSON格式（无markdown）：
+{
+    "nodules": [
+        {
+            "id": "nodule_1",
+            "location": {
+                "breast": "left/right",
+                "clock_position": "钟点方向或象限原文",
+                "distance_from_nipple": "距离原文"
+            },
+            "morphology": {
+                "shape": "椭圆形/圆形/不规则形",
+                "boundary": "清晰/大部分清晰/模糊/成角/微小分叶/毛刺状",
+                "echo": "均匀低回声/不均匀回声/无回声/等回声/高回声/复合回声",
+                "orientation": "平行/不平行",
+                "size": "大小原文"
+            },
+            "llm_birads_class": "3",
+            "llm_birads_reasoning": "基于形态学特征（椭圆形、边界清晰、均匀低回声、平行方位）判断为3类"
+        }
+    ],
+    "llm_highest_birads": "3"
+}
+
+要求：
+- 必须识别所有异常发现，不能遗漏
+- 必须为每个异常发现提供BI-RADS分类和判断理由
+- 判断理由必须基于形态学特征和公理体系
+- 如果报告中没有异常发现，返回空列表：{"nodules": [], "llm_highest_birads": null}"""
+
+
+# 主分析的System Prompt（其后拼接输出格式说明和RAG上下文）
+ANALYSIS_SYSTEM_PROMPT = """\
+你是MedCrux医学影像分析助手，基于OCR文本进行事实核查。
+
+重要：请识别报告中的所有结节，为每个结节提取完整信息。
+
+步骤：
+1. **识别所有结节**：
+   - 仔细阅读报告，识别所有提到的结节
+   - 为每个结节分配唯一ID（nodule_1, nodule_2等）
+   - 如果报告中没有明确提到结节，返回空列表
+
+2. **提取每个结节的信息**：
+   a. **位置信息**（照抄报告原文，系统会在本地统一标准化）：
+      - breast：左乳/右乳
+      - clock_position：钟点方向原文（如"3点钟方向"）；报告只提到象限时填象限原文（如"外下象限"）
+      - distance_from_nipple：距乳头距离原文（如"约27mm"），未提到时省略
+
+   b. **形态学特征**（必须提取）：
+      - shape：形状（椭圆形/圆形/不规则形/条状/条索状/其他）
+      - boundary：边界（清晰/大部分清晰/模糊/成角/微小分叶/毛刺状）
+      - echo：回声（均匀低回声/不均匀回声/无回声/等回声/高回声/复合回声）
+      - orientation：方位（平行/不平行）
+      - size：大小原文（如"12×8×6mm"）
+
+   c. **其他信息**：
+      - malignant_signs：恶性征象列表（如有）
+      - birads_class：BI-RADS分级
+      - risk_assessment：风险评估（Low/Medium/High）
+
+3. **术语标准化**：
+   - 标准术语：形状{椭圆形,圆形,不规则形} 边界{清晰,大部分清晰,模糊,成角,微小分叶,毛刺状}
+     回声{均匀低回声,不均匀回声,无回声,等回声,高回声,复合回声} 方位{平行,不平行}
+   - 同义词处理："清楚"→"清晰" "circumscribed"→"清晰" "低回声"（未明确"均匀"）保持为"低回声"
+   - 非标准术语：保持原样输出（如"条状"保持为"条状"，不标准化为"椭圆形"）
+
+4. **逻辑一致性检查**：
+   - 对照BI-RADS分类充要条件检查每个结节的特征
+   - 不符合充要条件必须识别为不一致
+   - 示例（BI-RADS 3类）：形状椭圆形、边界清晰/大部分清晰、回声均匀低回声（"低回声"≠"均匀低回声"）、方位平行、无恶性征象
+
+5. **整体评估**：
+   - total_nodules：结节总数
+   - highest_risk：所有结节中的最高风险等级
+   - summary：整体评估摘要
+   - advice：综合建议
+
+"""
+
+# 独立BI-RADS判断的System Prompt（其后拼接输出格式说明和RAG上下文）
+INDEPENDENT_BIRADS_SYSTEM_PROMPT = """\
+你是MedCrux医学影像分析助手，基于事实性描述（检查所见）识别异常发现并独立判断BI-RADS分类。
+
+重要规则：
+1. **只基于事实性描述（检查所见）判断**，不要参考任何结论性内容（如影像学诊断、建议等）
+2. **必须识别所有异常发现**，为每个异常发现提取完整信息（位置、形态学特征）
+3. **基于公理体系、知识图谱和形态学特征独立判断BI-RADS分类**
+4. **必须提供判断理由**，说明为什么判断为该BI-RADS分类
+
+步骤：
+1. **识别所有异常发现**：
+   - 仔细阅读事实性描述，识别所有提到的异常发现
+   - 为每个异常发现分配唯一ID（nodule_1, nodule_2等）
+
+2. **提取每个异常发现的信息**：
+   - 位置信息（breast、clock_position、distance_from_nipple，照抄报告原文，系统会在本地统一标准化）
+   - 形态学特征（shape、boundary、echo、orientation、size等）
+
+3. **独立判断BI-RADS分类**：
+   - 基于形态学特征、公理体系、知识图谱独立判断BI-RADS分类
+   - 不要参考原报告的BI-RADS分类
+   - 必须提供判断理由（llm_birads_reasoning）
+
+4. **提取最高BI-RADS分类**：
+   - 从所有异常发现中提取最高BI-RADS分类
+
+"""
+
 
 def _convert_old_format_to_new(old_result: dict) -> dict:
     """
@@ -232,28 +411,16 @@ def analyze_text_with_deepseek(ocr_text: str) -> dict:
         retrieval_result = retriever.retrieve(ocr_text)
         rag_time = time.time() - rag_start_time
 
-        if retrieval_result["entities"]:
-            rag_context = "\n\n## 相关医学知识（来自RAG知识库）：\n\n"
-
-            # 添加相关实体（减少数量，提高性能）
-            rag_context += "### 相关医学概念和规则：\n"
-            for entity in retrieval_result["entities"][:5]:  # 减少到5个实体
-                entity_name = entity.get("name", "")
-                entity_content = entity.get("content", "")
-                if entity_name and entity_content:
-                    # 减少内容长度，只取前150字符
-                    rag_context += f"- **{entity_name}**：{entity_content[:150]}...\n"
-
-            # 添加相关关系（推理路径，减少数量）
-            if retrieval_result["inference_paths"]:
-                rag_context += "\n### 逻辑推理路径：\n"
-                for path in retrieval_result["inference_paths"][:3]:  # 减少到3条路径
-                    rag_context += f"- {' → '.join(path)}\n"
-
+        # 在token预算内按相关度/token挑选实体和推理路径
+        packed = pack_rag_context(retrieval_result)
+        if packed.text:
+            rag_context = packed.text
             logger.info(
                 f"RAG检索完成：{len(retrieval_result['entities'])} 个实体，"
                 f"{len(retrieval_result['relations'])} 个关系，"
                 f"置信度：{retrieval_result['confidence']:.2f}，"
+                f"选入上下文：{packed.entity_count} 个实体、{packed.path_count} 条路径"
+                f"（约{packed.token_count} tokens），"
                 f"耗时：{rag_time:.2f}秒"
             )
         else:
@@ -266,141 +433,10 @@ def analyze_text_with_deepseek(ocr_text: str) -> dict:
 
     # 2. 定义 System Prompt (人设与规则)
     # 版本1.1.0：支持多个结节识别和分离
-    system_prompt = (
-        """你是MedCrux医学影像分析助手，基于OCR文本进行事实核查。
-
-重要：请识别报告中的所有结节，为每个结节提取完整信息。
-
-步骤：
-1. **识别所有结节**：
-   - 仔细阅读报告，识别所有提到的结节
-   - 为每个结节分配唯一ID（nodule_1, nodule_2等）
-   - 如果报告中没有明确提到结节，返回空列表
-
-2. **提取每个结节的信息**：
-   a. **位置信息**（必须提取并标准化）：
-      - breast：左乳/右乳（必须，输出"left"或"right"）
-      - clock_position：钟点位置（必须，优先使用）
-        * 如果报告中明确提到钟点方向（如"3点"、"12点"），直接使用
-        * 如果报告中只提到象限（如"外下"、"上内"），**必须根据左右乳房进行镜像转换，统一使用4个固定钟点（1、11、5、7）**：
-          - **左乳**：
-            - "外上" → "11点"（左乳上外象限，固定使用11点）
-            - "外下" → "7点"（左乳下外象限，固定使用7点）
-            - "内上" → "1点"（左乳上内象限，固定使用1点）
-            - "内下" → "5点"（左乳下内象限，固定使用5点）
-          - **右乳**：
-            - "外上" → "1点"（右乳上外象限，固定使用1点，镜像）
-            - "外下" → "5点"（右乳下外象限，固定使用5点，镜像）
-            - "内上" → "11点"（右乳上内象限，固定使用11点，镜像）
-            - "内下" → "7点"（右乳下内象限，固定使用7点，镜像）
-          - **通用**（左右乳房相同）：
-            - "上方" → "12点"
-            - "下方" → "6点"
-            - "乳头旁"/"乳晕区" → "12点"
-        * **重要**：象限转换时，统一只使用4个固定钟点（1、11、5、7），不要使用10点、2点、4点、9点等其他钟点
-        * 输出格式：必须是"X点"（如"3点"、"11点"），不能是"3点钟"或"3点钟方向"
-      - quadrant：象限（可选，如果报告只提到象限）
-        * 如果已转换为钟点方向，可以省略
-        * 如果报告只提到象限，保留象限信息
-      - distance_from_nipple：距乳头距离（必须，如果有提到距离）
-        * 单位必须统一为cm
-        * 如果报告中是mm，转换为cm（除以10，如"27mm" → "2.7"）
-        * 如果单位不明确，根据数值大小判断（>10可能是mm，<10可能是cm）
-        * 输出格式：数值（如"2.5"），不带单位
-
-   b. **形态学特征**（必须提取）：
-      - shape：形状（椭圆形/圆形/不规则形/条状/条索状/其他）
-      - boundary：边界（清晰/大部分清晰/模糊/成角/微小分叶/毛刺状）
-      - echo：回声（均匀低回声/不均匀回声/无回声/等回声/高回声/复合回声）
-      - orientation：方位（平行/不平行）
-      - size：大小（格式：长径×横径×前后径 cm，如"1.2×0.8×0.6 cm"）
-
-   c. **其他信息**：
-      - malignant_signs：恶性征象列表（如有）
-      - birads_class：BI-RADS分级
-      - risk_assessment：风险评估（Low/Medium/High）
-
-3. **术语标准化**：
-   - 标准术语：形状{椭圆形,圆形,不规则形} 边界{清晰,大部分清晰,模糊,成角,微小分叶,毛刺状}
-     回声{均匀低回声,不均匀回声,无回声,等回声,高回声,复合回声} 方位{平行,不平行}
-   - 同义词处理："清楚"→"清晰" "circumscribed"→"清晰" "低回声"（未明确"均匀"）保持为"低回声"
-   - 非标准术语：保持原样输出（如"条状"保持为"条状"，不标准化为"椭圆形"）
-
-4. **逻辑一致性检查**：
-   - 对照BI-RADS分类充要条件检查每个结节的特征
-   - 不符合充要条件必须识别为不一致
-   - 示例（BI-RADS 3类）：形状椭圆形、边界清晰/大部分清晰、回声均匀低回声（"低回声"≠"均匀低回声"）、方位平行、无恶性征象
-
-5. **整体评估**：
-   - total_nodules：结节总数
-   - highest_risk：所有结节中的最高风险等级
-   - summary：整体评估摘要
-   - advice：综合建议
-
-返回JSON（无markdown）：
-{
-    "patient_gender": "Unknown/Female/Male",
-    "nodules": [
-        {
-            "id": "nodule_1",
-            "location": {
-                "breast": "left/right",
-                "clock_position": "X点",  // 必须，标准钟点方向（象限转换统一使用1、11、5、7点，明确钟点方向直接使用）
-                "quadrant": "上内/上外/下内/下外/中央区",  // 可选
-                "distance_from_nipple": "X.X"  // 必须（如果有提到距离），数值格式，单位cm
-            },
-            "morphology": {
-                "shape": "椭圆形/圆形/不规则形/条状/条索状/其他",
-                "boundary": "清晰/大部分清晰/模糊/成角/微小分叶/毛刺状",
-                "echo": "均匀低回声/不均匀回声/无回声/等回声/高回声/复合回声",
-                "orientation": "平行/不平行",
-                "size": "长径×横径×前后径 cm"
-            },
-            "malignant_signs": ["恶性征象1", "恶性征象2"],
-            "birads_class": "3",
-            "risk_assessment": "Low/Medium/High",
-            "inconsistency_alert": true/false,
-            "inconsistency_reasons": ["原因1", "原因2"]
-        }
-    ],
-    "overall_assessment": {
-        "total_nodules": 1,
-        "highest_risk": "Low/Medium/High",
-        "summary": "整体评估摘要",
-        "advice": "综合建议"
-    }
-}
-
-要求：
-- 必须识别所有结节，不能遗漏
-- 必须提取每个结节的位置信息（如果报告中提到）
-- **位置信息必须标准化**：
-  - 象限转换时，统一只使用4个固定钟点（1、11、5、7），不要使用10点、2点、4点、9点等其他钟点
-  - 距离单位必须统一为cm，mm需要转换为cm（除以10）
-  - clock_position输出格式必须是"X点"（如"11点"、"1点"），不能是"X点钟"或"X点钟方向"
-  - distance_from_nipple输出格式必须是数值（如"2.7"），不带单位
-- 必须提取所有形态学特征和BI-RADS分类
-- 如检测到不一致，必须在inconsistency_reasons中说明原因
-- 如果报告中没有结节，返回空列表：{"nodules": [], "overall_assessment": {"total_nodules": 0, ...}}
-
-**位置信息提取示例**：
-
-示例1：原文"在左侧乳腺3点钟方向距乳头约1.9cm处"
-→ {"breast": "left", "clock_position": "3点", "distance_from_nipple": "1.9"}
-
-示例2：原文"在右侧乳腺外下象限距乳头约2.7cm处"
-→ {"breast": "right", "clock_position": "5点", "quadrant": "下外", "distance_from_nipple": "2.7"}
-
-示例3：原文"在左侧乳腺外上象限距乳头约2.0cm处"
-→ {"breast": "left", "clock_position": "11点", "quadrant": "上外", "distance_from_nipple": "2.0"}
-
-示例4：原文"在右侧乳腺外上象限距乳头约2.0cm处"
-→ {"breast": "right", "clock_position": "1点", "quadrant": "上外", "distance_from_nipple": "2.0"}
-
-示例5：原文"在左侧乳腺外下象限距乳头约27mm处"
-→ {"breast": "left", "clock_position": "7点", "distance_from_nipple": "2.7"}"""
-        + rag_context
-    )
+    # 输出格式：默认使用紧凑编码（减少输出token），本地展开为原有格式
+    compact = get_output_schema() == SCHEMA_COMPACT
+    output_format = ANALYSIS_COMPACT_OUTPUT if compact else _ANALYSIS_FULL_OUTPUT
+    system_prompt = ANALYSIS_SYSTEM_PROMPT + output_format + rag_context
 
     # 3. 调用 API
     context = {"ocr_text_length": len(ocr_text)}
@@ -408,32 +444,44 @@ def analyze_text_with_deepseek(ocr_text: str) -> dict:
 
     llm_start_time = time.time()
     try:
-        if not api_key:
+        if not is_llm_configured():
             raise ValueError("DEEPSEEK_API_KEY未设置")
 
-        response = client.chat.completions.create(
-            model="deepseek-chat",  # 使用 DeepSeek V3
-            messages=[
+        request_kwargs = {
+            "model": route_model(STAGE_ANALYSIS),  # 按阶段配置和延迟目标选择模型（默认 deepseek-chat）
+            "messages": [
                 {"role": "system", "content": system_prompt},
                 {
                     "role": "user",
-                    "content": f"这是 OCR 识别出的医学报告文本，请分析：\n\n{ocr_text}",
+                    "content": f"{ANALYSIS_USER_PROMPT}\n\n{ocr_text}",
                 },
             ],
-            temperature=0.1,  # 医学分析需要严谨，温度设低
-            stream=False,
-            response_format={"type": "json_object"},  # 强制返回 JSON (DeepSeek 支持)
-        )
+            "temperature": 0.1,  # 医学分析需要严谨，温度设低
+            "stream": False,
+            "response_format": {"type": "json_object"},  # 强制返回 JSON (DeepSeek 支持)
+        }
+        response = create_chat_completion(client, STAGE_ANALYSIS, **request_kwargs)
 
         llm_api_time = time.time() - llm_start_time
         logger.debug(f"DeepSeek API调用成功，耗时：{llm_api_time:.2f}秒")
 
-        # 3. 解析结果
-        content = response.choices[0].message.content
-        result = json.loads(content)
+        # 3. 解析结果（不合法的JSON先本地修复，失败时再发起一次续写/纠正请求）
+        result = parse_json_response(
+            client,
+            STAGE_ANALYSIS,
+            response,
+            request_kwargs,
+            requirements=ResultRequirements(
+                fields=ANALYSIS_COMPACT_REQUIRED_FIELDS if compact else ("nodules", "overall_assessment"),
+                nodule_fields=COMPACT_REQUIRED_NODULE_FIELDS if compact else ("morphology", "birads_class"),
+            ),
+        )
 
-        # 4. 格式转换：确保是新格式（如果LLM返回旧格式，转换为新格式）
+        # 4. 格式转换：展开紧凑编码，确保是新格式（如果LLM返回旧格式，转换为新格式），并在本地标准化位置
+        result = expand_analysis_result(result)
         result = _convert_old_format_to_new(result)
+        for nodule in result.get("nodules", []):
+            normalize_nodule_location(nodule)
 
         # 5. 后处理：逻辑一致性检查（如果LLM没有正确执行）
         post_process_start = time.time()
@@ -468,6 +516,166 @@ def analyze_text_with_deepseek(ocr_text: str) -> dict:
         }
 
 
+def _request_independent_birads(
+    text: str, system_prompt: str, compact: bool, user_prompt: str | None = None
+) -> dict:
+    """
+    发起一次独立BI-RADS判断请求，返回展开并标准化位置后的结果
+
+    结果按规范化的描述文本缓存（见lesion_cache），相同描述再次出现时不再调用LLM。
+
+    Raises:
+        json.JSONDecodeError: 结果解析失败
+        Exception: LLM调用失败（同create_chat_completion）
+    """
+    user_prompt = user_prompt or INDEPENDENT_BIRADS_USER_PROMPT
+    # 缓存键使用阶段配置的模型，延迟超标临时切换到备用模型时仍可命中
+    cache_key = lesion_cache.make_key(text, get_stage_config(STAGE_INDEPENDENT_BIRADS).model, user_prompt)
+    cached = lesion_cache.get(cache_key)
+    if cached is not None:
+        logger.debug(f"独立BI-RADS判断命中缓存 [文本长度: {len(text)}]")
+        return cached
+
+    request_kwargs = {
+        "model": route_model(STAGE_INDEPENDENT_BIRADS),
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"{user_prompt}\n\n{text}"},
+        ],
+        "temperature": 0.1,
+        "stream": False,
+        "response_format": {"type": "json_object"},
+    }
+    response = create_chat_completion(client, STAGE_INDEPENDENT_BIRADS, **request_kwargs)
+
+    # 不合法的JSON先本地修复，失败时再发起一次续写/纠正请求
+    result = parse_json_response(
+        client,
+        STAGE_INDEPENDENT_BIRADS,
+        response,
+        request_kwargs,
+        requirements=ResultRequirements(
+            fields=INDEPENDENT_BIRADS_COMPACT_REQUIRED_FIELDS if compact else ("nodules", "llm_highest_birads"),
+            nodule_fields=COMPACT_REQUIRED_NODULE_FIELDS if compact else ("llm_birads_class",),
+        ),
+    )
+    result = expand_independent_birads_result(result)
+    for nodule in result.get("nodules", []) or []:
+        normalize_nodule_location(nodule)
+    lesion_cache.put(cache_key, result)
+    return result
+
+
+def _judge_lesions_concurrently(segments: list[str], system_prompt: str, compact: bool) -> dict:
+    """
+    逐病灶并发判断BI-RADS分类，合并为与整体判断相同的结果格式
+
+    所有请求使用相同的system prompt（可命中后端的提示词缓存），只有用户消息中的病灶描述不同。
+    每个任务复制当前上下文，保留LLM调用优先级等上下文变量。
+
+    Raises:
+        Exception: 任一病灶判断失败
+    """
+    workers = min(LESION_FANOUT_WORKERS, len(segments))
+    logger.info(f"逐病灶并发判断BI-RADS [病灶数: {len(segments)}, 并发数: {workers}]")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="medcrux-birads") as executor:
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run,
+                _request_independent_birads,
+                segment,
+                system_prompt,
+                compact,
+                LESION_USER_PROMPT,
+            )
+            for segment in segments
+        ]
+        results = [future.result() for future in futures]
+
+    nodules = [nodule for result in results for nodule in result.get("nodules", []) or []]
+    for index, nodule in enumerate(nodules, start=1):
+        nodule["id"] = f"nodule_{index}"
+    return {"nodules": nodules, "llm_highest_birads": None}
+
+
+def retrieve_independent_birads_context(factual_text: str) -> str:
+    """
+    RAG检索：从知识图谱中检索与检查所见相关的知识，在token预算内打包为提示词上下文
+
+    检索失败时返回空字符串，不影响LLM分析。
+    """
+    rag_context = ""
+    rag_start_time = time.time()
+    try:
+        retriever = _get_retriever()
+        retrieval_result = retriever.retrieve(factual_text)
+        rag_time = time.time() - rag_start_time
+
+        packed = pack_rag_context(retrieval_result)
+        if packed.text:
+            rag_context = packed.text
+            logger.info(
+                f"RAG检索完成：{len(retrieval_result['entities'])} 个实体，"
+                f"选入上下文：{packed.entity_count} 个实体（约{packed.token_count} tokens），耗时：{rag_time:.2f}秒"
+            )
+        else:
+            logger.warning(f"RAG检索未找到相关知识，耗时：{rag_time:.2f}秒")
+    except Exception as e:
+        rag_time = time.time() - rag_start_time
+        log_error_with_context(logger, e, context={"factual_text_length": len(factual_text)}, operation="RAG检索")
+        logger.warning(f"RAG检索失败，耗时：{rag_time:.2f}秒，继续执行LLM分析")
+    return rag_context
+
+
+def build_independent_birads_system_prompt(rag_context: str, compact: bool) -> str:
+    """构建独立BI-RADS判断的System Prompt（输出格式同主分析，compact为True时使用紧凑编码）"""
+    output_format = INDEPENDENT_BIRADS_COMPACT_OUTPUT if compact else _INDEPENDENT_BIRADS_FULL_OUTPUT
+    return INDEPENDENT_BIRADS_SYSTEM_PROMPT + output_format + rag_context
+
+
+def finalize_independent_birads_result(result: dict) -> dict:
+    """规范化独立BI-RADS判断结果：结节ID唯一且连续，缺少llm_highest_birads时从结节中提取"""
+    # 1. 规范化结节ID，确保唯一且连续（nodule_1, nodule_2, ...）
+    nodules = result.get("nodules", []) or []
+    seen_ids: set[str] = set()
+    for idx, nodule in enumerate(nodules):
+        original_id = str(nodule.get("id") or "").strip() or f"nodule_{idx + 1}"
+        # 如果LLM给出的id重复或为空，则重新分配一个规范id
+        if original_id in seen_ids:
+            new_id = f"nodule_{idx + 1}"
+            logger.warning(
+                f"独立BI-RADS判断返回的结节ID重复或无效：{original_id}，已重命名为 {new_id}"
+            )
+            nodule["id"] = new_id
+            seen_ids.add(new_id)
+        else:
+            nodule["id"] = original_id
+            seen_ids.add(original_id)
+
+    result["nodules"] = nodules
+
+    # 2. 提取最高BI-RADS分类
+    llm_highest_birads = result.get("llm_highest_birads")
+
+    # 如果没有提供llm_highest_birads，从nodules中提取
+    if not llm_highest_birads and nodules:
+        birads_classes = []
+        for nodule in nodules:
+            birads_class = nodule.get("llm_birads_class")
+            if birads_class:
+                try:
+                    # 提取数字部分
+                    birads_num = int(re.match(r"\d+", birads_class).group())
+                    birads_classes.append((birads_num, birads_class))
+                except (ValueError, AttributeError):
+                    pass
+
+        if birads_classes:
+            llm_highest_birads = max(birads_classes, key=lambda x: x[0])[1]
+            result["llm_highest_birads"] = llm_highest_birads
+    return result
+
+
 def analyze_birads_independently(factual_text: str) -> dict:
     """
     基于事实性描述（检查所见）独立判断BI-RADS分类
@@ -503,93 +711,11 @@ def analyze_birads_independently(factual_text: str) -> dict:
         }
 
     # 1. RAG检索：从知识图谱中检索相关知识
-    rag_context = ""
-    rag_start_time = time.time()
-    try:
-        retriever = _get_retriever()
-        retrieval_result = retriever.retrieve(factual_text)
-        rag_time = time.time() - rag_start_time
-
-        if retrieval_result["entities"]:
-            rag_context = "\n\n## 相关医学知识（来自RAG知识库）：\n\n"
-            rag_context += "### 相关医学概念和规则：\n"
-            for entity in retrieval_result["entities"][:5]:
-                entity_name = entity.get("name", "")
-                entity_content = entity.get("content", "")
-                if entity_name and entity_content:
-                    rag_context += f"- **{entity_name}**：{entity_content[:150]}...\n"
-
-            if retrieval_result["inference_paths"]:
-                rag_context += "\n### 逻辑推理路径：\n"
-                for path in retrieval_result["inference_paths"][:3]:
-                    rag_context += f"- {' → '.join(path)}\n"
-
-            logger.info(f"RAG检索完成：{len(retrieval_result['entities'])} 个实体，耗时：{rag_time:.2f}秒")
-        else:
-            logger.warning(f"RAG检索未找到相关知识，耗时：{rag_time:.2f}秒")
-    except Exception as e:
-        rag_time = time.time() - rag_start_time
-        log_error_with_context(logger, e, context={"factual_text_length": len(factual_text)}, operation="RAG检索")
-        logger.warning(f"RAG检索失败，耗时：{rag_time:.2f}秒，继续执行LLM分析")
-
-    # 2. 构建System Prompt
-    system_prompt = (
-        """你是MedCrux医学影像分析助手，基于事实性描述（检查所见）识别异常发现并独立判断BI-RADS分类。
-
-重要规则：
-1. **只基于事实性描述（检查所见）判断**，不要参考任何结论性内容（如影像学诊断、建议等）
-2. **必须识别所有异常发现**，为每个异常发现提取完整信息（位置、形态学特征）
-3. **基于公理体系、知识图谱和形态学特征独立判断BI-RADS分类**
-4. **必须提供判断理由**，说明为什么判断为该BI-RADS分类
-
-步骤：
-1. **识别所有异常发现**：
-   - 仔细阅读事实性描述，识别所有提到的异常发现
-   - 为每个异常发现分配唯一ID（nodule_1, nodule_2等）
-
-2. **提取每个异常发现的信息**：
-   - 位置信息（breast、clock_position、distance_from_nipple等）
-   - 形态学特征（shape、boundary、echo、orientation、size等）
-
-3. **独立判断BI-RADS分类**：
-   - 基于形态学特征、公理体系、知识图谱独立判断BI-RADS分类
-   - 不要参考原报告的BI-RADS分类
-   - 必须提供判断理由（llm_birads_reasoning）
-
-4. **提取最高BI-RADS分类**：
-   - 从所有异常发现中提取最高BI-RADS分类
-
-返回JSON格式（无markdown）：
-{
-    "nodules": [
-        {
-            "id": "nodule_1",
-            "location": {
-                "breast": "left/right",
-                "clock_position": "X点",
-                "distance_from_nipple": "X.X"
-            },
-            "morphology": {
-                "shape": "椭圆形/圆形/不规则形",
-                "boundary": "清晰/大部分清晰/模糊/成角/微小分叶/毛刺状",
-                "echo": "均匀低回声/不均匀回声/无回声/等回声/高回声/复合回声",
-                "orientation": "平行/不平行",
-                "size": "长径×横径×前后径 cm"
-            },
-            "llm_birads_class": "3",
-            "llm_birads_reasoning": "基于形态学特征（椭圆形、边界清晰、均匀低回声、平行方位）判断为3类"
-        }
-    ],
-    "llm_highest_birads": "3"
-}
+    rag_context = retrieve_independent_birads_context(factual_text)
 
-要求：
-- 必须识别所有异常发现，不能遗漏
-- 必须为每个异常发现提供BI-RADS分类和判断理由
-- 判断理由必须基于形态学特征和公理体系
-- 如果报告中没有异常发现，返回空列表：{"nodules": [], "llm_highest_birads": null}"""
-        + rag_context
-    )
+    # 2. 构建System Prompt（输出格式同主分析，默认使用紧凑编码）
+    compact = get_output_schema() == SCHEMA_COMPACT
+    system_prompt = build_independent_birads_system_prompt(rag_context, compact)
 
     # 3. 调用 API
     context = {"factual_text_length": len(factual_text)}
@@ -597,68 +723,30 @@ def analyze_birads_independently(factual_text: str) -> dict:
 
     llm_start_time = time.time()
     try:
-        if not api_key:
+        if not is_llm_configured():
             raise ValueError("DEEPSEEK_API_KEY未设置")
 
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": f"这是检查所见（事实性描述），请识别所有异常发现并独立判断BI-RADS分类：\n\n{factual_text}",
-                },
-            ],
-            temperature=0.1,
-            stream=False,
-            response_format={"type": "json_object"},
-        )
+        # 病灶描述可以可靠切分时，逐病灶并发判断（输出时间不随结节数线性增长，且按病灶命中缓存）
+        segments = split_lesions(factual_text) if LESION_FANOUT_WORKERS > 1 else []
+        result = None
+        if segments:
+            try:
+                result = _judge_lesions_concurrently(segments, system_prompt, compact)
+            except Exception as e:
+                log_error_with_context(
+                    logger, e, context={"segments": len(segments)}, operation="逐病灶并发BI-RADS判断"
+                )
+                logger.warning("逐病灶并发判断失败，改为整体判断")
+        if result is None:
+            result = _request_independent_birads(factual_text, system_prompt, compact)
 
         llm_api_time = time.time() - llm_start_time
         logger.debug(f"DeepSeek API调用成功，耗时：{llm_api_time:.2f}秒")
 
-        # 4. 解析结果
-        content = response.choices[0].message.content
-        result = json.loads(content)
-
-        # 4.1 规范化结节ID，确保唯一且连续（nodule_1, nodule_2, ...）
-        nodules = result.get("nodules", []) or []
-        seen_ids: set[str] = set()
-        for idx, nodule in enumerate(nodules):
-            original_id = str(nodule.get("id") or "").strip() or f"nodule_{idx + 1}"
-            # 如果LLM给出的id重复或为空，则重新分配一个规范id
-            if original_id in seen_ids:
-                new_id = f"nodule_{idx + 1}"
-                logger.warning(
-                    f"独立BI-RADS判断返回的结节ID重复或无效：{original_id}，已重命名为 {new_id}"
-                )
-                nodule["id"] = new_id
-                seen_ids.add(new_id)
-            else:
-                nodule["id"] = original_id
-                seen_ids.add(original_id)
-
-        result["nodules"] = nodules
-
-        # 5. 提取最高BI-RADS分类
+        # 4. 规范化结节ID并提取最高BI-RADS分类
+        result = finalize_independent_birads_result(result)
+        nodules = result["nodules"]
         llm_highest_birads = result.get("llm_highest_birads")
-        
-        # 如果没有提供llm_highest_birads，从nodules中提取
-        if not llm_highest_birads and nodules:
-            birads_classes = []
-            for nodule in nodules:
-                birads_class = nodule.get("llm_birads_class")
-                if birads_class:
-                    try:
-                        # 提取数字部分
-                        birads_num = int(re.match(r"\d+", birads_class).group())
-                        birads_classes.append((birads_num, birads_class))
-                    except (ValueError, AttributeError):
-                        pass
-            
-            if birads_classes:
-                llm_highest_birads = max(birads_classes, key=lambda x: x[0])[1]
-                result["llm_highest_birads"] = llm_highest_birads
 
         total_time = time.time() - llm_start_time
         nodules_count = len(nodules)
@@ -0,0 +1,234 @@
+"""
+LLM调用指标模块：按阶段记录token用量和延迟
+
+每次实际发出的LLM请求（包括重试和对冲请求）都会记录一条LLMCallRecord：
+- stage：阶段名称（report_structure / analysis / independent_birads）
+- model：模型名称
+- prompt_tokens / cached_tokens / completion_tokens：token用量
+- latency：请求耗时（秒）
+- outcome：success / error / timeout
+
+另外按阶段统计LLM输出JSON的解析结果（clean / repaired / continued / failed），
+用于追踪本地JSON修复率。
+
+指标保存在进程内（registry单例），通过API端点 /api/metrics/llm 查询，
+用于比较各阶段的成本和延迟，以及在提示词变更后追踪回归。
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_ERROR = "error"
+OUTCOME_TIMEOUT = "timeout"
+
+# JSON解析结果
+JSON_PARSE_CLEAN = "clean"  # 直接解析成功
+JSON_PARSE_REPAIRED = "repaired"  # 本地修复成功
+JSON_PARSE_CONTINUED = "continued"  # 本地修复失败，续写/纠正请求后成功
+JSON_PARSE_FAILED = "failed"  # 全部失败
+
+
+@dataclass
+class LLMCallRecord:
+    """单次LLM请求的记录"""
+
+    stage: str
+    model: str
+    latency: float
+    outcome: str
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+    error_type: str | None = None
+    hedged: bool = False
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class _StageTotals:
+    """阶段累计值（不受滚动窗口大小影响）"""
+
+    calls: int = 0
+    success: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+    latency_sum: float = 0.0
+
+
+def _as_int(value) -> int:
+    """只接受整数token计数（兼容Mock或缺失字段）"""
+    return value if isinstance(value, int) and not isinstance(value, bool) else 0
+
+
+def extract_usage(response) -> dict:
+    """
+    从chat.completions响应中提取token用量
+
+    兼容两种缓存token字段：
+    - DeepSeek：usage.prompt_cache_hit_tokens
+    - OpenAI：usage.prompt_tokens_details.cached_tokens
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
+    cached_tokens = _as_int(getattr(usage, "prompt_cache_hit_tokens", None))
+    if not cached_tokens:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = _as_int(getattr(details, "cached_tokens", None))
+
+    return {
+        "prompt_tokens": _as_int(getattr(usage, "prompt_tokens", None)),
+        "cached_tokens": cached_tokens,
+        "completion_tokens": _as_int(getattr(usage, "completion_tokens", None)),
+    }
+
+
+def _percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    index = min(int(q * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class LLMMetricsRegistry:
+    """进程内LLM指标注册表（线程安全）"""
+
+    def __init__(self, window_size: int = 1000):
+        self._window_size = window_size
+        self._records: dict[str, deque] = {}
+        self._totals: dict[tuple[str, str], _StageTotals] = {}
+        self._json_parse: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, record: LLMCallRecord):
+        """记录一次LLM请求"""
+        with self._lock:
+            self._records.setdefault(record.stage, deque(maxlen=self._window_size)).append(record)
+            totals = self._totals.setdefault((record.stage, record.model), _StageTotals())
+            totals.calls += 1
+            if record.outcome == OUTCOME_SUCCESS:
+                totals.success += 1
+            elif record.outcome == OUTCOME_TIMEOUT:
+                totals.timeouts += 1
+            else:
+                totals.errors += 1
+            totals.prompt_tokens += record.prompt_tokens
+            totals.cached_tokens += record.cached_tokens
+            totals.completion_tokens += record.completion_tokens
+            totals.latency_sum += record.latency
+
+    def record_json_parse(self, stage: str, outcome: str):
+        """记录一次LLM输出JSON的解析结果"""
+        with self._lock:
+            counts = self._json_parse.setdefault(stage, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+    def latency_percentile(
+        self, stage: str, q: float, min_samples: int = 20, model: str | None = None, include_timeouts: bool = False
+    ) -> float | None:
+        """
+        返回阶段最近成功请求延迟的q分位数
+
+        Args:
+            stage: 阶段名称
+            q: 分位数（0-1）
+            min_samples: 最少样本数，不足时返回None
+            model: 只统计指定模型（可选）
+            include_timeouts: 同时统计超时请求（其延迟即超时时长）
+        """
+        outcomes = {OUTCOME_SUCCESS, OUTCOME_TIMEOUT} if include_timeouts else {OUTCOME_SUCCESS}
+        with self._lock:
+            latencies = sorted(
+                r.latency
+                for r in self._records.get(stage, ())
+                if r.outcome in outcomes and (model is None or r.model == model)
+            )
+        if len(latencies) < min_samples:
+            return None
+        return _percentile(latencies, q)
+
+    def recent(self, stage: str | None = None, limit: int = 50) -> list[dict]:
+        """返回最近的请求记录（按时间倒序）"""
+        with self._lock:
+            if stage is not None:
+                records = list(self._records.get(stage, ()))
+            else:
+                records = [r for stage_records in self._records.values() for r in stage_records]
+        records.sort(key=lambda r: r.timestamp, reverse=True)
+        return [asdict(r) for r in records[:limit]]
+
+    def snapshot(self) -> dict:
+        """
+        返回各阶段的汇总指标
+
+        Returns:
+            {
+                "stages": {
+                    "analysis": {
+                        "calls": int, "success": int, "errors": int, "timeouts": int,
+                        "prompt_tokens": int, "cached_tokens": int, "completion_tokens": int,
+                        "avg_latency": float,
+                        "latency_p50": float, "latency_p95": float, "latency_p99": float,  # 滚动窗口
+                        "models": {"deepseek-chat": {...同上累计字段...}}
+                    }
+                },
+                "json_parse": {
+                    "analysis": {"clean": int, "repaired": int, "continued": int, "failed": int, "repair_rate": float}
+                }
+            }
+        """
+        with self._lock:
+            totals = dict(self._totals)
+            windows = {stage: [r.latency for r in records] for stage, records in self._records.items()}
+            json_parse = {stage: dict(counts) for stage, counts in self._json_parse.items()}
+
+        stages: dict[str, dict] = {}
+        for (stage, model), stage_totals in sorted(totals.items()):
+            model_summary = asdict(stage_totals)
+            latency_sum = model_summary.pop("latency_sum")
+            model_summary["avg_latency"] = round(latency_sum / stage_totals.calls, 4) if stage_totals.calls else 0.0
+
+            summary = stages.setdefault(
+                stage,
+                {**{key: 0 for key in model_summary if key != "avg_latency"}, "latency_sum": 0.0, "models": {}},
+            )
+            for key, value in model_summary.items():
+                if key != "avg_latency":
+                    summary[key] += value
+            summary["latency_sum"] += latency_sum
+            summary["models"][model] = model_summary
+
+        for stage, summary in stages.items():
+            latency_sum = summary.pop("latency_sum")
+            summary["avg_latency"] = round(latency_sum / summary["calls"], 4) if summary["calls"] else 0.0
+            latencies = sorted(windows.get(stage, []))
+            for label, q in (("latency_p50", 0.5), ("latency_p95", 0.95), ("latency_p99", 0.99)):
+                value = _percentile(latencies, q)
+                summary[label] = round(value, 4) if value is not None else None
+
+        for counts in json_parse.values():
+            parsed = sum(counts.values())
+            recovered = counts.get(JSON_PARSE_REPAIRED, 0) + counts.get(JSON_PARSE_CONTINUED, 0)
+            # 修复率：需要修复的输出中最终恢复成功的比例
+            needed = parsed - counts.get(JSON_PARSE_CLEAN, 0)
+            counts["repair_rate"] = round(recovered / needed, 4) if needed else None
+
+        return {"stages": stages, "json_parse": json_parse}
+
+    def reset(self):
+        """清空所有指标（测试或重新基线时使用）"""
+        with self._lock:
+            self._records.clear()
+            self._totals.clear()
+            self._json_parse.clear()
+
+
+# 进程内单例
+registry = LLMMetricsRegistry()
@@ -0,0 +1,168 @@
+"""
+LLM后端模块：可切换的OpenAI兼容后端和延迟创建的客户端
+
+支持的后端（MEDCRUX_LLM_PROVIDER）：
+- deepseek（默认）：https://api.deepseek.com，使用DEEPSEEK_API_KEY
+- local：本地替身服务（medcrux.analysis.llm_stub_server），用于离线压测，不消耗API额度
+
+任意OpenAI兼容后端都可以通过环境变量覆盖：
+- MEDCRUX_LLM_BASE_URL：接口地址
+- MEDCRUX_LLM_API_KEY：API Key（未设置时使用后端默认的环境变量）
+- MEDCRUX_LLM_MODEL：默认模型名称
+
+客户端在第一次使用时才创建（而不是在import时），所有阶段共用一个客户端和一个连接池（见llm_transport），
+环境变量变更后调用reset_client()即可重新创建。
+
+MEDCRUX_LLM_CASSETTE_MODE为record/replay时，客户端包装为录制回放客户端（见llm_cassette），
+回放模式不访问网络，也不需要API Key。
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+
+from openai import OpenAI
+
+from medcrux.analysis.llm_cassette import (
+    CASSETTE_RECORD,
+    CASSETTE_REPLAY,
+    CassetteClient,
+    get_cassette_dir,
+    get_cassette_mode,
+    get_latency_scale,
+)
+from medcrux.analysis.llm_transport import get_http_client, reset_http_client
+from medcrux.utils.logger import setup_logger
+
+logger = setup_logger("medcrux.analysis.llm_provider")
+
+PROVIDER_DEEPSEEK = "deepseek"
+PROVIDER_LOCAL = "local"
+
+# 本地替身服务默认地址（见 scripts/start_llm_stub.sh）
+LOCAL_STUB_BASE_URL = "http://127.0.0.1:8900/v1"
+
+
+@dataclass(frozen=True)
+class LLMProviderConfig:
+    """LLM后端配置"""
+
+    name: str
+    base_url: str
+    api_key: str | None
+    model: str
+
+
+# 内置后端：(base_url, API Key环境变量, 固定API Key, 默认模型)
+_BUILTIN_PROVIDERS = {
+    PROVIDER_DEEPSEEK: ("https://api.deepseek.com", "DEEPSEEK_API_KEY", None, "deepseek-chat"),
+    PROVIDER_LOCAL: (LOCAL_STUB_BASE_URL, None, "local-stub", "deepseek-chat"),
+}
+
+
+class LLMNotConfiguredError(ValueError):
+    """当前LLM后端未配置API Key（是ValueError的子类，兼容原有异常处理）"""
+
+    def __init__(self, provider: str):
+        super().__init__(f"LLM后端{provider}未配置API Key")
+        self.provider = provider
+
+
+def get_provider_config() -> LLMProviderConfig:
+    """根据环境变量解析当前LLM后端配置"""
+    name = os.getenv("MEDCRUX_LLM_PROVIDER", PROVIDER_DEEPSEEK).strip().lower()
+    if name not in _BUILTIN_PROVIDERS:
+        logger.warning(f"未知的LLM后端：{name}，使用{PROVIDER_DEEPSEEK}")
+        name = PROVIDER_DEEPSEEK
+
+    base_url, key_env, fixed_key, model = _BUILTIN_PROVIDERS[name]
+    api_key = os.getenv("MEDCRUX_LLM_API_KEY") or (os.getenv(key_env) if key_env else fixed_key)
+    return LLMProviderConfig(
+        name=name,
+        base_url=os.getenv("MEDCRUX_LLM_BASE_URL", base_url),
+        api_key=api_key,
+        model=os.getenv("MEDCRUX_LLM_MODEL", model),
+    )
+
+
+def is_llm_configured() -> bool:
+    """当前后端是否具备调用条件（已配置API Key，或处于回放模式）"""
+    return bool(get_provider_config().api_key) or get_cassette_mode() == CASSETTE_REPLAY
+
+
+def get_default_model() -> str:
+    """当前后端的默认模型"""
+    return get_provider_config().model
+
+
+def get_client() -> OpenAI | CassetteClient:
+    """
+    获取进程内共享的OpenAI兼容客户端（首次调用时创建，录制回放模式下为CassetteClient）
+
+    Raises:
+        LLMNotConfiguredError: 当前后端未配置API Key
+    """
+    return _shared.get()
+
+
+def _create_client() -> OpenAI | CassetteClient:
+    mode = get_cassette_mode()
+    if mode == CASSETTE_REPLAY:
+        logger.info(f"LLM客户端初始化完成 [回放录制: {get_cassette_dir()}, 延迟系数: {get_latency_scale()}]")
+        return CassetteClient(get_cassette_dir(), CASSETTE_REPLAY, latency_scale=get_latency_scale())
+
+    config = get_provider_config()
+    if not config.api_key:
+        raise LLMNotConfiguredError(config.name)
+    # 重试由llm_client按阶段策略统一处理，关闭SDK内置重试
+    client = OpenAI(
+        api_key=config.api_key, base_url=config.base_url, max_retries=0, http_client=get_http_client(config.base_url)
+    )
+    logger.info(f"LLM客户端初始化完成 [后端: {config.name}, 地址: {config.base_url}]")
+    if mode == CASSETTE_RECORD:
+        logger.info(f"LLM请求录制到: {get_cassette_dir()}")
+        return CassetteClient(get_cassette_dir(), CASSETTE_RECORD, inner=client)
+    return client
+
+
+class _SharedClient:
+    """进程内共享的LLM客户端（线程安全，首次使用时按当前配置创建）"""
+
+    def __init__(self):
+        self.client: OpenAI | CassetteClient | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> OpenAI | CassetteClient:
+        client = self.client
+        if client is not None:
+            return client
+
+        with self._lock:
+            if self.client is None:
+                self.client = _create_client()
+            return self.client
+
+    def reset(self):
+        with self._lock:
+            self.client = None
+            reset_http_client()
+
+
+_shared = _SharedClient()
+
+
+def reset_client():
+    """丢弃已创建的客户端和连接池，下次使用时按最新配置重新创建"""
+    _shared.reset()
+
+
+class LazyLLMClient:
+    """
+    延迟创建的客户端代理
+
+    模块级的 `client = LazyLLMClient()` 在import时不会创建连接，
+    访问 `client.chat` 等属性时才委托给get_client()。
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(get_client(), name)
@@ -0,0 +1,237 @@
+"""
+LLM限流模块：跨进程共享的令牌桶（每分钟请求数 + 每分钟token数）
+
+多个uvicorn worker和批处理任务同时调用DeepSeek时，容易触发后端限流（429），
+表现为analyze_birads_independently等阶段成批失败。本模块在发出请求前排队等待令牌，
+让请求平滑地发出，而不是集中失败。
+
+- 两个令牌桶：requests（MEDCRUX_LLM_RPM）和tokens（MEDCRUX_LLM_TPM），容量为每分钟限额，按秒匀速补充
+- 桶状态保存在本机文件中（MEDCRUX_LLM_RATE_STATE，默认系统临时目录），通过文件锁在进程间共享
+- 优先级：交互式请求（默认）可以用完整个桶；批处理请求（llm_priority(PRIORITY_BATCH)）
+  必须为交互式请求保留MEDCRUX_LLM_BATCH_RESERVE比例（默认20%）的容量
+- 两个限额都未配置时不限流
+
+请求的token数在发出前估算（提示词 + max_tokens），对冲请求直接记账不排队。
+"""
+
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from medcrux.utils import estimate_tokens
+from medcrux.utils.logger import setup_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows：退化为进程内限流
+    fcntl = None
+
+logger = setup_logger("medcrux.analysis.llm_rate_limiter")
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+
+# 未指定max_tokens时，按该值估算输出token
+DEFAULT_COMPLETION_TOKENS = 1000
+
+# 单次等待的最长休眠（秒），让其他进程释放的令牌能被及时发现
+_MAX_SLEEP = 1.0
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("medcrux_llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: str):
+    """
+    在上下文中设置LLM调用优先级
+
+    Example:
+        with llm_priority(PRIORITY_BATCH):
+            analyze_text_with_deepseek(text)
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def get_priority() -> str:
+    """当前上下文的LLM调用优先级"""
+    return _priority.get()
+
+
+def estimate_request_tokens(request_kwargs: dict) -> int:
+    """估算一次chat.completions请求消耗的token数（提示词 + 输出上限）"""
+    prompt_tokens = sum(
+        estimate_tokens(message.get("content") or "")
+        for message in request_kwargs.get("messages", [])
+        if isinstance(message, dict)
+    )
+    return prompt_tokens + int(request_kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+def _env_rate(name: str) -> float | None:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+@dataclass(frozen=True)
+class RateLimitConfig:
+    """限流配置（限额未设置或不大于0时对应的桶不限流）"""
+
+    requests_per_minute: float | None = None
+    tokens_per_minute: float | None = None
+    batch_reserve: float = 0.2  # 批处理请求必须为交互式请求保留的容量比例
+
+
+def get_rate_limit_config() -> RateLimitConfig:
+    """根据环境变量解析限流配置"""
+    return RateLimitConfig(
+        requests_per_minute=_env_rate("MEDCRUX_LLM_RPM"),
+        tokens_per_minute=_env_rate("MEDCRUX_LLM_TPM"),
+        batch_reserve=float(os.getenv("MEDCRUX_LLM_BATCH_RESERVE", "0.2")),
+    )
+
+
+class RateLimiter:
+    """文件锁保护的跨进程令牌桶"""
+
+    def __init__(self, config: RateLimitConfig, state_path: Path, *, clock=time.time, sleep=time.sleep):
+        self.capacities = {
+            name: limit
+            for name, limit in (("requests", config.requests_per_minute), ("tokens", config.tokens_per_minute))
+            if limit and limit > 0
+        }
+        self.state_path = Path(state_path)
+        self.batch_reserve = config.batch_reserve
+        self._clock = clock
+        self._sleep = sleep
+        self._thread_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.capacities)
+
+    @contextmanager
+    def _locked_state(self):
+        """加锁读取桶状态，退出时写回（同一主机的所有进程互斥）"""
+        with self._thread_lock:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.state_path.open("a+", encoding="utf-8") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read() or "{}")
+                    except json.JSONDecodeError:
+                        state = {}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refill(self, state: dict, now: float) -> dict[str, float]:
+        """按经过的时间补充令牌，返回各桶当前余量"""
+        levels = {}
+        for name, capacity in self.capacities.items():
+            bucket = state.get(name) or {"level": capacity, "updated": now}
+            elapsed = max(0.0, now - bucket["updated"])
+            level = min(capacity, bucket["level"] + elapsed * capacity / 60.0)
+            state[name] = {"level": level, "updated": now}
+            levels[name] = level
+        return levels
+
+    def _wait_time(self, costs: dict[str, float], priority: str) -> float:
+        """在一次加锁中尝试扣减令牌；成功返回0，否则返回需要等待的秒数"""
+        now = self._clock()
+        with self._locked_state() as state:
+            levels = self._refill(state, now)
+            wait = 0.0
+            for name, capacity in self.capacities.items():
+                reserve = capacity * self.batch_reserve if priority == PRIORITY_BATCH else 0.0
+                # 单次请求超过桶容量时，桶满即可放行（透支部分由后续补充偿还）
+                need = min(costs[name], capacity - reserve) + reserve
+                if levels[name] < need:
+                    wait = max(wait, (need - levels[name]) * 60.0 / capacity)
+            if wait == 0.0:
+                for name in self.capacities:
+                    state[name]["level"] -= costs[name]
+            return wait
+
+    def acquire(self, tokens: int, timeout: float, priority: str | None = None) -> bool:
+        """
+        等待并扣减一次请求的令牌
+
+        Args:
+            tokens: 估算的token数
+            timeout: 最长等待时间（秒）
+            priority: 优先级，默认使用当前上下文的优先级
+
+        Returns:
+            是否在timeout内获得令牌
+        """
+        if not self.enabled:
+            return True
+
+        priority = priority or get_priority()
+        costs = {"requests": 1, "tokens": tokens}
+        deadline = self._clock() + timeout
+        waited = 0.0
+        while True:
+            wait = self._wait_time(costs, priority)
+            if wait == 0.0:
+                if waited >= 1.0:
+                    logger.info(f"LLM限流排队{waited:.2f}秒 [优先级: {priority}, 估算token: {tokens}]")
+                return True
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                logger.warning(f"LLM限流等待超时 [优先级: {priority}, 已等待: {waited:.2f}秒]")
+                return False
+            delay = min(wait, remaining, _MAX_SLEEP)
+            self._sleep(delay)
+            waited += delay
+
+    def charge(self, tokens: int):
+        """不排队直接记账（用于对冲请求），余量可以为负"""
+        if not self.enabled:
+            return
+        now = self._clock()
+        with self._locked_state() as state:
+            self._refill(state, now)
+            for name, cost in (("requests", 1), ("tokens", tokens)):
+                if name in self.capacities:
+                    state[name]["level"] -= cost
+
+    def snapshot(self) -> dict:
+        """返回各桶的容量和当前余量"""
+        if not self.enabled:
+            return {"enabled": False}
+        now = self._clock()
+        with self._locked_state() as state:
+            levels = self._refill(state, now)
+        return {
+            "enabled": True,
+            "buckets": {
+                name: {"capacity_per_minute": capacity, "available": round(levels[name], 2)}
+                for name, capacity in self.capacities.items()
+            },
+        }
+
+
+# 进程内单例（状态通过文件在同一主机的进程间共享）
+rate_limiter = RateLimiter(
+    get_rate_limit_config(),
+    state_path=Path(os.getenv("MEDCRUX_LLM_RATE_STATE", Path(tempfile.gettempdir()) / "medcrux_llm_rate.json")),
+)
@@ -0,0 +1,180 @@
+"""
+LLM模型路由模块：按阶段配置模型、max_tokens和超时，并按延迟目标切换到更快的模型
+
+三个阶段难度不同：结构解析是简单的抽取任务，主分析（一致性判断）最难。
+每个阶段可以单独配置（STAGE为REPORT_STRUCTURE / ANALYSIS / INDEPENDENT_BIRADS）：
+- MEDCRUX_LLM_<STAGE>_MODEL：阶段模型（默认使用后端默认模型）
+- MEDCRUX_LLM_<STAGE>_MAX_TOKENS：输出token上限（默认不限制）
+- MEDCRUX_LLM_<STAGE>_TIMEOUT：单次请求超时（秒，默认使用llm_client的阶段策略）
+- MEDCRUX_LLM_<STAGE>_FALLBACK_MODEL：备用的更快模型
+- MEDCRUX_LLM_<STAGE>_P95_TARGET：延迟目标（秒）
+
+同时配置了备用模型和延迟目标时，阶段模型最近请求（含超时）的p95超过目标，
+后续请求改用备用模型；每MEDCRUX_LLM_ROUTER_PROBE_INTERVAL个请求（默认10）仍发给阶段模型一次，
+刷新其延迟样本，p95回到目标以内后自动切回。
+
+每个请求实际使用的模型通过track_stage_models()收集，由API在响应中返回。
+"""
+
+import contextvars
+import os
+import threading
+from dataclasses import dataclass
+
+from medcrux.analysis.llm_metrics import LLMMetricsRegistry, registry
+from medcrux.analysis.llm_provider import get_default_model
+from medcrux.utils.logger import setup_logger
+
+logger = setup_logger("medcrux.analysis.llm_router")
+
+# 计算p95所需的最少样本数，样本不足时不切换
+MIN_LATENCY_SAMPLES = 20
+
+_stage_models: contextvars.ContextVar[dict | None] = contextvars.ContextVar("medcrux_llm_stage_models", default=None)
+
+
+@dataclass(frozen=True)
+class StageModelConfig:
+    """单个阶段的模型配置"""
+
+    model: str
+    fallback_model: str | None = None
+    max_tokens: int | None = None
+    timeout: float | None = None
+    latency_target: float | None = None  # p95延迟目标（秒）
+
+    @property
+    def can_fall_back(self) -> bool:
+        return bool(self.fallback_model and self.latency_target and self.fallback_model != self.model)
+
+
+def _env(stage: str, name: str) -> str | None:
+    value = os.getenv(f"MEDCRUX_LLM_{stage.upper()}_{name}")
+    return value.strip() if value and value.strip() else None
+
+
+def _env_number(stage: str, name: str, cast):
+    value = _env(stage, name)
+    if value is None:
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        logger.warning(f"无效的配置 MEDCRUX_LLM_{stage.upper()}_{name}={value}，已忽略")
+        return None
+
+
+def get_stage_config(stage: str) -> StageModelConfig:
+    """根据环境变量解析阶段的模型配置"""
+    return StageModelConfig(
+        model=_env(stage, "MODEL") or get_default_model(),
+        fallback_model=_env(stage, "FALLBACK_MODEL"),
+        max_tokens=_env_number(stage, "MAX_TOKENS", int),
+        timeout=_env_number(stage, "TIMEOUT", float),
+        latency_target=_env_number(stage, "P95_TARGET", float),
+    )
+
+
+class ModelRouter:
+    """按阶段延迟目标选择模型（线程安全）"""
+
+    def __init__(self, metrics: LLMMetricsRegistry = registry, probe_interval: int = 10):
+        self._metrics = metrics
+        self.probe_interval = max(1, probe_interval)
+        self._counters: dict[str, int] = {}
+        self._degraded: set[str] = set()
+        self._routed_stages: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _primary_p95(self, stage: str, config: StageModelConfig) -> float | None:
+        return self._metrics.latency_percentile(
+            stage, 0.95, min_samples=MIN_LATENCY_SAMPLES, model=config.model, include_timeouts=True
+        )
+
+    def route(self, stage: str) -> str:
+        """
+        选择阶段本次请求使用的模型
+
+        Returns:
+            模型名称：阶段模型，或p95超过延迟目标时的备用模型
+        """
+        config = get_stage_config(stage)
+        if not config.can_fall_back:
+            return config.model
+
+        p95 = self._primary_p95(stage, config)
+        degraded = p95 is not None and p95 > config.latency_target
+        with self._lock:
+            self._routed_stages.add(stage)
+            if degraded != (stage in self._degraded):
+                if degraded:
+                    self._degraded.add(stage)
+                    logger.warning(
+                        f"LLM阶段{stage}模型{config.model}的p95延迟{p95:.2f}秒超过目标"
+                        f"{config.latency_target:.2f}秒，切换到{config.fallback_model}"
+                    )
+                else:
+                    self._degraded.discard(stage)
+                    logger.info(f"LLM阶段{stage}模型{config.model}延迟恢复，切回阶段模型")
+            if not degraded:
+                return config.model
+            self._counters[stage] = self._counters.get(stage, 0) + 1
+            probe = self._counters[stage] % self.probe_interval == 0
+        # 定期探测阶段模型，刷新其延迟样本
+        return config.model if probe else config.fallback_model
+
+    def snapshot(self) -> dict:
+        """返回各阶段的路由状态（只包含配置了备用模型且已有请求的阶段）"""
+        with self._lock:
+            routed_stages = sorted(self._routed_stages)
+        stages = {}
+        for stage in routed_stages:
+            config = get_stage_config(stage)
+            if not config.can_fall_back:
+                continue
+            p95 = self._primary_p95(stage, config)
+            with self._lock:
+                degraded = stage in self._degraded
+            stages[stage] = {
+                "model": config.model,
+                "fallback_model": config.fallback_model,
+                "latency_target": config.latency_target,
+                "model_p95": round(p95, 4) if p95 is not None else None,
+                "routed_to": config.fallback_model if degraded else config.model,
+            }
+        return stages
+
+    def reset(self):
+        """清空路由状态（主要用于测试）"""
+        with self._lock:
+            self._counters.clear()
+            self._degraded.clear()
+            self._routed_stages.clear()
+
+
+# 进程内单例
+router = ModelRouter(probe_interval=int(os.getenv("MEDCRUX_LLM_ROUTER_PROBE_INTERVAL", "10")))
+
+
+def route_model(stage: str) -> str:
+    """选择阶段本次请求使用的模型（见ModelRouter.route）"""
+    return router.route(stage)
+
+
+def track_stage_models() -> dict[str, str]:
+    """
+    在当前上下文中开始收集各阶段实际使用的模型
+
+    Returns:
+        {阶段名称: 模型名称}，之后的LLM请求成功时写入（同一阶段多次请求时保留最后一次）
+    """
+    models: dict[str, str] = {}
+    _stage_models.set(models)
+    return models
+
+
+def record_stage_model(stage: str, model: str):
+    """记录阶段实际使用的模型（未开始收集时忽略）"""
+    models = _stage_models.get()
+    if models is not None:
+        models[stage] = model
@@ -0,0 +1,343 @@
+"""
+本地LLM替身服务：OpenAI兼容的 /v1/chat/completions 接口，返回符合各阶段schema的确定性响应
+
+用途：在不消耗真实API额度的情况下对完整流程进行离线压测和端到端测试。
+
+启动：
+    MEDCRUX_STUB_LATENCY="lognormal:2.0,0.4" uvicorn medcrux.analysis.llm_stub_server:app --port 8900
+    MEDCRUX_LLM_PROVIDER=local ./scripts/start_api.sh
+
+响应生成：
+- 根据system prompt识别阶段（报告结构解析 / 主分析 / 独立BI-RADS判断 / 批量独立BI-RADS判断）
+- 默认基于规则从用户消息中生成响应（章节切分、病灶描述提取）
+- system prompt要求紧凑编码输出时，分析结果按compact_schema编码
+- 如设置 MEDCRUX_STUB_CANNED_DIR，且目录中存在 <阶段名>.json，则直接返回该文件内容
+
+延迟分布（MEDCRUX_STUB_LATENCY，可按阶段覆盖：MEDCRUX_STUB_LATENCY_<阶段名大写>）：
+- "0" 或 "fixed:1.5"：固定延迟（秒）
+- "uniform:1,3"：均匀分布
+- "normal:2,0.5"：正态分布（截断为非负）
+- "lognormal:2,0.4"：对数正态分布（参数为中位数和sigma），最接近真实LLM的长尾延迟
+
+其他配置：
+- MEDCRUX_STUB_ERROR_RATE：以该概率返回503，用于验证重试和熔断
+- MEDCRUX_STUB_SEED：随机数种子，保证压测可复现
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from medcrux.analysis.batch_analyzer import BATCH_MARKER
+from medcrux.analysis.compact_schema import (
+    COMPACT_SCHEMA_MARKER,
+    compact_analysis_result,
+    compact_independent_birads_result,
+)
+from medcrux.analysis.llm_client import (
+    STAGE_ANALYSIS,
+    STAGE_INDEPENDENT_BIRADS,
+    STAGE_INDEPENDENT_BIRADS_BATCH,
+    STAGE_REPORT_STRUCTURE,
+)
+from medcrux.analysis.report_structure_parser import (
+    DIAGNOSIS_START_KEYWORDS,
+    FINDINGS_START_KEYWORDS,
+    FOOTER_KEYWORDS,
+    RECOMMENDATION_START_KEYWORDS,
+)
+from medcrux.utils.logger import setup_logger
+from medcrux.utils.tokens import estimate_tokens
+
+logger = setup_logger("medcrux.analysis.llm_stub")
+
+app = FastAPI(title="MedCrux LLM Stub", version="1.0.0")
+
+_rng = random.Random(os.getenv("MEDCRUX_STUB_SEED"))
+
+
+def parse_latency_spec(spec: str | None) -> Callable[[random.Random], float]:
+    """
+    解析延迟分布配置，返回采样函数
+
+    Args:
+        spec: 分布配置字符串（见模块说明），为空时无延迟
+
+    Raises:
+        ValueError: 无法识别的分布配置
+    """
+    if not spec or spec.strip() in {"0", "none"}:
+        return lambda rng: 0.0
+
+    kind, _, raw_params = spec.strip().partition(":")
+    if not raw_params:
+        # 只写数字时视为固定延迟
+        kind, raw_params = "fixed", kind
+    try:
+        params = [float(p) for p in raw_params.split(",") if p.strip()]
+    except ValueError as e:
+        raise ValueError(f"无法解析延迟配置：{spec}") from e
+
+    if kind == "fixed" and len(params) == 1:
+        return lambda rng: params[0]
+    if kind == "uniform" and len(params) == 2:
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == "normal" and len(params) == 2:
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == "lognormal" and len(params) == 2:
+        return lambda rng: rng.lognormvariate(math.log(params[0]), params[1])
+    raise ValueError(f"无法解析延迟配置：{spec}")
+
+
+def _latency_for_stage(stage: str) -> float:
+    spec = os.getenv(f"MEDCRUX_STUB_LATENCY_{stage.upper()}", os.getenv("MEDCRUX_STUB_LATENCY"))
+    return parse_latency_spec(spec)(_rng)
+
+
+def detect_stage(system_prompt: str) -> str:
+    """根据system prompt识别请求所属阶段"""
+    if "报告结构解析" in system_prompt:
+        return STAGE_REPORT_STRUCTURE
+    if BATCH_MARKER in system_prompt:
+        return STAGE_INDEPENDENT_BIRADS_BATCH
+    if "独立判断BI-RADS" in system_prompt or "llm_birads_class" in system_prompt:
+        return STAGE_INDEPENDENT_BIRADS
+    return STAGE_ANALYSIS
+
+
+# 批量请求中每份报告以"### 报告 <rid>"开头
+_BATCH_REPORT_PATTERN = re.compile(r"### 报告 (\S+)\n(.*?)(?=\n\n### 报告 |\Z)", re.DOTALL)
+
+
+def _report_text(user_message: str) -> str:
+    """去掉用户消息中的指令前缀，只保留报告文本"""
+    _, sep, text = user_message.partition("\n\n")
+    return text if sep else user_message
+
+
+def _find_first(text: str, keywords: list[str], start: int = 0) -> tuple[int, int] | None:
+    """返回start之后最早出现的关键词位置（起点, 终点）"""
+    best = None
+    for keyword in keywords:
+        index = text.find(keyword, start)
+        if index != -1 and (best is None or index < best[0]):
+            best = (index, index + len(keyword))
+    return best
+
+
+def _strip_label(text: str) -> str:
+    return text.lstrip("：: \n").strip()
+
+
+def build_structure_response(text: str) -> dict:
+    """基于章节关键词切分报告结构"""
+    findings_pos = _find_first(text, FINDINGS_START_KEYWORDS)
+    diagnosis_pos = _find_first(text, DIAGNOSIS_START_KEYWORDS, findings_pos[1] if findings_pos else 0)
+    recommendation_pos = _find_first(text, RECOMMENDATION_START_KEYWORDS, diagnosis_pos[1] if diagnosis_pos else 0)
+    footer_pos = _find_first(text, FOOTER_KEYWORDS)
+
+    end_of_text = footer_pos[0] if footer_pos else len(text)
+    findings_start = findings_pos[1] if findings_pos else 0
+    findings_end = diagnosis_pos[0] if diagnosis_pos else end_of_text
+    diagnosis_end = recommendation_pos[0] if recommendation_pos else end_of_text
+
+    findings = _strip_label(text[findings_start:findings_end]) or None
+    diagnosis = _strip_label(text[diagnosis_pos[0] : diagnosis_end]) if diagnosis_pos else None
+    recommendation = _strip_label(text[recommendation_pos[1] : end_of_text]) if recommendation_pos else None
+    return {"findings": findings, "diagnosis": diagnosis or None, "recommendation": recommendation or None}
+
+
+# BI-RADS 4类及以上视为可疑
+_SUSPICIOUS_BIRADS = 4
+
+_LESION_SPLIT = re.compile(r"(?=在?[左右]侧?乳)")
+_BIRADS_PATTERN = re.compile(r"BI-?RADS\s*[:：]?\s*(\d[ABCabc]?)", re.IGNORECASE)
+_CLOCK_PATTERN = re.compile(r"(\d{1,2})\s*点")
+_DISTANCE_PATTERN = re.compile(r"距乳头约?\s*([\d.]+)\s*(cm|mm)", re.IGNORECASE)
+_SIZE_PATTERN = re.compile(r"([\d.]+)\s*[×xX*]\s*([\d.]+)(?:\s*[×xX*]\s*([\d.]+))?\s*(cm|mm)", re.IGNORECASE)
+
+
+def _rule_morphology(segment: str) -> dict:
+    shape = "不规则形" if "不规则" in segment else "椭圆形"
+    boundary = "模糊" if ("不清" in segment or "模糊" in segment) else ("毛刺状" if "毛刺" in segment else "清晰")
+    if "无回声" in segment:
+        echo = "无回声"
+    elif "不均" in segment:
+        echo = "不均匀回声"
+    elif "低回声" in segment:
+        echo = "均匀低回声" if "均匀" in segment else "低回声"
+    else:
+        echo = ""
+    orientation = "不平行" if ("不平行" in segment or "垂直" in segment) else "平行"
+
+    size = ""
+    size_match = _SIZE_PATTERN.search(segment)
+    if size_match:
+        factor = 0.1 if size_match.group(4).lower() == "mm" else 1.0
+        dims = [f"{float(v) * factor:g}" for v in size_match.groups()[:3] if v]
+        size = "×".join(dims) + " cm"
+    return {"shape": shape, "boundary": boundary, "echo": echo, "orientation": orientation, "size": size}
+
+
+def _rule_location(segment: str) -> dict:
+    location = {"breast": "right" if "右" in segment[:4] else "left"}
+    clock_match = _CLOCK_PATTERN.search(segment)
+    if clock_match:
+        location["clock_position"] = f"{int(clock_match.group(1))}点"
+    distance_match = _DISTANCE_PATTERN.search(segment)
+    if distance_match:
+        value = float(distance_match.group(1))
+        if distance_match.group(2).lower() == "mm":
+            value /= 10
+        location["distance_from_nipple"] = f"{value:g}"
+    return location
+
+
+def _rule_birads(segment: str, morphology: dict) -> str:
+    explicit = _BIRADS_PATTERN.search(segment)
+    if explicit:
+        return explicit.group(1).upper()
+    if morphology["echo"] == "无回声":
+        return "2"
+    suspicious = morphology["shape"] == "不规则形" or morphology["boundary"] in {"模糊", "毛刺状"}
+    return "4" if suspicious else "3"
+
+
+def _birads_number(birads: str) -> int:
+    """BI-RADS分类的数字部分（用于比较大小）"""
+    match = re.match(r"\d+", birads or "")
+    return int(match.group()) if match else 0
+
+
+def _extract_lesion_segments(text: str) -> list[str]:
+    return [
+        segment.strip()
+        for segment in _LESION_SPLIT.split(text)
+        if re.search(r"(查见|可见|探及).*?(回声|结节)", segment)
+    ]
+
+
+def build_analysis_response(text: str, independent: bool) -> dict:
+    """基于规则提取病灶，生成主分析或独立BI-RADS判断的响应"""
+    nodules = []
+    for index, segment in enumerate(_extract_lesion_segments(text), start=1):
+        morphology = _rule_morphology(segment)
+        birads = _rule_birads(segment, morphology)
+        nodule = {"id": f"nodule_{index}", "location": _rule_location(segment), "morphology": morphology}
+        if independent:
+            nodule["llm_birads_class"] = birads
+            nodule["llm_birads_reasoning"] = f"替身服务基于规则判断为{birads}类"
+        else:
+            nodule.update(
+                {
+                    "malignant_signs": [],
+                    "birads_class": birads,
+                    "risk_assessment": "Medium" if _birads_number(birads) >= _SUSPICIOUS_BIRADS else "Low",
+                    "inconsistency_alert": False,
+                    "inconsistency_reasons": [],
+                }
+            )
+        nodules.append(nodule)
+
+    highest = max(
+        (n.get("llm_birads_class") or n.get("birads_class") for n in nodules), default=None, key=_birads_number
+    )
+    if independent:
+        return {"nodules": nodules, "llm_highest_birads": highest}
+
+    highest_risk = "Medium" if highest and _birads_number(highest) >= _SUSPICIOUS_BIRADS else "Low"
+    return {
+        "patient_gender": "Female",
+        "nodules": nodules,
+        "overall_assessment": {
+            "total_nodules": len(nodules),
+            "highest_risk": highest_risk,
+            "summary": f"替身服务识别到{len(nodules)}个结节",
+            "advice": "替身服务响应，仅用于测试",
+        },
+    }
+
+
+def _canned_response(stage: str) -> dict | None:
+    canned_dir = os.getenv("MEDCRUX_STUB_CANNED_DIR")
+    if not canned_dir:
+        return None
+    canned_file = Path(canned_dir) / f"{stage}.json"
+    if not canned_file.exists():
+        return None
+    with open(canned_file, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def generate_stage_response(stage: str, user_message: str, compact: bool = False) -> dict:
+    """生成指定阶段的响应内容（JSON对象），compact为True时按紧凑编码输出分析结果"""
+    canned = _canned_response(stage)
+    if canned is not None:
+        return canned
+
+    text = _report_text(user_message)
+    if stage == STAGE_REPORT_STRUCTURE:
+        return build_structure_response(text)
+    if stage == STAGE_INDEPENDENT_BIRADS:
+        result = build_analysis_response(text, independent=True)
+        return compact_independent_birads_result(result) if compact else result
+    if stage == STAGE_INDEPENDENT_BIRADS_BATCH:
+        reports = []
+        for rid, report_text in _BATCH_REPORT_PATTERN.findall(text):
+            result = build_analysis_response(report_text, independent=True)
+            reports.append({"rid": rid, **(compact_independent_birads_result(result) if compact else result)})
+        return {"reports": reports}
+    result = build_analysis_response(text, independent=False)
+    return compact_analysis_result(result) if compact else result
+
+
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    """OpenAI兼容的chat completions接口"""
+    body = await request.json()
+    messages = body.get("messages", [])
+    system_prompt = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    user_message = "\n".join(m.get("content", "") for m in messages if m.get("role") == "user")
+    stage = detect_stage(system_prompt)
+
+    await asyncio.sleep(_latency_for_stage(stage))
+
+    error_rate = float(os.getenv("MEDCRUX_STUB_ERROR_RATE", "0") or 0)
+    if error_rate and _rng.random() < error_rate:
+        return JSONResponse(status_code=503, content={"error": {"message": "stub overloaded", "type": "server_error"}})
+
+    compact = COMPACT_SCHEMA_MARKER in system_prompt
+    content = json.dumps(
+        generate_stage_response(stage, user_message, compact),
+        ensure_ascii=False,
+        separators=(",", ":") if compact else None,
+    )
+    prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+    completion_tokens = estimate_tokens(content)
+    return {
+        "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "deepseek-chat"),
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"},
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_cache_hit_tokens": 0,
+            "prompt_cache_miss_tokens": prompt_tokens,
+        },
+    }
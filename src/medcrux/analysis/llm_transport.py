@@ -0,0 +1,181 @@
+"""
+LLM HTTP传输模块：进程内共享一个连接池，所有阶段的LLM请求复用连接和TLS会话
+
+OpenAI SDK默认为每个客户端创建独立的连接池，池大小和keep-alive都不可配置。
+本模块在第一次创建LLM客户端时（而不是import时）创建一个调优过的HTTP客户端，
+由llm_provider传给OpenAI客户端，所有阶段共用：
+
+- MEDCRUX_LLM_POOL_MAX_CONNECTIONS：最大连接数（默认20）
+- MEDCRUX_LLM_POOL_MAX_KEEPALIVE：最多保持的空闲连接数（默认10）
+- MEDCRUX_LLM_POOL_KEEPALIVE_EXPIRY：空闲连接保持时间（秒，默认30）
+- MEDCRUX_LLM_HTTP2：设为1启用HTTP/2（需要安装h2，未安装时回退到HTTP/1.1）
+
+配置了HTTP(S)_PROXY/ALL_PROXY（且LLM接口地址不在NO_PROXY中）时，连接池经代理连接。
+传入自定义传输层后，httpx 0.28会忽略代理环境变量（请求直连），0.27则另外挂载不经过连接池的代理传输层，
+因此代理由连接池自己处理，共享客户端不再读取代理环境变量。
+
+连接池使用情况（连接数、在途请求数、利用率）见 `/api/metrics/llm` 的 `http_pool` 字段。
+"""
+
+import importlib.util
+import os
+import threading
+import urllib.request
+from dataclasses import dataclass
+
+import httpx
+import openai
+
+from medcrux.utils.logger import setup_logger
+
+logger = setup_logger("medcrux.analysis.llm_transport")
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """连接池配置"""
+
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+
+
+def get_pool_config() -> PoolConfig:
+    """根据环境变量解析连接池配置"""
+    return PoolConfig(
+        max_connections=int(os.getenv("MEDCRUX_LLM_POOL_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("MEDCRUX_LLM_POOL_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv("MEDCRUX_LLM_POOL_KEEPALIVE_EXPIRY", "30")),
+        http2=os.getenv("MEDCRUX_LLM_HTTP2", "").strip().lower() in ("1", "true", "yes"),
+    )
+
+
+class PooledTransport(httpx.HTTPTransport):
+    """
+    记录使用情况的连接池传输层（线程安全）
+
+    在途请求数从发出请求到收到响应头为止计数（非流式的LLM请求在此期间生成输出，覆盖绝大部分耗时）。
+    """
+
+    def __init__(self, config: PoolConfig, proxy: str | None = None):
+        limits = httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        )
+        http2 = config.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("未安装h2，LLM连接池回退到HTTP/1.1")
+            http2 = False
+        super().__init__(limits=limits, http2=http2, proxy=proxy)
+        self.config = config
+        self.http2 = http2
+        self.proxied = proxy is not None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._requests = 0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self._in_flight += 1
+            self._requests += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            return super().handle_request(request)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _connections(self) -> list:
+        pool = getattr(self, "_pool", None)
+        return list(getattr(pool, "connections", []) or [])
+
+    def snapshot(self) -> dict:
+        """返回连接池使用情况"""
+        connections = self._connections()
+        idle = sum(1 for connection in connections if connection.is_idle())
+        with self._lock:
+            in_flight, peak, requests = self._in_flight, self._peak_in_flight, self._requests
+        return {
+            "http2": self.http2,
+            "proxied": self.proxied,
+            "max_connections": self.config.max_connections,
+            "max_keepalive_connections": self.config.max_keepalive_connections,
+            "keepalive_expiry": self.config.keepalive_expiry,
+            "connections": len(connections),
+            "idle_connections": idle,
+            "in_flight": in_flight,
+            "peak_in_flight": peak,
+            "requests": requests,
+            "utilization": round(in_flight / self.config.max_connections, 4),
+        }
+
+
+def _environment_proxy(base_url: str | None) -> str | None:
+    """环境变量为LLM接口地址配置的代理（NO_PROXY中的地址不走代理）"""
+    url = httpx.URL(base_url or "https://")
+    if url.host and urllib.request.proxy_bypass(url.host):
+        return None
+    proxies = urllib.request.getproxies()
+    return proxies.get(url.scheme) or proxies.get("all")
+
+
+class _SharedHTTPClient:
+    """进程内共享的HTTP客户端及其传输层（线程安全，首次使用时按当前配置创建）"""
+
+    def __init__(self):
+        self.client: httpx.Client | None = None
+        self.transport: PooledTransport | None = None
+        self._lock = threading.Lock()
+
+    def get(self, base_url: str | None = None) -> httpx.Client:
+        client = self.client
+        if client is not None:
+            return client
+
+        with self._lock:
+            if self.client is None:
+                config = get_pool_config()
+                self.transport = PooledTransport(config, proxy=_environment_proxy(base_url))
+                # DefaultHttpxClient沿用OpenAI SDK的默认超时和重定向设置，请求级超时由llm_client按阶段传入；
+                # 代理已由连接池处理，trust_env=False避免httpx按代理环境变量挂载绕过连接池的传输层（见模块说明）
+                self.client = openai.DefaultHttpxClient(transport=self.transport, trust_env=False)
+                logger.info(
+                    f"LLM连接池初始化完成 [最大连接数: {config.max_connections}, "
+                    f"空闲连接数: {config.max_keepalive_connections}, HTTP/2: {self.transport.http2}, "
+                    f"代理: {self.transport.proxied}]"
+                )
+            return self.client
+
+    def reset(self):
+        with self._lock:
+            if self.client is not None:
+                self.client.close()
+            self.client = None
+            self.transport = None
+
+
+_shared = _SharedHTTPClient()
+
+
+def get_http_client(base_url: str | None = None) -> httpx.Client:
+    """
+    获取进程内共享的HTTP客户端（首次调用时按当前配置创建）
+
+    Args:
+        base_url: LLM接口地址，首次创建时用于选择代理（见模块说明）
+    """
+    return _shared.get(base_url)
+
+
+def pool_snapshot() -> dict | None:
+    """连接池使用情况，尚未创建时返回None"""
+    transport = _shared.transport
+    return transport.snapshot() if transport is not None else None
+
+
+def reset_http_client():
+    """关闭共享的HTTP客户端，下次使用时按最新配置重新创建"""
+    _shared.reset()
@@ -0,0 +1,199 @@
+"""
+位置标准化模块：在本地把病灶位置和大小的原文标准化（不依赖LLM）
+
+原先由提示词要求LLM完成象限→钟点的镜像转换和mm→cm换算，这部分说明占了主分析提示词的近一半，
+且模型偶尔不遵守（如输出"10点钟方向"、"27mm"）。现在LLM只需照抄位置原文，
+由本模块确定性地完成标准化：
+
+- 钟点方向："3点钟方向"、"3:00"、"3 o'clock" → "3点"
+- 象限："外上象限"、"上外"、"UOQ" → "上外"；只有象限时按左右乳镜像转换为固定钟点（1、11、5、7），
+  中央区（乳头旁、乳晕区）和上方/下方等不对应确定钟点的区域只记录象限
+- 距乳头距离："距乳头约27mm"、"2.7cm" → "2.7"（单位cm，不带单位；单位缺失时>10视为mm）
+- 大小："12×8×6mm"、"1.2x0.8cm" → "1.2×0.8×0.6 cm"
+
+所有函数对已经标准化的值幂等。
+"""
+
+import re
+
+# 象限到钟点的映射（统一使用4个固定钟点：1、11、5、7）
+# 左乳：外上→11点，外下→7点，内上→1点，内下→5点
+# 右乳：外上→1点，外下→5点，内上→11点，内下→7点（镜像）
+# 中央区、上方、下方不在表中：这些区域没有确定的钟点，不推测钟点
+QUADRANT_CLOCK_MAP = {
+    "上外": {"left": "11点", "right": "1点"},
+    "下外": {"left": "7点", "right": "5点"},
+    "上内": {"left": "1点", "right": "11点"},
+    "下内": {"left": "5点", "right": "7点"},
+}
+
+# 象限原文 → 标准象限名（按长度倒序匹配）
+QUADRANT_SYNONYMS = {
+    "外上": "上外",
+    "上外": "上外",
+    "UOQ": "上外",
+    "外下": "下外",
+    "下外": "下外",
+    "LOQ": "下外",
+    "内上": "上内",
+    "上内": "上内",
+    "UIQ": "上内",
+    "内下": "下内",
+    "下内": "下内",
+    "LIQ": "下内",
+    "乳头旁": "中央区",
+    "乳晕区": "中央区",
+    "乳晕后": "中央区",
+    "中央区": "中央区",
+    "上方": "上方",
+    "下方": "下方",
+}
+_QUADRANT_PATTERN = re.compile(
+    "|".join(re.escape(k) for k in sorted(QUADRANT_SYNONYMS, key=len, reverse=True)), re.IGNORECASE
+)
+
+_CLOCK_PATTERN = re.compile(r"(\d{1,2})\s*(?:点|:00|：00|\s*o'?clock)", re.IGNORECASE)
+_BARE_NUMBER_PATTERN = re.compile(r"^\s*(\d{1,2})\s*$")
+_DISTANCE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(mm|cm|毫米|厘米)?", re.IGNORECASE)
+_SIZE_PATTERN = re.compile(
+    r"(\d+(?:\.\d+)?)\s*[×xX*]\s*(\d+(?:\.\d+)?)(?:\s*[×xX*]\s*(\d+(?:\.\d+)?))?\s*(mm|cm|毫米|厘米)?", re.IGNORECASE
+)
+
+# 单位缺失时，大于该值的距离视为mm
+_AMBIGUOUS_MM_THRESHOLD = 10
+
+
+def _is_mm(unit: str | None) -> bool:
+    return bool(unit) and unit.lower() in ("mm", "毫米")
+
+
+def _format_cm(value: float) -> str:
+    return f"{round(value, 2):g}"
+
+
+def normalize_breast(text: str | None) -> str:
+    """侧别原文 → "left" / "right"，无法识别时返回空字符串"""
+    if not text:
+        return ""
+    value = str(text).strip().lower()
+    if value in ("left", "l") or "左" in value:
+        return "left"
+    if value in ("right", "r") or "右" in value:
+        return "right"
+    return ""
+
+
+def normalize_quadrant(text: str | None) -> str | None:
+    """象限原文 → 标准象限名（"上外"、"下内"、"中央区"等），无法识别时返回None"""
+    if not text:
+        return None
+    match = _QUADRANT_PATTERN.search(str(text))
+    return QUADRANT_SYNONYMS[match.group(0).upper()] if match else None
+
+
+def convert_quadrant_to_clock_position(quadrant: str, breast: str) -> str | None:
+    """
+    将象限转换为标准钟点位置（统一使用4个固定钟点：1、11、5、7）
+
+    Args:
+        quadrant: 象限（如"上外"、"外上象限"等）
+        breast: 乳腺侧（"left"或"right"）
+
+    Returns:
+        标准钟点位置（如"11点"、"1点"等），无法识别或不是四个象限之一（如中央区）时返回None
+    """
+    clocks = QUADRANT_CLOCK_MAP.get(normalize_quadrant(quadrant) or "")
+    if not clocks:
+        return None
+    breast_key = "right" if (breast or "").lower() == "right" else "left"
+    return clocks[breast_key]
+
+
+def parse_clock_position(text) -> str | None:
+    """钟点原文 → "X点"（1-12），无法识别时返回None"""
+    if text is None or text == "":
+        return None
+    value = str(text)
+    match = _CLOCK_PATTERN.search(value) or _BARE_NUMBER_PATTERN.match(value)
+    if not match:
+        return None
+    clock = int(match.group(1))
+    if clock == 0:
+        clock = 12
+    return f"{clock}点" if 1 <= clock <= 12 else None
+
+
+def parse_distance_cm(text) -> str | None:
+    """距乳头距离原文 → cm数值字符串（如"2.7"），无法识别时返回None"""
+    if text is None or text == "":
+        return None
+    if isinstance(text, int | float):
+        value, unit = float(text), None
+    else:
+        match = _DISTANCE_PATTERN.search(str(text))
+        if not match:
+            return None
+        value, unit = float(match.group(1)), match.group(2)
+
+    if _is_mm(unit) or (unit is None and value > _AMBIGUOUS_MM_THRESHOLD):
+        value /= 10
+    return _format_cm(value)
+
+
+def parse_size_cm(text) -> str | None:
+    """
+    大小原文 → "长径×横径×前后径 cm"，无法识别时返回None
+
+    单位缺失时按cm处理（病灶大小的数值范围无法可靠区分mm和cm）。
+    """
+    if not text:
+        return None
+    match = _SIZE_PATTERN.search(str(text))
+    if not match:
+        return None
+    factor = 0.1 if _is_mm(match.group(4)) else 1.0
+    dimensions = [_format_cm(float(value) * factor) for value in match.groups()[:3] if value]
+    return f"{'×'.join(dimensions)} cm"
+
+
+def normalize_location(location: dict | None) -> dict:
+    """
+    标准化位置字典（breast / clock_position / quadrant / distance_from_nipple）
+
+    clock_position字段可以是钟点原文或象限原文（如"外下象限"）；
+    没有明确钟点时，按左右乳镜像把四个象限转换为固定钟点（中央区等区域不设置钟点）。无法识别的原文保留。
+    """
+    location = dict(location or {})
+    breast = normalize_breast(location.get("breast"))
+    if breast:
+        location["breast"] = breast
+
+    raw_clock = location.get("clock_position")
+    raw_quadrant = location.get("quadrant")
+    clock = parse_clock_position(raw_clock)
+    quadrant = normalize_quadrant(raw_quadrant) or (normalize_quadrant(raw_clock) if not clock else None)
+    if quadrant:
+        location["quadrant"] = quadrant
+    if not clock and quadrant:
+        clock = convert_quadrant_to_clock_position(quadrant, breast)
+    if clock:
+        location["clock_position"] = clock
+    elif quadrant and normalize_quadrant(raw_clock):
+        # 钟点字段中是中央区等区域的原文：已记录为象限，钟点未知
+        location["clock_position"] = None
+
+    if "distance_from_nipple" in location:
+        distance = parse_distance_cm(location["distance_from_nipple"])
+        if distance:
+            location["distance_from_nipple"] = distance
+    return location
+
+
+def normalize_nodule_location(nodule: dict) -> dict:
+    """就地标准化结节的位置和大小（location与morphology.size），返回该结节"""
+    if isinstance(nodule.get("location"), dict):
+        nodule["location"] = normalize_location(nodule["location"])
+    morphology = nodule.get("morphology")
+    if isinstance(morphology, dict) and morphology.get("size"):
+        morphology["size"] = parse_size_cm(morphology["size"]) or morphology["size"]
+    return nodule
@@ -0,0 +1,190 @@
+"""
+长报告处理模块：按检查项目切分超长OCR文本，分块并发解析后合并乳腺超声结果（map-reduce）
+
+体检套餐报告的OCR文本可达数千字，包含多个检查项目。整段发送给报告结构解析时，
+请求慢且输出可能被截断。文本长度超过MEDCRUX_LONG_TEXT_THRESHOLD（默认3000字符）时：
+
+1. 切分：在检查项目标题（如"甲状腺超声"、"心电图"，词表见exam_segmenter）和空行处切分为段落；
+   段落包含乳腺相关关键词时视为乳腺段落，紧随其后、不以检查项目标题开头的段落视为其续写
+2. 筛选：只保留乳腺段落（没有任何乳腺段落时保留全部），按原文顺序打包为不超过
+   MEDCRUX_LONG_TEXT_CHUNK_CHARS（默认1500字符）的分块；超长段落按句切分
+3. map：各分块并发调用parse_report_structure（并发数MEDCRUX_LONG_TEXT_WORKERS，默认4）
+4. reduce：按分块顺序（与完成顺序无关）拼接检查所见、影像学诊断和建议，去掉重复内容
+"""
+
+import contextvars
+import itertools
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from medcrux.analysis.exam_segmenter import get_exam_lexicon
+from medcrux.analysis.report_structure_parser import parse_report_structure
+from medcrux.utils.logger import log_error_with_context, setup_logger
+
+logger = setup_logger("medcrux.analysis.long_report")
+
+DEFAULT_LONG_TEXT_THRESHOLD = 3000
+DEFAULT_CHUNK_CHARS = 1500
+DEFAULT_WORKERS = 4
+
+# 主分析输入来源：结构解析失败时只使用长报告中的乳腺段落（见report_structure_parser的ANALYSIS_INPUT_*）
+ANALYSIS_INPUT_BREAST_CHUNKS = "breast_chunks"
+
+BLANK_LINE_PATTERN = re.compile(r"\n\s*\n")
+SENTENCE_END_PATTERN = re.compile(r"(?<=[。；;\n])")
+
+BREAST_KEYWORDS = ("乳腺", "乳房", "乳头", "BI-RADS", "BIRADS", "腋窝")
+
+STRUCTURE_FIELDS = ("findings", "diagnosis", "recommendation")
+
+
+def get_long_text_threshold() -> int:
+    """启用分块处理的文本长度阈值（MEDCRUX_LONG_TEXT_THRESHOLD）"""
+    return int(os.getenv("MEDCRUX_LONG_TEXT_THRESHOLD", str(DEFAULT_LONG_TEXT_THRESHOLD)))
+
+
+def get_chunk_chars() -> int:
+    """每个分块的最大字符数（MEDCRUX_LONG_TEXT_CHUNK_CHARS）"""
+    return max(1, int(os.getenv("MEDCRUX_LONG_TEXT_CHUNK_CHARS", str(DEFAULT_CHUNK_CHARS))))
+
+
+def is_long_text(text: str | None) -> bool:
+    """文本是否超过分块处理阈值"""
+    return bool(text) and len(text) > get_long_text_threshold()
+
+
+def _is_breast_section(section: str) -> bool:
+    upper = section.upper()
+    return any(keyword in upper for keyword in BREAST_KEYWORDS)
+
+
+def split_sections(text: str) -> list[str]:
+    """
+    在检查项目标题和空行处切分文本
+
+    Returns:
+        段落列表（按原文顺序，已去掉首尾空白和空段落）
+    """
+    boundaries = {0, len(text)}
+    boundaries.update(match.start() for match in get_exam_lexicon().pattern.finditer(text))
+    boundaries.update(match.end() for match in BLANK_LINE_PATTERN.finditer(text))
+    positions = sorted(boundaries)
+    sections = (text[start:end].strip() for start, end in itertools.pairwise(positions))
+    return [section for section in sections if section]
+
+
+def select_breast_sections(sections: list[str]) -> list[str]:
+    """
+    筛选乳腺段落及其续写段落，没有任何乳腺段落时返回全部段落
+    """
+    selected = []
+    in_breast = False
+    for section in sections:
+        if _is_breast_section(section):
+            in_breast = True
+        elif get_exam_lexicon().pattern.match(section):
+            in_breast = False
+        if in_breast:
+            selected.append(section)
+    return selected or sections
+
+
+def _split_sentences(section: str, max_chars: int) -> list[str]:
+    """超长段落按句切分（单句仍超长时按长度硬切）"""
+    pieces = []
+    for sentence in SENTENCE_END_PATTERN.split(section):
+        pieces.extend(sentence[start : start + max_chars] for start in range(0, len(sentence), max_chars))
+    return pieces
+
+
+def pack_chunks(sections: list[str], max_chars: int) -> list[str]:
+    """按原文顺序把段落打包为不超过max_chars的分块"""
+    chunks: list[str] = []
+    current = ""
+    for section in sections:
+        pieces = [section] if len(section) <= max_chars else _split_sentences(section, max_chars)
+        for piece in pieces:
+            candidate = f"{current}\n{piece}" if current else piece
+            if len(candidate) <= max_chars:
+                current = candidate
+            else:
+                chunks.append(current)
+                current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_long_text(text: str, max_chars: int | None = None) -> list[str]:
+    """
+    把长报告切分为只包含乳腺段落的分块
+
+    Args:
+        text: OCR文本
+        max_chars: 每个分块的最大字符数，默认读取MEDCRUX_LONG_TEXT_CHUNK_CHARS
+
+    Returns:
+        分块列表（按原文顺序）
+    """
+    return pack_chunks(select_breast_sections(split_sections(text)), max_chars or get_chunk_chars())
+
+
+def extract_breast_text(text: str) -> str:
+    """长报告中的乳腺段落（结构解析失败时作为主分析输入，代替完整OCR文本）"""
+    return "\n".join(select_breast_sections(split_sections(text)))
+
+
+def merge_report_structures(structures: list[dict]) -> dict:
+    """
+    按分块顺序合并结构解析结果：各字段拼接非空内容，去掉完全重复的内容
+
+    Returns:
+        与parse_report_structure相同格式的结果，所有分块都没有某字段时该字段为None
+    """
+    merged = {}
+    for field in STRUCTURE_FIELDS:
+        parts: list[str] = []
+        for structure in structures:
+            value = ((structure or {}).get(field) or "").strip()
+            if value and value not in parts:
+                parts.append(value)
+        merged[field] = "\n".join(parts) or None
+    return merged
+
+
+def _parse_chunk(index: int, chunk: str) -> dict:
+    try:
+        return parse_report_structure(chunk)
+    except Exception as e:
+        log_error_with_context(logger, e, context={"chunk": index, "length": len(chunk)}, operation="分块报告结构解析")
+        return {}
+
+
+def parse_long_report_structure(ocr_text: str) -> dict:
+    """
+    分块并发解析长报告的结构，合并乳腺超声部分
+
+    Args:
+        ocr_text: OCR识别的文本（长度超过MEDCRUX_LONG_TEXT_THRESHOLD）
+
+    Returns:
+        与parse_report_structure相同格式的结果
+    """
+    chunks = split_long_text(ocr_text)
+    if len(chunks) <= 1:
+        return parse_report_structure(chunks[0] if chunks else ocr_text)
+
+    workers = min(max(1, int(os.getenv("MEDCRUX_LONG_TEXT_WORKERS", str(DEFAULT_WORKERS)))), len(chunks))
+    logger.info(
+        f"长报告分块解析结构 [文本长度: {len(ocr_text)}, 乳腺内容: {sum(len(c) for c in chunks)} 字符, "
+        f"分块数: {len(chunks)}, 并发数: {workers}]"
+    )
+    # 每个任务复制当前上下文，保留LLM调用优先级和模型记录等上下文变量
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="medcrux-chunk") as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, _parse_chunk, index, chunk)
+            for index, chunk in enumerate(chunks)
+        ]
+        structures = [future.result() for future in futures]
+    return merge_report_structures(structures)
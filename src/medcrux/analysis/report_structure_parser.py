@@ -9,16 +9,26 @@
 5. 建议：根据BI-RADS分类提出的临床建议
 6. 报告尾部：报告医师签名、审核医师签名、报告日期
 
-本模块使用LLM识别报告的各个部分，提取事实性摘要（检查所见）和结论（影像学诊断和建议）。
+本模块识别报告的各个部分，提取事实性摘要（检查所见）和结论（影像学诊断和建议）：
+先按章节标题在本地切分（见split_sections_locally），切分结果的置信度不低于
+MEDCRUX_LOCAL_SPLIT_MIN_CONFIDENCE（默认0.8）时直接使用，否则调用LLM解析。
 """
 
-import json
+import bisect
+import itertools
 import os
 import re
-
-from openai import OpenAI
-
+import threading
+from dataclasses import asdict, dataclass, field
+
+from medcrux.analysis.birads_grammar import birads_sort_key, extract_birads_mentions
+from medcrux.analysis.json_repair import ResultRequirements
+from medcrux.analysis.llm_client import STAGE_REPORT_STRUCTURE, create_chat_completion, parse_json_response
+from medcrux.analysis.llm_provider import LazyLLMClient, is_llm_configured
+from medcrux.analysis.llm_router import route_model
+from medcrux.analysis.report_template import ReportTemplateRegistry, section_label_pattern, strip_section
 from medcrux.utils.logger import log_error_with_context, setup_logger
+from medcrux.utils.multi_pattern import MultiPatternMatcher
 
 logger = setup_logger("medcrux.analysis.report_structure")
 
@@ -50,6 +60,122 @@ RECOMMENDATION_START_KEYWORDS = ["建议", "处理建议", "临床建议"]
 # 报告尾部关键词
 FOOTER_KEYWORDS = ["报告医师", "审核医师", "报告日期"]
 
+# 关键词匹配器（构建一次，单遍扫描文本）
+HEADER_KEYWORD_MATCHER = MultiPatternMatcher(HEADER_KEYWORDS)
+BASIC_HEADER_KEYWORD_MATCHER = MultiPatternMatcher(HEADER_KEYWORDS[:5])  # 姓名、年龄、性别、超声号、住院号
+DIAGNOSIS_KEYWORD_MATCHER = MultiPatternMatcher(DIAGNOSIS_START_KEYWORDS)
+
+# OCR常见的章节标题误识别和同义写法（与上面的关键词一起用于本地切分）
+OCR_FINDINGS_VARIANTS = ["检査所见", "检杳所见", "超声所见", "超卢所见", "超声描迷", "超卢描迷"]
+OCR_DIAGNOSIS_VARIANTS = ["影像学诊晰", "影象学诊断", "超声诊断", "超卢提示", "超卢诊断", "诊断结论"]
+OCR_RECOMMENDATION_VARIANTS = ["建以", "处理意见"]
+
+# 主分析输入来源
+ANALYSIS_INPUT_SECTIONS = "sections"  # 只包含检查所见和影像学诊断
+ANALYSIS_INPUT_FULL_TEXT = "full_text"  # 完整OCR文本（结构解析失败时回退）
+
+# 检查所见少于该长度时视为解析不可靠，回退到完整OCR文本
+MIN_SCOPED_FINDINGS_LENGTH = 10
+
+# 报告结构解析的System Prompt：基于公理1.1的结构定义，添加明确的规则和示例
+REPORT_STRUCTURE_SYSTEM_PROMPT = """你是MedCrux报告结构解析助手，负责识别医学影像报告的各个部分。
+
+## 报告结构定义
+
+一个完备的乳腺超声检查报告包含以下六个部分：
+1. **报告头部**：医疗机构名称、检查日期时间、患者基本信息（姓名、性别、年龄、ID号、超声号、住院号、科别、床号等）、检查部位、检查方法、仪器名称  # noqa: E501
+2. **检查技术**：设备型号、探头类型和频率、检查方法（二维、彩色多普勒、弹性成像等）
+3. **检查所见**：乳腺结构描述、病变详细描述（如发现）、血流情况、其他发现
+4. **影像学诊断**：BI-RADS分类、诊断意见（如"超声提示"、"诊断"等）
+5. **建议**：根据BI-RADS分类提出的临床建议
+6. **报告尾部**：报告医师签名、审核医师签名、报告日期
+
+## 提取要求
+
+请仔细阅读OCR文本，识别报告的各个部分，并提取以下内容：
+
+### 1. 检查所见（findings）
+- **必须排除的内容**：
+  - 报告头部信息：姓名、年龄、性别、超声号、住院号、科别、床号、检查部位、仪器名称、院区、床号等
+  - 任何包含"姓名"、"年龄"、"性别"、"超声号"、"住院号"、"科别"、"床号"、"检查部位"、"仪器名称"、"院区"等关键词的文本
+- **必须包含的内容**：
+  - 乳腺结构描述（如"双乳结构清晰"、"腺体回声均匀"等）
+  - 病变详细描述（如"在左侧乳腺3点钟方向查见..."）
+  - 血流情况（如"CDFI：未见明显血流信号"）
+  - 其他发现（如"导管未见扩张"、"乳腺后间隙结构清晰"等）
+- **边界识别**：
+  - 从"检查所见"、"超声描述"、"超卢描述"等关键词之后开始
+  - 到"影像学诊断"、"超声提示"、"诊断"等关键词之前结束
+  - 如果文本开头就是病变描述，从第一个病变描述开始
+
+### 2. 影像学诊断（diagnosis）
+- **必须包含的内容**：
+  - BI-RADS分类（如"BI-RADS 3类"）
+  - 诊断意见（如"左侧乳腺低回声结节"）
+- **边界识别**：
+  - 从"影像学诊断"、"超声提示"、"诊断"等关键词之后开始
+  - 到"建议"关键词之前结束
+  - 如果只有"超声提示"，从"超声提示"之后开始
+
+### 3. 建议（recommendation）
+- **必须包含的内容**：
+  - 根据BI-RADS分类提出的临床建议（如"建议6个月后复查"、"建议活检"等）
+- **边界识别**：
+  - 从"建议"关键词之后开始
+  - 到"报告医师"、"审核医师"、"报告日期"等关键词之前结束
+
+## 重要规则
+
+1. **严格排除报告头部信息**：
+   - 如果"检查所见"中包含以下任何关键词，必须删除包含该关键词的整段文本：
+     - "姓名"、"年龄"、"性别"、"超声号"、"住院号"、"科别"、"床号"、"检查部位"、"仪器名称"、"院区"、"秒超检查报合"等
+   - 示例：如果文本是"姓名：[患者姓名] 性别：[性别] 年龄：[年龄] 在左侧乳腺..."，必须只提取"在左侧乳腺..."部分
+
+2. **准确识别边界**：
+   - 如果文本开头就是报告头部信息（如"[医疗机构名称] 院区：[院区名称]..."），必须跳过这些内容
+   - 如果"检查所见"和"影像学诊断"之间没有明确分隔，必须根据内容特征判断边界
+   - 如果"影像学诊断"部分包含病变描述（如"在左侧乳腺3点钟方向查见..."），这些内容应该属于"检查所见"，而不是"影像学诊断"
+
+3. **如果某个部分不存在**：返回null
+
+## 示例
+
+**错误示例**：
+```json
+{
+    "findings": "[报告头部信息：医疗机构名称、检查日期时间、患者基本信息] 在左侧乳腺...",
+    "diagnosis": "[病变描述：位置、大小、形态] 超声提示：BI-RADS X类"
+}
+```
+
+**正确示例**：
+```json
+{
+    "findings": (
+        "在左侧乳腺X点钟方向距乳头约Xcm处查见约X×X×Xcm低回声，"
+        "形态规则，边界清楚，CDFI：未见明显血流信号。"
+        "余乳腺腺体层回声均匀，导管未见扩张，乳腺后间隙结构清晰。"
+    ),
+    "diagnosis": "超声提示：左侧乳腺低回声结节，BI-RADS X类；右侧乳腺囊性结节，BI-RADS X类。",
+    "recommendation": null
+}
+```
+
+返回JSON格式（无markdown，严格按照上述规则）：
+{
+    "findings": "检查所见的内容（严格排除报告头部信息，只包含病变描述和结构描述）",
+    "diagnosis": "影像学诊断的内容（只包含BI-RADS分类和诊断意见，不包含病变描述）",
+    "recommendation": "建议的内容（如果有，否则为null）"
+}"""
+
+REPORT_STRUCTURE_USER_PROMPT = "请解析以下OCR文本的报告结构："
+
+# 患者性别（报告头部中唯一对主分析有用的信息）
+GENDER_PATTERN = re.compile(r"性\s*别\s*[:：]?\s*(男|女)")
+
+# 病变描述（如"在左侧乳腺3点钟方向查见"），出现在影像学诊断中时说明边界不准
+LESION_DESCRIPTION_PATTERN = re.compile(r"在.*?乳腺.*?查见.*?(低回声|高回声|无回声|异常|结节|病变)")
+
 
 def _filter_header_info(text: str) -> str:
     """
@@ -66,22 +192,19 @@ def _filter_header_info(text: str) -> str:
 
     # 按行分割
     lines = text.split("\n")
-    filtered_lines = []
 
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-
-        # 检查是否包含报告头部关键词
-        contains_header_keyword = any(keyword in line for keyword in HEADER_KEYWORDS)
-
-        # 检查是否是基础信息格式（如"姓名："、"年龄："等）
-        header_pattern = r"(姓名|年龄|性别|超声号|住院号|科别|床号|检查部位|仪器名称|院区)[:：]\s*"
-        is_header_format = re.search(header_pattern, line)
-
-        if not contains_header_keyword and not is_header_format:
-            filtered_lines.append(line)
+    # 单遍扫描全文，标记包含报告头部关键词的行（命中后直接跳到下一行继续扫描）
+    # 基础信息格式"姓名："、"年龄："等的关键词都在HEADER_KEYWORDS中，不再单独检查
+    line_starts = list(itertools.accumulate((len(line) + 1 for line in lines), initial=0))
+    header_lines = set()
+    match = HEADER_KEYWORD_MATCHER.find(text)
+    while match is not None:
+        line_index = bisect.bisect_right(line_starts, match.start) - 1
+        header_lines.add(line_index)
+        match = HEADER_KEYWORD_MATCHER.find(text, line_starts[line_index + 1])
+    filtered_lines = [
+        line.strip() for index, line in enumerate(lines) if line.strip() and index not in header_lines
+    ]
 
     # 如果过滤后为空，尝试更宽松的过滤
     if not filtered_lines:
@@ -94,7 +217,7 @@ def _filter_header_info(text: str) -> str:
     result = "\n".join(filtered_lines).strip()
 
     # 如果结果仍然包含头部关键词，尝试更激进的过滤
-    if any(keyword in result for keyword in HEADER_KEYWORDS[:5]):  # 只检查前5个关键词
+    if BASIC_HEADER_KEYWORD_MATCHER.search(result):  # 只检查前5个关键词
         # 找到第一个病变描述的位置
         match = re.search(r"(查见|可见|发现|在.*?乳腺)", result)
         if match:
@@ -118,8 +241,7 @@ def _fix_diagnosis_boundary(diagnosis: str, findings: str) -> tuple[str, str]:
         return diagnosis, findings
 
     # 检查诊断中是否包含病变描述（如"在左侧乳腺3点钟方向查见"）
-    lesion_pattern = r"在.*?乳腺.*?查见.*?(低回声|高回声|无回声|异常|结节|病变)"
-    lesion_match = re.search(lesion_pattern, diagnosis)
+    lesion_match = LESION_DESCRIPTION_PATTERN.search(diagnosis)
 
     if lesion_match:
         # 找到病变描述的开始位置
@@ -127,7 +249,7 @@ def _fix_diagnosis_boundary(diagnosis: str, findings: str) -> tuple[str, str]:
 
         # 检查病变描述之前是否有"超声提示"等关键词
         before_lesion = diagnosis[:lesion_start]
-        has_diagnosis_keyword = any(keyword in before_lesion for keyword in DIAGNOSIS_START_KEYWORDS)
+        has_diagnosis_keyword = DIAGNOSIS_KEYWORD_MATCHER.search(before_lesion)
 
         if has_diagnosis_keyword:
             # 病变描述之前的部分是诊断，之后的部分应该移到检查所见
@@ -144,14 +266,226 @@ def _fix_diagnosis_boundary(diagnosis: str, findings: str) -> tuple[str, str]:
     return diagnosis, findings
 
 
-# 初始化DeepSeek客户端
-api_key = os.getenv("DEEPSEEK_API_KEY")
-client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com") if api_key else None
+# 本地切分置信度不低于该值时跳过LLM
+DEFAULT_LOCAL_SPLIT_MIN_CONFIDENCE = 0.8
+
+# 本地切分的章节
+SECTION_FINDINGS = "findings"
+SECTION_DIAGNOSIS = "diagnosis"
+SECTION_RECOMMENDATION = "recommendation"
+SECTION_FOOTER = "footer"
+
+_SECTION_LABEL_PATTERNS = {
+    SECTION_FINDINGS: section_label_pattern(FINDINGS_START_KEYWORDS + OCR_FINDINGS_VARIANTS),
+    SECTION_DIAGNOSIS: section_label_pattern(DIAGNOSIS_START_KEYWORDS + OCR_DIAGNOSIS_VARIANTS),
+    SECTION_RECOMMENDATION: section_label_pattern(RECOMMENDATION_START_KEYWORDS + OCR_RECOMMENDATION_VARIANTS),
+    SECTION_FOOTER: section_label_pattern(FOOTER_KEYWORDS),
+}
+
+
+@dataclass
+class LocalSectionSplit:
+    """本地切分结果"""
+
+    findings: str | None = None
+    diagnosis: str | None = None
+    recommendation: str | None = None
+    confidence: float = 0.0
+    reasons: list[str] = field(default_factory=list)  # 降低置信度的原因
+
+
+# 本地切分中表示章节结构异常（而非内容存疑）的原因：此时按模板切分同样不可靠
+REASON_REPEATED_LABELS = "章节标题重复"
+REASON_DIAGNOSIS_BEFORE_FINDINGS = "影像学诊断在检查所见之前"
+REASON_RECOMMENDATION_BEFORE_DIAGNOSIS = "建议在影像学诊断之前"
+STRUCTURAL_SPLIT_REASONS = frozenset(
+    (REASON_REPEATED_LABELS, REASON_DIAGNOSIS_BEFORE_FINDINGS, REASON_RECOMMENDATION_BEFORE_DIAGNOSIS)
+)
+
+
+def get_local_split_min_confidence() -> float:
+    """跳过LLM所需的本地切分置信度（MEDCRUX_LOCAL_SPLIT_MIN_CONFIDENCE，设为大于1的值时总是调用LLM）"""
+    return float(os.getenv("MEDCRUX_LOCAL_SPLIT_MIN_CONFIDENCE", str(DEFAULT_LOCAL_SPLIT_MIN_CONFIDENCE)))
+
+
+def _score_section_content(findings: str | None, diagnosis: str | None) -> tuple[float, list[str]]:
+    """按切分出的内容判断边界是否可靠，返回(置信度系数, 原因)"""
+    factor = 1.0
+    reasons = []
+    if len(findings or "") < MIN_SCOPED_FINDINGS_LENGTH:
+        factor *= 0.5
+        reasons.append("检查所见过短")
+    if diagnosis is None:
+        factor = 0.0
+        reasons.append("影像学诊断为空")
+    elif LESION_DESCRIPTION_PATTERN.search(diagnosis):
+        factor *= 0.7
+        reasons.append("影像学诊断中包含病变描述")
+    if findings and re.search(r"BI-?RADS", findings, re.IGNORECASE):
+        factor *= 0.7
+        reasons.append("检查所见中包含BI-RADS分类")
+    return factor, reasons
+
+
+def split_sections_locally(ocr_text: str) -> LocalSectionSplit:
+    """
+    按章节标题（检查所见/影像学诊断/建议/报告尾部及其OCR变体）在本地切分报告
+
+    检查所见和建议不含标题，影像学诊断保留标题（与LLM输出一致，_fix_diagnosis_boundary依赖该标题）。
+    出现在检查所见之前的报告尾部关键词（如头部的"报告日期"）不视为报告尾部。
+
+    Args:
+        ocr_text: OCR识别的文本
+
+    Returns:
+        LocalSectionSplit，confidence为0-1：
+        - 缺少检查所见或影像学诊断标题、影像学诊断在检查所见之前：0
+        - 同一章节标题重复（常见于多检查项目报告）：×0.5
+        - 建议在影像学诊断之前、检查所见过短：×0.5
+        - 影像学诊断中包含病变描述、检查所见中包含BI-RADS分类（边界可能不准）：×0.7
+    """
+    if not ocr_text or not ocr_text.strip():
+        return LocalSectionSplit(reasons=["文本为空"])
+
+    positions: dict[str, list[tuple[int, int]]] = {
+        section: [(match.start(), match.end()) for match in pattern.finditer(ocr_text)]
+        for section, pattern in _SECTION_LABEL_PATTERNS.items()
+    }
+    findings_labels = positions[SECTION_FINDINGS]
+    diagnosis_labels = positions[SECTION_DIAGNOSIS]
+    if not findings_labels:
+        return LocalSectionSplit(reasons=["缺少检查所见标题"])
+    if not diagnosis_labels:
+        return LocalSectionSplit(reasons=["缺少影像学诊断标题"])
+
+    findings_start, findings_end = findings_labels[0]
+    diagnosis_start, diagnosis_end = diagnosis_labels[0]
+    if diagnosis_start < findings_start:
+        return LocalSectionSplit(reasons=[REASON_DIAGNOSIS_BEFORE_FINDINGS])
+
+    confidence = 1.0
+    reasons = []
+    if len(findings_labels) > 1 or len(diagnosis_labels) > 1:
+        confidence *= 0.5
+        reasons.append(REASON_REPEATED_LABELS)
+
+    footer_start = next((start for start, _ in positions[SECTION_FOOTER] if start > findings_start), len(ocr_text))
+    recommendation_labels = [
+        (start, end) for start, end in positions[SECTION_RECOMMENDATION] if findings_start < start < footer_start
+    ]
+    recommendation = None
+    diagnosis_stop = footer_start
+    if recommendation_labels:
+        recommendation_start, recommendation_end = recommendation_labels[0]
+        if recommendation_start < diagnosis_start:
+            confidence *= 0.5
+            reasons.append(REASON_RECOMMENDATION_BEFORE_DIAGNOSIS)
+        else:
+            diagnosis_stop = recommendation_start
+            recommendation = strip_section(ocr_text[recommendation_end:footer_start])
+
+    findings = strip_section(ocr_text[findings_end:diagnosis_start])
+    diagnosis = strip_section(ocr_text[diagnosis_start:diagnosis_stop])
+    if diagnosis == strip_section(ocr_text[diagnosis_start:diagnosis_end]):
+        # 只有标题没有内容
+        diagnosis = None
+
+    content_factor, content_reasons = _score_section_content(findings, diagnosis)
+    confidence *= content_factor
+    reasons.extend(content_reasons)
+
+    return LocalSectionSplit(
+        findings=findings,
+        diagnosis=diagnosis,
+        recommendation=recommendation,
+        confidence=round(confidence, 4),
+        reasons=reasons,
+    )
+
+
+# LLM结构解析结果必须包含的字段（本地修复后缺少这些字段说明输出被截断）
+STRUCTURE_REQUIRED_FIELDS = ("findings", "diagnosis")
+
+# 报告结构解析来源
+STRUCTURE_SOURCE_LOCAL = "local"  # 本地切分
+STRUCTURE_SOURCE_TEMPLATE = "template"  # 按已学到的报告模板切分
+STRUCTURE_SOURCE_LLM = "llm"
+
+
+class LocalSplitStats:
+    """报告结构解析来源统计（本地切分 / 报告模板 / LLM，线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys((STRUCTURE_SOURCE_LOCAL, STRUCTURE_SOURCE_TEMPLATE, STRUCTURE_SOURCE_LLM), 0)
+
+    def record(self, source: str):
+        with self._lock:
+            self._counts[source] += 1
+
+    def snapshot(self) -> dict:
+        """返回各来源的次数，以及本地切分和报告模板的比例"""
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        return {
+            **counts,
+            "local_rate": round(counts[STRUCTURE_SOURCE_LOCAL] / total, 4) if total else None,
+            "template_rate": round(counts[STRUCTURE_SOURCE_TEMPLATE] / total, 4) if total else None,
+            "min_confidence": get_local_split_min_confidence(),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self._counts, 0)
+
+
+# 进程内单例
+local_split_stats = LocalSplitStats()
+
+# 报告模板（进程内单例，见report_template）
+report_templates = ReportTemplateRegistry(
+    marker_pattern=section_label_pattern(
+        HEADER_KEYWORDS
+        + FINDINGS_START_KEYWORDS
+        + OCR_FINDINGS_VARIANTS
+        + DIAGNOSIS_START_KEYWORDS
+        + OCR_DIAGNOSIS_VARIANTS
+        + RECOMMENDATION_START_KEYWORDS
+        + OCR_RECOMMENDATION_VARIANTS
+        + FOOTER_KEYWORDS
+    ),
+    footer_pattern=_SECTION_LABEL_PATTERNS[SECTION_FOOTER],
+    min_observations=int(os.getenv("MEDCRUX_REPORT_TEMPLATE_MIN_OBSERVATIONS", "2")),
+    max_templates=int(os.getenv("MEDCRUX_REPORT_TEMPLATE_MAX", "256")),
+    path=os.getenv("MEDCRUX_REPORT_TEMPLATE_FILE") or None,
+)
+
+
+def _postprocess_structure(findings: str | None, diagnosis: str | None, recommendation: str | None) -> dict:
+    """后处理：过滤检查所见中的报告头部信息，修正影像学诊断边界"""
+    # 后处理1：过滤检查所见中的报告头部信息
+    if findings:
+        findings = _filter_header_info(findings)
+
+    # 后处理2：修正影像学诊断边界（如果包含病变描述，移到检查所见）
+    if diagnosis and findings:
+        diagnosis, findings = _fix_diagnosis_boundary(diagnosis, findings)
+
+    return {
+        "findings": findings,
+        "diagnosis": diagnosis,
+        "recommendation": recommendation,
+    }
+
+
+# 初始化DeepSeek客户端（延迟创建，见llm_provider）
+client = LazyLLMClient()
 
 
 def extract_doctor_birads(diagnosis_text: str) -> dict:
     """
-    从diagnosis文本中提取原报告的BI-RADS分类集合和最高值
+    从diagnosis文本中提取原报告的BI-RADS分类集合和最高值（容忍OCR噪声，见birads_grammar）
     
     Args:
         diagnosis_text: 影像学诊断文本（例如："超声提示：左侧乳腺低回声结节，BI-RADS 3类；右侧乳腺囊性结节，BI-RADS 2类。"）
@@ -161,14 +495,16 @@ def extract_doctor_birads(diagnosis_text: str) -> dict:
             "birads_set": set,  # BI-RADS分类集合（去重）
             "birads_list": list,  # BI-RADS分类列表（保留顺序）
             "highest_birads": str,  # 最高BI-RADS分类
-            "diagnosis_text": str  # 原始diagnosis文本
+            "diagnosis_text": str,  # 原始diagnosis文本
+            "mentions": list,  # 每处分类的原文位置（value/start/end/text/explicit/in_range）
         }
     
     支持格式：
-    - "BI-RADS 3类"
-    - "BI-RADS 2类和3类"
-    - "BI-RADS 3类、4类"
+    - "BI-RADS 3类"、"BI-RADS3类"、"BIRADS:3"、"Bl-RADS 4a"、"BI—RADS 4A类"
+    - "BI-RADS 2类和3类"、"BI-RADS 3类、4类"、"BI-RADS 3、4类"
     - "BI-RADS 3类；BI-RADS 4类"
+    - "BI-RADS 3-4类"（范围，两端都计入）
+    - "4a类"（省略关键词）
     """
     if not diagnosis_text:
         return {
@@ -176,50 +512,25 @@ def extract_doctor_birads(diagnosis_text: str) -> dict:
             "birads_list": [],
             "highest_birads": None,
             "diagnosis_text": diagnosis_text,
+            "mentions": [],
         }
 
-    # 匹配BI-RADS分类（支持数字和字母后缀，如"3"、"4A"、"4B"、"4C"）
-    # 支持多种格式：BI-RADS 3类、BI-RADS 3、bi-rads 3类等
-    # 支持省略格式：BI-RADS 3类、4类（第二个分类省略了"BI-RADS"）
-    pattern = r"BI-RADS\s+(\d+[ABC]?)\s*类?(?:\s*[、，,]\s*(\d+[ABC]?)\s*类?)*"
-    all_matches = re.findall(pattern, diagnosis_text, re.IGNORECASE)
-    
-    # 展开匹配结果（第一个是主匹配，后续是可选匹配）
-    matches = []
-    for match in all_matches:
-        if isinstance(match, tuple):
-            # 展开元组：第一个是主匹配，后续是可选匹配
-            matches.append(match[0])
-            for item in match[1:]:
-                if item:
-                    matches.append(item)
-        else:
-            matches.append(match)
-    
-    # 如果使用复杂正则没有匹配到，回退到简单正则
-    if not matches:
-        pattern_simple = r"BI-RADS\s+(\d+[ABC]?)\s*类?"
-        matches = re.findall(pattern_simple, diagnosis_text, re.IGNORECASE)
-
-    if not matches:
+    mentions = extract_birads_mentions(diagnosis_text)
+    if not mentions:
         logger.warning(f"无法从diagnosis文本中提取BI-RADS分类: {diagnosis_text[:100]}")
         return {
             "birads_set": set(),
             "birads_list": [],
             "highest_birads": None,
             "diagnosis_text": diagnosis_text,
+            "mentions": [],
         }
 
-    # 转换为数字进行比较（忽略字母后缀）
-    birads_list = list(matches)
-    birads_set = set(matches)
+    birads_list = [mention.value for mention in mentions]
+    birads_set = set(birads_list)
 
-    # 提取最高BI-RADS分类（比较数字部分）
-    try:
-        highest_birads = max(matches, key=lambda x: int(re.match(r"\d+", x).group()))
-    except (ValueError, AttributeError) as e:
-        logger.error(f"提取最高BI-RADS分类失败: {e}, matches: {matches}")
-        highest_birads = matches[0] if matches else None
+    # 最高BI-RADS分类（先比较数字，再比较字母后缀）
+    highest_birads = max(birads_list, key=birads_sort_key)
 
     logger.info(
         f"从diagnosis提取BI-RADS分类成功: 集合={birads_set}, 最高={highest_birads}, "
@@ -231,9 +542,48 @@ def extract_doctor_birads(diagnosis_text: str) -> dict:
         "birads_list": birads_list,
         "highest_birads": highest_birads,
         "diagnosis_text": diagnosis_text,
+        "mentions": [asdict(mention) for mention in mentions],
     }
 
 
+def build_analysis_input(ocr_text: str, report_structure: dict | None) -> tuple[str, str]:
+    """
+    构建主分析（analyze_text_with_deepseek）的输入文本
+
+    结构解析成功时，只发送检查所见和影像学诊断，去掉报告头部、检查技术、
+    报告尾部以及多检查报告中的其他检查内容；患者性别从头部单独提取后保留。
+    结构解析失败或检查所见不可靠时，回退到完整OCR文本。
+
+    Args:
+        ocr_text: OCR识别的完整文本
+        report_structure: parse_report_structure的结果（可为None）
+
+    Returns:
+        (输入文本, 输入来源)，输入来源为ANALYSIS_INPUT_SECTIONS或ANALYSIS_INPUT_FULL_TEXT
+    """
+    findings = (report_structure or {}).get("findings") or ""
+    diagnosis = (report_structure or {}).get("diagnosis") or ""
+
+    if len(findings.strip()) < MIN_SCOPED_FINDINGS_LENGTH:
+        logger.info("检查所见缺失或过短，主分析使用完整OCR文本")
+        return ocr_text, ANALYSIS_INPUT_FULL_TEXT
+
+    parts = []
+    gender_match = GENDER_PATTERN.search(ocr_text)
+    if gender_match:
+        parts.append(f"性别：{gender_match.group(1)}")
+    parts.append(f"检查所见：{findings.strip()}")
+    if diagnosis.strip():
+        parts.append(f"影像学诊断：{diagnosis.strip()}")
+    scoped_text = "\n".join(parts)
+
+    if len(scoped_text) >= len(ocr_text):
+        return ocr_text, ANALYSIS_INPUT_FULL_TEXT
+
+    logger.info(f"主分析使用检查所见和影像学诊断 [长度: {len(scoped_text)}/{len(ocr_text)} 字符]")
+    return scoped_text, ANALYSIS_INPUT_SECTIONS
+
+
 def parse_report_structure(ocr_text: str) -> dict:
     """
     解析OCR文本，识别报告的各个部分
@@ -258,7 +608,42 @@ def parse_report_structure(ocr_text: str) -> dict:
             "recommendation": None,
         }
 
-    if not client:
+    local_split = split_sections_locally(ocr_text)
+    min_confidence = get_local_split_min_confidence()
+    if local_split.confidence >= min_confidence:
+        report_templates.learn(ocr_text, asdict(local_split))
+        structure = _postprocess_structure(local_split.findings, local_split.diagnosis, local_split.recommendation)
+        local_split_stats.record(STRUCTURE_SOURCE_LOCAL)
+        logger.info(
+            f"报告结构本地切分完成，跳过LLM [置信度: {local_split.confidence}, "
+            f"检查所见: {len(structure['findings'] or '')} 字符, "
+            f"诊断: {len(structure['diagnosis'] or '')} 字符, "
+            f"建议: {len(structure['recommendation'] or '')} 字符]"
+        )
+        return structure
+
+    # 已学到的报告模板：按模板的章节标题切分，内容检查（同本地切分）通过时跳过LLM；
+    # 本地切分发现章节标题重复或顺序异常（多检查报告等）时模板的章节边界同样不可靠，直接交给LLM
+    template_split = None
+    if not STRUCTURAL_SPLIT_REASONS.intersection(local_split.reasons):
+        template_split = report_templates.apply(
+            ocr_text,
+            accept=lambda split: _score_section_content(split.findings, split.diagnosis)[0] >= min_confidence,
+        )
+    if template_split is not None:
+        structure = _postprocess_structure(
+            template_split.findings, template_split.diagnosis, template_split.recommendation
+        )
+        local_split_stats.record(STRUCTURE_SOURCE_TEMPLATE)
+        logger.info(
+            f"报告结构按模板切分完成，跳过LLM [模板: {template_split.template_id}, "
+            f"检查所见: {len(structure['findings'] or '')} 字符, "
+            f"诊断: {len(structure['diagnosis'] or '')} 字符, "
+            f"建议: {len(structure['recommendation'] or '')} 字符]"
+        )
+        return structure
+
+    if not is_llm_configured():
         logger.warning("DEEPSEEK_API_KEY未设置，无法使用LLM解析报告结构")
         return {
             "findings": None,
@@ -266,141 +651,46 @@ def parse_report_structure(ocr_text: str) -> dict:
             "recommendation": None,
         }
 
-    # 设计prompt，基于公理1.1的结构定义，添加明确的规则和示例
-    system_prompt = """你是MedCrux报告结构解析助手，负责识别医学影像报告的各个部分。
-
-## 报告结构定义
-
-一个完备的乳腺超声检查报告包含以下六个部分：
-1. **报告头部**：医疗机构名称、检查日期时间、患者基本信息（姓名、性别、年龄、ID号、超声号、住院号、科别、床号等）、检查部位、检查方法、仪器名称  # noqa: E501
-2. **检查技术**：设备型号、探头类型和频率、检查方法（二维、彩色多普勒、弹性成像等）
-3. **检查所见**：乳腺结构描述、病变详细描述（如发现）、血流情况、其他发现
-4. **影像学诊断**：BI-RADS分类、诊断意见（如"超声提示"、"诊断"等）
-5. **建议**：根据BI-RADS分类提出的临床建议
-6. **报告尾部**：报告医师签名、审核医师签名、报告日期
-
-## 提取要求
-
-请仔细阅读OCR文本，识别报告的各个部分，并提取以下内容：
-
-### 1. 检查所见（findings）
-- **必须排除的内容**：
-  - 报告头部信息：姓名、年龄、性别、超声号、住院号、科别、床号、检查部位、仪器名称、院区、床号等
-  - 任何包含"姓名"、"年龄"、"性别"、"超声号"、"住院号"、"科别"、"床号"、"检查部位"、"仪器名称"、"院区"等关键词的文本
-- **必须包含的内容**：
-  - 乳腺结构描述（如"双乳结构清晰"、"腺体回声均匀"等）
-  - 病变详细描述（如"在左侧乳腺3点钟方向查见..."）
-  - 血流情况（如"CDFI：未见明显血流信号"）
-  - 其他发现（如"导管未见扩张"、"乳腺后间隙结构清晰"等）
-- **边界识别**：
-  - 从"检查所见"、"超声描述"、"超卢描述"等关键词之后开始
-  - 到"影像学诊断"、"超声提示"、"诊断"等关键词之前结束
-  - 如果文本开头就是病变描述，从第一个病变描述开始
-
-### 2. 影像学诊断（diagnosis）
-- **必须包含的内容**：
-  - BI-RADS分类（如"BI-RADS 3类"）
-  - 诊断意见（如"左侧乳腺低回声结节"）
-- **边界识别**：
-  - 从"影像学诊断"、"超声提示"、"诊断"等关键词之后开始
-  - 到"建议"关键词之前结束
-  - 如果只有"超声提示"，从"超声提示"之后开始
-
-### 3. 建议（recommendation）
-- **必须包含的内容**：
-  - 根据BI-RADS分类提出的临床建议（如"建议6个月后复查"、"建议活检"等）
-- **边界识别**：
-  - 从"建议"关键词之后开始
-  - 到"报告医师"、"审核医师"、"报告日期"等关键词之前结束
-
-## 重要规则
-
-1. **严格排除报告头部信息**：
-   - 如果"检查所见"中包含以下任何关键词，必须删除包含该关键词的整段文本：
-     - "姓名"、"年龄"、"性别"、"超声号"、"住院号"、"科别"、"床号"、"检查部位"、"仪器名称"、"院区"、"秒超检查报合"等
-   - 示例：如果文本是"姓名：[患者姓名] 性别：[性别] 年龄：[年龄] 在左侧乳腺..."，必须只提取"在左侧乳腺..."部分
-
-2. **准确识别边界**：
-   - 如果文本开头就是报告头部信息（如"[医疗机构名称] 院区：[院区名称]..."），必须跳过这些内容
-   - 如果"检查所见"和"影像学诊断"之间没有明确分隔，必须根据内容特征判断边界
-   - 如果"影像学诊断"部分包含病变描述（如"在左侧乳腺3点钟方向查见..."），这些内容应该属于"检查所见"，而不是"影像学诊断"
-
-3. **如果某个部分不存在**：返回null
-
-## 示例
-
-**错误示例**：
-```json
-{
-    "findings": "[报告头部信息：医疗机构名称、检查日期时间、患者基本信息] 在左侧乳腺...",
-    "diagnosis": "[病变描述：位置、大小、形态] 超声提示：BI-RADS X类"
-}
-```
-
-**正确示例**：
-```json
-{
-    "findings": (
-        "在左侧乳腺X点钟方向距乳头约Xcm处查见约X×X×Xcm低回声，"
-        "形态规则，边界清楚，CDFI：未见明显血流信号。"
-        "余乳腺腺体层回声均匀，导管未见扩张，乳腺后间隙结构清晰。"
-    ),
-    "diagnosis": "超声提示：左侧乳腺低回声结节，BI-RADS X类；右侧乳腺囊性结节，BI-RADS X类。",
-    "recommendation": null
-}
-```
-
-返回JSON格式（无markdown，严格按照上述规则）：
-{
-    "findings": "检查所见的内容（严格排除报告头部信息，只包含病变描述和结构描述）",
-    "diagnosis": "影像学诊断的内容（只包含BI-RADS分类和诊断意见，不包含病变描述）",
-    "recommendation": "建议的内容（如果有，否则为null）"
-}"""
-
+    local_split_stats.record(STRUCTURE_SOURCE_LLM)
     try:
-        logger.debug(f"开始解析报告结构 [文本长度: {len(ocr_text)}]")
-
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": f"请解析以下OCR文本的报告结构：\n\n{ocr_text}",
-                },
-            ],
-            temperature=0.1,  # 结构解析需要严谨，温度设低
-            stream=False,
-            response_format={"type": "json_object"},  # 强制返回 JSON
+        logger.debug(
+            f"开始解析报告结构 [文本长度: {len(ocr_text)}, 本地切分置信度: {local_split.confidence}, "
+            f"原因: {'、'.join(local_split.reasons) or '无'}]"
         )
 
-        content = response.choices[0].message.content
-        result = json.loads(content)
+        request_kwargs = {
+            "model": route_model(STAGE_REPORT_STRUCTURE),  # 按阶段配置和延迟目标选择模型
+            "messages": [
+                {"role": "system", "content": REPORT_STRUCTURE_SYSTEM_PROMPT},
+                {"role": "user", "content": f"{REPORT_STRUCTURE_USER_PROMPT}\n\n{ocr_text}"},
+            ],
+            "temperature": 0.1,  # 结构解析需要严谨，温度设低
+            "stream": False,
+            "response_format": {"type": "json_object"},  # 强制返回 JSON
+        }
+        response = create_chat_completion(client, STAGE_REPORT_STRUCTURE, **request_kwargs)
+
+        result = parse_json_response(
+            client,
+            STAGE_REPORT_STRUCTURE,
+            response,
+            request_kwargs,
+            requirements=ResultRequirements(fields=STRUCTURE_REQUIRED_FIELDS),
+        )
+        report_templates.learn(ocr_text, result)
 
         # 后处理：过滤和修正结果
-        findings = result.get("findings")
-        diagnosis = result.get("diagnosis")
-        recommendation = result.get("recommendation")
-
-        # 后处理1：过滤检查所见中的报告头部信息
-        if findings:
-            findings = _filter_header_info(findings)
-
-        # 后处理2：修正影像学诊断边界（如果包含病变描述，移到检查所见）
-        if diagnosis and findings:
-            diagnosis, findings = _fix_diagnosis_boundary(diagnosis, findings)
+        structure = _postprocess_structure(
+            result.get("findings"), result.get("diagnosis"), result.get("recommendation")
+        )
 
         logger.info(
-            f"报告结构解析完成 [检查所见: {len(findings or '')} 字符, "
-            f"诊断: {len(diagnosis or '')} 字符, "
-            f"建议: {len(recommendation or '')} 字符]"
+            f"报告结构解析完成 [检查所见: {len(structure['findings'] or '')} 字符, "
+            f"诊断: {len(structure['diagnosis'] or '')} 字符, "
+            f"建议: {len(structure['recommendation'] or '')} 字符]"
         )
 
-        return {
-            "findings": findings,
-            "diagnosis": diagnosis,
-            "recommendation": recommendation,
-        }
+        return structure
 
     except Exception as e:
         log_error_with_context(
@@ -0,0 +1,393 @@
+"""
+报告模板识别模块：按报告头部和章节标题的布局识别医院报告模板，复用学到的章节边界
+
+大部分报告来自少数几家医院，同一家医院的报告使用固定模板。本模块：
+- 指纹：报告标题行（去掉数字和符号）+ 依次出现的标题词（头部字段、章节标题、报告尾部，去重）；
+  标题行可能是患者姓名等隐私信息，模板中只保存它的摘要
+- 学习：结构解析成功（本地切分或LLM）后，在原文中定位检查所见、影像学诊断、建议的内容，
+  记录紧挨在内容之前的章节标题原文（如"超声表现"、"超声印象"）；学到的标题必须能在同一份报告上
+  重新切分出相同的内容，否则不记录（头部字段已包含在指纹中，切分从检查所见的标题之后开始，不单独记录）
+- 应用：同一模板连续min_observations次学到相同的章节标题后视为稳定，
+  之后的新报告按这些标题直接切分；标题找不到、重复出现（多检查报告）或切分结果被调用方拒绝时不命中
+
+模板保存在进程内（最近使用的max_templates个），指定path时从该JSON文件加载，
+并在模板的章节标题变化或模板变为稳定时写回。
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+
+from medcrux.utils.logger import log_error_with_context, setup_logger
+
+logger = setup_logger("medcrux.analysis.report_template")
+
+# 模板学习和应用的章节（与报告结构解析结果的字段名相同），建议可以缺失
+TEMPLATE_SECTIONS = ("findings", "diagnosis", "recommendation")
+_REQUIRED_SECTIONS = ("findings", "diagnosis")
+
+DEFAULT_MIN_OBSERVATIONS = 2
+DEFAULT_MAX_TEMPLATES = 256
+
+# 在原文中定位章节内容时使用的内容开头长度
+_ANCHOR_LENGTH = 12
+# 标题行最多保留的字符数
+_TITLE_LENGTH = 30
+
+# 章节内容之前紧挨着的标题（位于行首或分隔符之后的2-10个字符，可带冒号）
+_LABEL_BEFORE_PATTERN = re.compile(r"(?:^|(?<=[\s。；;，,\]】]))([^\s:：∶。；;，,]{2,10})[ \t]*[:：∶]?\s*$")
+# 以标题开头的影像学诊断（本地切分和LLM都保留影像学诊断的标题）
+_LEADING_LABEL_PATTERN = re.compile(r"^([^\s:：∶。；;，,]{2,10})[ \t]*[:：∶]\s*")
+# 标题行中与模板无关的字符（数字、空白、符号）
+_TITLE_NOISE_PATTERN = re.compile(r"[\W\d_]+")
+
+
+def section_label_pattern(labels: Iterable[str]) -> re.Pattern:
+    """
+    章节标题的正则：标题位于行首或标点、空白之后，后跟冒号（含OCR误识别的∶）或换行；
+    标题字符之间允许OCR插入的空格，较长的标题优先匹配
+    """
+    ordered = sorted(set(labels), key=len, reverse=True)
+    alternation = "|".join(r"[ \t]?".join(re.escape(char) for char in label) for label in ordered)
+    return re.compile(rf"(?:^|(?<=[\s。；;，,\]】]))(?:{alternation})[ \t]*(?:[:：∶]|$)", re.MULTILINE)
+
+
+@lru_cache(maxsize=1024)
+def _single_label_pattern(label: str) -> re.Pattern:
+    return section_label_pattern([label])
+
+
+def strip_section(text: str) -> str | None:
+    """去掉章节内容首尾的空白和标点，为空时返回None"""
+    return text.strip(" \t\n：:∶;；，,") or None
+
+
+@dataclass
+class ReportTemplate:
+    """一个报告模板"""
+
+    template_id: str
+    title_digest: str  # 规范化的标题行的摘要（不保存标题原文），没有标题行时为空
+    markers: list[str]  # 依次出现的标题词
+    labels: dict[str, str] = field(default_factory=dict)  # 章节 → 模板中的章节标题原文
+    observations: int = 0  # 连续学到相同章节标题的次数
+    lookups: int = 0
+    hits: int = 0
+
+
+@dataclass
+class TemplateSplit:
+    """按模板切分的结果（影像学诊断保留标题，与本地切分和LLM一致）"""
+
+    template_id: str
+    findings: str
+    diagnosis: str
+    recommendation: str | None = None
+
+
+# 写入模板文件的字段（查询统计不持久化）
+_PERSISTED_FIELDS = ("template_id", "title_digest", "markers", "labels", "observations")
+
+
+class ReportTemplateRegistry:
+    """
+    报告模板注册表（线程安全）
+
+    Args:
+        marker_pattern: 指纹使用的标题词正则（头部字段、章节标题、报告尾部）
+        footer_pattern: 报告尾部标题的正则（切分时章节内容到此为止）
+        min_observations: 模板稳定（可以应用）所需的连续相同学习次数
+        max_templates: 最多保留的模板数（按最近使用淘汰，设为0关闭）
+        path: 模板文件（JSON），为None时只保存在进程内
+    """
+
+    def __init__(
+        self,
+        marker_pattern: re.Pattern,
+        footer_pattern: re.Pattern,
+        min_observations: int = DEFAULT_MIN_OBSERVATIONS,
+        max_templates: int = DEFAULT_MAX_TEMPLATES,
+        path: str | Path | None = None,
+    ):
+        self.marker_pattern = marker_pattern
+        self.footer_pattern = footer_pattern
+        self.min_observations = max(1, min_observations)
+        self.max_templates = max_templates
+        self.path = Path(path) if path else None
+        self._templates: OrderedDict[str, ReportTemplate] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        if self.path and self.enabled:
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_templates > 0
+
+    def fingerprint(self, ocr_text: str) -> tuple[str, str, list[str]]:
+        """
+        计算报告布局指纹
+
+        Returns:
+            (模板ID, 标题行摘要, 依次出现的标题词)
+        """
+        markers = list(
+            dict.fromkeys(re.sub(r"[\s:：∶]", "", match.group()) for match in self.marker_pattern.finditer(ocr_text))
+        )
+        # 第一行非空文本通常是医院和报告名称；该行包含标题词（如直接以"姓名："开头）时不作为标题行
+        first_line = next((line for line in ocr_text.splitlines() if line.strip()), "")
+        title = "" if self.marker_pattern.search(first_line) else _TITLE_NOISE_PATTERN.sub("", first_line)
+        title = title[:_TITLE_LENGTH]
+        title_digest = hashlib.sha256(title.encode()).hexdigest()[:16] if title else ""
+        template_id = hashlib.sha256(f"{title_digest}|{','.join(markers)}".encode()).hexdigest()[:16]
+        return template_id, title_digest, markers
+
+    def _split_with_labels(self, ocr_text: str, labels: dict[str, str]) -> dict[str, str | None] | None:
+        """
+        按章节标题切分
+
+        每个章节标题必须恰好出现一次并且按章节顺序出现：同一标题出现多次的报告
+        （如甲状腺和乳腺写在一起的多检查报告）无法按模板确定边界。
+        缺少必需的章节标题，或标题找不到、重复、顺序不对、内容为空时返回None。
+        """
+        if not all(labels.get(section) for section in _REQUIRED_SECTIONS):
+            return None
+        spans = {}
+        position = 0
+        for section in TEMPLATE_SECTIONS:
+            label = labels.get(section)
+            if not label:
+                continue
+            matches = list(_single_label_pattern(label).finditer(ocr_text))
+            if len(matches) > 1:
+                return None
+            if not matches or matches[0].start() < position:
+                if section in _REQUIRED_SECTIONS:
+                    return None
+                continue
+            spans[section] = matches[0].span()
+            position = matches[0].end()
+
+        _, findings_end = spans["findings"]
+        diagnosis_start, diagnosis_end = spans["diagnosis"]
+        footer = self.footer_pattern.search(ocr_text, diagnosis_end)
+        footer_start = footer.start() if footer else len(ocr_text)
+
+        recommendation = None
+        diagnosis_stop = footer_start
+        if "recommendation" in spans and spans["recommendation"][0] < footer_start:
+            diagnosis_stop = spans["recommendation"][0]
+            recommendation = strip_section(ocr_text[spans["recommendation"][1] : footer_start])
+
+        findings = strip_section(ocr_text[findings_end:diagnosis_start])
+        diagnosis = strip_section(ocr_text[diagnosis_start:diagnosis_stop])
+        if not findings or diagnosis == strip_section(ocr_text[diagnosis_start:diagnosis_end]):
+            return None
+        return {"findings": findings, "diagnosis": diagnosis, "recommendation": recommendation}
+
+    @staticmethod
+    def _anchor(section: str, content: str) -> str:
+        """章节内容在原文中的定位文本（影像学诊断去掉开头的标题）"""
+        content = content.strip()
+        if section == "diagnosis":
+            content = _LEADING_LABEL_PATTERN.sub("", content, count=1)
+        return content[:_ANCHOR_LENGTH]
+
+    def _learn_labels(self, ocr_text: str, structure: dict) -> dict[str, str] | None:
+        """从解析结果学习章节标题，学不到或无法在原文上复现时返回None"""
+        labels = {}
+        anchors = {}
+        previous_end = 0
+        for section in TEMPLATE_SECTIONS:
+            content = structure.get(section)
+            anchor = self._anchor(section, content) if content else ""
+            if not anchor:
+                if section in _REQUIRED_SECTIONS:
+                    return None
+                continue
+            position = ocr_text.find(anchor, previous_end)
+            label_match = _LABEL_BEFORE_PATTERN.search(ocr_text, previous_end, position) if position >= 0 else None
+            if label_match is None:
+                if section in _REQUIRED_SECTIONS:
+                    return None
+                continue
+            labels[section] = label_match.group(1)
+            anchors[section] = anchor
+            previous_end = position + len(anchor)
+
+        split = self._split_with_labels(ocr_text, labels)
+        if split is None or any(anchor not in (split[section] or "") for section, anchor in anchors.items()):
+            return None
+        return labels
+
+    def learn(self, ocr_text: str, structure: dict | None) -> str | None:
+        """
+        从一次成功的结构解析中学习模板
+
+        Args:
+            ocr_text: OCR识别的文本
+            structure: 后处理之前的解析结果（findings/diagnosis/recommendation）
+
+        Returns:
+            模板ID，没有学到时返回None
+        """
+        if not self.enabled or not ocr_text or not structure:
+            return None
+        labels = self._learn_labels(ocr_text, structure)
+        if labels is None:
+            logger.debug("未能从解析结果中学到报告模板的章节标题")
+            return None
+        template_id, title_digest, markers = self.fingerprint(ocr_text)
+
+        with self._lock:
+            template = self._templates.get(template_id)
+            if template is None:
+                template = ReportTemplate(template_id=template_id, title_digest=title_digest, markers=markers)
+                self._templates[template_id] = template
+            same_layout = all(template.labels.get(section) == labels.get(section) for section in _REQUIRED_SECTIONS)
+            if same_layout:
+                template.observations += 1
+                template.labels.update(labels)  # 建议的标题可能只在部分报告中出现
+            else:
+                template.labels = labels
+                template.observations = 1
+            changed = not same_layout or template.observations == self.min_observations
+            self._templates.move_to_end(template_id)
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+            if changed and self.path:
+                self._save_locked()
+
+        if changed and template.observations == self.min_observations:
+            logger.info(f"报告模板已稳定 [{template_id}, 章节标题: {labels}]")
+        return template_id
+
+    def apply(self, ocr_text: str, accept: Callable[[TemplateSplit], bool] | None = None) -> TemplateSplit | None:
+        """
+        报告属于已稳定的模板时按模板切分
+
+        Args:
+            ocr_text: OCR识别的文本
+            accept: 可选的切分结果检查（如检查内容是否可靠），返回False时不命中
+
+        Returns:
+            TemplateSplit，未识别出模板或无法按模板切分时返回None
+        """
+        if not self.enabled or not ocr_text:
+            return None
+        template_id, _, _ = self.fingerprint(ocr_text)
+        with self._lock:
+            template = self._templates.get(template_id)
+            if template is not None:
+                template.lookups += 1
+                self._templates.move_to_end(template_id)
+            stable = template is not None and template.observations >= self.min_observations
+            labels = dict(template.labels) if stable else None
+
+        split = None
+        if labels:
+            sections = self._split_with_labels(ocr_text, labels)
+            if sections is not None:
+                split = TemplateSplit(template_id=template_id, **sections)
+                if accept is not None and not accept(split):
+                    split = None
+
+        with self._lock:
+            if split is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                template.hits += 1
+        return split
+
+    def snapshot(self) -> dict:
+        """返回模板数量、命中统计和每个模板的命中率（按查询次数降序）"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            templates = sorted(self._templates.values(), key=lambda template: template.lookups, reverse=True)
+            return {
+                "enabled": self.enabled,
+                "templates": len(self._templates),
+                "stable": sum(template.observations >= self.min_observations for template in templates),
+                "min_observations": self.min_observations,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+                "per_template": [
+                    {
+                        "template_id": template.template_id,
+                        "title_digest": template.title_digest,
+                        "stable": template.observations >= self.min_observations,
+                        "observations": template.observations,
+                        "lookups": template.lookups,
+                        "hits": template.hits,
+                        "hit_rate": round(template.hits / template.lookups, 4) if template.lookups else None,
+                        "labels": dict(template.labels),
+                    }
+                    for template in templates
+                ],
+            }
+
+    def reset(self):
+        """重置命中统计（保留已学到的模板）"""
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            for template in self._templates.values():
+                template.lookups = 0
+                template.hits = 0
+
+    def clear(self):
+        """清空模板和统计（主要用于测试）"""
+        with self._lock:
+            self._templates.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            log_error_with_context(logger, e, context={"path": str(self.path)}, operation="加载报告模板")
+            return
+        skipped = 0
+        for item in data.get("templates", []) if isinstance(data, dict) else []:
+            try:
+                template = ReportTemplate(**{key: item[key] for key in _PERSISTED_FIELDS})
+            except (KeyError, TypeError):
+                skipped += 1
+                continue
+            # 缺少必需章节标题的模板无法切分报告
+            if not isinstance(template.labels, dict) or not all(
+                template.labels.get(section) for section in _REQUIRED_SECTIONS
+            ):
+                skipped += 1
+                continue
+            self._templates[template.template_id] = template
+        logger.info(f"已加载报告模板 [{len(self._templates)} 个, 跳过无效模板: {skipped} 个, 文件: {self.path}]")
+
+    def _save_locked(self):
+        """写回模板文件（调用方持有锁；先写临时文件再替换，避免读到写了一半的文件）"""
+        data = {
+            "templates": [
+                {key: value for key, value in asdict(template).items() if key in _PERSISTED_FIELDS}
+                for template in self._templates.values()
+            ]
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.path.with_name(f"{self.path.name}.tmp")
+            temporary.write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            os.replace(temporary, self.path)
+        except OSError as e:
+            log_error_with_context(logger, e, context={"path": str(self.path)}, operation="保存报告模板")
@@ -7,8 +7,21 @@ BL-010: 风险征兆识别模块（v1.3.2简化版）
 """
 
 from typing import List, Dict, Any
+from medcrux.utils.multi_pattern import MultiPatternMatcher
 from .risk_sign_samples import STRONG_EVIDENCE_SAMPLES, WEAK_EVIDENCE_SAMPLES
 
+# 证据样本及其关键词集合（小写），按匹配顺序：先强证据，后弱证据
+_EVIDENCE_ENTRIES = [
+    (evidence, level, frozenset(keyword.lower() for keyword in evidence["keywords"]))
+    for level, samples in (("strong", STRONG_EVIDENCE_SAMPLES), ("weak", WEAK_EVIDENCE_SAMPLES))
+    for evidence in samples
+]
+
+# 全部证据样本的关键词只构建一次匹配器，每次识别单遍扫描文本
+EVIDENCE_KEYWORD_MATCHER = MultiPatternMatcher(
+    keyword for _, _, keywords in _EVIDENCE_ENTRIES for keyword in sorted(keywords)
+)
+
 
 def identify_risk_signs(morphology: Dict[str, Any], findings_text: str = "") -> List[Dict[str, str]]:
     """
@@ -43,27 +56,15 @@ def identify_risk_signs(morphology: Dict[str, Any], findings_text: str = "") ->
         morphology_text_parts.append(findings_text)
     
     morphology_text = " ".join(morphology_text_parts).lower()
+    matched_keywords = EVIDENCE_KEYWORD_MATCHER.matched_keywords(morphology_text)
     
-    # 匹配强证据
-    for evidence in STRONG_EVIDENCE_SAMPLES:
-        if any(keyword.lower() in morphology_text for keyword in evidence["keywords"]):
-            # 检查是否已经匹配到相同的风险征兆
-            if not any(rs["sign"] == evidence["sign"] for rs in risk_signs):
-                risk_signs.append({
-                    "sign": evidence["sign"],
-                    "evidence_level": "strong",
-                    "evidence_source": evidence["evidence_source"],
-                    "suggestion": evidence["suggestion"]
-                })
-    
-    # 匹配弱证据（如果还没有匹配到强证据，或者弱证据是独立的）
-    for evidence in WEAK_EVIDENCE_SAMPLES:
-        if any(keyword.lower() in morphology_text for keyword in evidence["keywords"]):
-            # 检查是否已经匹配到相同的风险征兆
+    # 匹配强证据，再匹配弱证据（已经匹配到相同的风险征兆时跳过）
+    for evidence, level, keywords in _EVIDENCE_ENTRIES:
+        if not keywords.isdisjoint(matched_keywords):
             if not any(rs["sign"] == evidence["sign"] for rs in risk_signs):
                 risk_signs.append({
                     "sign": evidence["sign"],
-                    "evidence_level": "weak",
+                    "evidence_level": level,
                     "evidence_source": evidence["evidence_source"],
                     "suggestion": evidence["suggestion"]
                 })
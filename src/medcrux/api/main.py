@@ -13,12 +13,35 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
+from medcrux.analysis.exam_segmenter import (ANALYSIS_INPUT_BREAST_EXAM,
+                                             isolate_breast_exam)
+from medcrux.analysis.findings_extractor import (ANALYSIS_SOURCE_LLM,
+                                                 extract_findings_fast_path)
+from medcrux.analysis.lesion_cache import lesion_cache
+from medcrux.analysis.llm_circuit_breaker import breaker as llm_breaker
 from medcrux.analysis.llm_engine import (analyze_birads_independently,
                                          analyze_text_with_deepseek,
                                          calculate_urgency_level,
                                          check_consistency_sets)
-from medcrux.analysis.report_structure_parser import (extract_doctor_birads,
-                                                      parse_report_structure)
+from medcrux.analysis.llm_metrics import registry as llm_metrics_registry
+from medcrux.analysis.llm_rate_limiter import rate_limiter as llm_rate_limiter
+from medcrux.analysis.llm_router import router as llm_router
+from medcrux.analysis.llm_router import track_stage_models
+from medcrux.analysis.llm_transport import pool_snapshot as llm_pool_snapshot
+# _convert_quadrant_to_clock_position保留旧的导入路径（实现已移至location_normalizer）
+from medcrux.analysis.location_normalizer import (
+    convert_quadrant_to_clock_position as _convert_quadrant_to_clock_position,  # noqa: F401
+    normalize_location)
+from medcrux.analysis.long_report import (ANALYSIS_INPUT_BREAST_CHUNKS,
+                                          extract_breast_text, is_long_text,
+                                          parse_long_report_structure)
+from medcrux.analysis.report_structure_parser import (ANALYSIS_INPUT_FULL_TEXT,
+                                                      build_analysis_input,
+                                                      extract_doctor_birads,
+                                                      local_split_stats,
+                                                      parse_report_structure,
+                                                      report_templates,
+                                                      split_sections_locally)
 from medcrux.analysis.risk_sign_identifier import (aggregate_risk_signs,
                                                    identify_risk_signs)
 from medcrux.ingestion.ocr_service import extract_text_from_bytes
@@ -28,38 +51,6 @@ from medcrux.utils.logger import log_error_with_context, setup_logger
 logger = setup_logger("medcrux.api")
 
 
-def _convert_quadrant_to_clock_position(quadrant: str, breast: str) -> str | None:
-    """
-    将象限转换为标准钟点位置（统一使用4个固定钟点：1、11、5、7）
-    
-    Args:
-        quadrant: 象限（如"上外"、"下内"等）
-        breast: 乳腺侧（"left"或"right"）
-    
-    Returns:
-        标准钟点位置（如"11点"、"1点"等），如果无法转换则返回None
-    """
-    if not quadrant:
-        return None
-    
-    # 象限到钟点的映射（统一使用4个固定钟点：1、11、5、7）
-    # 左乳：外上→11点，外下→7点，内上→1点，内下→5点
-    # 右乳：外上→1点，外下→5点，内上→11点，内下→7点（镜像）
-    quadrant_map = {
-        "上外": {"left": "11点", "right": "1点"},
-        "外上": {"left": "11点", "right": "1点"},
-        "下外": {"left": "7点", "right": "5点"},
-        "外下": {"left": "7点", "right": "5点"},
-        "上内": {"left": "1点", "right": "11点"},
-        "内上": {"left": "1点", "right": "11点"},
-        "下内": {"left": "5点", "right": "7点"},
-        "内下": {"left": "5点", "right": "7点"},
-    }
-    
-    breast_key = "right" if breast.lower() == "right" else "left"
-    return quadrant_map.get(quadrant, {}).get(breast_key)
-
-
 def _match_nodule_by_id_or_location(llm_nodule: dict, original_nodules: list[dict]) -> dict | None:
     """
     通过ID或位置匹配找到对应的原始nodule
@@ -135,26 +126,51 @@ def _merge_nodule_data(original_nodule: dict | None, llm_nodule: dict) -> dict:
     elif llm_nodule.get("size"):
         standardized_nodule["size"] = llm_nodule["size"]
     
-    # 5. 标准化clock_position（如果LLM返回象限，转换为钟点）
-    location = standardized_nodule.get("location", {})
-    clock_position = location.get("clock_position", "")
-    quadrant = location.get("quadrant", "")
-    breast = location.get("breast", "left")
-    
-    # 如果clock_position不是标准钟点格式（如"X点"），尝试从象限转换
-    if clock_position and not re.match(r"^\d+点$", clock_position):
-        clock_position = None
-    
-    # 如果没有有效的clock_position，从象限转换
-    if not clock_position and quadrant:
-        clock_position = _convert_quadrant_to_clock_position(quadrant, breast)
-        if clock_position:
-            location["clock_position"] = clock_position
-            standardized_nodule["location"] = location
-    
+    # 5. 标准化位置（非标准钟点格式从象限转换，距离统一为cm）
+    standardized_nodule["location"] = normalize_location(standardized_nodule.get("location"))
+
     return standardized_nodule
 
 
+def _build_degraded_response(filename: str, raw_text: str) -> dict:
+    """
+    LLM熔断时的本地降级结果：OCR文本 + 正则提取的原报告BI-RADS + 本地风险征兆识别
+
+    只在乳腺超声部分的影像学诊断中提取BI-RADS、在检查所见中识别风险征兆（多检查报告先去掉其他检查项目，
+    再在本地切分章节），避免报告头部或甲状腺、肝胆等其他检查的内容混入；切分不出的章节退回整段文本。
+
+    Args:
+        filename: 上传文件名
+        raw_text: OCR识别的文本
+
+    Returns:
+        与分析接口相同结构的响应（degraded为True）
+    """
+    exam_text = isolate_breast_exam(raw_text) or raw_text
+    local_split = split_sections_locally(exam_text)
+    doctor_birads = extract_doctor_birads(local_split.diagnosis or exam_text)
+    risk_signs = identify_risk_signs({}, local_split.findings or exam_text)
+    logger.warning(
+        f"LLM熔断，返回本地降级结果 [原报告BI-RADS: {doctor_birads.get('highest_birads')}, 风险征兆: {len(risk_signs)}]"
+    )
+    return {
+        "filename": filename,
+        "ocr_text": raw_text,
+        "ai_result": {
+            "ai_risk_assessment": "Unavailable",
+            "birads_class": doctor_birads.get("highest_birads") or "",
+            "doctor_birads": {
+                "birads_list": doctor_birads.get("birads_list", []),
+                "highest_birads": doctor_birads.get("highest_birads"),
+            },
+            "risk_signs": risk_signs,
+            "advice": "AI分析服务暂时不可用，以下为本地规则提取结果，请稍后重试获取完整分析。",
+        },
+        "message": "AI分析服务暂时不可用，已返回本地分析结果。",
+        "degraded": True,
+    }
+
+
 app = FastAPI(title="MedCrux API", version="1.3.0")
 
 # 配置CORS
@@ -178,6 +194,10 @@ class AnalysisResponse(BaseModel):
     ai_result: dict
     message: str
     report_structure: dict | None = None  # 报告结构解析结果（可选）
+    analysis_input: str | None = None  # 主分析输入来源：sections / full_text / breast_chunks / breast_exam（可选）
+    analysis_source: str | None = None  # 主分析结果来源：llm / fast_path（可选）
+    degraded: bool = False  # LLM熔断时返回的本地降级结果
+    llm_models: dict | None = None  # 各LLM阶段实际使用的模型（可选）
 
 
 @app.get("/api/health", response_model=HealthResponse)
@@ -189,6 +209,27 @@ async def health_check():
     return {"status": "operational", "version": "1.3.0"}
 
 
+@app.get("/api/metrics/llm")
+async def get_llm_metrics(recent: int = 0):
+    """
+    LLM调用指标接口：按阶段返回token用量（prompt/cached/completion）、延迟分位数和调用结果统计
+
+    Args:
+        recent: 附带最近N条请求记录（默认不附带）
+    """
+    metrics = llm_metrics_registry.snapshot()
+    metrics["circuit_breaker"] = llm_breaker.snapshot()
+    metrics["rate_limiter"] = llm_rate_limiter.snapshot()
+    metrics["lesion_cache"] = lesion_cache.snapshot()
+    metrics["model_router"] = llm_router.snapshot()
+    metrics["http_pool"] = llm_pool_snapshot()
+    metrics["report_structure"] = local_split_stats.snapshot()
+    metrics["report_templates"] = report_templates.snapshot()
+    if recent > 0:
+        metrics["recent"] = llm_metrics_registry.recent(limit=recent)
+    return metrics
+
+
 @app.post("/api/analyze/upload", response_model=AnalysisResponse)
 async def analyze_report(file: UploadFile = File(...)):
     """
@@ -201,6 +242,8 @@ async def analyze_report(file: UploadFile = File(...)):
     """
     context = {"filename": file.filename, "content_type": file.content_type}
     logger.info(f"收到分析请求 [文件: {file.filename}, 类型: {file.content_type}]")
+    # 收集各LLM阶段实际使用的模型（延迟超标时可能切换到备用模型）
+    stage_models = track_stage_models()
 
     try:
         # 1. 读取文件内容
@@ -226,11 +269,23 @@ async def analyze_report(file: UploadFile = File(...)):
                 "message": "未能识别出有效文字，请上传清晰的图片。",
             }
 
+        # 3.5. LLM熔断时直接返回本地降级结果，不再等待失败的LLM调用
+        if llm_breaker.is_open():
+            return _build_degraded_response(file.filename, raw_text)
+
         # 4. 报告结构解析（提取事实性摘要和结论）
+        # 多检查混合报告先在本地去掉其他检查项目，之后的LLM阶段只处理报告头部和乳腺超声部分
+        breast_exam_text = isolate_breast_exam(raw_text)
+        exam_text = breast_exam_text or raw_text
         logger.info("开始报告结构解析")
         report_structure = None
+        long_text = is_long_text(exam_text)
         try:
-            report_structure = parse_report_structure(raw_text)
+            # 超长报告（如体检套餐）按检查项目分块并发解析，只合并乳腺超声部分
+            if long_text:
+                report_structure = parse_long_report_structure(exam_text)
+            else:
+                report_structure = parse_report_structure(exam_text)
             logger.info("报告结构解析完成")
         except Exception as e:
             log_error_with_context(
@@ -241,6 +296,14 @@ async def analyze_report(file: UploadFile = File(...)):
             )
             logger.warning("报告结构解析失败，将使用前端fallback逻辑")
 
+        # 主分析输入：结构解析成功时只使用检查所见和影像学诊断，否则回退到完整OCR文本
+        analysis_text, analysis_input = build_analysis_input(exam_text, report_structure)
+        if long_text and analysis_input == ANALYSIS_INPUT_FULL_TEXT:
+            # 超长报告结构解析失败时只发送乳腺段落，不发送完整OCR文本
+            analysis_text, analysis_input = extract_breast_text(exam_text), ANALYSIS_INPUT_BREAST_CHUNKS
+        elif breast_exam_text and analysis_input == ANALYSIS_INPUT_FULL_TEXT:
+            analysis_input = ANALYSIS_INPUT_BREAST_EXAM
+
         # 4.5. 提取原报告BI-RADS分类（BL-009新增）
         original_birads_data = None
         original_birads_set = set()
@@ -265,7 +328,7 @@ async def analyze_report(file: UploadFile = File(...)):
                 logger.warning("提取原报告BI-RADS分类失败，尝试回退到analyze_text_with_deepseek")
                 # 回退方案：使用analyze_text_with_deepseek提取
                 try:
-                    fallback_analysis = analyze_text_with_deepseek(raw_text)
+                    fallback_analysis = analyze_text_with_deepseek(analysis_text)
                     nodules = fallback_analysis.get("nodules", [])
                     if nodules:
                         birads_classes = set()
@@ -287,10 +350,20 @@ async def analyze_report(file: UploadFile = File(...)):
                     logger.error(f"回退方案也失败: {fallback_error}")
 
         # 5. AI分析（保留现有流程，用于向后兼容）
+        # 检查所见全部使用标准术语且BI-RADS明确时，走规则快速通道，不调用LLM
         logger.info("开始AI分析")
         try:
-            ai_analysis = analyze_text_with_deepseek(raw_text)
-            logger.info("AI分析完成")
+            ai_analysis = None
+            if report_structure:
+                ai_analysis = extract_findings_fast_path(
+                    report_structure.get("findings"), report_structure.get("diagnosis"), raw_text
+                )
+            if ai_analysis is None:
+                ai_analysis = analyze_text_with_deepseek(analysis_text)
+            if ai_analysis.get("ai_risk_assessment") == "Error" and llm_breaker.is_open():
+                # 分析过程中熔断器打开（后端持续出错或变慢）
+                return _build_degraded_response(file.filename, raw_text)
+            logger.info(f"AI分析完成 [来源: {ai_analysis.get('analysis_source', ANALYSIS_SOURCE_LLM)}]")
             logger.debug(f"AI分析结果: {ai_analysis.get('ai_risk_assessment', 'Unknown')}")
         except Exception as e:
             log_error_with_context(
@@ -585,6 +658,9 @@ async def analyze_report(file: UploadFile = File(...)):
             "ocr_text": raw_text,
             "ai_result": ai_result_for_ui,
             "message": "分析完成",
+            "analysis_input": analysis_input,
+            "analysis_source": ai_analysis.get("analysis_source", ANALYSIS_SOURCE_LLM),
+            "llm_models": stage_models,
         }
 
         # 如果报告结构解析成功，添加到响应中
@@ -0,0 +1,147 @@
+"""
+RAG上下文打包模块：在token预算内按"相关度/token"挑选检索结果，拼成提示词中的知识上下文
+
+原先固定取前5个实体（内容截断到150字符）和前3条推理路径，不考虑相关度和token成本：
+低相关的长公理挤占预算，高相关的短术语反而可能被丢弃。
+
+打包规则：
+- 每个候选的token数使用知识库中预先计算的token_count（见scripts/extract_rag_data.py），
+  缺失时现场估算；标题行也计入预算（MEDCRUX_RAG_TOKEN_BUDGET，默认400）
+- 先选实体：相关度为检索得分，按相关度/token从高到低贪心选入
+- 再用剩余预算选推理路径：只考虑两端实体都已选入的关系，相关度为关系强度 × 两端实体平均得分
+- 输出时按相关度排序，推理路径排在实体之后
+"""
+
+import os
+from dataclasses import dataclass
+
+from medcrux.utils import estimate_tokens
+
+# 实体内容的最长字符数（超过时截断并加省略号）
+MAX_ENTITY_CONTENT_CHARS = 300
+
+DEFAULT_TOKEN_BUDGET = 400
+
+# 检索结果没有得分时使用的默认相关度
+DEFAULT_SCORE = 0.5
+DEFAULT_RELATION_STRENGTH = 0.5
+
+CONTEXT_HEADER = "\n\n## 相关医学知识（来自RAG知识库）：\n\n"
+ENTITY_HEADER = "### 相关医学概念和规则：\n"
+PATH_HEADER = "\n### 逻辑推理路径：\n"
+
+_ENTITY_HEADER_TOKENS = estimate_tokens(CONTEXT_HEADER + ENTITY_HEADER)
+_PATH_HEADER_TOKENS = estimate_tokens(PATH_HEADER)
+
+
+@dataclass
+class PackedContext:
+    """打包结果"""
+
+    text: str = ""
+    entity_count: int = 0
+    path_count: int = 0
+    token_count: int = 0
+
+
+def get_rag_token_budget() -> int:
+    """RAG上下文的token预算（MEDCRUX_RAG_TOKEN_BUDGET）"""
+    return int(os.getenv("MEDCRUX_RAG_TOKEN_BUDGET", str(DEFAULT_TOKEN_BUDGET)))
+
+
+def render_entity_line(entity: dict) -> str:
+    """实体在提示词中的一行（单行），缺少名称或内容时返回空字符串"""
+    name = entity.get("name", "")
+    # 合并换行和多余空白，去掉抽取时残留的分隔线和加粗标记，减少token
+    content = " ".join((entity.get("content") or "").split()).rstrip("-*# ")
+    if not name or not content:
+        return ""
+    if len(content) > MAX_ENTITY_CONTENT_CHARS:
+        content = content[:MAX_ENTITY_CONTENT_CHARS] + "..."
+    return f"- **{name}**：{content}\n"
+
+
+def render_path_line(path: list[str]) -> str:
+    """推理路径在提示词中的一行"""
+    return f"- {' → '.join(path)}\n"
+
+
+def entity_token_count(entity: dict) -> int:
+    """实体行的token数（知识库生成时预先计算并保存在实体索引中）"""
+    return estimate_tokens(render_entity_line(entity))
+
+
+def relation_token_count(relation: dict) -> int:
+    """关系对应推理路径行的token数（知识库生成时预先计算并保存在关系索引中）"""
+    return estimate_tokens(
+        render_path_line([relation.get("source_entity_id", ""), relation.get("target_entity_id", "")])
+    )
+
+
+def _stored_tokens(item: dict, compute) -> int:
+    tokens = item.get("token_count")
+    return tokens if isinstance(tokens, int) and tokens > 0 else compute(item)
+
+
+def pack_rag_context(retrieval_result: dict, token_budget: int | None = None) -> PackedContext:
+    """
+    在token预算内挑选检索结果，生成提示词中的知识上下文
+
+    Args:
+        retrieval_result: GraphRAGRetriever.retrieve的结果
+        token_budget: token预算，默认读取MEDCRUX_RAG_TOKEN_BUDGET
+
+    Returns:
+        PackedContext，没有实体可选入时text为空字符串
+    """
+    budget = get_rag_token_budget() if token_budget is None else token_budget
+
+    # 1. 实体：按相关度/token贪心选入
+    entity_candidates = [
+        (float(entity.get("score", DEFAULT_SCORE)), _stored_tokens(entity, entity_token_count), entity)
+        for entity in retrieval_result.get("entities", [])
+        if render_entity_line(entity)
+    ]
+    entities, used = _select(entity_candidates, budget, _ENTITY_HEADER_TOKENS)
+    if not entities:
+        return PackedContext()
+
+    # 2. 推理路径：只考虑两端实体都已选入的关系，用剩余预算选入
+    entity_scores = {entity.get("id"): score for score, entity in entities}
+    path_candidates = []
+    for relation in retrieval_result.get("relations", []):
+        source, target = relation.get("source_entity_id"), relation.get("target_entity_id")
+        if source in entity_scores and target in entity_scores:
+            strength = float(relation.get("strength") or DEFAULT_RELATION_STRENGTH)
+            score = strength * (entity_scores[source] + entity_scores[target]) / 2
+            path_candidates.append((score, _stored_tokens(relation, relation_token_count), [source, target]))
+    paths, path_tokens = _select(path_candidates, budget - used, _PATH_HEADER_TOKENS)
+
+    text = CONTEXT_HEADER + ENTITY_HEADER + "".join(render_entity_line(entity) for _, entity in entities)
+    if paths:
+        text += PATH_HEADER + "".join(render_path_line(path) for _, path in paths)
+    return PackedContext(text=text, entity_count=len(entities), path_count=len(paths), token_count=used + path_tokens)
+
+
+def _select(candidates: list[tuple], budget: int, header_tokens: int) -> tuple[list[tuple], int]:
+    """
+    按相关度/token贪心选入候选（选入任意候选时标题行计入预算）
+
+    Args:
+        candidates: [(相关度, token数, 内容)]
+        budget: 可用token数
+        header_tokens: 标题行token数
+
+    Returns:
+        ([(相关度, 内容)]按相关度从高到低, 使用的token数)
+    """
+    used = header_tokens
+    selected = []
+    for score, tokens, item in sorted(candidates, key=lambda c: c[0] / max(c[1], 1), reverse=True):
+        if used + tokens <= budget:
+            used += tokens
+            selected.append((score, item))
+    if not selected:
+        return [], 0
+    selected.sort(key=lambda x: x[0], reverse=True)
+    return selected, used
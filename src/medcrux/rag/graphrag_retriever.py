@@ -9,15 +9,21 @@ GraphRAG检索模块：基于知识图谱的检索和推理
 
 import json
 
+from medcrux.rag.context_packer import entity_token_count, relation_token_count
 from medcrux.rag.data_paths import (
     ENTITY_INDEX_FILE,
     RAG_DATA_DIR,
     RELATION_INDEX_FILE,
 )
+from medcrux.rag.ngram_index import EntityNgramIndex
 from medcrux.utils.logger import log_error_with_context, setup_logger
 
 logger = setup_logger("medcrux.rag.graphrag")
 
+# 实体匹配返回的最多实体数和最低得分（得分见ngram_index，0-1）
+MAX_MATCHED_ENTITIES = 10
+MIN_MATCH_SCORE = 0.1
+
 
 class GraphRAGRetriever:
     """GraphRAG检索器：基于知识图谱的检索和推理"""
@@ -28,6 +34,7 @@ class GraphRAGRetriever:
         self.relations: dict[str, dict] = {}
         self.entity_index: dict[str, dict] = {}
         self.relation_index: dict[str, dict] = {}
+        self.entity_ngram_index = EntityNgramIndex({})
         self._load_knowledge_base()
 
     def _load_knowledge_base(self):
@@ -44,9 +51,16 @@ class GraphRAGRetriever:
                     entity_file = RAG_DATA_DIR / entity_info["file"]
                     if entity_file.exists():
                         with open(entity_file, encoding="utf-8") as f:
-                            self.entities[entity_id] = json.load(f)
+                            entity = json.load(f)
+                        # 索引中预先计算的token数，供RAG上下文打包使用（旧索引缺失时现场估算）
+                        entity["token_count"] = entity_info.get("token_count") or entity_token_count(entity)
+                        self.entities[entity_id] = entity
                 logger.info(f"加载实体数据：{len(self.entities)} 个实体")
 
+                # 建立实体倒排索引（中文字符二元/三元组和英文词 → 实体ID）
+                self.entity_ngram_index = EntityNgramIndex(self.entities)
+                logger.info(f"建立实体倒排索引：{self.entity_ngram_index.term_count} 个检索词")
+
             # 加载关系索引
             if RELATION_INDEX_FILE.exists():
                 with open(RELATION_INDEX_FILE, encoding="utf-8") as f:
@@ -58,7 +72,9 @@ class GraphRAGRetriever:
                     relation_file = RAG_DATA_DIR / relation_info["file"]
                     if relation_file.exists():
                         with open(relation_file, encoding="utf-8") as f:
-                            self.relations[relation_id] = json.load(f)
+                            relation = json.load(f)
+                        relation["token_count"] = relation_info.get("token_count") or relation_token_count(relation)
+                        self.relations[relation_id] = relation
                 logger.info(f"加载关系数据：{len(self.relations)} 个关系")
 
         except Exception as e:
@@ -113,63 +129,14 @@ class GraphRAGRetriever:
 
     def _match_entities(self, query: str) -> list[dict]:
         """
-        根据查询文本匹配相关实体（性能优化版本）
+        根据查询文本匹配相关实体
 
-        优化策略：
-        1. 先提取查询关键词
-        2. 快速过滤：只检查包含关键词的实体
-        3. 减少字符串操作
+        通过加载时建立的倒排索引（见ngram_index）生成候选实体并打分：
+        中文查询按字符二元/三元组匹配，不依赖空格分词；只对倒排表命中的实体打分，不遍历全部实体
         """
-        matched_entities = []
-        query_lower = query.lower()
-        query_words = set(query_lower.split())
-
-        # 如果查询为空，返回空列表
-        if not query_words:
-            return []
-
-        # 快速过滤：只检查实体名称或ID中包含查询关键词的实体
-        for entity_id, entity in self.entities.items():
-            score = 0.0
-            entity_id_lower = entity_id.lower()
-
-            # 1. 快速检查：实体ID是否包含查询关键词（最快）
-            for word in query_words:
-                if word in entity_id_lower:
-                    score += 0.5
-                    break  # 找到匹配就跳出，避免重复计算
-
-            # 2. 匹配实体名称（如果还没有匹配）
-            if score < 0.3 and entity.get("name"):
-                name_lower = entity["name"].lower()
-                for word in query_words:
-                    if word in name_lower:
-                        score += 0.4
-                        break
-
-            # 3. 匹配实体内容（只在前面匹配度较低时进行，避免全文搜索）
-            if score < 0.5 and entity.get("content"):
-                content_lower = entity["content"].lower()
-                # 只检查前200个字符，避免全文搜索
-                content_preview = content_lower[:200]
-                common_words = query_words & set(content_preview.split())
-                if common_words:
-                    score += min(len(common_words) * 0.2, 0.3)
-
-            # 只添加有意义的匹配（提高阈值，减少结果数量）
-            if score > 0.3:  # 提高阈值，减少匹配数量
-                matched_entities.append(
-                    {
-                        "id": entity_id,
-                        "entity": entity,
-                        "score": score,
-                    }
-                )
-
-        # 按分数排序
-        matched_entities.sort(key=lambda x: x["score"], reverse=True)
-        # 返回前10个最相关的实体（减少数量，提高性能）
-        return [e["entity"] for e in matched_entities[:10]]
+        matches = self.entity_ngram_index.search(query, limit=MAX_MATCHED_ENTITIES, min_score=MIN_MATCH_SCORE)
+        # 附带匹配得分供上下文打包使用
+        return [{**self.entities[entity_id], "score": round(score, 4)} for entity_id, score in matches]
 
     def _get_relations_for_entities(self, entity_ids: list[str]) -> list[dict]:
         """获取与实体相关的关系"""
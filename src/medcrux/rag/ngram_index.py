@@ -0,0 +1,138 @@
+"""
+实体倒排索引模块：按中文字符二元/三元组和英文词建立倒排索引，匹配查询文本中提到的知识库实体
+
+原先的实体匹配用 `query.lower().split()` 切分查询，对没有空格的中文报告，
+整行文本成为一个"词"，几乎匹配不到实体名称；并且每次查询都遍历全部实体。
+
+索引规则：
+- 检索词：中文连续字符的二元组和三元组（紧挨在前面的一个数字并入，如"3类"），
+  英文词和数字（转小写，"BI-RADS"同时索引为"bi-rads"和"birads"）；单个汉字不作为检索词
+- 知识库加载时建立一次索引：实体名称（含实体ID）和实体内容分别建立倒排表
+- 查询时只对倒排表中命中的候选实体打分：
+  - 名称得分：实体名称检索词中被查询覆盖的比例（按IDF加权，常见词如"birads"权重低）
+  - 内容得分：查询中出现在知识库里的检索词，有多少出现在该实体内容中（按IDF加权）
+  - 总分 = 0.7 × 名称得分 + 0.3 × 内容得分
+"""
+
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from collections.abc import Iterable
+
+# 中文连续字符（可带一个前导数字）、英文词和数字
+_CJK_RUN_PATTERN = re.compile(r"[0-9]?[\u4e00-\u9fff]+")
+_WORD_PATTERN = re.compile(r"[a-z0-9]+(?:[-_][a-z0-9]+)*")
+# 全角字符（OCR常把字母、数字、符号识别为全角），出现时才做NFKC规范化
+_FULLWIDTH_PATTERN = re.compile(r"[\uff01-\uff5e]")
+
+NAME_WEIGHT = 0.7
+CONTENT_WEIGHT = 0.3
+
+FIELD_NAME = "name"
+FIELD_CONTENT = "content"
+
+
+def text_terms(text: str | None) -> set[str]:
+    """
+    提取文本的检索词
+
+    Args:
+        text: 查询文本或实体字段
+
+    Returns:
+        检索词集合（中文二元/三元组、英文词和数字）
+    """
+    if not text:
+        return set()
+    if _FULLWIDTH_PATTERN.search(text):
+        text = unicodedata.normalize("NFKC", text)
+    normalized = text.lower()
+    terms = set()
+    for run in _CJK_RUN_PATTERN.findall(normalized):
+        for size in (2, 3):
+            terms.update(run[index : index + size] for index in range(len(run) - size + 1))
+    for word in _WORD_PATTERN.findall(normalized):
+        terms.add(word)
+        if "-" in word:
+            terms.add(word.replace("-", ""))
+    return terms
+
+
+class EntityNgramIndex:
+    """
+    实体倒排索引（建立后只读）
+
+    Args:
+        entities: {实体ID: 实体}，实体的name和content字段参与索引
+    """
+
+    def __init__(self, entities: dict[str, dict]):
+        self._postings: dict[str, dict[str, set[str]]] = {FIELD_NAME: defaultdict(set), FIELD_CONTENT: defaultdict(set)}
+        self._name_terms: dict[str, set[str]] = {}
+        document_frequency: dict[str, int] = defaultdict(int)
+
+        for entity_id, entity in entities.items():
+            name_terms = text_terms(entity.get("name")) | text_terms(entity_id)
+            content_terms = text_terms(entity.get("content"))
+            self._name_terms[entity_id] = name_terms
+            for term in name_terms:
+                self._postings[FIELD_NAME][term].add(entity_id)
+            for term in content_terms:
+                self._postings[FIELD_CONTENT][term].add(entity_id)
+            for term in name_terms | content_terms:
+                document_frequency[term] += 1
+
+        self._order = {entity_id: position for position, entity_id in enumerate(entities)}
+        total = max(len(entities), 1)
+        self._idf = {term: math.log(1 + total / count) for term, count in document_frequency.items()}
+        self._name_weights = {entity_id: self._weight(terms) for entity_id, terms in self._name_terms.items()}
+
+    def __len__(self) -> int:
+        return len(self._name_terms)
+
+    @property
+    def term_count(self) -> int:
+        """索引中的检索词数量"""
+        return len(self._idf)
+
+    def _weight(self, terms: Iterable[str]) -> float:
+        return sum(self._idf.get(term, 0.0) for term in terms)
+
+    def search(self, query: str, limit: int = 10, min_score: float = 0.0) -> list[tuple[str, float]]:
+        """
+        查询与文本相关的实体
+
+        只累加查询检索词倒排表中的实体，耗时与命中的倒排表长度成正比，不随知识库中的实体总数增长
+
+        Args:
+            query: 查询文本（如OCR识别的报告文本）
+            limit: 最多返回的实体数
+            min_score: 最低得分（不含）
+
+        Returns:
+            [(实体ID, 得分)]，按得分从高到低（同分按实体加载顺序）
+        """
+        query_terms = text_terms(query) & self._idf.keys()
+        if not query_terms:
+            return []
+
+        matched_weights = {FIELD_NAME: defaultdict(float), FIELD_CONTENT: defaultdict(float)}
+        for term in query_terms:
+            weight = self._idf[term]
+            for field, postings in self._postings.items():
+                for entity_id in postings.get(term, ()):
+                    matched_weights[field][entity_id] += weight
+        query_weight = self._weight(query_terms)
+
+        scored = []
+        for entity_id in matched_weights[FIELD_NAME].keys() | matched_weights[FIELD_CONTENT].keys():
+            name_weight = self._name_weights[entity_id]
+            name_score = matched_weights[FIELD_NAME][entity_id] / name_weight if name_weight else 0.0
+            content_score = matched_weights[FIELD_CONTENT][entity_id] / query_weight
+            score = NAME_WEIGHT * name_score + CONTENT_WEIGHT * content_score
+            if score > min_score:
+                scored.append((entity_id, score))
+
+        scored.sort(key=lambda item: (-item[1], self._order[item[0]]))
+        return scored[:limit]
@@ -1,5 +1,7 @@
-"""工具模块：提供日志、错误追踪等通用功能"""
+"""工具模块：提供日志、错误追踪、token估算、多关键词匹配等通用功能"""
 
 from medcrux.utils.logger import log_error_with_context, setup_logger
+from medcrux.utils.multi_pattern import KeywordMatch, MultiPatternMatcher
+from medcrux.utils.tokens import estimate_tokens
 
-__all__ = ["setup_logger", "log_error_with_context"]
+__all__ = ["KeywordMatch", "MultiPatternMatcher", "estimate_tokens", "log_error_with_context", "setup_logger"]
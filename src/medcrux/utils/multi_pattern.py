@@ -0,0 +1,98 @@
+"""
+多关键词匹配模块：一次构建，单遍扫描文本，返回所有关键词的出现位置
+
+替代 `any(keyword in text for keyword in KEYWORDS)` 式的逐个关键词扫描。
+匹配语义与Aho-Corasick自动机相同（所有出现，包括相互重叠和互为前缀的关键词），
+实现上把关键词编译为一个按长度降序的备选正则，由re的C实现完成扫描：
+纯Python实现的自动机逐字符跳转，在本项目的文本长度下比逐个关键词的`in`还慢
+（见scripts/benchmark_multi_pattern.py）。
+
+每次从上一处匹配的下一个字符继续search，得到每个起始位置上最长的关键词；
+同一位置上更短的关键词必然是它的前缀，构建时预先记录每个关键词的前缀关键词，扫描时一并返回。
+"""
+
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class KeywordMatch:
+    """一处关键词出现"""
+
+    keyword: str  # 关键词（构建时的写法）
+    start: int
+    end: int
+
+
+class MultiPatternMatcher:
+    """
+    多关键词匹配器（构建后只读，线程安全）
+
+    Args:
+        keywords: 关键词列表（忽略空字符串和重复）
+        ignore_case: 是否忽略大小写
+    """
+
+    def __init__(self, keywords: Iterable[str], ignore_case: bool = False):
+        self.keywords = tuple(dict.fromkeys(keyword for keyword in keywords if keyword))
+        self.ignore_case = ignore_case
+        flags = re.IGNORECASE if ignore_case else 0
+        ordered = sorted(self.keywords, key=len, reverse=True)
+        alternation = "|".join(re.escape(keyword) for keyword in ordered) or r"(?!)"
+        self._pattern = re.compile(alternation, flags)
+
+        # 匹配到的文本（按大小写规范化）→ 关键词；关键词 → 同一起点上更短的关键词
+        self._canonical = {self._normalize(keyword): keyword for keyword in self.keywords}
+        self._prefixes = {
+            keyword: [
+                other
+                for other in ordered
+                if len(other) < len(keyword) and self._normalize(keyword).startswith(self._normalize(other))
+            ]
+            for keyword in self.keywords
+        }
+
+    def _normalize(self, text: str) -> str:
+        return text.lower() if self.ignore_case else text
+
+    def search(self, text: str | None) -> bool:
+        """文本中是否出现任一关键词"""
+        return bool(text) and self._pattern.search(text) is not None
+
+    def find(self, text: str | None, pos: int = 0) -> KeywordMatch | None:
+        """从pos开始的第一处关键词出现（该起点上最长的关键词），没有时返回None"""
+        match = self._pattern.search(text, pos) if text else None
+        if match is None:
+            return None
+        keyword = self._canonical[self._normalize(match.group())]
+        return KeywordMatch(keyword=keyword, start=match.start(), end=match.end())
+
+    def _scan(self, text: str) -> Iterator[tuple[int, str]]:
+        """按起始位置顺序返回(起始位置, 该位置上最长的关键词)"""
+        search = self._pattern.search
+        position = 0
+        while (match := search(text, position)) is not None:
+            position = match.start()
+            yield position, self._canonical[self._normalize(match.group())]
+            position += 1
+
+    def finditer(self, text: str | None) -> Iterator[KeywordMatch]:
+        """
+        按起始位置顺序返回所有关键词出现（同一起点先长后短）
+        """
+        if not text:
+            return
+        for start, keyword in self._scan(text):
+            yield KeywordMatch(keyword=keyword, start=start, end=start + len(keyword))
+            for prefix in self._prefixes[keyword]:
+                yield KeywordMatch(keyword=prefix, start=start, end=start + len(prefix))
+
+    def matched_keywords(self, text: str | None) -> set[str]:
+        """文本中出现的关键词集合"""
+        matched: set[str] = set()
+        if text:
+            for _, keyword in self._scan(text):
+                matched.add(keyword)
+                matched.update(self._prefixes[keyword])
+        return matched
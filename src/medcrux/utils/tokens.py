@@ -0,0 +1,36 @@
+"""
+Token估算模块：在不依赖分词器的情况下估算文本的token数
+
+按DeepSeek官方给出的经验换算：
+- 1个中文字符 ≈ 0.6 token
+- 1个英文字符（含数字、标点） ≈ 0.3 token
+
+用于本地替身服务的usage字段、提示词节省量统计、RAG上下文预算等场景，
+精确计费以API返回的usage为准。
+"""
+
+import math
+import re
+
+# CJK统一表意文字、全角标点
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+CJK_TOKENS_PER_CHAR = 0.6
+OTHER_TOKENS_PER_CHAR = 0.3
+
+
+def estimate_tokens(text: str | None) -> int:
+    """
+    估算文本的token数
+
+    Args:
+        text: 待估算文本
+
+    Returns:
+        估算的token数（非空文本至少为1）
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    other_count = sum(1 for ch in text if not ch.isspace()) - cjk_count
+    return max(1, math.ceil(cjk_count * CJK_TOKENS_PER_CHAR + other_count * OTHER_TOKENS_PER_CHAR))
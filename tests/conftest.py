@@ -7,6 +7,10 @@ from pathlib import Path
 
 import pytest
 
+from medcrux.analysis import report_structure_parser
+from medcrux.analysis.lesion_cache import lesion_cache
+from medcrux.analysis.llm_circuit_breaker import breaker
+
 # 测试数据目录
 TEST_DATA_DIR = Path(__file__).parent / "test_data"
 
@@ -140,6 +144,12 @@ def setup_test_env(monkeypatch):
     # 设置测试API Key（如果未设置）
     if "DEEPSEEK_API_KEY" not in os.environ:
         monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key-for-testing")
+    # LLM熔断器是进程内单例，避免前一个测试的失败调用影响后续测试
+    breaker.reset()
+    # 病灶判断缓存同理，避免前一个测试的模拟结果被后续测试命中
+    lesion_cache.clear()
+    # 报告模板同理，避免前一个测试学到的模板让后续测试跳过LLM（通过模块访问，其他测试可能重新加载该模块）
+    report_structure_parser.report_templates.clear()
 
 
 @pytest.fixture
@@ -150,6 +150,59 @@ class TestAPI:
         assert "report_structure" in data
         assert data["report_structure"]["findings"] == "左乳上方可见低回声结节"
 
+    @patch("medcrux.api.main.analyze_birads_independently")
+    @patch("medcrux.api.main.analyze_text_with_deepseek")
+    @patch("medcrux.api.main.extract_text_from_bytes")
+    @patch("medcrux.api.main.parse_report_structure")
+    def test_analyze_report_uses_scoped_sections(self, mock_parse, mock_extract, mock_analyze, mock_independent):
+        """测试主分析只接收检查所见和影像学诊断"""
+        mock_extract.return_value = (
+            "[医疗机构名称] 姓名：[患者姓名] 性别：女 超声号：[超声号] 检查技术：彩色多普勒超声。"
+            "检查所见：左乳上方可见低回声结节，形态规则，边界清楚。影像学诊断：BI-RADS 3类。报告医师：[医师]"
+        )
+        mock_parse.return_value = {
+            "findings": "左乳上方可见低回声结节，形态规则，边界清楚。",
+            "diagnosis": "BI-RADS 3类。",
+            "recommendation": None,
+        }
+        mock_analyze.return_value = {"nodules": [], "overall_assessment": {}}
+        mock_independent.return_value = {"nodules": [], "llm_highest_birads": None}
+
+        response = client.post("/api/analyze/upload", files={"file": ("test.jpg", b"fake image data", "image/jpeg")})
+
+        assert response.status_code == 200
+        assert response.json()["analysis_input"] == "sections"
+        analysis_text = mock_analyze.call_args.args[0]
+        assert "左乳上方可见低回声结节" in analysis_text
+        assert "超声号" not in analysis_text
+        assert "检查技术" not in analysis_text
+
+    @patch("medcrux.api.main.analyze_birads_independently")
+    @patch("medcrux.api.main.analyze_text_with_deepseek")
+    @patch("medcrux.api.main.extract_text_from_bytes")
+    @patch("medcrux.api.main.parse_report_structure")
+    def test_analyze_report_fast_path_skips_llm(self, mock_parse, mock_extract, mock_analyze, mock_independent):
+        """测试标准描述的报告走规则快速通道，不调用主分析LLM"""
+        mock_extract.return_value = (
+            "检查所见：在左侧乳腺3点钟方向查见约12×8mm低回声，椭圆形，边界清晰，均匀低回声，平行。"
+            "影像学诊断：左侧乳腺低回声结节，BI-RADS 3类。"
+        )
+        mock_parse.return_value = {
+            "findings": "在左侧乳腺3点钟方向查见约12×8mm低回声，椭圆形，边界清晰，均匀低回声，平行。",
+            "diagnosis": "左侧乳腺低回声结节，BI-RADS 3类。",
+            "recommendation": None,
+        }
+        mock_independent.return_value = {"nodules": [], "llm_highest_birads": "3"}
+
+        response = client.post("/api/analyze/upload", files={"file": ("test.jpg", b"fake image data", "image/jpeg")})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["analysis_source"] == "fast_path"
+        assert data["ai_result"]["birads_class"] == "3"
+        assert data["ai_result"]["extracted_shape"] == "椭圆形"
+        mock_analyze.assert_not_called()
+
     @patch("medcrux.api.main.analyze_text_with_deepseek")
     @patch("medcrux.api.main.extract_text_from_bytes")
     def test_analyze_report_new_format_conversion(self, mock_extract, mock_analyze):
@@ -0,0 +1,129 @@
+"""
+测试多报告批量独立BI-RADS判断
+"""
+
+import json
+import re
+from unittest.mock import MagicMock, patch
+
+from medcrux.analysis.batch_analyzer import BATCH_MARKER, analyze_birads_batch
+from medcrux.analysis.llm_rate_limiter import PRIORITY_BATCH, get_priority
+
+REPORTS = [
+    "在右侧乳腺10点查见1.8×1.2cm低回声结节，形态不规则，边界模糊。",
+    "在左侧乳腺1点查见0.5×0.3cm低回声结节，椭圆形，边界清晰。",
+    "在左侧乳腺4点查见0.8×0.5cm无回声结节，边界清晰。",
+]
+
+
+def _empty_retriever():
+    retriever = MagicMock()
+    retriever.retrieve.return_value = {"entities": [], "relations": [], "inference_paths": [], "confidence": 0.0}
+    return retriever
+
+
+def _nodule(text: str) -> dict:
+    """按病灶描述生成紧凑格式的单结节结果"""
+    birads = "4a" if "不规则" in text else ("2" if "无回声" in text else "3")
+    return {"b": "R" if "右" in text[:4] else "L", "c": re.search(r"(\d+)点", text).group(1), "k": birads}
+
+
+def _response(payload: dict):
+    content = json.dumps(payload, ensure_ascii=False)
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=content, finish_reason="stop"))])
+
+
+def _batch_reports(user_message: str) -> list[tuple[str, str]]:
+    return re.findall(r"### 报告 (\S+)\n(.*?)(?=\n\n### 报告 |\Z)", user_message, re.DOTALL)
+
+
+def _is_batch(kwargs: dict) -> bool:
+    return BATCH_MARKER in kwargs["messages"][0]["content"]
+
+
+@patch("medcrux.analysis.llm_engine._get_retriever", return_value=_empty_retriever())
+@patch("medcrux.analysis.llm_engine.client")
+class TestAnalyzeBiradsBatch:
+    """测试批量判断"""
+
+    def test_one_request_per_batch(self, mock_client, _mock_retriever, monkeypatch):
+        monkeypatch.delenv("MEDCRUX_LLM_SCHEMA", raising=False)
+        priorities = []
+
+        def create(**kwargs):
+            priorities.append(get_priority())
+            reports = _batch_reports(kwargs["messages"][-1]["content"])
+            return _response({"reports": [{"rid": rid, "nodules": [_nodule(text)], "n": 1} for rid, text in reports]})
+
+        mock_client.chat.completions.create.side_effect = create
+
+        results = analyze_birads_batch(REPORTS, batch_size=3)
+
+        assert mock_client.chat.completions.create.call_count == 1
+        assert [r["llm_highest_birads"] for r in results] == ["4a", "3", "2"]
+        assert [r["nodules"][0]["location"]["clock_position"] for r in results] == ["10点", "1点", "4点"]
+        assert all(r["nodules"][0]["id"] == "nodule_1" for r in results)
+        # 批量请求以批处理优先级排队
+        assert priorities == [PRIORITY_BATCH]
+
+    def test_invalid_or_missing_slice_resent_individually(self, mock_client, _mock_retriever, monkeypatch):
+        monkeypatch.delenv("MEDCRUX_LLM_SCHEMA", raising=False)
+
+        def create(**kwargs):
+            if _is_batch(kwargs):
+                # r2缺少分类，r3缺失
+                return _response(
+                    {
+                        "reports": [
+                            {"rid": "r1", "nodules": [_nodule(REPORTS[0])], "n": 1},
+                            {"rid": "r2", "nodules": [{"b": "L"}], "n": 1},
+                        ]
+                    }
+                )
+            text = kwargs["messages"][-1]["content"].split("\n\n", 1)[1]
+            return _response({"nodules": [_nodule(text)]})
+
+        mock_client.chat.completions.create.side_effect = create
+
+        results = analyze_birads_batch(REPORTS, batch_size=3)
+
+        assert mock_client.chat.completions.create.call_count == 3
+        assert [r["llm_highest_birads"] for r in results] == ["4a", "3", "2"]
+
+    def test_batch_failure_falls_back_to_single_calls(self, mock_client, _mock_retriever, monkeypatch):
+        monkeypatch.delenv("MEDCRUX_LLM_SCHEMA", raising=False)
+
+        def create(**kwargs):
+            if _is_batch(kwargs):
+                raise ValueError
+            text = kwargs["messages"][-1]["content"].split("\n\n", 1)[1]
+            return _response({"nodules": [_nodule(text)]})
+
+        mock_client.chat.completions.create.side_effect = create
+
+        results = analyze_birads_batch(REPORTS, batch_size=3)
+
+        assert mock_client.chat.completions.create.call_count == 4
+        assert [r["llm_highest_birads"] for r in results] == ["4a", "3", "2"]
+        assert all("error" not in r for r in results)
+
+    def test_short_text_and_leftover_report_not_batched(self, mock_client, _mock_retriever, monkeypatch):
+        monkeypatch.delenv("MEDCRUX_LLM_SCHEMA", raising=False)
+
+        def create(**kwargs):
+            if _is_batch(kwargs):
+                reports = _batch_reports(kwargs["messages"][-1]["content"])
+                return _response(
+                    {"reports": [{"rid": rid, "nodules": [_nodule(text)], "n": 1} for rid, text in reports]}
+                )
+            text = kwargs["messages"][-1]["content"].split("\n\n", 1)[1]
+            return _response({"nodules": [_nodule(text)]})
+
+        mock_client.chat.completions.create.side_effect = create
+
+        results = analyze_birads_batch(["无", *REPORTS], batch_size=2)
+
+        # 1次批量请求（2份）+ 1次单份请求（剩余1份），短文本不调用LLM
+        assert mock_client.chat.completions.create.call_count == 2
+        assert results[0] == {"nodules": [], "llm_highest_birads": None}
+        assert [r["llm_highest_birads"] for r in results[1:]] == ["4a", "3", "2"]
@@ -0,0 +1,93 @@
+"""
+测试BI-RADS分类文法提取（OCR噪声、范围、枚举、位置）
+"""
+
+import pytest
+
+from medcrux.analysis.birads_grammar import birads_sort_key, extract_birads_mentions
+from medcrux.analysis.report_structure_parser import extract_doctor_birads
+
+# OCR噪声语料：(文本, 期望的分类列表)
+OCR_CORPUS = [
+    ("BI-RADS 3类", ["3"]),
+    ("BI-RADS3类", ["3"]),
+    ("BIRADS 3类", ["3"]),
+    ("BI-RADS:3", ["3"]),
+    ("Bl-RADS 4a", ["4A"]),
+    ("BI—RADS 4A类", ["4A"]),
+    ("BI一RADS 3类", ["3"]),
+    ("bi-rads 4 b类", ["4B"]),
+    ("左乳结节，4a类", ["4A"]),
+    ("BI-RADS 分类为 4c类", ["4C"]),
+    ("BI-RADS 2类和3类", ["2", "3"]),
+    ("BI-RADS 3、4类", ["3", "4"]),
+    ("BI-RADS 2类、3类、4类", ["2", "3", "4"]),
+    ("BI-RADS 3类；BI-RADS 4类", ["3", "4"]),
+    ("右乳结节 BI-RADS 4a类，左乳结节 BI-RADS 3类。", ["4A", "3"]),
+    ("BI-RADS 4a级", ["4A"]),
+    ("BI-RADS分级：3级", ["3"]),
+]
+
+# 其他分级（Adler血流分级、脂肪肝分级等）："级"只在BI-RADS关键词之后视为分类
+OTHER_GRADES = [
+    ("左乳低回声结节，血流分级：Adler 2级。BI-RADS 3类", ["3"]),
+    ("CDFI：血流信号Adler 1级", []),
+    ("脂肪肝 1级", []),
+    ("BI-RADS 3类，Adler 2级", ["3"]),
+    ("血流Adler 1级，左乳结节4a类", ["4A"]),
+]
+
+
+class TestExtractBiradsMentions:
+    """测试记号化和文法"""
+
+    @pytest.mark.parametrize(("text", "expected"), OCR_CORPUS)
+    def test_ocr_variants(self, text, expected):
+        assert [mention.value for mention in extract_birads_mentions(text)] == expected
+
+    def test_spans_point_to_original_text(self):
+        text = "超声提示：左侧乳腺低回声结节，BI-RADS 3类；右侧乳腺囊性结节，BIRADS:2。"
+        mentions = extract_birads_mentions(text)
+        assert [text[m.start : m.end] for m in mentions] == ["3类", "2"]
+        assert all(mention.explicit for mention in mentions)
+
+    def test_range(self):
+        mentions = extract_birads_mentions("右乳结节，BI-RADS 3-4类")
+        assert [(m.value, m.in_range) for m in mentions] == [("3", True), ("4", True)]
+
+        bare = extract_birads_mentions("右乳结节3~4类")
+        assert [(m.value, m.explicit, m.in_range) for m in bare] == [("3", False, True), ("4", False, True)]
+
+    def test_quantities_are_not_categories(self):
+        assert [m.value for m in extract_birads_mentions("BI-RADS 3类，2个结节")] == ["3"]
+        assert extract_birads_mentions("建议6个月复查，大小3.2cm") == []
+
+    def test_other_rads_systems_ignored(self):
+        text = "甲状腺结节，TI-RADS 3类。乳腺结节，BI-RADS 4b类"
+        assert [m.value for m in extract_birads_mentions(text)] == ["4B"]
+
+    @pytest.mark.parametrize(("text", "expected"), OTHER_GRADES)
+    def test_other_grades_ignored(self, text, expected):
+        assert [mention.value for mention in extract_birads_mentions(text)] == expected
+
+    def test_sort_key(self):
+        assert max(["4A", "4C", "4", "3"], key=birads_sort_key) == "4C"
+
+
+class TestExtractDoctorBiradsWithGrammar:
+    """测试extract_doctor_birads使用文法提取"""
+
+    def test_corpus_recall(self):
+        """OCR噪声语料全部提取成功（不需要LLM回退）"""
+        misses = [text for text, _ in OCR_CORPUS if not extract_doctor_birads(text)["birads_list"]]
+        assert misses == []
+
+    def test_highest_compares_letter_suffix(self):
+        result = extract_doctor_birads("BI-RADS 4A类；BI-RADS 4C类；BI-RADS 4B类")
+        assert result["highest_birads"] == "4C"
+        assert [mention["value"] for mention in result["mentions"]] == ["4A", "4C", "4B"]
+
+    def test_adler_grade_not_doctor_birads(self):
+        result = extract_doctor_birads("左乳低回声结节，血流分级：Adler 2级。BI-RADS 3类")
+        assert result["birads_list"] == ["3"]
+        assert extract_doctor_birads("CDFI：血流信号Adler 1级")["highest_birads"] is None
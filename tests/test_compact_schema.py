@@ -0,0 +1,196 @@
+"""
+测试紧凑输出schema模块
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+from medcrux.analysis.compact_schema import (
+    ANALYSIS_COMPACT_REQUIRED_FIELDS,
+    BOUNDARY_CODES,
+    COMPACT_REQUIRED_NODULE_FIELDS,
+    COMPACT_SCHEMA_MARKER,
+    ECHO_CODES,
+    INDEPENDENT_BIRADS_COMPACT_REQUIRED_FIELDS,
+    ORIENTATION_CODES,
+    SCHEMA_COMPACT,
+    SCHEMA_FULL,
+    SHAPE_CODES,
+    compact_analysis_result,
+    compact_independent_birads_result,
+    expand_analysis_result,
+    expand_independent_birads_result,
+    get_output_schema,
+)
+from medcrux.analysis.json_repair import repair_json, validate_nodule_result
+from medcrux.analysis.llm_engine import analyze_birads_independently, analyze_text_with_deepseek
+from medcrux.rag.logical_consistency_checker import LogicalConsistencyChecker
+
+COMPACT_ANALYSIS = {
+    "g": "F",
+    "nodules": [
+        {"b": "L", "c": 3, "d": 1.9, "s": "OV", "m": "CI", "e": "HY", "o": "P", "z": "1.2×0.8×0.6", "ms": [], "k": "3"},
+        {
+            "b": "R",
+            "c": 5,
+            "q": "下外",
+            "d": 2.7,
+            "s": "条状",
+            "m": "IN",
+            "e": "低回声",
+            "o": "NP",
+            "z": "1.8×1.2",
+            "ms": ["边界模糊"],
+            "k": "4a",
+            "r": "M",
+            "x": ["形状非标准"],
+        },
+    ],
+    "sm": "双乳结节",
+    "ad": "建议复查",
+}
+
+
+def _response(content: dict):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=json.dumps(content, ensure_ascii=False)))])
+
+
+def _empty_retriever():
+    retriever = MagicMock()
+    retriever.retrieve.return_value = {"entities": [], "relations": [], "inference_paths": [], "confidence": 0.0}
+    return retriever
+
+
+class TestCodeTables:
+    """测试编码表"""
+
+    def test_codes_cover_checker_standard_terms(self):
+        checker = LogicalConsistencyChecker()
+        assert set(SHAPE_CODES.values()) == checker.standard_shapes
+        assert set(BOUNDARY_CODES.values()) == checker.standard_boundaries
+        assert set(ECHO_CODES.values()) == checker.standard_echoes
+        assert set(ORIENTATION_CODES.values()) == checker.standard_orientations
+
+    def test_schema_config(self, monkeypatch):
+        monkeypatch.delenv("MEDCRUX_LLM_SCHEMA", raising=False)
+        assert get_output_schema() == SCHEMA_COMPACT
+        monkeypatch.setenv("MEDCRUX_LLM_SCHEMA", "FULL")
+        assert get_output_schema() == SCHEMA_FULL
+
+
+class TestRequiredFields:
+    """测试必需字段能发现在结节数组中间被截断的输出"""
+
+    def test_truncated_analysis_missing_trailing_fields(self):
+        text = json.dumps(COMPACT_ANALYSIS, ensure_ascii=False)
+        repaired, _ = repair_json(text[: text.index('{"b": "R"')])
+
+        assert len(repaired["nodules"]) == 1
+        problems = validate_nodule_result(repaired, ANALYSIS_COMPACT_REQUIRED_FIELDS, COMPACT_REQUIRED_NODULE_FIELDS)
+        assert problems == ["缺少字段：sm", "缺少字段：ad"]
+
+    def test_truncated_independent_missing_count(self):
+        nodules = [{"b": "L", "c": 3, "k": "3"}, {"b": "R", "c": 10, "k": "4b"}]
+        text = json.dumps({"nodules": nodules, "n": 2}, ensure_ascii=False)
+        repaired, _ = repair_json(text[: text.index('{"b": "R"')])
+
+        required = (INDEPENDENT_BIRADS_COMPACT_REQUIRED_FIELDS, COMPACT_REQUIRED_NODULE_FIELDS)
+        assert validate_nodule_result(repaired, *required) == ["缺少字段：n"]
+        assert validate_nodule_result(compact_independent_birads_result({"nodules": []}), *required) == []
+
+
+class TestExpand:
+    """测试本地展开"""
+
+    def test_expand_analysis(self):
+        result = expand_analysis_result(COMPACT_ANALYSIS)
+
+        first, second = result["nodules"]
+        assert result["patient_gender"] == "Female"
+        assert first["id"] == "nodule_1"
+        assert first["location"] == {"breast": "left", "clock_position": "3点", "distance_from_nipple": "1.9"}
+        assert first["morphology"] == {
+            "shape": "椭圆形",
+            "boundary": "清晰",
+            "echo": "均匀低回声",
+            "orientation": "平行",
+            "size": "1.2×0.8×0.6 cm",
+        }
+        assert first["risk_assessment"] == "Low"
+        assert first["inconsistency_alert"] is False
+
+        # 非标准术语原样保留
+        assert second["morphology"]["shape"] == "条状"
+        assert second["morphology"]["echo"] == "低回声"
+        assert second["location"]["quadrant"] == "下外"
+        assert second["inconsistency_alert"] is True
+        assert result["overall_assessment"] == {
+            "total_nodules": 2,
+            "highest_risk": "Medium",
+            "summary": "双乳结节",
+            "advice": "建议复查",
+        }
+
+    def test_roundtrip(self):
+        expanded = expand_analysis_result(COMPACT_ANALYSIS)
+        assert expand_analysis_result(compact_analysis_result(expanded)) == expanded
+
+        independent = {
+            "nodules": [{"b": "R", "c": 10, "s": "IR", "m": "SP", "e": "HE", "o": "NP", "z": "2×1", "k": "5"}]
+        }
+        expanded = expand_independent_birads_result(independent)
+        assert expanded["nodules"][0]["llm_birads_class"] == "5"
+        assert expanded["nodules"][0]["morphology"]["boundary"] == "毛刺状"
+        assert expand_independent_birads_result(compact_independent_birads_result(expanded)) == expanded
+
+    def test_full_format_passthrough(self):
+        full = {"nodules": [], "overall_assessment": {"total_nodules": 0}}
+        assert expand_analysis_result(full) is full
+        legacy = {"ai_risk_assessment": "Low"}
+        assert expand_analysis_result(legacy) is legacy
+        independent = {"nodules": [], "llm_highest_birads": None}
+        assert expand_independent_birads_result(independent) is independent
+
+
+class TestEngineIntegration:
+    """测试分析引擎使用紧凑schema"""
+
+    @patch("medcrux.analysis.llm_engine._get_retriever", return_value=_empty_retriever())
+    @patch("medcrux.analysis.llm_engine.client")
+    def test_analysis_requests_and_expands_compact(self, mock_client, _mock_retriever, monkeypatch):
+        monkeypatch.delenv("MEDCRUX_LLM_SCHEMA", raising=False)
+        mock_client.chat.completions.create.return_value = _response(COMPACT_ANALYSIS)
+
+        result = analyze_text_with_deepseek("检查所见：左乳3点低回声结节。")
+
+        system_prompt = mock_client.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+        assert COMPACT_SCHEMA_MARKER in system_prompt
+        assert len(result["nodules"]) == 2
+        assert result["nodules"][0]["morphology"]["echo"] == "均匀低回声"
+        # 展开后仍经过一致性检查：3类结节满足充要条件
+        assert result["nodules"][0]["inconsistency_alert"] is False
+
+    @patch("medcrux.analysis.llm_engine._get_retriever", return_value=_empty_retriever())
+    @patch("medcrux.analysis.llm_engine.client")
+    def test_full_schema_keeps_original_prompt(self, mock_client, _mock_retriever, monkeypatch):
+        monkeypatch.setenv("MEDCRUX_LLM_SCHEMA", SCHEMA_FULL)
+        mock_client.chat.completions.create.return_value = _response({"nodules": [], "llm_highest_birads": None})
+
+        result = analyze_birads_independently("在右侧乳腺10点查见低回声结节，形态不规则。")
+
+        system_prompt = mock_client.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+        assert COMPACT_SCHEMA_MARKER not in system_prompt
+        assert "llm_birads_reasoning" in system_prompt
+        assert result["nodules"] == []
+
+    @patch("medcrux.analysis.llm_engine._get_retriever", return_value=_empty_retriever())
+    @patch("medcrux.analysis.llm_engine.client")
+    def test_independent_highest_birads_computed_locally(self, mock_client, _mock_retriever, monkeypatch):
+        monkeypatch.delenv("MEDCRUX_LLM_SCHEMA", raising=False)
+        compact = {"nodules": [{"b": "L", "c": 3, "k": "3", "y": "椭圆形平行"}, {"b": "R", "c": 10, "k": "4b"}]}
+        mock_client.chat.completions.create.return_value = _response(compact)
+
+        result = analyze_birads_independently("在右侧乳腺10点查见低回声结节，形态不规则。")
+
+        assert result["llm_highest_birads"] == "4b"
+        assert [n["id"] for n in result["nodules"]] == ["nodule_1", "nodule_2"]
@@ -0,0 +1,102 @@
+"""
+测试RAG上下文打包模块
+"""
+
+import json
+
+from medcrux.rag.context_packer import (
+    PATH_HEADER,
+    entity_token_count,
+    pack_rag_context,
+    relation_token_count,
+    render_entity_line,
+)
+from medcrux.rag.data_paths import ENTITY_INDEX_FILE, RAG_DATA_DIR, RELATION_INDEX_FILE
+from medcrux.rag.graphrag_retriever import GraphRAGRetriever
+from medcrux.utils import estimate_tokens
+
+
+def _entity(entity_id: str, score: float, content: str) -> dict:
+    return {"id": entity_id, "name": entity_id, "content": content, "score": score}
+
+
+RETRIEVAL = {
+    "entities": [
+        _entity("axiom_long", 0.9, "长" * 280),
+        _entity("term_oval", 0.8, "椭圆形（oval）"),
+        _entity("concept_birads_3", 0.7, "可能良性，恶性可能性<2%"),
+        _entity("empty", 1.0, ""),
+    ],
+    "relations": [
+        {"source_entity_id": "concept_birads_3", "target_entity_id": "term_oval", "strength": 0.9},
+        {"source_entity_id": "concept_birads_3", "target_entity_id": "axiom_long", "strength": 0.9},
+    ],
+    "inference_paths": [],
+    "confidence": 0.8,
+}
+
+
+class TestRendering:
+    """测试实体行"""
+
+    def test_entity_line_is_single_line(self):
+        line = render_entity_line({"name": "BI-RADS 3类", "content": "当且仅当：\n\n- 椭圆形\n- 边界清晰\n\n---\n"})
+        assert line == "- **BI-RADS 3类**：当且仅当： - 椭圆形 - 边界清晰\n"
+        assert render_entity_line({"name": "x", "content": ""}) == ""
+        assert render_entity_line({"name": "x", "content": "长" * 400}).endswith("...\n")
+
+
+class TestPackRagContext:
+    """测试在预算内挑选检索结果"""
+
+    def test_prefers_score_per_token(self):
+        packed = pack_rag_context(RETRIEVAL, token_budget=60)
+
+        # 长公理得分最高但token成本过高，被短而相关的实体取代
+        assert packed.entity_count == 2
+        assert "axiom_long" not in packed.text
+        assert packed.text.index("term_oval") < packed.text.index("concept_birads_3")
+        assert "- concept_birads_3 → term_oval" in packed.text
+        assert packed.token_count <= 60
+        assert estimate_tokens(packed.text) <= 60
+
+    def test_paths_only_between_selected_entities(self):
+        packed = pack_rag_context(RETRIEVAL, token_budget=1000)
+
+        assert packed.entity_count == 3
+        assert packed.path_count == 2
+        assert packed.text.count("→") == 2
+
+    def test_budget_too_small(self):
+        assert pack_rag_context(RETRIEVAL, token_budget=10).text == ""
+        assert PATH_HEADER not in pack_rag_context(RETRIEVAL, token_budget=45).text
+
+    def test_default_budget_from_env(self, monkeypatch):
+        monkeypatch.setenv("MEDCRUX_RAG_TOKEN_BUDGET", "60")
+        assert pack_rag_context(RETRIEVAL).entity_count == 2
+
+    def test_missing_scores_and_token_counts(self):
+        retrieval = {"entities": [{"id": "a", "name": "a", "content": "内容"}], "relations": []}
+        assert pack_rag_context(retrieval, token_budget=100).entity_count == 1
+
+
+class TestKnowledgeBaseTokenCounts:
+    """测试知识库中预先计算的token数"""
+
+    def test_index_token_counts_are_current(self):
+        for index_file, count in ((ENTITY_INDEX_FILE, entity_token_count), (RELATION_INDEX_FILE, relation_token_count)):
+            index = json.loads(index_file.read_text(encoding="utf-8"))
+            for info in index.values():
+                item = json.loads((RAG_DATA_DIR / info["file"]).read_text(encoding="utf-8"))
+                assert info["token_count"] == count(item), info["file"]
+
+    def test_retrieved_entities_carry_score_and_token_count(self):
+        retriever = GraphRAGRetriever()
+        result = retriever.retrieve("BI-RADS 3类 椭圆形 边界清晰")
+
+        assert result["entities"]
+        for entity in result["entities"]:
+            assert entity["score"] > 0
+            assert entity["token_count"] == entity_token_count(entity)
+            # 检索结果是副本，不影响知识库数据
+            assert "score" not in retriever.entities[entity["id"]]
@@ -0,0 +1,65 @@
+"""
+测试多检查混合报告的检查项目切分（只保留乳腺超声部分）
+"""
+
+import itertools
+import json
+
+from medcrux.analysis.exam_segmenter import get_exam_lexicon, isolate_breast_exam, segment_exams
+
+HEADER = "体检中心超声检查报告\n姓名：[姓名] 性别：女"
+THYROID = "甲状腺超声\n检查所见：甲状腺左叶查见0.4×0.3cm低回声结节。\n超声提示：甲状腺结节，TI-RADS 3类。"
+BREAST = (
+    "乳腺超声\n检查所见：在左侧乳腺3点钟方向查见1.2×0.8cm低回声结节，边界清晰。\n"
+    "超声提示：左侧乳腺低回声结节，BI-RADS 3类。"
+)
+ECG = "心电图\n窦性心律，心电图正常。"
+
+
+class TestSegmentExams:
+    """测试按标题切分"""
+
+    def test_blocks_cover_text_in_order(self):
+        text = f"{HEADER}\n{THYROID}\n{BREAST}\n{ECG}"
+        blocks = segment_exams(text)
+        assert [block.title for block in blocks] == [None, "甲状腺超声", "乳腺超声", "心电图"]
+        assert [block.is_breast for block in blocks] == [False, False, True, False]
+        assert blocks[0].start == 0
+        assert blocks[-1].end == len(text)
+        assert all(a.end == b.start for a, b in itertools.pairwise(blocks))
+
+
+class TestIsolateBreastExam:
+    """测试提取乳腺超声部分"""
+
+    def test_keeps_header_and_breast_only(self):
+        isolated = isolate_breast_exam(f"{HEADER}\n{THYROID}\n{BREAST}\n{ECG}")
+        assert isolated == f"{HEADER}\n{BREAST}"
+
+    def test_single_exam_report_untouched(self):
+        assert isolate_breast_exam(f"{HEADER}\n{BREAST}") is None
+        assert isolate_breast_exam(f"{HEADER}\n检查所见：双乳未见明显异常。") is None
+
+    def test_birads_outside_breast_block_not_isolated(self):
+        # 诊断按部位集中写在最后，乳腺的BI-RADS分类在甲状腺部分中，不能切分
+        text = (
+            f"{HEADER}\n乳腺超声\n检查所见：左侧乳腺查见低回声结节，边界清晰。\n"
+            "甲状腺超声\n检查所见：甲状腺左叶查见低回声结节。\n"
+            "超声提示：1.甲状腺结节，TI-RADS 3类；2.左侧乳腺结节，BI-RADS 3类。"
+        )
+        assert isolate_breast_exam(text) is None
+
+    def test_title_only_breast_block_not_isolated(self):
+        # 报告头部列出检查项目时，乳腺标题后没有内容
+        text = f"检查项目：乳腺超声 {THYROID}"
+        assert isolate_breast_exam(text) is None
+
+    def test_custom_lexicon(self, tmp_path, monkeypatch):
+        lexicon_file = tmp_path / "lexicon.json"
+        lexicon_file.write_text(json.dumps({"other_titles": ["糖化血红蛋白"]}), encoding="utf-8")
+        text = f"{HEADER}\n{BREAST}\n糖化血红蛋白\n5.6%，正常。"
+
+        assert isolate_breast_exam(text) is None
+        monkeypatch.setenv("MEDCRUX_EXAM_LEXICON", str(lexicon_file))
+        assert get_exam_lexicon().pattern.search("糖化血红蛋白")
+        assert isolate_breast_exam(text) == f"{HEADER}\n{BREAST}"
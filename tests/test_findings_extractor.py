@@ -0,0 +1,92 @@
+"""
+测试检查所见本地提取模块（规则快速通道）
+"""
+
+from medcrux.analysis.findings_extractor import ANALYSIS_SOURCE_FAST_PATH, extract_findings_fast_path
+
+FINDINGS = (
+    "双乳腺体层结构清晰。"
+    "在左侧乳腺3点钟方向距乳头约19mm处查见约12×8×6mm低回声结节，形态呈椭圆形，边界清楚，"
+    "内部呈均匀低回声，与皮肤平行，CDFI：未见明显血流信号。"
+    "在右侧乳腺10点钟方向查见约0.9×0.5cm无回声，椭圆形，边界清晰，平行，未见钙化。"
+    "余乳腺腺体层回声均匀，导管未见扩张。"
+)
+DIAGNOSIS = "超声提示：左侧乳腺低回声结节，BI-RADS 3类；右侧乳腺囊肿，BI-RADS 2类。"
+
+
+class TestFastPathExtraction:
+    """测试完整标准描述的提取"""
+
+    def test_extracts_all_nodules(self):
+        result = extract_findings_fast_path(FINDINGS, DIAGNOSIS, "姓名：[患者姓名] 性别：女")
+
+        assert result["analysis_source"] == ANALYSIS_SOURCE_FAST_PATH
+        assert result["patient_gender"] == "Female"
+        assert result["overall_assessment"]["total_nodules"] == 2
+
+        first, second = result["nodules"]
+        assert first["location"] == {"breast": "left", "clock_position": "3点", "distance_from_nipple": "1.9"}
+        assert first["morphology"] == {
+            "shape": "椭圆形",
+            "boundary": "清晰",
+            "echo": "均匀低回声",
+            "orientation": "平行",
+            "size": "1.2×0.8×0.6 cm",
+        }
+        assert first["birads_class"] == "3"
+        assert second["location"]["breast"] == "right"
+        assert second["birads_class"] == "2"
+        assert second["morphology"]["size"] == "0.9×0.5 cm"
+
+    def test_single_birads_applies_to_all_nodules(self):
+        result = extract_findings_fast_path(FINDINGS, "双乳结节，BI-RADS 3类")
+        assert [n["birads_class"] for n in result["nodules"]] == ["3", "3"]
+
+    def test_consistency_check_is_applied(self):
+        findings = "在左侧乳腺3点钟方向查见约12×8mm低回声，不规则形，边界清晰，均匀低回声，平行。"
+        nodule = extract_findings_fast_path(findings, "BI-RADS 3类")["nodules"][0]
+
+        assert nodule["inconsistency_alert"] is True
+        assert nodule["risk_assessment"] == "Medium"
+
+
+class TestFastPathFallback:
+    """测试无法高置信度提取时回退到LLM"""
+
+    def test_non_standard_echo(self):
+        findings = "在左侧乳腺3点钟方向查见约12×8mm低回声，椭圆形，边界清晰，平行。"
+        assert extract_findings_fast_path(findings, "BI-RADS 3类") is None
+
+    def test_quadrant_without_clock_position(self):
+        findings = "在右侧乳腺外上象限查见约12×8mm低回声，椭圆形，边界清晰，均匀低回声，平行。"
+        result = extract_findings_fast_path(findings, "BI-RADS 3类")
+        # 只有象限时按右乳镜像转换为固定钟点
+        assert result["nodules"][0]["location"] == {"breast": "right", "clock_position": "1点", "quadrant": "上外"}
+
+    def test_suspicious_sign(self):
+        findings = "在左侧乳腺3点钟方向查见约12×8mm低回声，椭圆形，边界清晰，均匀低回声，平行，内见点状钙化。"
+        assert extract_findings_fast_path(findings, "BI-RADS 3类") is None
+
+    def test_higher_birads(self):
+        findings = "在左侧乳腺3点钟方向查见约12×8mm低回声，椭圆形，边界清晰，均匀低回声，平行。"
+        assert extract_findings_fast_path(findings, "BI-RADS 4a类") is None
+
+    def test_multiple_lesions_described_together(self):
+        findings = "双侧乳腺查见多发低回声结节，较大者约12×8mm，椭圆形，边界清晰，均匀低回声，平行。"
+        assert extract_findings_fast_path(findings, "BI-RADS 3类") is None
+
+    def test_missing_sections(self):
+        assert extract_findings_fast_path(None, DIAGNOSIS) is None
+        assert extract_findings_fast_path(FINDINGS, "左侧乳腺低回声结节") is None
+
+    def test_lesion_without_keyword_is_not_skipped(self):
+        """含侧别和大小但没有病灶关键词的描述（液性暗区）不能被忽略"""
+        findings = (
+            "在左侧乳腺3点钟方向查见约12×8mm低回声，椭圆形，边界清晰，均匀低回声，平行。"
+            "在右侧乳腺10点钟方向查见0.8×0.5cm液性暗区。"
+        )
+        assert extract_findings_fast_path(findings, DIAGNOSIS) is None
+
+    def test_diagnosis_side_without_extracted_lesion(self):
+        findings = "在左侧乳腺3点钟方向查见约12×8mm低回声，椭圆形，边界清晰，均匀低回声，平行。"
+        assert extract_findings_fast_path(findings, DIAGNOSIS) is None
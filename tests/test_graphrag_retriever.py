@@ -101,3 +101,13 @@ class TestGraphRAGRetriever:
             entities = [test_entity]
             confidence = retriever._calculate_confidence(entities, relations)
             assert 0.0 <= confidence <= 1.0
+
+    def test_match_entities_chinese_query(self):
+        """测试没有空格的中文查询也能匹配到实体"""
+        retriever = GraphRAGRetriever()
+        if not retriever.entities:
+            return
+        matched = retriever._match_entities("内部可见微钙化，后方回声衰减伴声影")
+        names = [entity.get("name") for entity in matched]
+        assert "微钙化" in names
+        assert all(0.0 < entity["score"] <= 1.0 for entity in matched)
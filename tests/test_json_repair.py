@@ -0,0 +1,195 @@
+"""
+测试JSON修复模块和LLM输出解析（本地修复、续写/纠正请求、修复率统计）
+"""
+
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from medcrux.analysis.json_repair import (
+    REPAIR_CODE_FENCE,
+    REPAIR_EXTRA_TEXT,
+    REPAIR_TRAILING_COMMA,
+    REPAIR_TRUNCATED,
+    REPAIR_UNESCAPED_QUOTE,
+    JSONRepairError,
+    ResultRequirements,
+    repair_json,
+    validate_nodule_result,
+)
+from medcrux.analysis.llm_client import CONTINUATION_PROMPT, parse_json_response
+from medcrux.analysis.llm_metrics import registry
+
+COMPLETE = {
+    "nodules": [{"id": "nodule_1", "morphology": {"shape": "椭圆形"}, "birads_class": "3"}],
+    "overall_assessment": {"total_nodules": 1},
+}
+
+REQUEST = {"model": "deepseek-chat", "messages": [{"role": "user", "content": "分析"}]}
+REQUIRED = {
+    "requirements": ResultRequirements(fields=("nodules", "overall_assessment"), nodule_fields=("birads_class",))
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+def _response(content: str, finish_reason: str = "stop"):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)],
+        usage=None,
+    )
+
+
+class TestRepairJson:
+    """测试本地修复"""
+
+    def test_valid_json_needs_no_repair(self):
+        assert repair_json('{"a": 1}') == ({"a": 1}, [])
+
+    def test_code_fence_and_trailing_comma(self):
+        result, repairs = repair_json('```json\n{"a": [1, 2,],}\n```')
+        assert result == {"a": [1, 2]}
+        assert repairs == [REPAIR_CODE_FENCE, REPAIR_TRAILING_COMMA]
+
+    def test_surrounding_text_and_unescaped_quote(self):
+        result, repairs = repair_json('结果如下：{"reason": "边界"清晰"，形态规则"} 以上')
+        assert result == {"reason": '边界"清晰"，形态规则'}
+        assert REPAIR_EXTRA_TEXT in repairs
+        assert REPAIR_UNESCAPED_QUOTE in repairs
+
+    def test_truncated_array_drops_incomplete_element(self):
+        text = '{"nodules": [{"id": "nodule_1", "birads_class": "3"}, {"id": "nod'
+        result, repairs = repair_json(text)
+        assert result == {"nodules": [{"id": "nodule_1", "birads_class": "3"}]}
+        assert repairs == [REPAIR_TRUNCATED]
+
+    def test_truncated_first_string_value_not_kept(self):
+        with pytest.raises(JSONRepairError):
+            repair_json('{"findings": "双侧乳腺腺体结构清晰，在右侧乳腺10点查见')
+
+    def test_truncated_after_key(self):
+        result, _ = repair_json('{"nodules": [], "llm_highest_birads":')
+        assert result == {"nodules": []}
+
+    def test_unrecoverable(self):
+        with pytest.raises(JSONRepairError):
+            repair_json("模型没有返回JSON")
+        # 兼容原有的JSONDecodeError处理
+        assert issubclass(JSONRepairError, json.JSONDecodeError)
+
+
+class TestValidateNoduleResult:
+    """测试结构校验"""
+
+    def test_valid(self):
+        assert validate_nodule_result(COMPLETE, ("nodules",), ("birads_class",)) == []
+
+    def test_problems(self):
+        problems = validate_nodule_result(
+            {"nodules": [{"id": "nodule_1", "morphology": "椭圆形"}, "x"]},
+            required_fields=("overall_assessment",),
+            required_nodule_fields=("birads_class",),
+        )
+        assert len(problems) == 4
+
+
+class TestParseJsonResponse:
+    """测试LLM输出解析流程"""
+
+    def test_clean(self):
+        client = MagicMock()
+        result = parse_json_response(client, "analysis", _response(json.dumps(COMPLETE)), REQUEST, **REQUIRED)
+
+        assert result == COMPLETE
+        client.chat.completions.create.assert_not_called()
+        assert registry.snapshot()["json_parse"]["analysis"]["clean"] == 1
+
+    def test_local_repair_without_extra_request(self):
+        client = MagicMock()
+        content = "```json\n" + json.dumps(COMPLETE, ensure_ascii=False)[:-1] + ",}\n```"
+        result = parse_json_response(client, "analysis", _response(content), REQUEST, **REQUIRED)
+
+        assert result == COMPLETE
+        client.chat.completions.create.assert_not_called()
+        stats = registry.snapshot()["json_parse"]["analysis"]
+        assert stats["repaired"] == 1
+        assert stats["repair_rate"] == 1.0
+
+    def test_truncated_output_requests_continuation(self):
+        full = json.dumps(COMPLETE, ensure_ascii=False)
+        head, tail = full[:40], full[40:]
+        client = MagicMock()
+        client.chat.completions.create.return_value = _response(tail)
+
+        result = parse_json_response(client, "analysis", _response(head, "length"), REQUEST, **REQUIRED)
+
+        assert result == COMPLETE
+        messages = client.chat.completions.create.call_args.kwargs["messages"]
+        assert messages[-2] == {"role": "assistant", "content": head}
+        assert messages[-1]["content"] == CONTINUATION_PROMPT
+        assert registry.snapshot()["json_parse"]["analysis"]["continued"] == 1
+
+    def test_failed_after_correction(self):
+        client = MagicMock()
+        client.chat.completions.create.return_value = _response("仍然不是JSON")
+
+        with pytest.raises(json.JSONDecodeError):
+            parse_json_response(client, "analysis", _response("不是JSON"), REQUEST, **REQUIRED)
+
+        stats = registry.snapshot()["json_parse"]["analysis"]
+        assert stats["failed"] == 1
+        assert stats["repair_rate"] == 0.0
+
+    def test_incomplete_after_correction(self):
+        incomplete = {key: value for key, value in COMPLETE.items() if key != "overall_assessment"}
+        client = MagicMock()
+        client.chat.completions.create.return_value = _response(json.dumps(incomplete, ensure_ascii=False))
+
+        with pytest.raises(JSONRepairError):
+            parse_json_response(client, "analysis", _response("不是JSON"), REQUEST, **REQUIRED)
+
+        stats = registry.snapshot()["json_parse"]["analysis"]
+        assert stats["failed"] == 1
+        assert "continued" not in stats
+
+    def test_truncated_output_skips_local_repair(self):
+        """截断在完整结节之后：本地补全会丢失后面的结节，必须续写"""
+        full = json.dumps(
+            {
+                "nodules": [COMPLETE["nodules"][0], {**COMPLETE["nodules"][0], "id": "nodule_2"}],
+                "overall_assessment": {"total_nodules": 2},
+            },
+            ensure_ascii=False,
+        )
+        cut = full.index('{"id": "nodule_2"')
+        client = MagicMock()
+        client.chat.completions.create.return_value = _response(full[cut:])
+
+        result = parse_json_response(client, "analysis", _response(full[:cut], "length"), REQUEST, **REQUIRED)
+
+        assert len(result["nodules"]) == 2
+        client.chat.completions.create.assert_called_once()
+        stats = registry.snapshot()["json_parse"]["analysis"]
+        assert "repaired" not in stats
+        assert stats["continued"] == 1
+
+    def test_truncated_structure_requests_continuation(self):
+        head = '{"findings": "双侧乳腺腺体结构清晰，在右侧乳腺10点查见'
+        tail = '0.8×0.5cm无回声。", "diagnosis": "超声提示：BI-RADS 2类", "recommendation": null}'
+        client = MagicMock()
+        client.chat.completions.create.return_value = _response(tail)
+        requirements = ResultRequirements(fields=("findings", "diagnosis"))
+
+        result = parse_json_response(
+            client, "report_structure", _response(head, "length"), REQUEST, requirements=requirements
+        )
+
+        assert result["diagnosis"] == "超声提示：BI-RADS 2类"
+        assert result["findings"].endswith("无回声。")
@@ -0,0 +1,115 @@
+"""
+测试病灶判断缓存模块
+"""
+
+import json
+import re
+from unittest.mock import MagicMock, patch
+
+from medcrux.analysis.lesion_cache import LesionJudgmentCache, canonicalize_lesion, lesion_cache
+from medcrux.analysis.llm_engine import analyze_birads_independently
+
+FIRST_REPORT = (
+    "在右侧乳腺10点距乳头约2.5cm处查见1.8×1.2cm低回声结节，形态不规则。"
+    "在左侧乳腺1点查见0.5×0.3cm低回声结节，椭圆形，边界清晰。"
+)
+# 复查报告：右乳结节描述只有书写差异，左乳结节增大
+FOLLOW_UP_REPORT = (
+    "在右侧乳腺10点 距乳头约25mm处查见18 x 12mm低回声结节,形态不规则；"
+    "在左侧乳腺1点查见0.9×0.6cm低回声结节，椭圆形，边界清晰。"
+)
+
+
+def _empty_retriever():
+    retriever = MagicMock()
+    retriever.retrieve.return_value = {"entities": [], "relations": [], "inference_paths": [], "confidence": 0.0}
+    return retriever
+
+
+def _create(**kwargs):
+    segment = kwargs["messages"][-1]["content"].split("\n\n", 1)[1]
+    nodule = {"b": "R" if "右" in segment[:4] else "L", "c": re.search(r"(\d+)点", segment).group(1), "k": "3"}
+    content = json.dumps({"nodules": [nodule]}, ensure_ascii=False)
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=content))])
+
+
+class TestCanonicalizeLesion:
+    """测试病灶描述规范化"""
+
+    def test_equivalent_descriptions(self):
+        assert canonicalize_lesion("在右侧乳腺10点距乳头约25mm处查见18 x 12mm低回声结节,形态不规则；") == (
+            canonicalize_lesion("在右侧乳腺10点距乳头约2.5cm处查见1.8×1.2cm低回声结节，形态不规则。")
+        )
+        assert canonicalize_lesion("１.２０×０.８０厘米，ＣＤＦＩ：未见血流") == canonicalize_lesion(
+            "1.2*0.8cm，cdfi:未见血流"
+        )
+
+    def test_different_descriptions(self):
+        assert canonicalize_lesion("0.5×0.3cm低回声结节") != canonicalize_lesion("0.9×0.6cm低回声结节")
+        assert canonicalize_lesion("形态规则") != canonicalize_lesion("形态不规则")
+        assert canonicalize_lesion(None) == ""
+
+
+class TestLesionJudgmentCache:
+    """测试LRU缓存"""
+
+    def test_lru_eviction(self):
+        cache = LesionJudgmentCache(max_size=2)
+        cache.put(("a",), {"nodules": [1]})
+        cache.put(("b",), {"nodules": [2]})
+        assert cache.get(("a",)) == {"nodules": [1]}
+        cache.put(("c",), {"nodules": [3]})
+
+        assert cache.get(("b",)) is None
+        assert cache.get(("a",)) is not None
+        snapshot = cache.snapshot()
+        assert snapshot["size"] == 2
+        assert snapshot["evictions"] == 1
+        assert snapshot["hits"] == 2
+        assert snapshot["misses"] == 1
+
+    def test_returns_copies(self):
+        cache = LesionJudgmentCache()
+        result = {"nodules": [{"id": "nodule_1"}]}
+        cache.put(("a",), result)
+        result["nodules"][0]["id"] = "changed"
+        cache.get(("a",))["nodules"][0]["id"] = "changed"
+        assert cache.get(("a",)) == {"nodules": [{"id": "nodule_1"}]}
+
+    def test_disabled(self):
+        cache = LesionJudgmentCache(max_size=0)
+        cache.put(("a",), {"nodules": []})
+        assert cache.get(("a",)) is None
+        assert cache.snapshot()["enabled"] is False
+
+
+class TestEngineCache:
+    """测试独立BI-RADS判断只对新出现或有变化的病灶调用LLM"""
+
+    @patch("medcrux.analysis.llm_engine._get_retriever", return_value=_empty_retriever())
+    @patch("medcrux.analysis.llm_engine.client")
+    def test_follow_up_only_judges_changed_lesion(self, mock_client, _mock_retriever):
+        mock_client.chat.completions.create.side_effect = _create
+
+        first = analyze_birads_independently(FIRST_REPORT)
+        assert mock_client.chat.completions.create.call_count == 2
+
+        follow_up = analyze_birads_independently(FOLLOW_UP_REPORT)
+        assert mock_client.chat.completions.create.call_count == 3
+        assert [n["id"] for n in follow_up["nodules"]] == ["nodule_1", "nodule_2"]
+        assert follow_up["nodules"] == first["nodules"]
+
+        analyze_birads_independently(FIRST_REPORT)
+        assert mock_client.chat.completions.create.call_count == 3
+        assert lesion_cache.snapshot()["hits"] == 3
+
+    @patch("medcrux.analysis.llm_engine._get_retriever", return_value=_empty_retriever())
+    @patch("medcrux.analysis.llm_engine.client")
+    def test_unsplittable_findings_cached_as_whole(self, mock_client, _mock_retriever):
+        mock_client.chat.completions.create.side_effect = _create
+        findings = "双侧乳腺查见多发低回声结节，较大者位于左乳3点，大小约1.0×0.6cm。"
+
+        analyze_birads_independently(findings)
+        analyze_birads_independently(findings)
+
+        assert mock_client.chat.completions.create.call_count == 1
@@ -0,0 +1,119 @@
+"""
+测试病灶分段和逐病灶并发的独立BI-RADS判断
+"""
+
+import json
+import re
+import threading
+from unittest.mock import MagicMock, patch
+
+from medcrux.analysis.lesion_segmenter import split_lesions
+from medcrux.analysis.llm_engine import analyze_birads_independently
+from medcrux.analysis.llm_rate_limiter import PRIORITY_BATCH, get_priority, llm_priority
+
+FINDINGS = (
+    "双侧乳腺腺体结构清晰。"
+    "在右侧乳腺10点距乳头约2.5cm处查见1.8×1.2cm低回声结节，形态不规则，边界模糊。CDFI：未见明显血流信号。"
+    "在左侧乳腺1点查见0.5×0.3cm低回声结节，椭圆形，边界清晰。"
+    "在左侧乳腺4点查见0.8×0.5cm无回声结节，边界清晰。"
+    "右侧乳腺另未见明显结节。"
+)
+
+
+def _empty_retriever():
+    retriever = MagicMock()
+    retriever.retrieve.return_value = {"entities": [], "relations": [], "inference_paths": [], "confidence": 0.0}
+    return retriever
+
+
+def _compact_response(segment: str):
+    """按病灶描述返回紧凑格式的单结节结果"""
+    birads = "4a" if "不规则" in segment else ("2" if "无回声" in segment else "3")
+    nodule = {"b": "R" if "右" in segment[:4] else "L", "c": re.search(r"(\d+)点", segment).group(1), "k": birads}
+    content = json.dumps({"nodules": [nodule]}, ensure_ascii=False)
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=content))])
+
+
+class TestSplitLesions:
+    """测试病灶分段"""
+
+    def test_split_per_lesion(self):
+        segments = split_lesions(FINDINGS)
+        assert len(segments) == 3
+        assert segments[0].startswith("在右侧乳腺10点")
+        assert "CDFI" in segments[0]
+        assert segments[2].startswith("在左侧乳腺4点")
+
+    def test_nipple_reference_is_not_a_lesion_start(self):
+        findings = (
+            "在左侧乳腺3点距左乳头约2cm处查见0.5×0.3cm低回声结节，椭圆形。"
+            "在右侧乳腺9点右乳晕旁查见0.8×0.5cm无回声结节，边界清晰。"
+        )
+        segments = split_lesions(findings)
+        assert len(segments) == 2
+        assert "距左乳头约2cm" in segments[0]
+        assert "右乳晕旁" in segments[1]
+
+    def test_cannot_split(self):
+        assert split_lesions("双侧乳腺查见多发低回声结节，较大者位于左乳3点。") == []
+        assert split_lesions("乳腺内查见低回声结节，位于左乳3点。") == []
+        assert split_lesions("左乳3点、右乳5点各查见一低回声结节。") == []
+        assert split_lesions("") == []
+
+
+class TestConcurrentIndependentBirads:
+    """测试逐病灶并发判断"""
+
+    @patch("medcrux.analysis.llm_engine._get_retriever", return_value=_empty_retriever())
+    @patch("medcrux.analysis.llm_engine.client")
+    def test_lesions_judged_concurrently(self, mock_client, _mock_retriever, monkeypatch):
+        monkeypatch.delenv("MEDCRUX_LLM_SCHEMA", raising=False)
+        # 三个请求必须同时在途才能通过屏障，串行执行会超时
+        barrier = threading.Barrier(3, timeout=5)
+        priorities = []
+
+        def create(**kwargs):
+            priorities.append(get_priority())
+            barrier.wait()
+            return _compact_response(kwargs["messages"][-1]["content"].split("\n\n", 1)[1])
+
+        mock_client.chat.completions.create.side_effect = create
+
+        with llm_priority(PRIORITY_BATCH):
+            result = analyze_birads_independently(FINDINGS)
+
+        assert mock_client.chat.completions.create.call_count == 3
+        assert [n["id"] for n in result["nodules"]] == ["nodule_1", "nodule_2", "nodule_3"]
+        assert [n["location"]["clock_position"] for n in result["nodules"]] == ["10点", "1点", "4点"]
+        assert [n["llm_birads_class"] for n in result["nodules"]] == ["4a", "3", "2"]
+        assert result["llm_highest_birads"] == "4a"
+        # 工作线程继承调用方的优先级
+        assert priorities == [PRIORITY_BATCH] * 3
+
+    @patch("medcrux.analysis.llm_engine._get_retriever", return_value=_empty_retriever())
+    @patch("medcrux.analysis.llm_engine.client")
+    def test_single_lesion_uses_one_call(self, mock_client, _mock_retriever):
+        mock_client.chat.completions.create.side_effect = lambda **kwargs: _compact_response("在左侧乳腺3点查见结节")
+
+        result = analyze_birads_independently("在左侧乳腺3点查见0.5×0.3cm低回声结节，椭圆形，边界清晰。")
+
+        assert mock_client.chat.completions.create.call_count == 1
+        assert len(result["nodules"]) == 1
+
+    @patch("medcrux.analysis.llm_engine._get_retriever", return_value=_empty_retriever())
+    @patch("medcrux.analysis.llm_engine.client")
+    def test_fanout_failure_falls_back_to_single_call(self, mock_client, _mock_retriever):
+        def create(**kwargs):
+            content = kwargs["messages"][-1]["content"]
+            if "一个病灶" in content:
+                raise ValueError
+            return _compact_response("在左侧乳腺3点查见结节")
+
+        mock_client.chat.completions.create.side_effect = create
+
+        with patch("medcrux.analysis.llm_engine.LESION_FANOUT_WORKERS", 2):
+            result = analyze_birads_independently(FINDINGS)
+
+        assert "error" not in result
+        assert len(result["nodules"]) == 1
+        assert "一个病灶" not in mock_client.chat.completions.create.call_args.kwargs["messages"][-1]["content"]
@@ -0,0 +1,136 @@
+"""
+测试LLM录制回放
+"""
+
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+import openai
+import pytest
+from openai.types.chat import ChatCompletion
+
+from medcrux.analysis import llm_provider
+from medcrux.analysis.lesion_cache import lesion_cache
+from medcrux.analysis.llm_cassette import (
+    CASSETTE_RECORD,
+    CASSETTE_REPLAY,
+    CassetteClient,
+    CassetteMissError,
+    request_key,
+)
+from medcrux.analysis.llm_engine import analyze_birads_independently
+
+REQUEST = {"model": "deepseek-chat", "messages": [{"role": "user", "content": "你好"}], "temperature": 0.1}
+
+
+def _completion(content: str) -> ChatCompletion:
+    return ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "deepseek-chat",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+        }
+    )
+
+
+def _slow_client(contents: list[str], delay: float = 0.0) -> MagicMock:
+    responses = iter(contents)
+
+    def create(**_kwargs):
+        time.sleep(delay)
+        return _completion(next(responses))
+
+    inner = MagicMock()
+    inner.chat.completions.create.side_effect = create
+    return inner
+
+
+def _empty_retriever():
+    retriever = MagicMock()
+    retriever.retrieve.return_value = {"entities": [], "relations": [], "inference_paths": [], "confidence": 0.0}
+    return retriever
+
+
+class TestCassetteClient:
+    """测试录制和回放"""
+
+    def test_record_then_replay(self, tmp_path):
+        recorder = CassetteClient(tmp_path, CASSETTE_RECORD, inner=_slow_client(["第一次", "第二次"], delay=0.05))
+        recorder.chat.completions.create(timeout=30, **REQUEST)
+        recorder.chat.completions.create(timeout=10, **REQUEST)
+
+        cassette = json.loads((tmp_path / f"{request_key(REQUEST)}.json").read_text(encoding="utf-8"))
+        assert "timeout" not in cassette["request"]
+        assert [i["response"]["choices"][0]["message"]["content"] for i in cassette["interactions"]] == [
+            "第一次",
+            "第二次",
+        ]
+        assert all(i["latency"] >= 0.05 for i in cassette["interactions"])
+
+        player = CassetteClient(tmp_path, CASSETTE_REPLAY, latency_scale=0)
+        contents = [player.chat.completions.create(**REQUEST).choices[0].message.content for _ in range(3)]
+        # 按录制顺序循环返回
+        assert contents == ["第一次", "第二次", "第一次"]
+        assert player.chat.completions.create(**REQUEST).usage.prompt_tokens == 100
+
+    def test_replay_latency_is_scaled(self, tmp_path):
+        recorder = CassetteClient(tmp_path, CASSETTE_RECORD, inner=_slow_client(["结果"], delay=0.2))
+        recorder.chat.completions.create(**REQUEST)
+
+        player = CassetteClient(tmp_path, CASSETTE_REPLAY, latency_scale=0.5)
+        start = time.perf_counter()
+        player.chat.completions.create(**REQUEST)
+        assert 0.09 <= time.perf_counter() - start < 0.2
+
+    def test_replay_timeout(self, tmp_path):
+        recorder = CassetteClient(tmp_path, CASSETTE_RECORD, inner=_slow_client(["结果"], delay=0.2))
+        recorder.chat.completions.create(**REQUEST)
+
+        player = CassetteClient(tmp_path, CASSETTE_REPLAY)
+        with pytest.raises(openai.APITimeoutError):
+            player.chat.completions.create(timeout=0.05, **REQUEST)
+
+    def test_replay_miss(self, tmp_path):
+        player = CassetteClient(tmp_path, CASSETTE_REPLAY)
+        with pytest.raises(CassetteMissError):
+            player.chat.completions.create(**REQUEST)
+
+
+class TestCassettePipeline:
+    """测试通过录制回放运行真实分析流程"""
+
+    @patch("medcrux.analysis.llm_engine._get_retriever", return_value=_empty_retriever())
+    def test_independent_birads_replay_matches_recording(self, _mock_retriever, tmp_path, monkeypatch):
+        monkeypatch.delenv("MEDCRUX_LLM_SCHEMA", raising=False)
+        findings = "双侧乳腺查见多发低回声结节，较大者位于左乳3点，大小约1.2×0.8cm，边界清晰。"
+        content = json.dumps({"nodules": [{"b": "L", "c": "3", "k": "3"}]})
+
+        recorder = CassetteClient(tmp_path, CASSETTE_RECORD, inner=_slow_client([content]))
+        with patch("medcrux.analysis.llm_engine.client", recorder):
+            recorded = analyze_birads_independently(findings)
+
+        lesion_cache.clear()
+        player = CassetteClient(tmp_path, CASSETTE_REPLAY, latency_scale=0)
+        with patch("medcrux.analysis.llm_engine.client", player):
+            replayed = analyze_birads_independently(findings)
+
+        assert replayed == recorded
+        assert replayed["llm_highest_birads"] == "3"
+
+    def test_replay_mode_needs_no_api_key(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("DEEPSEEK_API_KEY", raising=False)
+        monkeypatch.delenv("MEDCRUX_LLM_API_KEY", raising=False)
+        monkeypatch.setenv("MEDCRUX_LLM_CASSETTE_MODE", "replay")
+        monkeypatch.setenv("MEDCRUX_LLM_CASSETTE_DIR", str(tmp_path))
+        llm_provider.reset_client()
+        try:
+            assert llm_provider.is_llm_configured()
+            client = llm_provider.get_client()
+            assert isinstance(client, CassetteClient)
+            assert client.directory == tmp_path
+        finally:
+            llm_provider.reset_client()
@@ -0,0 +1,170 @@
+"""
+测试LLM熔断器和本地降级模式
+"""
+
+from unittest.mock import MagicMock, patch
+
+import httpx
+import openai
+import pytest
+from fastapi.testclient import TestClient
+
+from medcrux.analysis import llm_client
+from medcrux.analysis.llm_circuit_breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    LLMCircuitOpenError,
+    breaker,
+)
+from medcrux.analysis.llm_client import StagePolicy, create_chat_completion
+from medcrux.api.main import app
+
+REQUEST = httpx.Request("POST", "https://api.deepseek.com/chat/completions")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker:
+    """测试熔断器状态转换"""
+
+    def test_opens_after_consecutive_failures(self):
+        cb = CircuitBreaker(failure_threshold=3, open_seconds=10.0, clock=FakeClock())
+        cb.record_failure()
+        cb.record_failure()
+        cb.record_success()
+        cb.record_failure()
+        cb.record_failure()
+        assert cb.allow_request()
+
+        cb.record_failure()
+        assert cb.is_open()
+        assert not cb.allow_request()
+
+    def test_slow_calls_count_as_failures(self):
+        cb = CircuitBreaker(failure_threshold=2, clock=FakeClock())
+        cb.record_success(latency=50.0, slow_threshold=45.0)
+        cb.record_success(latency=50.0, slow_threshold=45.0)
+        assert cb.snapshot()["state"] == STATE_OPEN
+
+    def test_half_open_probe_recovers(self):
+        clock = FakeClock()
+        cb = CircuitBreaker(failure_threshold=1, open_seconds=10.0, clock=clock)
+        cb.record_failure()
+
+        clock.now = 11.0
+        assert not cb.is_open()
+        assert cb.allow_request()
+        assert cb.snapshot()["state"] == STATE_HALF_OPEN
+        # 探测请求进行中，其他请求仍被拒绝
+        assert not cb.allow_request()
+
+        cb.record_success()
+        assert cb.snapshot()["state"] == STATE_CLOSED
+        assert cb.allow_request()
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        cb = CircuitBreaker(failure_threshold=1, open_seconds=10.0, clock=clock)
+        cb.record_failure()
+        clock.now = 11.0
+        assert cb.allow_request()
+
+        cb.record_failure()
+        assert cb.is_open()
+        assert cb.snapshot()["retry_after"] == pytest.approx(10.0)
+
+
+class TestBreakerIntegration:
+    """测试LLM调用与熔断器的集成"""
+
+    def test_open_breaker_rejects_without_calling_client(self):
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        client = MagicMock()
+
+        with pytest.raises(LLMCircuitOpenError):
+            create_chat_completion(client, "analysis", messages=[])
+        client.chat.completions.create.assert_not_called()
+
+    def test_transient_errors_open_breaker_and_stop_retries(self):
+        client = MagicMock()
+        client.chat.completions.create.side_effect = openai.APIConnectionError(request=REQUEST)
+        policy = StagePolicy(timeout=3.0, deadline=10.0, max_retries=10, backoff_base=0.001)
+
+        with (
+            patch.dict(llm_client.STAGE_POLICIES, {"test_stage": policy}),
+            pytest.raises(LLMCircuitOpenError),
+        ):
+            create_chat_completion(client, "test_stage", messages=[])
+
+        assert client.chat.completions.create.call_count == breaker.failure_threshold
+        assert breaker.is_open()
+
+    def test_permanent_errors_do_not_open_breaker(self):
+        client = MagicMock()
+        response = httpx.Response(401, request=REQUEST)
+        client.chat.completions.create.side_effect = openai.APIStatusError("error", response=response, body=None)
+
+        for _ in range(breaker.failure_threshold):
+            with pytest.raises(openai.APIStatusError):
+                create_chat_completion(client, "analysis", messages=[])
+        assert not breaker.is_open()
+
+
+class TestDegradedMode:
+    """测试熔断时的本地降级结果"""
+
+    @patch("medcrux.api.main.analyze_text_with_deepseek")
+    @patch("medcrux.api.main.parse_report_structure")
+    @patch("medcrux.api.main.extract_text_from_bytes")
+    def test_returns_local_result_when_open(self, mock_extract, mock_parse, mock_analyze):
+        mock_extract.return_value = (
+            "超声描述：左乳低回声结节，形态不规则，边缘毛刺状。超声提示：左侧乳腺低回声结节，BI-RADS 4A类。"
+        )
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        response = TestClient(app).post(
+            "/api/analyze/upload", files={"file": ("test.jpg", b"fake image data", "image/jpeg")}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["degraded"] is True
+        assert data["ocr_text"] == mock_extract.return_value
+        assert data["ai_result"]["birads_class"] == "4A"
+        assert data["ai_result"]["risk_signs"]
+        mock_parse.assert_not_called()
+        mock_analyze.assert_not_called()
+
+    @patch("medcrux.api.main.extract_text_from_bytes")
+    def test_local_result_limited_to_breast_exam(self, mock_extract):
+        mock_extract.return_value = (
+            "体检中心超声检查报告\n姓名：[姓名] 性别：女\n"
+            "甲状腺超声\n检查所见：甲状腺左叶查见低回声结节，形态不规则，内见微钙化。\n"
+            "超声提示：甲状腺结节，TI-RADS 4类。\n"
+            "乳腺超声\n检查所见：在左侧乳腺3点钟方向查见1.2×0.8cm低回声结节，边界清晰，形态规则。\n"
+            "超声提示：左侧乳腺低回声结节，BI-RADS 3类。"
+        )
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        response = TestClient(app).post(
+            "/api/analyze/upload", files={"file": ("test.jpg", b"fake image data", "image/jpeg")}
+        )
+
+        result = response.json()["ai_result"]
+        assert result["doctor_birads"]["birads_list"] == ["3"]
+        assert not any("钙化" in sign["sign"] or "不规则" in sign["sign"] for sign in result["risk_signs"])
+
+    def test_metrics_include_breaker_state(self):
+        response = TestClient(app).get("/api/metrics/llm")
+        assert response.json()["circuit_breaker"]["state"] == STATE_CLOSED
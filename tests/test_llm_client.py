@@ -0,0 +1,160 @@
+"""
+测试LLM调用策略模块（超时、有限重试、对冲请求）
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import httpx
+import openai
+import pytest
+
+from medcrux.analysis import llm_client
+from medcrux.analysis.llm_client import (
+    LLMDeadlineExceededError,
+    StagePolicy,
+    create_chat_completion,
+    is_transient_error,
+)
+from medcrux.analysis.llm_metrics import LLMCallRecord, registry
+
+REQUEST = httpx.Request("POST", "https://api.deepseek.com/chat/completions")
+
+
+def _status_error(status_code: int) -> openai.APIStatusError:
+    response = httpx.Response(status_code, request=REQUEST)
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+def _with_policy(policy: StagePolicy):
+    return patch.dict(llm_client.STAGE_POLICIES, {"test_stage": policy})
+
+
+class TestTransientErrors:
+    """测试瞬时错误判断"""
+
+    def test_connection_and_timeout_errors_are_transient(self):
+        assert is_transient_error(openai.APIConnectionError(request=REQUEST))
+        assert is_transient_error(openai.APITimeoutError(request=REQUEST))
+        assert is_transient_error(TimeoutError())
+
+    def test_status_codes(self):
+        assert is_transient_error(_status_error(429))
+        assert is_transient_error(_status_error(503))
+        assert not is_transient_error(_status_error(400))
+        assert not is_transient_error(_status_error(401))
+
+    def test_other_errors_are_not_transient(self):
+        assert not is_transient_error(ValueError("bad"))
+
+
+class TestCreateChatCompletion:
+    """测试按阶段策略调用"""
+
+    def test_passes_timeout_and_kwargs(self):
+        client = MagicMock()
+        client.chat.completions.create.return_value = "ok"
+        with _with_policy(StagePolicy(timeout=3.0, deadline=10.0)):
+            result = create_chat_completion(client, "test_stage", model="deepseek-chat", messages=[])
+
+        assert result == "ok"
+        kwargs = client.chat.completions.create.call_args.kwargs
+        assert kwargs["timeout"] == 3.0
+        assert kwargs["model"] == "deepseek-chat"
+
+    def test_retries_transient_errors(self):
+        client = MagicMock()
+        client.chat.completions.create.side_effect = [openai.APIConnectionError(request=REQUEST), "ok"]
+        with _with_policy(StagePolicy(timeout=3.0, deadline=10.0, backoff_base=0.01)):
+            result = create_chat_completion(client, "test_stage", messages=[])
+
+        assert result == "ok"
+        assert client.chat.completions.create.call_count == 2
+
+    def test_does_not_retry_permanent_errors(self):
+        client = MagicMock()
+        client.chat.completions.create.side_effect = _status_error(401)
+        with (
+            _with_policy(StagePolicy(timeout=3.0, deadline=10.0, backoff_base=0.01)),
+            pytest.raises(openai.APIStatusError),
+        ):
+            create_chat_completion(client, "test_stage", messages=[])
+
+        assert client.chat.completions.create.call_count == 1
+
+    def test_retries_are_bounded(self):
+        client = MagicMock()
+        client.chat.completions.create.side_effect = openai.APIConnectionError(request=REQUEST)
+        with (
+            _with_policy(StagePolicy(timeout=3.0, deadline=10.0, max_retries=2, backoff_base=0.01)),
+            pytest.raises(openai.APIConnectionError),
+        ):
+            create_chat_completion(client, "test_stage", messages=[])
+
+        assert client.chat.completions.create.call_count == 3
+
+    def test_deadline_stops_retries(self):
+        client = MagicMock()
+        client.chat.completions.create.side_effect = openai.APIConnectionError(request=REQUEST)
+        policy = StagePolicy(timeout=3.0, deadline=0.05, max_retries=10, backoff_base=1.0, backoff_max=1.0)
+        with (
+            _with_policy(policy),
+            patch("medcrux.analysis.llm_client.random.uniform", return_value=1.0),
+            pytest.raises(LLMDeadlineExceededError),
+        ):
+            create_chat_completion(client, "test_stage", messages=[])
+
+        assert client.chat.completions.create.call_count == 1
+
+
+class TestHedging:
+    """测试对冲请求"""
+
+    def test_hedged_request_wins_when_primary_is_slow(self):
+        release = threading.Event()
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                release.wait(2)
+                return "slow"
+            return "fast"
+
+        client = MagicMock()
+        client.chat.completions.create.side_effect = create
+        policy = StagePolicy(timeout=3.0, deadline=10.0, hedge=True, hedge_min_delay=0.05)
+        with _with_policy(policy):
+            start = time.monotonic()
+            result = create_chat_completion(client, "test_stage", messages=[])
+            elapsed = time.monotonic() - start
+        release.set()
+
+        assert result == "fast"
+        assert len(calls) == 2
+        assert elapsed < 1.0
+
+    def test_no_hedge_when_primary_is_fast(self):
+        client = MagicMock()
+        client.chat.completions.create.return_value = "ok"
+        policy = StagePolicy(timeout=3.0, deadline=10.0, hedge=True, hedge_min_delay=0.5)
+        with _with_policy(policy):
+            result = create_chat_completion(client, "test_stage", messages=[])
+
+        assert result == "ok"
+        assert client.chat.completions.create.call_count == 1
+
+    def test_hedge_delay_uses_observed_percentile(self):
+        for latency in range(1, 101):
+            registry.record(LLMCallRecord(stage="test_stage", model="m", latency=latency / 10, outcome="success"))
+        policy = StagePolicy(timeout=30.0, deadline=60.0, hedge=True, hedge_percentile=0.95, hedge_min_delay=1.0)
+
+        assert llm_client._hedge_delay("test_stage", policy) == pytest.approx(9.6)
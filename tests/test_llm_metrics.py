@@ -0,0 +1,120 @@
+"""
+测试LLM调用指标模块（按阶段的token和延迟统计）
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import httpx
+import openai
+import pytest
+from fastapi.testclient import TestClient
+
+from medcrux.analysis import llm_client
+from medcrux.analysis.llm_client import StagePolicy, create_chat_completion
+from medcrux.analysis.llm_metrics import LLMCallRecord, extract_usage, registry
+from medcrux.api.main import app
+
+REQUEST = httpx.Request("POST", "https://api.deepseek.com/chat/completions")
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+class TestExtractUsage:
+    """测试token用量提取"""
+
+    def test_deepseek_cache_fields(self):
+        usage = SimpleNamespace(prompt_tokens=120, completion_tokens=30, prompt_cache_hit_tokens=100)
+        assert extract_usage(SimpleNamespace(usage=usage)) == {
+            "prompt_tokens": 120,
+            "cached_tokens": 100,
+            "completion_tokens": 30,
+        }
+
+    def test_openai_cache_fields(self):
+        usage = SimpleNamespace(
+            prompt_tokens=50, completion_tokens=10, prompt_tokens_details=SimpleNamespace(cached_tokens=40)
+        )
+        assert extract_usage(SimpleNamespace(usage=usage))["cached_tokens"] == 40
+
+    def test_missing_usage(self):
+        assert extract_usage(MagicMock(usage=None))["prompt_tokens"] == 0
+        # Mock对象的属性不是整数，应被忽略
+        assert extract_usage(MagicMock())["completion_tokens"] == 0
+
+
+class TestMetricsRegistry:
+    """测试指标注册表"""
+
+    def test_snapshot_aggregates_by_stage_and_model(self):
+        registry.record(LLMCallRecord("analysis", "deepseek-chat", 2.0, "success", prompt_tokens=1000))
+        registry.record(LLMCallRecord("analysis", "deepseek-chat", 4.0, "success", completion_tokens=300))
+        registry.record(LLMCallRecord("analysis", "deepseek-chat", 1.0, "error", error_type="APIConnectionError"))
+        registry.record(LLMCallRecord("report_structure", "deepseek-chat", 1.0, "timeout"))
+
+        stages = registry.snapshot()["stages"]
+        analysis = stages["analysis"]
+        assert analysis["calls"] == 3
+        assert analysis["success"] == 2
+        assert analysis["errors"] == 1
+        assert analysis["prompt_tokens"] == 1000
+        assert analysis["completion_tokens"] == 300
+        assert analysis["avg_latency"] == pytest.approx(7.0 / 3, abs=1e-3)
+        assert analysis["models"]["deepseek-chat"]["calls"] == 3
+        assert stages["report_structure"]["timeouts"] == 1
+
+    def test_latency_percentile_uses_successful_calls(self):
+        for latency in range(1, 21):
+            registry.record(LLMCallRecord("analysis", "m", float(latency), "success"))
+        registry.record(LLMCallRecord("analysis", "m", 100.0, "error"))
+
+        assert registry.latency_percentile("analysis", 0.5) == pytest.approx(11.0)
+        assert registry.latency_percentile("analysis", 0.5, min_samples=50) is None
+
+    def test_recent_returns_latest_first(self):
+        registry.record(LLMCallRecord("analysis", "m", 1.0, "success", timestamp=1.0))
+        registry.record(LLMCallRecord("analysis", "m", 2.0, "success", timestamp=2.0))
+
+        recent = registry.recent(limit=1)
+        assert recent[0]["latency"] == pytest.approx(2.0)
+
+
+class TestCallRecording:
+    """测试LLM调用自动记录指标"""
+
+    def test_every_attempt_is_recorded(self):
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, prompt_cache_hit_tokens=0)
+        client = MagicMock()
+        client.chat.completions.create.side_effect = [
+            openai.APITimeoutError(request=REQUEST),
+            SimpleNamespace(usage=usage),
+        ]
+        with patch.dict(
+            llm_client.STAGE_POLICIES, {"test_stage": StagePolicy(timeout=3.0, deadline=10.0, backoff_base=0.01)}
+        ):
+            create_chat_completion(client, "test_stage", model="deepseek-chat", messages=[])
+
+        stage = registry.snapshot()["stages"]["test_stage"]
+        assert stage["calls"] == 2
+        assert stage["timeouts"] == 1
+        assert stage["success"] == 1
+        assert stage["prompt_tokens"] == 10
+
+
+class TestMetricsEndpoint:
+    """测试指标查询接口"""
+
+    def test_get_llm_metrics(self):
+        registry.record(LLMCallRecord("analysis", "deepseek-chat", 1.5, "success", prompt_tokens=800))
+
+        response = TestClient(app).get("/api/metrics/llm", params={"recent": 5})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["stages"]["analysis"]["prompt_tokens"] == 800
+        assert len(data["recent"]) == 1
@@ -0,0 +1,89 @@
+"""
+测试LLM后端模块（后端切换、延迟创建客户端）
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from medcrux.analysis import llm_provider
+from medcrux.analysis.llm_provider import (
+    LOCAL_STUB_BASE_URL,
+    LazyLLMClient,
+    LLMNotConfiguredError,
+    get_client,
+    get_provider_config,
+    is_llm_configured,
+    reset_client,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_provider_env(monkeypatch):
+    for name in ("MEDCRUX_LLM_PROVIDER", "MEDCRUX_LLM_BASE_URL", "MEDCRUX_LLM_API_KEY", "MEDCRUX_LLM_MODEL"):
+        monkeypatch.delenv(name, raising=False)
+    reset_client()
+    yield
+    reset_client()
+
+
+class TestProviderConfig:
+    """测试后端配置解析"""
+
+    def test_default_is_deepseek(self, monkeypatch):
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "sk-test")
+        config = get_provider_config()
+        assert config.name == "deepseek"
+        assert config.base_url == "https://api.deepseek.com"
+        assert config.api_key == "sk-test"
+        assert config.model == "deepseek-chat"
+
+    def test_local_stub_provider(self, monkeypatch):
+        monkeypatch.delenv("DEEPSEEK_API_KEY", raising=False)
+        monkeypatch.setenv("MEDCRUX_LLM_PROVIDER", "local")
+        config = get_provider_config()
+        assert config.base_url == LOCAL_STUB_BASE_URL
+        assert config.api_key
+        assert is_llm_configured()
+
+    def test_any_openai_compatible_endpoint(self, monkeypatch):
+        monkeypatch.setenv("MEDCRUX_LLM_BASE_URL", "http://llm.internal:8000/v1")
+        monkeypatch.setenv("MEDCRUX_LLM_API_KEY", "internal-key")
+        monkeypatch.setenv("MEDCRUX_LLM_MODEL", "qwen2.5-72b")
+        config = get_provider_config()
+        assert config.base_url == "http://llm.internal:8000/v1"
+        assert config.api_key == "internal-key"
+        assert config.model == "qwen2.5-72b"
+
+    def test_unknown_provider_falls_back_to_deepseek(self, monkeypatch):
+        monkeypatch.setenv("MEDCRUX_LLM_PROVIDER", "unknown")
+        assert get_provider_config().name == "deepseek"
+
+    def test_not_configured_without_key(self, monkeypatch):
+        monkeypatch.delenv("DEEPSEEK_API_KEY", raising=False)
+        assert not is_llm_configured()
+        with pytest.raises(LLMNotConfiguredError, match="deepseek"):
+            get_client()
+
+
+class TestLazyClient:
+    """测试延迟创建的客户端"""
+
+    def test_client_created_on_first_use_and_reused(self, monkeypatch):
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "sk-test")
+        with patch.object(llm_provider, "OpenAI") as mock_openai:
+            lazy = LazyLLMClient()
+            mock_openai.assert_not_called()
+
+            _ = lazy.chat
+            _ = lazy.chat
+            assert mock_openai.call_count == 1
+            assert mock_openai.call_args.kwargs["max_retries"] == 0
+
+    def test_reset_client_recreates(self, monkeypatch):
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "sk-test")
+        with patch.object(llm_provider, "OpenAI") as mock_openai:
+            get_client()
+            reset_client()
+            get_client()
+            assert mock_openai.call_count == 2
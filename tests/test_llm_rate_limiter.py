@@ -0,0 +1,157 @@
+"""
+测试LLM限流模块（跨进程令牌桶、交互式/批处理优先级）
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from medcrux.analysis.llm_circuit_breaker import STATE_HALF_OPEN, CircuitBreaker
+from medcrux.analysis.llm_client import LLMCircuitOpenError, LLMDeadlineExceededError, create_chat_completion
+from medcrux.analysis.llm_rate_limiter import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    RateLimitConfig,
+    RateLimiter,
+    estimate_request_tokens,
+    get_priority,
+    llm_priority,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _limiter(tmp_path, clock, rpm=None, tpm=None, reserve=0.2):
+    config = RateLimitConfig(requests_per_minute=rpm, tokens_per_minute=tpm, batch_reserve=reserve)
+    return RateLimiter(config, tmp_path / "rate.json", clock=clock, sleep=clock.sleep)
+
+
+class TestRateLimiter:
+    """测试令牌桶"""
+
+    def test_disabled_without_limits(self, tmp_path, clock):
+        limiter = _limiter(tmp_path, clock)
+        assert not limiter.enabled
+        assert limiter.acquire(10**6, timeout=0)
+
+    def test_requests_per_minute(self, tmp_path, clock):
+        limiter = _limiter(tmp_path, clock, rpm=2)
+        assert limiter.acquire(100, timeout=0)
+        assert limiter.acquire(100, timeout=0)
+        assert not limiter.acquire(100, timeout=0)
+
+        clock.now += 30
+        assert limiter.acquire(100, timeout=0)
+
+    def test_tokens_per_minute(self, tmp_path, clock):
+        limiter = _limiter(tmp_path, clock, tpm=1000)
+        assert limiter.acquire(800, timeout=0)
+        assert not limiter.acquire(800, timeout=0)
+
+    def test_acquire_waits_for_refill(self, tmp_path, clock):
+        limiter = _limiter(tmp_path, clock, rpm=60)
+        for _ in range(60):
+            assert limiter.acquire(1, timeout=0)
+
+        start = clock.now
+        assert limiter.acquire(1, timeout=5)
+        assert clock.now - start == pytest.approx(1.0)
+
+    def test_state_is_shared_between_limiters(self, tmp_path, clock):
+        """同一状态文件的两个实例（相当于两个worker进程）共享令牌"""
+        worker_a = _limiter(tmp_path, clock, rpm=2)
+        worker_b = _limiter(tmp_path, clock, rpm=2)
+        assert worker_a.acquire(1, timeout=0)
+        assert worker_b.acquire(1, timeout=0)
+        assert not worker_a.acquire(1, timeout=0)
+        assert worker_b.snapshot()["buckets"]["requests"]["available"] == pytest.approx(0.0)
+
+    def test_batch_keeps_reserve_for_interactive(self, tmp_path, clock):
+        limiter = _limiter(tmp_path, clock, rpm=10, reserve=0.2)
+        for _ in range(8):
+            assert limiter.acquire(1, timeout=0, priority=PRIORITY_BATCH)
+        assert not limiter.acquire(1, timeout=0, priority=PRIORITY_BATCH)
+
+        assert limiter.acquire(1, timeout=0, priority=PRIORITY_INTERACTIVE)
+        assert limiter.acquire(1, timeout=0, priority=PRIORITY_INTERACTIVE)
+
+    def test_oversized_request_passes_when_bucket_full(self, tmp_path, clock):
+        limiter = _limiter(tmp_path, clock, tpm=1000)
+        assert limiter.acquire(5000, timeout=0)
+        assert not limiter.acquire(10, timeout=0)
+
+
+class TestPriorityAndEstimate:
+    """测试优先级上下文和token估算"""
+
+    def test_priority_context(self):
+        assert get_priority() == PRIORITY_INTERACTIVE
+        with llm_priority(PRIORITY_BATCH):
+            assert get_priority() == PRIORITY_BATCH
+        assert get_priority() == PRIORITY_INTERACTIVE
+
+    def test_estimate_request_tokens(self):
+        kwargs = {"messages": [{"role": "user", "content": "左乳低回声结节"}], "max_tokens": 200}
+        assert estimate_request_tokens(kwargs) > 200
+        assert estimate_request_tokens({"messages": []}) == 1000
+
+
+class TestClientIntegration:
+    """测试LLM调用前排队"""
+
+    def test_rate_limit_timeout_raises_deadline_error(self):
+        limiter = MagicMock()
+        limiter.acquire.return_value = False
+        client = MagicMock()
+
+        with patch("medcrux.analysis.llm_client.rate_limiter", limiter), pytest.raises(LLMDeadlineExceededError):
+            create_chat_completion(client, "analysis", messages=[{"role": "user", "content": "text"}])
+
+        client.chat.completions.create.assert_not_called()
+
+    def test_open_breaker_does_not_consume_tokens(self):
+        limiter = MagicMock()
+        breaker = MagicMock()
+        breaker.allow_request.return_value = False
+        client = MagicMock()
+
+        with (
+            patch("medcrux.analysis.llm_client.rate_limiter", limiter),
+            patch("medcrux.analysis.llm_client.breaker", breaker),
+            pytest.raises(LLMCircuitOpenError),
+        ):
+            create_chat_completion(client, "analysis", messages=[{"role": "user", "content": "text"}])
+
+        limiter.acquire.assert_not_called()
+
+    def test_rate_limit_timeout_releases_half_open_probe(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, open_seconds=10, clock=clock)
+        breaker.record_failure()
+        clock.sleep(11)
+        limiter = MagicMock()
+        limiter.acquire.return_value = False
+
+        with (
+            patch("medcrux.analysis.llm_client.rate_limiter", limiter),
+            patch("medcrux.analysis.llm_client.breaker", breaker),
+            pytest.raises(LLMDeadlineExceededError),
+        ):
+            create_chat_completion(MagicMock(), "analysis", messages=[{"role": "user", "content": "text"}])
+
+        # 探测请求没有发出，下一次调用仍可作为探测请求放行
+        assert breaker.snapshot()["state"] == STATE_HALF_OPEN
+        assert breaker.allow_request() is True
@@ -0,0 +1,120 @@
+"""
+测试LLM模型路由模块（按阶段配置、按延迟目标切换模型）
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from medcrux.analysis.llm_client import STAGE_ANALYSIS, STAGE_REPORT_STRUCTURE, create_chat_completion, get_stage_policy
+from medcrux.analysis.llm_metrics import OUTCOME_SUCCESS, OUTCOME_TIMEOUT, LLMCallRecord, LLMMetricsRegistry
+from medcrux.analysis.llm_router import (
+    MIN_LATENCY_SAMPLES,
+    ModelRouter,
+    get_stage_config,
+    record_stage_model,
+    track_stage_models,
+)
+
+
+@pytest.fixture
+def fallback_env(monkeypatch):
+    monkeypatch.setenv("MEDCRUX_LLM_ANALYSIS_MODEL", "deepseek-reasoner")
+    monkeypatch.setenv("MEDCRUX_LLM_ANALYSIS_FALLBACK_MODEL", "deepseek-chat")
+    monkeypatch.setenv("MEDCRUX_LLM_ANALYSIS_P95_TARGET", "10")
+
+
+def _record(metrics: LLMMetricsRegistry, model: str, latency: float, outcome: str = OUTCOME_SUCCESS):
+    for _ in range(MIN_LATENCY_SAMPLES):
+        metrics.record(LLMCallRecord(stage=STAGE_ANALYSIS, model=model, latency=latency, outcome=outcome))
+
+
+class TestStageConfig:
+    """测试阶段配置"""
+
+    def test_defaults(self, monkeypatch):
+        monkeypatch.delenv("MEDCRUX_LLM_MODEL", raising=False)
+        config = get_stage_config(STAGE_REPORT_STRUCTURE)
+        assert config.model == "deepseek-chat"
+        assert config.max_tokens is None
+        assert config.can_fall_back is False
+        assert get_stage_policy(STAGE_REPORT_STRUCTURE).timeout == 20.0
+
+    def test_env_overrides(self, monkeypatch):
+        monkeypatch.setenv("MEDCRUX_LLM_REPORT_STRUCTURE_MODEL", "fast-model")
+        monkeypatch.setenv("MEDCRUX_LLM_REPORT_STRUCTURE_MAX_TOKENS", "800")
+        monkeypatch.setenv("MEDCRUX_LLM_REPORT_STRUCTURE_TIMEOUT", "90")
+        monkeypatch.setenv("MEDCRUX_LLM_REPORT_STRUCTURE_P95_TARGET", "abc")
+
+        config = get_stage_config(STAGE_REPORT_STRUCTURE)
+        assert config.model == "fast-model"
+        assert config.max_tokens == 800
+        assert config.latency_target is None
+        policy = get_stage_policy(STAGE_REPORT_STRUCTURE)
+        assert policy.timeout == 90.0
+        assert policy.deadline >= 90.0
+
+    def test_max_tokens_applied_to_requests(self, monkeypatch):
+        monkeypatch.setenv("MEDCRUX_LLM_ANALYSIS_MAX_TOKENS", "1200")
+        client = MagicMock()
+
+        create_chat_completion(client, STAGE_ANALYSIS, model="deepseek-chat", messages=[])
+        assert client.chat.completions.create.call_args.kwargs["max_tokens"] == 1200
+
+        create_chat_completion(client, STAGE_ANALYSIS, model="deepseek-chat", messages=[], max_tokens=50)
+        assert client.chat.completions.create.call_args.kwargs["max_tokens"] == 50
+
+
+class TestModelRouter:
+    """测试按p95延迟目标切换模型"""
+
+    def test_no_fallback_configured(self):
+        router = ModelRouter(metrics=LLMMetricsRegistry())
+        assert router.route(STAGE_ANALYSIS) == "deepseek-chat"
+
+    @pytest.mark.usefixtures("fallback_env")
+    def test_primary_within_target(self):
+        metrics = LLMMetricsRegistry()
+        _record(metrics, "deepseek-reasoner", 5.0)
+        router = ModelRouter(metrics=metrics)
+
+        assert router.route(STAGE_ANALYSIS) == "deepseek-reasoner"
+        assert router.snapshot()[STAGE_ANALYSIS]["routed_to"] == "deepseek-reasoner"
+
+    @pytest.mark.usefixtures("fallback_env")
+    def test_falls_back_and_probes_when_p95_exceeds_target(self):
+        metrics = LLMMetricsRegistry()
+        _record(metrics, "deepseek-reasoner", 30.0, outcome=OUTCOME_TIMEOUT)
+        router = ModelRouter(metrics=metrics, probe_interval=4)
+
+        models = [router.route(STAGE_ANALYSIS) for _ in range(8)]
+        assert models.count("deepseek-chat") == 6
+        assert models[3] == models[7] == "deepseek-reasoner"
+        assert router.snapshot()[STAGE_ANALYSIS]["model_p95"] == 30.0
+
+        # 探测请求恢复正常后切回阶段模型
+        metrics.reset()
+        _record(metrics, "deepseek-reasoner", 5.0)
+        assert router.route(STAGE_ANALYSIS) == "deepseek-reasoner"
+
+
+class TestStageModelTracking:
+    """测试记录各阶段实际使用的模型"""
+
+    def test_records_served_model(self):
+        models = track_stage_models()
+        client = MagicMock()
+
+        create_chat_completion(client, STAGE_ANALYSIS, model="deepseek-chat", messages=[])
+        record_stage_model(STAGE_REPORT_STRUCTURE, "fast-model")
+
+        assert models == {STAGE_ANALYSIS: "deepseek-chat", STAGE_REPORT_STRUCTURE: "fast-model"}
+
+    def test_failed_calls_not_recorded(self):
+        models = track_stage_models()
+        client = MagicMock()
+        client.chat.completions.create.side_effect = ValueError
+
+        with pytest.raises(ValueError):
+            create_chat_completion(client, STAGE_ANALYSIS, model="deepseek-chat", messages=[])
+        assert models == {}
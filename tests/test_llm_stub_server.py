@@ -0,0 +1,119 @@
+"""
+测试本地LLM替身服务
+"""
+
+import json
+import random
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from openai.types.chat import ChatCompletion
+
+from medcrux.analysis.llm_engine import analyze_birads_independently, analyze_text_with_deepseek
+from medcrux.analysis.llm_stub_server import app, build_structure_response, detect_stage, parse_latency_spec
+
+REPORT_TEXT = (
+    "超声描述：在左侧乳腺3点钟方向距乳头约19mm处查见约1.2×0.8×0.6cm低回声，形态规则，边界清楚，内部回声均匀。"
+    "在右侧乳腺外上象限查见约0.9×0.5cm无回声，边界清晰。"
+    "超声提示：左侧乳腺低回声结节，BI-RADS 3类；右侧乳腺囊肿，BI-RADS 2类。"
+    "建议：6个月后复查。报告医师：[医师]"
+)
+
+
+@pytest.fixture
+def stub_client(monkeypatch):
+    monkeypatch.delenv("MEDCRUX_STUB_LATENCY", raising=False)
+    monkeypatch.delenv("MEDCRUX_STUB_ERROR_RATE", raising=False)
+    return TestClient(app)
+
+
+def _chat(stub_client, system_prompt: str, user_message: str) -> dict:
+    response = stub_client.post(
+        "/v1/chat/completions",
+        json={
+            "model": "deepseek-chat",
+            "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_message}],
+        },
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestLatencySpec:
+    """测试延迟分布配置"""
+
+    def test_fixed_and_zero(self):
+        rng = random.Random(0)
+        assert parse_latency_spec(None)(rng) == 0.0
+        assert parse_latency_spec("1.5")(rng) == pytest.approx(1.5)
+        assert parse_latency_spec("fixed:0.2")(rng) == pytest.approx(0.2)
+
+    def test_distributions_are_reproducible_with_seed(self):
+        sampler = parse_latency_spec("lognormal:2.0,0.4")
+        first = [sampler(random.Random(42)) for _ in range(3)]
+        second = [sampler(random.Random(42)) for _ in range(3)]
+        assert first == second
+        assert all(value > 0 for value in first)
+        assert 1.0 <= parse_latency_spec("uniform:1,3")(random.Random(1)) <= 3.0
+
+    def test_invalid_spec(self):
+        with pytest.raises(ValueError):
+            parse_latency_spec("weibull:1,2")
+
+
+class TestStageResponses:
+    """测试各阶段响应"""
+
+    def test_detect_stage(self):
+        assert detect_stage("你是MedCrux报告结构解析助手") == "report_structure"
+        assert detect_stage("识别异常发现并独立判断BI-RADS分类") == "independent_birads"
+        assert detect_stage("你是MedCrux医学影像分析助手") == "analysis"
+
+    def test_structure_split(self):
+        result = build_structure_response(REPORT_TEXT)
+        assert result["findings"].startswith("在左侧乳腺")
+        assert result["diagnosis"].startswith("超声提示")
+        assert result["recommendation"] == "6个月后复查。"
+
+    def test_independent_birads_response_schema(self, stub_client):
+        data = _chat(stub_client, "独立判断BI-RADS分类", f"这是检查所见：\n\n{REPORT_TEXT}")
+        content = json.loads(data["choices"][0]["message"]["content"])
+
+        assert len(content["nodules"]) == 2
+        first = content["nodules"][0]
+        assert first["location"] == {"breast": "left", "clock_position": "3点", "distance_from_nipple": "1.9"}
+        assert first["morphology"]["size"] == "1.2×0.8×0.6 cm"
+        assert content["nodules"][1]["llm_birads_class"] == "2"
+        assert content["llm_highest_birads"] == "3"
+        assert data["usage"]["prompt_tokens"] > 0
+
+    def test_canned_response(self, stub_client, tmp_path, monkeypatch):
+        (tmp_path / "analysis.json").write_text(json.dumps({"nodules": [], "canned": True}), encoding="utf-8")
+        monkeypatch.setenv("MEDCRUX_STUB_CANNED_DIR", str(tmp_path))
+        data = _chat(stub_client, "你是MedCrux医学影像分析助手", REPORT_TEXT)
+        assert json.loads(data["choices"][0]["message"]["content"])["canned"] is True
+
+    def test_error_rate(self, stub_client, monkeypatch):
+        monkeypatch.setenv("MEDCRUX_STUB_ERROR_RATE", "1")
+        response = stub_client.post("/v1/chat/completions", json={"messages": []})
+        assert response.status_code == 503
+
+
+class TestPipelineAgainstStub:
+    """使用替身服务跑通真实的LLM调用流程（不访问网络）"""
+
+    def test_llm_engine_against_stub(self, stub_client):
+        def create(timeout=None, **kwargs):
+            response = stub_client.post("/v1/chat/completions", json=kwargs)
+            response.raise_for_status()
+            return ChatCompletion.model_validate(response.json())
+
+        stub_openai = MagicMock()
+        stub_openai.chat.completions.create.side_effect = create
+        with patch("medcrux.analysis.llm_engine.client", stub_openai):
+            analysis = analyze_text_with_deepseek(REPORT_TEXT)
+            independent = analyze_birads_independently(REPORT_TEXT)
+
+        assert analysis["overall_assessment"]["total_nodules"] == 2
+        assert independent["llm_highest_birads"] == "3"
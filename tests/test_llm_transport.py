@@ -0,0 +1,120 @@
+"""
+测试LLM共享连接池
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from medcrux.analysis import llm_provider, llm_transport
+from medcrux.analysis.llm_transport import PoolConfig, PooledTransport
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 保持连接
+
+    def do_GET(self):
+        time.sleep(0.2)
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fresh_pool(monkeypatch):
+    monkeypatch.setenv("MEDCRUX_LLM_PROVIDER", "local")
+    llm_provider.reset_client()
+    yield
+    llm_provider.reset_client()
+
+
+class TestPooledTransport:
+    """测试连接池的复用和使用情况统计"""
+
+    def test_connections_reused_and_utilization_tracked(self, server_url):
+        transport = PooledTransport(PoolConfig(max_connections=4, max_keepalive_connections=4))
+        with httpx.Client(transport=transport) as http_client:
+            for _ in range(2):
+                with ThreadPoolExecutor(max_workers=3) as executor:
+                    list(executor.map(lambda _: http_client.get(server_url), range(3)))
+
+            snapshot = transport.snapshot()
+            # 第二轮复用第一轮建立的3个连接
+            assert snapshot["connections"] == 3
+            assert snapshot["idle_connections"] == 3
+            assert snapshot["requests"] == 6
+            assert snapshot["peak_in_flight"] == 3
+            assert snapshot["in_flight"] == 0
+            assert snapshot["utilization"] == 0
+
+    def test_http2_falls_back_without_h2(self):
+        with patch("importlib.util.find_spec", return_value=None):
+            assert PooledTransport(PoolConfig(http2=True)).http2 is False
+        assert PooledTransport(PoolConfig()).http2 is False
+
+
+class TestSharedClient:
+    """测试所有阶段共用的客户端和连接池"""
+
+    def test_pool_created_lazily_and_shared(self, fresh_pool, monkeypatch):
+        monkeypatch.setenv("MEDCRUX_LLM_POOL_MAX_CONNECTIONS", "7")
+        assert llm_transport.pool_snapshot() is None
+
+        client = llm_provider.get_client()
+        assert llm_provider.get_client() is client
+        assert client._client is llm_transport.get_http_client()
+        snapshot = llm_transport.pool_snapshot()
+        assert snapshot["max_connections"] == 7
+        assert snapshot["requests"] == 0
+
+    def test_reset_client_recreates_pool(self, fresh_pool, monkeypatch):
+        llm_provider.get_client()
+        first = llm_transport.get_http_client()
+        monkeypatch.setenv("MEDCRUX_LLM_POOL_MAX_CONNECTIONS", "3")
+        llm_provider.reset_client()
+        assert llm_transport.pool_snapshot() is None
+
+        llm_provider.get_client()
+        assert llm_transport.get_http_client() is not first
+        assert llm_transport.pool_snapshot()["max_connections"] == 3
+
+    def test_proxy_goes_through_pool(self, fresh_pool, server_url, monkeypatch):
+        """配置代理时请求经连接池发往代理，而不是httpx按环境变量挂载的传输层"""
+        monkeypatch.setenv("HTTP_PROXY", server_url)
+        monkeypatch.delenv("NO_PROXY", raising=False)
+        monkeypatch.delenv("no_proxy", raising=False)
+
+        http_client = llm_transport.get_http_client("http://llm.invalid/v1")
+        assert http_client.get("http://llm.invalid/v1/models").status_code == 200
+
+        snapshot = llm_transport.pool_snapshot()
+        assert snapshot["proxied"] is True
+        assert snapshot["requests"] == 1
+
+    def test_no_proxy_bypasses_proxy(self, fresh_pool, monkeypatch):
+        monkeypatch.setenv("HTTPS_PROXY", "http://proxy.invalid:3128")
+        monkeypatch.setenv("NO_PROXY", "api.deepseek.com")
+
+        llm_transport.get_http_client("https://api.deepseek.com")
+        assert llm_transport.pool_snapshot()["proxied"] is False
@@ -0,0 +1,99 @@
+"""
+测试位置标准化模块
+"""
+
+import pytest
+
+from medcrux.analysis.location_normalizer import (
+    convert_quadrant_to_clock_position,
+    normalize_location,
+    normalize_nodule_location,
+    normalize_quadrant,
+    parse_clock_position,
+    parse_distance_cm,
+    parse_size_cm,
+)
+
+
+class TestParsers:
+    """测试单项解析"""
+
+    @pytest.mark.parametrize(
+        ("raw", "expected"),
+        [("3点钟方向", "3点"), ("11点", "11点"), ("3:00", "3点"), ("10 o'clock", "10点"), (7, "7点"), ("13点", None)],
+    )
+    def test_clock_position(self, raw, expected):
+        assert parse_clock_position(raw) == expected
+
+    @pytest.mark.parametrize(
+        ("raw", "expected"),
+        [("外上象限", "上外"), ("右乳内下", "下内"), ("UOQ", "上外"), ("乳晕区", "中央区"), ("腺体", None)],
+    )
+    def test_quadrant(self, raw, expected):
+        assert normalize_quadrant(raw) == expected
+
+    def test_quadrant_mirroring(self):
+        assert convert_quadrant_to_clock_position("外上象限", "left") == "11点"
+        assert convert_quadrant_to_clock_position("外上象限", "right") == "1点"
+        assert convert_quadrant_to_clock_position("上方", "right") is None
+        assert convert_quadrant_to_clock_position("乳晕后", "left") is None
+        assert convert_quadrant_to_clock_position("", "left") is None
+
+    @pytest.mark.parametrize(
+        ("raw", "expected"),
+        [("约27mm", "2.7"), ("距乳头约1.9cm", "1.9"), ("2.5", "2.5"), (2.7, "2.7"), ("27", "2.7"), ("15毫米", "1.5")],
+    )
+    def test_distance(self, raw, expected):
+        assert parse_distance_cm(raw) == expected
+
+    @pytest.mark.parametrize(
+        ("raw", "expected"),
+        [
+            ("12×8×6mm", "1.2×0.8×0.6 cm"),
+            ("1.2x0.8cm", "1.2×0.8 cm"),
+            ("1.2×0.8×0.6 cm", "1.2×0.8×0.6 cm"),
+            ("1.0*0.6", "1×0.6 cm"),
+        ],
+    )
+    def test_size(self, raw, expected):
+        assert parse_size_cm(raw) == expected
+
+
+class TestNormalizeLocation:
+    """测试位置字典标准化"""
+
+    def test_quadrant_only(self):
+        location = normalize_location(
+            {"breast": "右乳", "clock_position": "外下象限", "distance_from_nipple": "约27mm"}
+        )
+        assert location == {
+            "breast": "right",
+            "clock_position": "5点",
+            "quadrant": "下外",
+            "distance_from_nipple": "2.7",
+        }
+
+    @pytest.mark.parametrize("raw", ["乳晕后", "乳头旁", "上方"])
+    def test_central_or_vague_region_has_no_clock(self, raw):
+        location = normalize_location({"breast": "right", "clock_position": raw})
+        assert location["quadrant"] == normalize_quadrant(raw)
+        assert location["clock_position"] is None
+        assert normalize_location({"breast": "left", "quadrant": raw}).get("clock_position") is None
+
+    def test_explicit_clock_wins_over_quadrant(self):
+        location = normalize_location({"breast": "left", "clock_position": "10点钟方向", "quadrant": "外上"})
+        assert location["clock_position"] == "10点"
+        assert location["quadrant"] == "上外"
+
+    def test_idempotent(self):
+        normalized = {"breast": "left", "clock_position": "11点", "quadrant": "上外", "distance_from_nipple": "2"}
+        assert normalize_location(normalized) == normalized
+
+    def test_unrecognized_kept(self):
+        assert normalize_location({"breast": "left", "clock_position": "腺体深层"})["clock_position"] == "腺体深层"
+
+    def test_nodule(self):
+        nodule = {"location": {"breast": "L", "clock_position": "3点钟"}, "morphology": {"size": "12×8mm"}}
+        normalize_nodule_location(nodule)
+        assert nodule["location"] == {"breast": "left", "clock_position": "3点"}
+        assert nodule["morphology"]["size"] == "1.2×0.8 cm"
@@ -0,0 +1,110 @@
+"""
+测试长报告分块和并发结构解析
+"""
+
+import threading
+import time
+from unittest.mock import patch
+
+from medcrux.analysis.long_report import (
+    extract_breast_text,
+    is_long_text,
+    merge_report_structures,
+    pack_chunks,
+    parse_long_report_structure,
+    split_long_text,
+    split_sections,
+)
+
+THYROID = "甲状腺超声\n甲状腺左叶查见0.3cm低回声结节，边界清晰。\n超声提示：甲状腺结节，TI-RADS 3类。"
+BREAST = (
+    "乳腺超声\n双侧乳腺腺体结构清晰。在左侧乳腺3点查见1.2×0.8cm低回声结节，边界清晰。\n\n"
+    "CDFI：未见明显血流信号。\n超声提示：左侧乳腺低回声结节，BI-RADS 3类。"
+)
+ECG = "心电图\n窦性心律，心电图正常。"
+REPORT = f"[体检中心] 姓名：[姓名] 性别：女\n{THYROID}\n{BREAST}\n{ECG}"
+
+
+class TestSplitLongText:
+    """测试切分和筛选"""
+
+    def test_split_on_exam_titles_and_blank_lines(self):
+        sections = split_sections(REPORT)
+        assert sections[0].startswith("[体检中心]")
+        assert sections[1].startswith("甲状腺超声")
+        assert sections[2].startswith("乳腺超声")
+        assert sections[3].startswith("CDFI")
+        assert sections[4].startswith("心电图")
+
+    def test_keep_breast_sections_and_continuation(self):
+        text = extract_breast_text(REPORT)
+        assert "乳腺超声" in text
+        # 空行后的续写段落保留
+        assert "CDFI" in text
+        assert "甲状腺" not in text
+        assert "心电图" not in text
+        assert "姓名" not in text
+
+    def test_no_breast_section_keeps_all(self):
+        text = f"{THYROID}\n{ECG}"
+        assert extract_breast_text(text) == "\n".join(split_sections(text))
+
+    def test_pack_chunks_respects_limit_and_order(self):
+        sections = ["甲" * 40, "乙" * 40, "丙。" * 50]
+        chunks = pack_chunks(sections, 100)
+        assert all(len(chunk) <= 100 for chunk in chunks)
+        assert "".join(chunks).replace("\n", "") == "".join(sections)
+
+    def test_threshold(self, monkeypatch):
+        monkeypatch.setenv("MEDCRUX_LONG_TEXT_THRESHOLD", "100")
+        assert is_long_text("字" * 101)
+        assert not is_long_text("字" * 100)
+        assert not is_long_text("")
+
+
+class TestParseLongReportStructure:
+    """测试分块并发解析和合并"""
+
+    def test_merge_in_chunk_order(self):
+        merged = merge_report_structures(
+            [
+                {"findings": "右乳结节", "diagnosis": "BI-RADS 3类", "recommendation": None},
+                {},
+                {"findings": "左乳结节", "diagnosis": "BI-RADS 3类", "recommendation": "定期复查"},
+            ]
+        )
+        assert merged == {"findings": "右乳结节\n左乳结节", "diagnosis": "BI-RADS 3类", "recommendation": "定期复查"}
+
+    def test_chunks_parsed_concurrently_and_merged_deterministically(self, monkeypatch):
+        monkeypatch.setenv("MEDCRUX_LONG_TEXT_CHUNK_CHARS", "60")
+        chunks = split_long_text(REPORT)
+        assert len(chunks) >= 2
+        # 所有分块同时在途才能通过屏障，串行执行会超时
+        barrier = threading.Barrier(len(chunks), timeout=5)
+
+        def parse(chunk):
+            index = chunks.index(chunk)
+            barrier.wait()
+            # 先提交的分块后完成，合并结果仍按原文顺序
+            time.sleep(0.01 * (len(chunks) - index))
+            return {"findings": f"分块{index}", "diagnosis": None, "recommendation": None}
+
+        with patch("medcrux.analysis.long_report.parse_report_structure", side_effect=parse):
+            result = parse_long_report_structure(REPORT)
+
+        assert result["findings"] == "\n".join(f"分块{index}" for index in range(len(chunks)))
+        assert result["diagnosis"] is None
+
+    def test_failed_chunk_is_skipped(self, monkeypatch):
+        monkeypatch.setenv("MEDCRUX_LONG_TEXT_CHUNK_CHARS", "60")
+
+        def parse(chunk):
+            if "CDFI" in chunk:
+                raise ValueError
+            return {"findings": chunk[:4], "diagnosis": None, "recommendation": None}
+
+        with patch("medcrux.analysis.long_report.parse_report_structure", side_effect=parse):
+            result = parse_long_report_structure(REPORT)
+
+        assert result["findings"].startswith("乳腺超声")
+        assert "CDFI" not in result["findings"]
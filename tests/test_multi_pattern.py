@@ -0,0 +1,66 @@
+"""
+测试多关键词匹配器
+"""
+
+from medcrux.analysis.report_structure_parser import HEADER_KEYWORDS, _filter_header_info
+from medcrux.analysis.risk_sign_identifier import identify_risk_signs
+from medcrux.utils.multi_pattern import KeywordMatch, MultiPatternMatcher
+
+
+class TestMultiPatternMatcher:
+    """测试匹配语义"""
+
+    def test_overlapping_and_prefix_matches(self):
+        matcher = MultiPatternMatcher(["不均匀", "回声不均匀", "内部回声不均匀", "回声"])
+        matches = list(matcher.finditer("内部回声不均匀"))
+        assert matches == [
+            KeywordMatch("内部回声不均匀", 0, 7),
+            KeywordMatch("回声不均匀", 2, 7),
+            KeywordMatch("回声", 2, 4),
+            KeywordMatch("不均匀", 4, 7),
+        ]
+
+    def test_find_from_position(self):
+        matcher = MultiPatternMatcher(["姓名", "年龄"])
+        text = "姓名：[姓名] 年龄：45岁"
+        assert matcher.find(text) == KeywordMatch("姓名", 0, 2)
+        assert matcher.find(text, 1) == KeywordMatch("姓名", 4, 6)
+        assert matcher.find(text, 7) == KeywordMatch("年龄", 8, 10)
+        assert matcher.find(text, 10) is None
+
+    def test_ignore_case(self):
+        matcher = MultiPatternMatcher(["CDFI丰富"], ignore_case=True)
+        assert matcher.matched_keywords("cdfi丰富") == {"CDFI丰富"}
+        assert not MultiPatternMatcher(["CDFI丰富"]).search("cdfi丰富")
+
+    def test_empty_keywords(self):
+        matcher = MultiPatternMatcher(["", ""])
+        assert not matcher.search("任意文本")
+        assert matcher.find("任意文本") is None
+        assert matcher.matched_keywords("任意文本") == set()
+        assert not MultiPatternMatcher(["超声"]).search(None)
+
+    def test_matches_keyword_loop(self):
+        text = "左侧乳腺低回声结节，形态不规则，边界模糊，可见毛刺，内部回声不均匀，血流信号丰富。"
+        keywords = ["不规则", "不规则形", "边界模糊", "毛刺", "毛刺状", "回声不均匀", "不均匀", "丰富", "血流信号丰富"]
+        assert MultiPatternMatcher(keywords).matched_keywords(text) == {k for k in keywords if k in text}
+
+
+class TestCallSites:
+    """测试采用匹配器的调用点结果不变"""
+
+    def test_filter_header_lines(self):
+        text = (
+            "超声检查报告\n姓名：[姓名] 性别：女\n科别：乳腺外科 床号：12\n\n"
+            "在左侧乳腺3点钟方向查见低回声结节\n报告医师：[姓名]"
+        )
+        assert all(keyword not in _filter_header_info(text) for keyword in HEADER_KEYWORDS)
+        assert "低回声结节" in _filter_header_info(text)
+
+    def test_risk_signs_strong_before_weak(self):
+        signs = identify_risk_signs({"shape": "不规则形", "boundary": "边界模糊"}, findings_text="CDFI丰富")
+        assert [sign["evidence_level"] for sign in signs] == sorted(
+            (sign["evidence_level"] for sign in signs), key=["strong", "weak"].index
+        )
+        assert len({sign["sign"] for sign in signs}) == len(signs)
+        assert identify_risk_signs({}, findings_text="椭圆形，边界清晰") == []
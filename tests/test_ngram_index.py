@@ -0,0 +1,62 @@
+"""
+测试实体倒排索引：检索词提取、中文查询匹配、打分排序
+"""
+
+from medcrux.rag.ngram_index import EntityNgramIndex, text_terms
+
+ENTITIES = {
+    "sign_micro_calcification": {"name": "微钙化", "content": "乳腺内的微小钙化灶，恶性征象之一。"},
+    "sign_acoustic_shadow": {"name": "声影", "content": "后方回声衰减，伴声影。"},
+    "birads_3": {"name": "BI-RADS 3类", "content": "可能良性，建议6个月复查。"},
+    "birads_4": {"name": "BI-RADS 4类", "content": "可疑恶性，建议穿刺活检。"},
+}
+
+
+class TestTextTerms:
+    """测试检索词提取"""
+
+    def test_chinese_bigrams_and_trigrams(self):
+        assert text_terms("微钙化") == {"微钙", "钙化", "微钙化"}
+
+    def test_single_character_not_indexed(self):
+        assert text_terms("化") == set()
+        assert text_terms("") == set()
+        assert text_terms(None) == set()
+
+    def test_english_tokens_and_leading_digit(self):
+        terms = text_terms("BI-RADS 3类")
+        assert {"bi-rads", "birads", "3"} <= terms
+        assert "3类" in terms
+
+    def test_fullwidth_normalized(self):
+        assert text_terms("ＢＩ－ＲＡＤＳ") == text_terms("BI-RADS")
+
+
+class TestEntityNgramIndex:
+    """测试倒排索引检索"""
+
+    def test_chinese_query_without_spaces(self):
+        index = EntityNgramIndex(ENTITIES)
+        query = "左侧乳腺低回声结节，内部可见微钙化，后方回声衰减伴声影"
+        matched = [entity_id for entity_id, _ in index.search(query)]
+        assert set(matched) == {"sign_micro_calcification", "sign_acoustic_shadow"}
+
+    def test_birads_category_ranked_by_name(self):
+        index = EntityNgramIndex(ENTITIES)
+        results = index.search("BI-RADS 4类")
+        assert results[0][0] == "birads_4"
+        assert results[0][1] > results[1][1]
+
+    def test_limit_and_min_score(self):
+        index = EntityNgramIndex(ENTITIES)
+        query = "BI-RADS 3类 微钙化"
+        assert len(index.search(query, limit=1)) == 1
+        assert all(score > 0.5 for _, score in index.search(query, min_score=0.5))
+
+    def test_unknown_or_empty_query(self):
+        index = EntityNgramIndex(ENTITIES)
+        assert index.search("") == []
+        assert index.search("甲状腺") == []
+        assert EntityNgramIndex({}).search("微钙化") == []
+        assert len(index) == 4
+        assert index.term_count > 0
@@ -13,7 +13,12 @@ import os
 
 import pytest
 
-from medcrux.analysis.report_structure_parser import parse_report_structure
+from medcrux.analysis.report_structure_parser import (
+    ANALYSIS_INPUT_FULL_TEXT,
+    ANALYSIS_INPUT_SECTIONS,
+    build_analysis_input,
+    parse_report_structure,
+)
 
 
 class TestReportStructureParser:
@@ -152,3 +157,43 @@ class TestReportStructureParser:
                 # 如果原来没有key，确保清理
                 os.environ.pop("DEEPSEEK_API_KEY", None)
 
+
+class TestBuildAnalysisInput:
+    """测试主分析输入构建（只发送检查所见和影像学诊断）"""
+
+    OCR_TEXT = (
+        "[医疗机构名称] 姓名：[患者姓名] 性别：女 年龄：[年龄] 超声号：[超声号] "
+        "检查技术：彩色多普勒超声，线阵探头7.5MHz。"
+        "超声描述：在左侧乳腺3点钟方向查见约1.2×0.8cm低回声，形态规则，边界清楚。"
+        "超声提示：左侧乳腺低回声结节，BI-RADS 3类。"
+        "甲状腺超声：甲状腺大小正常。报告医师：[医师] 报告日期：[日期]"
+    )
+    STRUCTURE = {
+        "findings": "在左侧乳腺3点钟方向查见约1.2×0.8cm低回声，形态规则，边界清楚。",
+        "diagnosis": "超声提示：左侧乳腺低回声结节，BI-RADS 3类。",
+        "recommendation": None,
+    }
+
+    def test_uses_sections_when_structure_parsed(self):
+        text, source = build_analysis_input(self.OCR_TEXT, self.STRUCTURE)
+
+        assert source == ANALYSIS_INPUT_SECTIONS
+        assert self.STRUCTURE["findings"] in text
+        assert "BI-RADS 3类" in text
+        assert "超声号" not in text
+        assert "甲状腺" not in text
+        assert len(text) < len(self.OCR_TEXT)
+
+    def test_keeps_patient_gender(self):
+        text, _ = build_analysis_input(self.OCR_TEXT, self.STRUCTURE)
+        assert text.startswith("性别：女")
+
+    def test_falls_back_to_full_text(self):
+        assert build_analysis_input(self.OCR_TEXT, None) == (self.OCR_TEXT, ANALYSIS_INPUT_FULL_TEXT)
+        assert build_analysis_input(self.OCR_TEXT, {"findings": None, "diagnosis": "BI-RADS 3类"}) == (
+            self.OCR_TEXT,
+            ANALYSIS_INPUT_FULL_TEXT,
+        )
+        assert build_analysis_input(self.OCR_TEXT, {"findings": "见下", "diagnosis": None})[1] == (
+            ANALYSIS_INPUT_FULL_TEXT
+        )
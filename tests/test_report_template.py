@@ -0,0 +1,234 @@
+"""
+测试报告模板识别：指纹、从解析结果学习章节标题、按模板切分、命中统计和模板文件
+"""
+
+import json
+from unittest.mock import patch
+
+from medcrux.analysis import report_structure_parser
+from medcrux.analysis.report_template import ReportTemplateRegistry, section_label_pattern
+
+
+def make_report(index: int, hospital: str = "某某市第一人民医院") -> str:
+    return (
+        f"{hospital} 超声检查报告单\n"
+        f"姓名：[姓名] 性别：女 年龄：{40 + index}岁 超声号：{1000 + index}\n"
+        "超声表现：\n"
+        f"双侧乳腺腺体结构清晰。在左侧乳腺{index}点钟方向查见1.{index}×0.8cm低回声结节，边界清晰。\n"
+        "超声印象：\n"
+        "左侧乳腺低回声结节，BI-RADS 3类。\n"
+        "随访建议：6个月复查。\n"
+        "报告医师：[医师] 报告日期：[日期]"
+    )
+
+
+def make_multi_exam_report() -> str:
+    """同一模板的甲状腺+乳腺多检查报告（章节标题各出现两次）"""
+    return (
+        "某某市第一人民医院 超声检查报告单\n"
+        "姓名：[姓名] 性别：女 年龄：52岁 超声号：2001\n"
+        "超声表现：\n"
+        "甲状腺右叶查见0.5×0.4cm低回声结节，边界清晰，形态规则。\n"
+        "超声印象：\n"
+        "甲状腺结节，TI-RADS 3类。\n"
+        "超声表现：\n"
+        "左侧乳腺2点钟方向查见1.6×1.2cm低回声结节，形态不规则，边界模糊，可见毛刺及微钙化。\n"
+        "超声印象：\n"
+        "左侧乳腺低回声结节，BI-RADS 4C类。\n"
+        "随访建议：穿刺活检。\n"
+        "报告医师：[医师] 报告日期：[日期]"
+    )
+
+
+def llm_structure(report: str) -> dict:
+    """模拟LLM的解析结果（影像学诊断保留标题）"""
+    findings = report.split("超声表现：\n")[1].split("\n超声印象", maxsplit=1)[0]
+    diagnosis = report.split("超声印象：\n")[1].split("\n随访建议", maxsplit=1)[0]
+    return {"findings": findings, "diagnosis": f"超声印象：{diagnosis}", "recommendation": "6个月复查。"}
+
+
+def make_registry(**kwargs) -> ReportTemplateRegistry:
+    return ReportTemplateRegistry(
+        marker_pattern=section_label_pattern(["姓名", "性别", "年龄", "超声号", "报告医师", "报告日期"]),
+        footer_pattern=section_label_pattern(["报告医师", "审核医师", "报告日期"]),
+        **kwargs,
+    )
+
+
+class TestReportTemplateRegistry:
+    """测试模板注册表"""
+
+    def test_fingerprint_ignores_patient_values(self):
+        registry = make_registry()
+        assert registry.fingerprint(make_report(1))[0] == registry.fingerprint(make_report(2))[0]
+        assert registry.fingerprint(make_report(1))[0] != registry.fingerprint(make_report(1, "另一家医院"))[0]
+        assert registry.fingerprint(make_report(1))[1] != registry.fingerprint(make_report(1, "另一家医院"))[1]
+
+    def test_title_not_exported_or_persisted(self, tmp_path):
+        path = tmp_path / "templates.json"
+        registry = make_registry(path=path)
+        report = make_report(1, "张三")
+        registry.learn(report, llm_structure(report))
+        assert "张三" not in str(registry.snapshot())
+        assert "张三" not in path.read_text(encoding="utf-8")
+
+    def test_learns_labels_and_applies_after_min_observations(self):
+        registry = make_registry(min_observations=2)
+        registry.learn(make_report(1), llm_structure(make_report(1)))
+        assert registry.apply(make_report(3)) is None
+
+        registry.learn(make_report(2), llm_structure(make_report(2)))
+        split = registry.apply(make_report(3))
+        assert split.findings.startswith("双侧乳腺腺体结构清晰")
+        assert "超声印象" not in split.findings
+        assert split.diagnosis.startswith("超声印象")
+        assert split.recommendation == "6个月复查。"
+
+        snapshot = registry.snapshot()
+        assert snapshot["stable"] == 1
+        assert snapshot["hits"] == 1
+        assert snapshot["misses"] == 1
+        assert snapshot["per_template"][0]["labels"] == {
+            "findings": "超声表现",
+            "diagnosis": "超声印象",
+            "recommendation": "随访建议",
+        }
+        assert snapshot["per_template"][0]["hit_rate"] == 0.5
+
+    def test_unknown_template_and_rejected_split_miss(self):
+        registry = make_registry(min_observations=1)
+        registry.learn(make_report(1), llm_structure(make_report(1)))
+        assert registry.apply(make_report(2, "另一家医院")) is None
+        assert registry.apply(make_report(2), accept=lambda split: False) is None
+        assert registry.snapshot()["misses"] == 2
+
+    def test_conflicting_labels_restart_observations(self):
+        registry = make_registry(min_observations=2)
+        registry.learn(make_report(1), llm_structure(make_report(1)))
+        # 同一模板指纹，但影像学诊断的标题不同
+        report = make_report(2).replace("超声印象", "超声结论")
+        structure = {**llm_structure(make_report(2)), "diagnosis": "超声结论：左侧乳腺低回声结节，BI-RADS 3类。"}
+        registry.learn(report, structure)
+
+        template = registry.snapshot()["per_template"][0]
+        assert template["observations"] == 1
+        assert template["labels"]["diagnosis"] == "超声结论"
+        assert registry.apply(make_report(3)) is None
+
+    def test_repeated_labels_miss(self):
+        registry = make_registry(min_observations=1)
+        registry.learn(make_report(1), llm_structure(make_report(1)))
+        assert registry.fingerprint(make_multi_exam_report())[0] == registry.fingerprint(make_report(1))[0]
+        assert registry.apply(make_multi_exam_report()) is None
+        assert registry.snapshot()["misses"] == 1
+
+    def test_unreproducible_structure_not_learned(self):
+        registry = make_registry()
+        structure = {"findings": "双侧乳腺腺体结构清晰", "diagnosis": None}
+        assert registry.learn(make_report(1), structure) is None
+        assert registry.snapshot()["templates"] == 0
+
+    def test_templates_persisted_to_file(self, tmp_path):
+        path = tmp_path / "templates.json"
+        registry = make_registry(min_observations=2, path=path)
+        for index in (1, 2):
+            registry.learn(make_report(index), llm_structure(make_report(index)))
+        assert path.exists()
+
+        reloaded = make_registry(min_observations=2, path=path)
+        assert reloaded.apply(make_report(3)) is not None
+
+    def test_template_file_with_extra_fields_loads(self, tmp_path):
+        """旧版本写入的模板文件（含已不再记录的头部字段）仍可加载"""
+        path = tmp_path / "templates.json"
+        registry = make_registry(min_observations=1, path=path)
+        registry.learn(make_report(1), llm_structure(make_report(1)))
+        data = json.loads(path.read_text(encoding="utf-8"))
+        assert "header_fields" not in data["templates"][0]
+        data["templates"][0]["header_fields"] = ["姓名", "性别", "年龄", "超声号"]
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+        reloaded = make_registry(min_observations=1, path=path)
+        assert reloaded.apply(make_report(2)) is not None
+
+    def test_templates_without_required_labels_skipped_on_load(self, tmp_path):
+        path = tmp_path / "templates.json"
+        registry = make_registry(min_observations=1, path=path)
+        registry.learn(make_report(1), llm_structure(make_report(1)))
+        data = json.loads(path.read_text(encoding="utf-8"))
+        data["templates"][0]["labels"].pop("diagnosis")
+        data["templates"].append({"template_id": "incomplete"})
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+        reloaded = make_registry(min_observations=1, path=path)
+        assert reloaded.snapshot()["templates"] == 0
+        assert reloaded.apply(make_report(2)) is None
+
+    def test_split_without_required_label(self):
+        registry = make_registry()
+        assert registry._split_with_labels(make_report(1), {"findings": "超声表现"}) is None
+
+    def test_disabled(self):
+        registry = make_registry(max_templates=0)
+        assert registry.learn(make_report(1), llm_structure(make_report(1))) is None
+        assert registry.apply(make_report(1)) is None
+
+
+class TestParseReportStructureWithTemplates:
+    """测试parse_report_structure在LLM解析之前应用已学到的模板"""
+
+    def setup_method(self):
+        # 通过模块访问（其他测试可能重新加载该模块）
+        report_structure_parser.local_split_stats.reset()
+
+    def test_known_template_skips_llm(self):
+        for index in (1, 2):
+            report = make_report(index)
+            with (
+                patch("medcrux.analysis.report_structure_parser.create_chat_completion") as mock_create,
+                patch(
+                    "medcrux.analysis.report_structure_parser.parse_json_response",
+                    return_value=llm_structure(report),
+                ),
+            ):
+                report_structure_parser.parse_report_structure(report)
+            mock_create.assert_called_once()
+
+        with patch("medcrux.analysis.report_structure_parser.create_chat_completion") as mock_create:
+            result = report_structure_parser.parse_report_structure(make_report(3))
+
+        mock_create.assert_not_called()
+        assert "超声号" not in result["findings"]
+        assert "BI-RADS 3类" in result["diagnosis"]
+        assert result["recommendation"] == "6个月复查。"
+        snapshot = report_structure_parser.local_split_stats.snapshot()
+        assert snapshot["template"] == 1
+        assert snapshot["llm"] == 2
+
+    def test_multi_exam_report_of_known_template_uses_llm(self):
+        for index in (1, 2):
+            report = make_report(index)
+            with (
+                patch("medcrux.analysis.report_structure_parser.create_chat_completion"),
+                patch(
+                    "medcrux.analysis.report_structure_parser.parse_json_response",
+                    return_value=llm_structure(report),
+                ),
+            ):
+                report_structure_parser.parse_report_structure(report)
+
+        breast_structure = {
+            "findings": "左侧乳腺2点钟方向查见1.6×1.2cm低回声结节，形态不规则，边界模糊，可见毛刺及微钙化。",
+            "diagnosis": "超声印象：左侧乳腺低回声结节，BI-RADS 4C类。",
+            "recommendation": "穿刺活检。",
+        }
+        with (
+            patch("medcrux.analysis.report_structure_parser.create_chat_completion") as mock_create,
+            patch("medcrux.analysis.report_structure_parser.parse_json_response", return_value=breast_structure),
+        ):
+            result = report_structure_parser.parse_report_structure(make_multi_exam_report())
+
+        mock_create.assert_called_once()
+        assert "TI-RADS" not in result["diagnosis"]
+        assert "BI-RADS 4C类" in result["diagnosis"]
+        assert report_structure_parser.local_split_stats.snapshot()["template"] == 0